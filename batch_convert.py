@@ -0,0 +1,274 @@
+"""Normalise and convert whole directory trees of sgexml files headlessly.
+
+Usage::
+
+    python batch_convert.py INPUT_DIR OUTPUT_DIR [--workers 4] [--formats triorb json]
+
+Every ``*.sgexml`` below ``INPUT_DIR`` is read with the ``main.py`` loaders
+(shape deduplication into TriOrb Shapes, NameLatin9Key stripping, promotion
+of legacy inline geometry) and written below ``OUTPUT_DIR`` with the same
+relative path. Supported formats:
+
+``triorb``  ``<name>.triorb.sgexml``, identical to ``Save (TriOrb)``
+``legacy``  ``<name>.sick.sgexml``, identical to the legacy SICK export
+``json``    ``<name>.json``, the ``build_index_payload`` dict; the casetable and
+            ScanPlane indexes list their entries and carry only the payloads
+            not already under ``casetable_payload`` / ``fieldsets``
+
+Files below ``OUTPUT_DIR`` and files named like the outputs above are not
+read, so re-running into a directory inside ``INPUT_DIR`` does not convert
+earlier results again. Files are processed in a process pool. A file that cannot be read or parsed
+is reported and skipped; the exit status is 1 when any file failed.
+"""
+
+from __future__ import annotations
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass
+import json
+import os
+from pathlib import Path
+import sys
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+import main
+from packed_points import PackedPoints
+import sgexml_writer
+
+OUTPUT_FORMATS = {
+    "triorb": ".triorb.sgexml",
+    "legacy": ".sick.sgexml",
+    "json": ".json",
+}
+DEFAULT_FORMATS = ("triorb", "json")
+DEFAULT_PATTERN = "*.sgexml"
+
+
+@dataclass(frozen=True)
+class ConversionResult:
+    """Outcome of converting one source file."""
+
+    source: Path
+    size: int
+    seconds: float
+    outputs: Tuple[Path, ...] = ()
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+@dataclass(frozen=True)
+class BatchSummary:
+    """Aggregated results of one batch run."""
+
+    results: Tuple[ConversionResult, ...]
+    seconds: float
+
+    @property
+    def failures(self) -> Tuple[ConversionResult, ...]:
+        return tuple(result for result in self.results if not result.ok)
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(result.size for result in self.results)
+
+    @property
+    def files_per_second(self) -> float:
+        return len(self.results) / self.seconds if self.seconds > 0 else 0.0
+
+    @property
+    def megabytes_per_second(self) -> float:
+        return self.total_bytes / 1e6 / self.seconds if self.seconds > 0 else 0.0
+
+
+def is_output_file(path: Path) -> bool:
+    """Return whether ``path`` is named like one of this tool's outputs."""
+
+    return Path(path).name.endswith(tuple(OUTPUT_FORMATS.values()))
+
+
+def iter_source_files(
+    input_dir: Path, pattern: str = DEFAULT_PATTERN, output_dir: Optional[Path] = None
+) -> Iterator[Path]:
+    """Yield files below ``input_dir`` matching ``pattern`` in a stable order.
+
+    Earlier outputs are skipped: everything below ``output_dir`` (unless it
+    is ``input_dir`` itself) and any file named like an output.
+    """
+
+    input_root = Path(input_dir).resolve()
+    output_root = Path(output_dir).resolve() if output_dir is not None else None
+    if output_root == input_root:
+        output_root = None
+    for path in sorted(Path(input_dir).rglob(pattern)):
+        if not path.is_file() or is_output_file(path):
+            continue
+        if output_root is not None and path.resolve().is_relative_to(output_root):
+            continue
+        yield path
+
+
+def output_paths(
+    source: Path, input_dir: Path, output_dir: Path, formats: Sequence[str]
+) -> List[Tuple[str, Path]]:
+    # 入力ディレクトリからの相対パスを出力側にもそのまま再現する。
+    relative = Path(source).relative_to(input_dir)
+    target_dir = Path(output_dir) / relative.parent
+    return [(fmt, target_dir / (relative.stem + OUTPUT_FORMATS[fmt])) for fmt in formats]
+
+
+def convert_file(
+    source: Path, input_dir: Path, output_dir: Path, formats: Sequence[str]
+) -> ConversionResult:
+    """Convert one file. Errors are captured in the result instead of raised."""
+
+    start = time.perf_counter()
+    size = 0
+    written: List[Path] = []
+    try:
+        data = Path(source).read_bytes()
+        size = len(data)
+        document = main.SgexmlDocument.from_bytes(Path(source), data)
+        # ローダーは UI 向けにパース失敗をフォールバックで握りつぶすため、
+        # バッチでは既定値のファイルを書き出さずに失敗として扱う。
+        if not document.is_loaded:
+            raise ValueError("not a well-formed XML document")
+        payload = main.build_index_payload(document)
+        for fmt, target in output_paths(source, input_dir, output_dir, formats):
+            target.parent.mkdir(parents=True, exist_ok=True)
+            if fmt == "json":
+                with target.open("w", encoding="utf-8") as handle:
+                    json.dump(payload, handle, ensure_ascii=False, indent=2, default=_json_default)
+            else:
+                sgexml_writer.write_sgexml(payload, target, fmt)
+            written.append(target)
+    except Exception as exc:  # noqa: BLE001 - 1 ファイルの失敗でバッチ全体を止めない
+        return ConversionResult(
+            Path(source),
+            size,
+            time.perf_counter() - start,
+            tuple(written),
+            f"{type(exc).__name__}: {exc}",
+        )
+    return ConversionResult(Path(source), size, time.perf_counter() - start, tuple(written))
+
+
+def _json_default(value: object) -> object:
+    # Polygon 座標は PackedPoints で保持されているため、従来の点 dict のリストで書き出す。
+    if isinstance(value, PackedPoints):
+        return value.to_dicts()
+    if isinstance(value, (main.CasetableIndex, main.FieldsetPlaneIndex)):
+        return _index_json(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _index_json(index: Union[main.CasetableIndex, main.FieldsetPlaneIndex]) -> Dict[str, Any]:
+    # 表示中の Casetable / 編集中の ScanPlane は casetable_payload / fieldsets と同じ内容なので、
+    # 索引には一覧と、それ以外のペイロードだけを書き出す。
+    return {
+        "summaries": index.summaries(),
+        "payloads": {key: index.payload(key) for key in index if key != index.default_key},
+    }
+
+
+def run_batch(
+    input_dir: Path,
+    output_dir: Path,
+    *,
+    formats: Sequence[str] = DEFAULT_FORMATS,
+    workers: Optional[int] = None,
+    pattern: str = DEFAULT_PATTERN,
+    on_result: Optional[Callable[[ConversionResult], None]] = None,
+) -> BatchSummary:
+    """Convert every matching file below ``input_dir``.
+
+    ``workers`` defaults to ``os.cpu_count()``; ``1`` converts in-process,
+    which is easier to debug. ``on_result`` is called as each file finishes.
+    """
+
+    unknown = [fmt for fmt in formats if fmt not in OUTPUT_FORMATS]
+    if unknown:
+        raise ValueError(f"Unknown output format(s): {', '.join(unknown)}")
+    input_dir = Path(input_dir)
+    output_dir = Path(output_dir)
+    sources = list(iter_source_files(input_dir, pattern, output_dir))
+    worker_count = max(1, workers or os.cpu_count() or 1)
+    start = time.perf_counter()
+    results: List[ConversionResult] = []
+    for result in _iter_results(sources, input_dir, output_dir, tuple(formats), worker_count):
+        results.append(result)
+        if on_result is not None:
+            on_result(result)
+    results.sort(key=lambda result: str(result.source))
+    return BatchSummary(tuple(results), time.perf_counter() - start)
+
+
+def _iter_results(
+    sources: List[Path],
+    input_dir: Path,
+    output_dir: Path,
+    formats: Tuple[str, ...],
+    worker_count: int,
+) -> Iterable[ConversionResult]:
+    if worker_count == 1 or len(sources) <= 1:
+        for source in sources:
+            yield convert_file(source, input_dir, output_dir, formats)
+        return
+    with ProcessPoolExecutor(max_workers=min(worker_count, len(sources))) as executor:
+        futures = {
+            executor.submit(convert_file, source, input_dir, output_dir, formats): source
+            for source in sources
+        }
+        for future in as_completed(futures):
+            try:
+                yield future.result()
+            except Exception as exc:  # noqa: BLE001 - ワーカープロセス自体の異常終了など
+                yield ConversionResult(futures[future], 0, 0.0, (), f"{type(exc).__name__}: {exc}")
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input_dir", type=Path)
+    parser.add_argument("output_dir", type=Path)
+    parser.add_argument("--workers", type=int, default=None, help="process count (default: CPU count)")
+    parser.add_argument(
+        "--formats",
+        nargs="+",
+        choices=sorted(OUTPUT_FORMATS),
+        default=list(DEFAULT_FORMATS),
+    )
+    parser.add_argument("--pattern", default=DEFAULT_PATTERN, help="glob for input files")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary and failures")
+    args = parser.parse_args(argv)
+
+    if not args.input_dir.is_dir():
+        parser.error(f"input directory not found: {args.input_dir}")
+
+    def report(result: ConversionResult) -> None:
+        if not result.ok:
+            print(f"FAIL {result.source}: {result.error}", file=sys.stderr)
+        elif not args.quiet:
+            print(f"ok   {result.source} ({result.size / 1e6:.2f} MB, {result.seconds:.2f}s)")
+
+    summary = run_batch(
+        args.input_dir,
+        args.output_dir,
+        formats=args.formats,
+        workers=args.workers,
+        pattern=args.pattern,
+        on_result=report,
+    )
+    print(
+        f"{len(summary.results)} files ({len(summary.failures)} failed),"
+        f" {summary.total_bytes / 1e6:.1f} MB in {summary.seconds:.2f}s:"
+        f" {summary.files_per_second:.1f} files/s, {summary.megabytes_per_second:.2f} MB/s"
+    )
+    return 1 if summary.failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,85 @@
+"""Compare eager and lazy Casetable serialization on multi-casetable documents.
+
+Usage::
+
+    python benchmarks/bench_casetables.py [--casetables 8] [--cases 128] [--evals 5]
+        [--fieldsets 50] [--repeat 5]
+
+Writes a synthetic document (see ``synthetic_documents.py``) with
+``--casetables`` Casetables of ``--cases`` cases each and reports, on an
+already parsed document, the time to serialize every casetable up front
+versus indexing them and serializing only the viewed one, the cost of
+fetching one more casetable on demand, and the JSON each approach ships
+with the initial page.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+import sys
+import tempfile
+import time
+from typing import Any, Callable, List
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import main  # noqa: E402
+from synthetic_documents import SyntheticSpec, write_synthetic_document  # noqa: E402
+
+
+def best_ms(func: Callable[[], Any], repeat: int) -> float:
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return (best or 0.0) * 1000
+
+
+def main_cli(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--casetables", type=int, default=8)
+    parser.add_argument("--cases", type=int, default=128)
+    parser.add_argument("--evals", type=int, default=5)
+    parser.add_argument("--fieldsets", type=int, default=50)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    spec = SyntheticSpec(
+        fieldsets=args.fieldsets, points=20, cases=args.cases, evals=args.evals, casetables=args.casetables
+    )
+    with tempfile.TemporaryDirectory() as tmp:
+        path = write_synthetic_document(Path(tmp) / "casetables.sgexml", spec)
+        document = main.SgexmlDocument.load(path)
+        size = path.stat().st_size
+
+    # 索引を毎回作り直し、メモ化の効かない状態で比べる。
+    eager = best_ms(lambda: main.load_casetable_index(document).payloads(), args.repeat)
+    lazy = best_ms(lambda: main.load_casetable_index(document).payload(), args.repeat)
+    index_only = best_ms(lambda: main.load_casetable_index(document), args.repeat)
+    index = main.load_casetable_index(document)
+    keys = index.keys()
+    other = keys[-1]
+    on_demand = best_ms(lambda: main.load_casetable_index(document).payload(other), args.repeat) - index_only
+    eager_json = len(json.dumps(index.payloads(), separators=(",", ":")))
+    lazy_json = len(json.dumps(index.payload(), separators=(",", ":"))) + len(
+        json.dumps(index.summaries(), separators=(",", ":"))
+    )
+
+    print(f"{spec.label}: {size / 1e6:.2f} MB, {len(keys)} casetables")
+    print(f"{'measurement':<44} {'ms':>9} {'JSON KB':>9}")
+    print("-" * 64)
+    print(f"{'eager: serialize every casetable':<44} {eager:>9.2f} {eager_json / 1024:>9.1f}")
+    print(f"{'lazy: index + viewed casetable':<44} {lazy:>9.2f} {lazy_json / 1024:>9.1f}")
+    print(f"{'index only':<44} {index_only:>9.2f}")
+    print(f"{f'on demand: casetable {other}':<44} {on_demand:>9.2f}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,119 @@
+"""Compare per-loader parsing with the shared SgexmlDocument session.
+
+Usage::
+
+    python benchmarks/bench_document_parse.py [--repeat N]
+
+For every ``sample/*.sgexml`` the script reports how many times
+``ET.parse`` ran and the wall time of one full ``index()`` payload build,
+first with the legacy call style (each loader parses on its own), then
+with a single document handed to every loader, and finally through the
+warm ``DocumentPayloadCache`` used by ``index()``.
+"""
+
+from __future__ import annotations
+
+import argparse
+from contextlib import contextmanager
+from pathlib import Path
+import sys
+import time
+from typing import Callable, Dict, Iterator, List
+import xml.etree.ElementTree as ET
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import main  # noqa: E402
+from payload_cache import DocumentPayloadCache  # noqa: E402
+
+
+@contextmanager
+def count_parses() -> Iterator[Dict[str, int]]:
+    """Count ``ET.parse`` calls made while the context is active."""
+
+    counter = {"parses": 0}
+    original = ET.parse
+
+    def _counting_parse(*args, **kwargs):
+        counter["parses"] += 1
+        return original(*args, **kwargs)
+
+    ET.parse = _counting_parse
+    try:
+        yield counter
+    finally:
+        ET.parse = original
+
+
+def _build_legacy() -> None:
+    main.load_fieldsets_and_shapes()
+    main.load_menu_items()
+    main.load_fileinfo_fields()
+    main.load_root_attributes()
+    main.load_scan_planes()
+    main.load_casetable_payload()
+
+
+def _build_shared() -> None:
+    document = main.SgexmlDocument.load()
+    main.load_fieldsets_and_shapes(document)
+    main.load_menu_items(document)
+    main.load_fileinfo_fields(document)
+    main.load_root_attributes(document)
+    main.load_scan_planes(document)
+    main.load_casetable_payload(document)
+
+
+_CACHE: DocumentPayloadCache = DocumentPayloadCache()
+
+
+def _build_cached() -> None:
+    _CACHE.lookup(main.SAMPLE_XML, main._build_cached_index_payload)
+
+
+def _measure(builder: Callable[[], None], repeat: int) -> Dict[str, float]:
+    with count_parses() as counter:
+        builder()
+    parses_per_build = counter["parses"]
+    timings: List[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        builder()
+        timings.append(time.perf_counter() - start)
+    return {
+        "parses": parses_per_build,
+        "best_ms": min(timings) * 1000,
+        "mean_ms": sum(timings) / len(timings) * 1000,
+    }
+
+
+def main_cli(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per sample")
+    args = parser.parse_args(argv)
+
+    samples = sorted((PROJECT_ROOT / "sample").glob("*.sgexml"))
+    header = f"{'sample':<44} {'size KB':>8} {'mode':<7} {'parses':>6} {'best ms':>9} {'mean ms':>9}"
+    print(header)
+    print("-" * len(header))
+    for sample in samples:
+        main.SAMPLE_XML = sample
+        size_kb = sample.stat().st_size / 1024
+        _build_cached()  # ウォームアップしてヒット時のコストだけを測る
+        for label, builder in (
+            ("legacy", _build_legacy),
+            ("shared", _build_shared),
+            ("cached", _build_cached),
+        ):
+            result = _measure(builder, max(1, args.repeat))
+            print(
+                f"{sample.name:<44} {size_kb:>8.1f} {label:<7} {result['parses']:>6}"
+                f" {result['best_ms']:>9.2f} {result['mean_ms']:>9.2f}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
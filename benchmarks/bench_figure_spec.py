@@ -0,0 +1,81 @@
+"""Compare building the base figure through plotly with the memoized dict.
+
+Usage::
+
+    python benchmarks/bench_figure_spec.py [--repeat 50] [--cold 5]
+
+Reports the cold-start import time of ``main`` (and of plotly.graph_objs for
+reference), each measured in a fresh interpreter, and the per-request cost
+of ``go.Figure`` + ``to_plotly_json()`` versus ``sample_figure_spec()``.
+It also checks that both produce the same JSON.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+import subprocess
+import sys
+import time
+from typing import List
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import plotly_panel  # noqa: E402
+
+
+def cold_import_ms(module: str, runs: int) -> float:
+    # 各回を新しいインタープリターで計測し、OS キャッシュの揺らぎを避けて最小値を取る。
+    code = f"import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", code],
+            cwd=PROJECT_ROOT,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout
+        samples.append(float(output.strip()) * 1000)
+    return min(samples)
+
+
+def plotly_figure_json() -> dict:
+    # 変更前の index() と同じく、毎回 Figure を組み立てて dict 化する。
+    import plotly.graph_objs as go
+
+    return go.Figure(plotly_panel.sample_figure_spec()).to_plotly_json()
+
+
+def per_call_ms(func, repeat: int) -> float:
+    func()
+    start = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - start) / repeat * 1000
+
+
+def main_cli(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeat", type=int, default=50, help="calls per per-request measurement")
+    parser.add_argument("--cold", type=int, default=5, help="fresh interpreters per import measurement")
+    args = parser.parse_args(argv)
+
+    same = json.dumps(plotly_figure_json(), sort_keys=True) == json.dumps(
+        plotly_panel.sample_figure_spec(), sort_keys=True
+    )
+    print(f"{'measurement':<36} {'ms':>9}")
+    print("-" * 46)
+    print(f"{'cold import main':<36} {cold_import_ms('main', args.cold):>9.1f}")
+    print(f"{'cold import plotly.graph_objs':<36} {cold_import_ms('plotly.graph_objs', args.cold):>9.1f}")
+    print(f"{'go.Figure + to_plotly_json':<36} {per_call_ms(plotly_figure_json, args.repeat):>9.3f}")
+    print(f"{'sample_figure_spec (memoized)':<36} {per_call_ms(plotly_panel.sample_figure_spec, args.repeat):>9.4f}")
+    print(f"same JSON: {same}")
+    return 0 if same else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
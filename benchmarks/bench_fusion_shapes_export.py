@@ -0,0 +1,89 @@
+"""Compare the Fusion 360 add-in's SVG output with its direct TriOrb Shapes output.
+
+Usage::
+
+    python benchmarks/bench_fusion_shapes_export.py [--bodies 50] [--points 2000]
+
+Synthetic body outlines (see ``bench_fusion_simplify``) are reduced the
+way the add-in does and written once as SVG and once as TriOrb Shapes
+JSON / XML. For each format the script reports the file size, the time
+to write it, and the time to turn it back into editor shapes: SVG goes
+through :func:`svg_path.path_polygons` (the same parsing as Import
+(SVG)), JSON through ``json.loads`` and XML through the loader ``main.py``
+uses for saved TriOrb shapes.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+from pathlib import Path
+import random
+import sys
+import time
+from typing import Callable, List, Tuple
+import xml.etree.ElementTree as ET
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from bench_fusion_simplify import geometry_core, synthetic_loop  # noqa: E402
+import main  # noqa: E402
+import svg_path  # noqa: E402
+
+
+def read_svg(text: str) -> int:
+    return sum(len(svg_path.path_polygons(d)[0]) for _, d in svg_path.iter_svg_paths(text))
+
+
+def read_json(text: str) -> int:
+    return len(json.loads(text)["shapes"])
+
+
+def read_xml(text: str) -> int:
+    root = ET.fromstring(f"<Root>{text.split('?>', 1)[1]}</Root>")
+    return len(main._load_triorb_shapes_from_root(root)[0])
+
+
+READERS: List[Tuple[str, Callable[[str], int]]] = [
+    ("SVG", read_svg),
+    ("TriOrb Shapes (JSON)", read_json),
+    ("TriOrb Shapes (XML)", read_xml),
+]
+
+
+def main_cli(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--bodies", type=int, default=50)
+    parser.add_argument("--points", type=int, default=2000, help="vertices per body outline before reduction")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    polygons = [
+        (geometry_core.simplify_polyline(synthetic_loop(args.points, 0.0, rng), True), f"Body{index + 1}")
+        for index in range(args.bodies)
+    ]
+    # アドインの点列は SVG 向き（Y 下向き）。
+    polygons = [([(x, -y) for x, y in points], name) for points, name in polygons]
+    vertices = sum(len(points) for points, _ in polygons)
+
+    header = f"{'format':<22} {'KB':>8} {'write ms':>9} {'read ms':>9} {'shapes':>7}"
+    print(f"{args.bodies} bodies, {vertices} vertices after reduction")
+    print(header)
+    print("-" * len(header))
+    for export_format, reader in READERS:
+        start = time.perf_counter()
+        text = geometry_core.render_export(polygons, export_format)
+        write_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        shapes = reader(text)
+        read_ms = (time.perf_counter() - start) * 1000
+        size = len(text.encode("utf-8")) / 1024
+        print(f"{export_format:<22} {size:>8.1f} {write_ms:>9.1f} {read_ms:>9.1f} {shapes:>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,107 @@
+"""Compare the Fusion 360 add-in's collinear-vertex removal with the old pass loop.
+
+Usage::
+
+    python benchmarks/bench_fusion_simplify.py [--loops 20] [--points 20000] [--jitter 0.5]
+
+Each synthetic loop imitates the outer loop of a finely tessellated body:
+long straight edges split into many co-edges, tessellated fillets, and a
+small sideways jitter (``--jitter``, as a fraction of the collinear
+tolerance) so that straight runs sit inside the tolerance band instead of
+being exactly straight. ``repeated_passes`` is the removal the add-in used
+before, which sweeps the whole loop again after every change;
+:func:`geometry_core.simplify_polyline` does a single stack pass. The script
+reports the time, the number of sweeps the old loop needed, the remaining
+vertices, and whether both kept the same vertices.
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+from pathlib import Path
+import random
+import sys
+import time
+from typing import List, Tuple
+
+ADDIN_DIR = Path(__file__).resolve().parents[1] / "tools" / "fusion360_svg_export"
+if str(ADDIN_DIR) not in sys.path:
+    sys.path.insert(0, str(ADDIN_DIR))
+
+import geometry_core  # noqa: E402
+
+Point = Tuple[float, float]
+
+
+def repeated_passes(points: List[Point], collinear_tol: float) -> Tuple[List[Point], int]:
+    pts = list(points)
+    sweeps = 0
+    changed = True
+    while changed and len(pts) > 2:
+        changed = False
+        sweeps += 1
+        kept = []
+        count = len(pts)
+        for i in range(count):
+            if geometry_core.is_collinear(pts[i - 1], pts[i], pts[(i + 1) % count], collinear_tol):
+                changed = True
+                continue
+            kept.append(pts[i])
+        pts = kept
+    return pts, sweeps
+
+
+def synthetic_loop(points: int, jitter: float, rng: random.Random) -> List[Point]:
+    # 角を半径 r で丸めた長方形。直線部は細かい co-edge に分割され、フィレットは 2 度刻みで多角形化される。
+    width, height, radius = rng.uniform(200, 800), rng.uniform(100, 400), rng.uniform(5, 40)
+    per_edge = max(1, (points - 4 * 45) // 4)
+    loop: List[Point] = []
+    corners = [(width - radius, radius, -90), (width - radius, height - radius, 0),
+               (radius, height - radius, 90), (radius, radius, 180)]
+    for index, (cx, cy, angle) in enumerate(corners):
+        for step in range(45):
+            theta = math.radians(angle + step * 2)
+            loop.append((cx + radius * math.cos(theta), cy + radius * math.sin(theta)))
+        ex, ey, next_angle = corners[(index + 1) % 4]
+        sx, sy = cx + radius * math.cos(math.radians(angle + 90)), cy + radius * math.sin(math.radians(angle + 90))
+        tx, ty = ex + radius * math.cos(math.radians(next_angle)), ey + radius * math.sin(math.radians(next_angle))
+        dx, dy = tx - sx, ty - sy
+        # 分割した線分長に対して、許容誤差 (sin) の jitter 倍だけ横にずらす。
+        offset = jitter * geometry_core.COLLINEAR_TOL / per_edge
+        for step in range(per_edge):
+            shift = rng.uniform(-offset, offset) if step else 0.0
+            loop.append((sx + dx * step / per_edge - dy * shift, sy + dy * step / per_edge + dx * shift))
+    return loop
+
+
+def main_cli(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--loops", type=int, default=20)
+    parser.add_argument("--points", type=int, default=20000, help="vertices per loop")
+    parser.add_argument("--jitter", type=float, default=0.5, help="sideways jitter, in collinear tolerances")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    loops = [synthetic_loop(args.points, args.jitter, rng) for _ in range(args.loops)]
+    tol = geometry_core.COLLINEAR_TOL
+
+    start = time.perf_counter()
+    old = [repeated_passes(loop, tol) for loop in loops]
+    old_ms = (time.perf_counter() - start) * 1000
+    start = time.perf_counter()
+    new = [geometry_core.simplify_polyline(loop, True, tol) for loop in loops]
+    new_ms = (time.perf_counter() - start) * 1000
+
+    identical = sum(1 for (pts, _), result in zip(old, new) if pts == result)
+    print(f"{args.loops} loops x {sum(map(len, loops)) // max(len(loops), 1)} points, jitter {args.jitter:g}")
+    print(f"repeated passes : {old_ms:8.1f} ms, {max(s for _, s in old)} sweeps max, "
+          f"{sum(len(p) for p, _ in old)} points kept")
+    print(f"stack pass      : {new_ms:8.1f} ms, {sum(map(len, new))} points kept")
+    print(f"identical loops : {identical}/{args.loops}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
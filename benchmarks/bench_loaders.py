@@ -0,0 +1,220 @@
+"""Time and memory-profile every loader over sample and synthetic documents.
+
+Usage::
+
+    python benchmarks/bench_loaders.py [--fieldsets 50 200] [--fields 2] [--points 200]
+        [--cases 128] [--evals 5] [--casetables 1] [--scan-planes 1] [--geometry inline triorb] [--repeat 3]
+        [--output results.json] [--compare baseline.json] [--threshold 1.25] [--min-delta-ms 1]
+
+Datasets are every ``sample/*.sgexml`` plus one synthetic document per
+``--fieldsets`` x ``--geometry`` combination (see ``synthetic_documents.py``).
+Each loader runs ``--repeat`` times on an already parsed document; the best
+wall time is reported together with the ``tracemalloc`` peak and the memory
+still held by the result. ``--output`` stores the rows as JSON, and
+``--compare`` prints the time ratio against such a file from another commit,
+exiting with status 1 when any loader got slower than ``--threshold`` by
+more than ``--min-delta-ms`` (so sub-millisecond jitter is not reported).
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+import gc
+import json
+from pathlib import Path
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import main  # noqa: E402
+from synthetic_documents import GEOMETRIES, SyntheticSpec, write_synthetic_document  # noqa: E402
+
+RESULT_FORMAT_VERSION = 1
+
+
+@dataclass(frozen=True)
+class LoaderResult:
+    dataset: str
+    size_bytes: int
+    loader: str
+    seconds: float
+    peak_bytes: int
+    retained_bytes: int
+
+
+def _convert_casetable_nodes(document: main.SgexmlDocument) -> Any:
+    # Casetable 全体を汎用ノードへ変換する。Configuration / FieldsConfiguration と同じ経路。
+    export = document.root.find("Export_CasetablesAndCases") if document.root is not None else None
+    if export is None:
+        return []
+    return [main._convert_element_to_node(node) for node in export]
+
+
+def loader_table(path: Path) -> List[Tuple[str, Callable[[main.SgexmlDocument], Any]]]:
+    """Return ``(name, loader)`` pairs; each loader takes the parsed document."""
+
+    return [
+        ("parse", lambda _document: main.SgexmlDocument.from_bytes(path, path.read_bytes())),
+        ("load_fieldsets_and_shapes", main.load_fieldsets_and_shapes),
+        ("load_fieldset_planes.payloads", lambda document: main.load_fieldset_planes(document).payloads()),
+        ("load_fieldsets_and_shapes_streaming", lambda _document: main.load_fieldsets_and_shapes_streaming(path)),
+        ("load_casetable_index", main.load_casetable_index),
+        ("load_casetable_payload", main.load_casetable_payload),
+        ("_convert_element_to_node", _convert_casetable_nodes),
+        ("load_scan_planes", main.load_scan_planes),
+        ("load_menu_items", main.load_menu_items),
+        ("load_fileinfo_fields", main.load_fileinfo_fields),
+        ("load_root_attributes", main.load_root_attributes),
+        ("build_index_payload", main.build_index_payload),
+    ]
+
+
+def _profile(loader: Callable[[], Any], repeat: int) -> Tuple[float, int, int]:
+    best: Optional[float] = None
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        result = loader()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+        del result
+    # メモリは計測オーバーヘッドで時間が歪まないよう、別の 1 回で測る。
+    gc.collect()
+    tracemalloc.start()
+    result = loader()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return best or 0.0, peak, current
+
+
+def run_dataset(name: str, path: Path, repeat: int) -> List[LoaderResult]:
+    document = main.SgexmlDocument.load(path)
+    size = path.stat().st_size
+    results = []
+    for loader_name, loader in loader_table(path):
+        seconds, peak, retained = _profile(lambda: loader(document), repeat)
+        results.append(LoaderResult(name, size, loader_name, seconds, peak, retained))
+    return results
+
+
+def _git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=PROJECT_ROOT,
+            check=True,
+            capture_output=True,
+            text=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(results: List[LoaderResult], args: argparse.Namespace) -> Dict[str, Any]:
+    return {
+        "version": RESULT_FORMAT_VERSION,
+        "revision": _git_revision(),
+        "created": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "arguments": {
+            key: value for key, value in vars(args).items() if key not in ("output", "compare")
+        },
+        "results": [asdict(result) for result in results],
+    }
+
+
+def compare_reports(
+    current: List[LoaderResult], baseline: Dict[str, Any]
+) -> List[Tuple[LoaderResult, float]]:
+    """Return ``(result, time ratio)`` for rows also present in ``baseline``."""
+
+    previous = {(row["dataset"], row["loader"]): row for row in baseline.get("results", [])}
+    ratios = []
+    for result in current:
+        row = previous.get((result.dataset, result.loader))
+        if row is None or row["seconds"] <= 0:
+            continue
+        ratios.append((result, result.seconds / row["seconds"]))
+    return ratios
+
+
+def _print_results(results: List[LoaderResult]) -> None:
+    header = f"{'dataset':<44} {'MB':>6} {'loader':<36} {'ms':>9} {'peak MB':>8} {'held MB':>8}"
+    print(header)
+    print("-" * len(header))
+    for result in results:
+        print(
+            f"{result.dataset[:44]:<44} {result.size_bytes / 1e6:>6.2f} {result.loader:<36}"
+            f" {result.seconds * 1000:>9.2f} {result.peak_bytes / 1e6:>8.2f} {result.retained_bytes / 1e6:>8.2f}"
+        )
+
+
+def main_cli(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fieldsets", type=int, nargs="*", default=[50, 200], help="synthetic sizes (none to skip)")
+    parser.add_argument("--fields", type=int, default=2, help="fields per fieldset")
+    parser.add_argument("--points", type=int, default=200, help="points per polygon")
+    parser.add_argument("--cases", type=int, default=128)
+    parser.add_argument("--evals", type=int, default=5)
+    parser.add_argument("--casetables", type=int, default=1, help="casetables per synthetic document")
+    parser.add_argument("--scan-planes", type=int, default=1, help="ScanPlanes per synthetic document")
+    parser.add_argument("--geometry", nargs="+", choices=GEOMETRIES, default=list(GEOMETRIES))
+    parser.add_argument("--no-samples", action="store_true", help="skip the files in sample/")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--output", type=Path, help="write results as JSON")
+    parser.add_argument("--compare", type=Path, help="JSON from a previous run to compare against")
+    parser.add_argument("--threshold", type=float, default=1.25, help="slowdown ratio reported as regression")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0, help="ignore slowdowns smaller than this")
+    args = parser.parse_args(argv)
+
+    results: List[LoaderResult] = []
+    if not args.no_samples:
+        for path in sorted((PROJECT_ROOT / "sample").glob("*.sgexml")):
+            results.extend(run_dataset(path.name, path, args.repeat))
+    with tempfile.TemporaryDirectory() as tmp:
+        for geometry in args.geometry:
+            for count in args.fieldsets:
+                spec = SyntheticSpec(
+                    fieldsets=count,
+                    fields=args.fields,
+                    points=args.points,
+                    cases=args.cases,
+                    evals=args.evals,
+                    geometry=geometry,
+                    casetables=args.casetables,
+                    scan_planes=args.scan_planes,
+                )
+                path = write_synthetic_document(Path(tmp) / f"{geometry}_{count}.sgexml", spec)
+                results.extend(run_dataset(spec.label, path, args.repeat))
+    _print_results(results)
+
+    if args.output:
+        args.output.write_text(json.dumps(build_report(results, args), indent=2) + "\n", encoding="utf-8")
+        print(f"\nwrote {len(results)} rows to {args.output}")
+
+    regressions = 0
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+        print(f"\ncompared with {args.compare} (revision {baseline.get('revision') or 'unknown'})")
+        for result, ratio in compare_reports(results, baseline):
+            delta_ms = result.seconds * 1000 * (1 - 1 / ratio)
+            flag = "REGRESSION" if ratio > args.threshold and delta_ms > args.min_delta_ms else ""
+            regressions += bool(flag)
+            print(f"{result.dataset[:44]:<44} {result.loader:<36} {ratio:>6.2f}x {flag}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,95 @@
+"""Measure what polygon simplification saves on finely sampled fields.
+
+Usage::
+
+    python benchmarks/bench_polygon_simplify.py [--shapes 200] [--points 400] [--tolerance 3.5]
+
+Synthetic wavy fields (as left by an SVG import or replication) are
+simplified with every method of :mod:`polygon_simplify` in one batch. For
+each method the script reports the simplification time, the remaining
+points, the size of the ``<Polygon>`` XML and the time ``main.py`` takes
+to parse it back, next to the same figures for the original shapes.
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import sys
+import time
+from typing import Any, Dict, List, Tuple
+import xml.etree.ElementTree as ET
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from bench_polygon_offset import synthetic_shapes  # noqa: E402
+import main  # noqa: E402
+from packed_points import js_number_to_string  # noqa: E402
+import polygon_simplify  # noqa: E402
+
+
+def canonical_shapes(count: int, points: int) -> List[Dict[str, Any]]:
+    # "100.0" のような表記は PackedPoints に詰められず解析の経路が変わるため、String(number) の表記に揃える。
+    shapes = synthetic_shapes(count, points)
+    for shape in shapes:
+        shape["polygon"]["points"] = [
+            {"X": js_number_to_string(float(point["X"])), "Y": js_number_to_string(float(point["Y"]))}
+            for point in shape["polygon"]["points"]
+        ]
+    return shapes
+
+
+def polygon_xml(shapes: List[Dict[str, Any]]) -> Tuple[List[ET.Element], int]:
+    # Save (TriOrb) と同じ <Polygon><Point X=".." Y=".."/>...</Polygon> を作る。
+    nodes = []
+    size = 0
+    for shape in shapes:
+        node = ET.Element("Polygon", {"Type": "Field"})
+        for point in shape["polygon"]["points"]:
+            ET.SubElement(node, "Point", {"X": point["X"], "Y": point["Y"]})
+        size += len(ET.tostring(node))
+        nodes.append(node)
+    return nodes, size
+
+
+def parse_ms(nodes: List[ET.Element]) -> float:
+    start = time.perf_counter()
+    for node in nodes:
+        main._parse_polygon_node(node)
+    return (time.perf_counter() - start) * 1000
+
+
+def main_cli(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shapes", type=int, default=200)
+    parser.add_argument("--points", type=int, default=400, help="points per polygon")
+    parser.add_argument(
+        "--tolerance", type=float, default=polygon_simplify.DEFAULT_TOLERANCE, help="mm (default: Resolution 70)"
+    )
+    args = parser.parse_args(argv)
+
+    shapes = canonical_shapes(args.shapes, args.points)
+    nodes, size = polygon_xml(shapes)
+    header = f"{'method':<16} {'simplify ms':>11} {'points':>8} {'XML KB':>8} {'parse ms':>9} {'max grown':>9}"
+    print(f"{args.shapes} polygons x {args.points} points, tolerance {args.tolerance:g} mm")
+    print(header)
+    print("-" * len(header))
+    print(f"{'(original)':<16} {'':>11} {args.shapes * args.points:>8} {size / 1024:>8.1f} {parse_ms(nodes):>9.1f}")
+    for method in polygon_simplify.METHODS:
+        start = time.perf_counter()
+        simplified, reports = polygon_simplify.simplify_shapes(shapes, args.tolerance, method)
+        elapsed = time.perf_counter() - start
+        nodes, size = polygon_xml(simplified)
+        points = sum(report.after for report in reports)
+        grown = max((report.growth for report in reports), default=0.0)
+        print(
+            f"{method:<16} {elapsed * 1000:>11.1f} {points:>8} {size / 1024:>8.1f} {parse_ms(nodes):>9.1f}"
+            f" {grown:>9.3f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,130 @@
+"""Compare the old concatenated shape key with the geometry fingerprint.
+
+Usage::
+
+    python benchmarks/bench_shape_fingerprint.py [--synthetic 200] [--points 2000]
+
+For every file in ``sample/`` (plus an optional synthetic set of large
+polygons) the TriOrb shapes are keyed with both schemes. The script reports
+keying time and the memory held by the resulting registry, and checks that
+both schemes partition the shapes into the same duplicate groups.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+from pathlib import Path
+import sys
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, Optional
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import main  # noqa: E402
+from shape_index import shape_fingerprint  # noqa: E402
+
+
+def legacy_shape_key(shape: Dict[str, Any]) -> Optional[str]:
+    # 比較用に残した旧実装（属性と座標を文字列連結したキー）。
+    def build(shape_type: str, attrs: Dict[str, str], points: Optional[List[Dict[str, str]]]) -> str:
+        attr_items = "/".join(f"{key}={attrs.get(key, '')}" for key in sorted(attrs))
+        key_parts = [shape_type, attr_items]
+        if shape_type == "Polygon" and points is not None:
+            key_parts.append(",".join(f"{point.get('X','')}:{point.get('Y','')}" for point in points))
+        return "|".join(key_parts)
+
+    if shape["type"] == "Polygon":
+        polygon = shape.get("polygon", {})
+        return build("Polygon", {"Type": polygon.get("Type", "CutOut")}, polygon.get("points", []))
+    if shape["type"] == "Rectangle":
+        return build("Rectangle", shape.get("rectangle", {}), None)
+    if shape["type"] == "Circle":
+        return build("Circle", shape.get("circle", {}), None)
+    return None
+
+
+def synthetic_shapes(count: int, points: int) -> List[Dict[str, Any]]:
+    # 半分は重複図形にして、重複排除の結果も比較できるようにする。
+    shapes = []
+    for index in range(count):
+        seed = index // 2
+        shapes.append(
+            {
+                "id": f"shape-{index:08d}",
+                "type": "Polygon",
+                "polygon": {
+                    "Type": "Field",
+                    "points": [
+                        {"X": str(seed * 7 + p_index), "Y": str(p_index * 3 - seed)}
+                        for p_index in range(points)
+                    ],
+                },
+            }
+        )
+    return shapes
+
+
+def _measure(shapes: List[Dict[str, Any]], key_func: Callable[[Dict[str, Any]], Any]) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    registry = {}
+    for shape in shapes:
+        key = key_func(shape)
+        if key is not None:
+            registry[key] = shape["id"]
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, current, registry
+
+
+def _groups(shapes: List[Dict[str, Any]], key_func: Callable[[Dict[str, Any]], Any]) -> set:
+    grouped: Dict[Any, List[str]] = {}
+    for shape in shapes:
+        key = key_func(shape)
+        if key is not None:
+            grouped.setdefault(key, []).append(shape["id"])
+    return {tuple(ids) for ids in grouped.values()}
+
+
+def main_cli(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--synthetic", type=int, default=200, help="synthetic polygons (0 to skip)")
+    parser.add_argument("--points", type=int, default=2000, help="points per synthetic polygon")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args(argv)
+
+    datasets = []
+    for path in sorted((PROJECT_ROOT / "sample").glob("*.sgexml")):
+        _, shapes, _ = main.load_fieldsets_and_shapes(main.SgexmlDocument.load(path))
+        datasets.append((path.name, shapes))
+    if args.synthetic:
+        datasets.append(
+            (f"synthetic {args.synthetic}x{args.points}", synthetic_shapes(args.synthetic, args.points))
+        )
+
+    header = f"{'dataset':<40} {'shapes':>6} {'scheme':<11} {'ms':>8} {'registry KB':>11} {'same dedup':>10}"
+    print(header)
+    print("-" * len(header))
+    for name, shapes in datasets:
+        same = _groups(shapes, legacy_shape_key) == _groups(shapes, shape_fingerprint)
+        for label, key_func in (("string key", legacy_shape_key), ("fingerprint", shape_fingerprint)):
+            best = None
+            for _ in range(args.repeat):
+                elapsed, current, registry = _measure(shapes, key_func)
+                best = elapsed if best is None else min(best, elapsed)
+                del registry
+            print(
+                f"{name[:40]:<40} {len(shapes):>6} {label:<11} {best * 1000:>8.2f}"
+                f" {current / 1024:>11.1f} {str(same):>10}"
+            )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
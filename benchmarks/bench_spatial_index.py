@@ -0,0 +1,118 @@
+"""Time spatial-index queries over TriOrb shapes against a linear scan.
+
+Usage::
+
+    python benchmarks/bench_spatial_index.py [--shapes 5000] [--queries 2000]
+
+Random polygons, rotated rectangles and circles are spread over a square
+site. The script reports the time to build :class:`spatial_index.ShapeSpatialIndex`,
+then answers the same point, box and radius queries once through the
+index and once by checking every shape's bounding box (which is what the
+editor did before), and finally lists the overlap candidates both through
+the grid and with an all-pairs comparison.
+"""
+
+from __future__ import annotations
+
+import argparse
+from pathlib import Path
+import random
+import sys
+import time
+from typing import Callable, List
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import spatial_index  # noqa: E402
+
+
+def random_shapes(count: int, site: float, rng: random.Random) -> List[dict]:
+    shapes = []
+    for index in range(count):
+        x, y = rng.uniform(-site, site), rng.uniform(-site, site)
+        kind = ("Polygon", "Rectangle", "Circle")[index % 3]
+        shape = {"id": f"shape-{index}", "type": kind}
+        if kind == "Polygon":
+            shape["polygon"] = {
+                "Type": "Field",
+                "points": [{"X": str(x + rng.uniform(-300, 300)), "Y": str(y + rng.uniform(-300, 300))}
+                           for _ in range(32)],
+            }
+        elif kind == "Rectangle":
+            shape["rectangle"] = {
+                "Type": "Field", "OriginX": str(x), "OriginY": str(y), "Width": str(rng.uniform(50, 600)),
+                "Height": str(rng.uniform(50, 600)), "Rotation": str(rng.uniform(-180, 180)),
+            }
+        else:
+            radius = rng.uniform(20, 300)
+            shape["circle"] = {"Type": "Field", "CenterX": str(x), "CenterY": str(y), "Radius": str(radius)}
+        shapes.append(shape)
+    return shapes
+
+
+def timed(func: Callable[[], object]) -> tuple:
+    start = time.perf_counter()
+    result = func()
+    return result, (time.perf_counter() - start) * 1000
+
+
+def main_cli(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--shapes", type=int, default=5000)
+    parser.add_argument("--queries", type=int, default=2000)
+    parser.add_argument("--site", type=float, default=50000.0, help="half width of the site in mm")
+    parser.add_argument("--radius", type=float, default=500.0, help="radius / half box size of each query in mm")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    shapes = random_shapes(args.shapes, args.site, rng)
+    index, build_ms = timed(lambda: spatial_index.ShapeSpatialIndex(shapes))
+    bounds = [(shape["id"], spatial_index.shape_bounds(shape)) for shape in shapes]
+    centers = [(rng.uniform(-args.site, args.site), rng.uniform(-args.site, args.site)) for _ in range(args.queries)]
+    r = args.radius
+
+    def scan_box(x0: float, y0: float, x1: float, y1: float) -> List[str]:
+        return [key for key, b in bounds if b.min_x <= x1 and b.max_x >= x0 and b.min_y <= y1 and b.max_y >= y0]
+
+    def scan_radius(x: float, y: float) -> List[str]:
+        return [
+            key for key, b in bounds
+            if max(b.min_x - x, x - b.max_x, 0) ** 2 + max(b.min_y - y, y - b.max_y, 0) ** 2 <= r * r
+        ]
+
+    cases = [
+        ("point", lambda x, y: index.query_point(x, y), lambda x, y: scan_box(x, y, x, y)),
+        (
+            "box",
+            lambda x, y: index.query_box(x - r, y - r, x + r, y + r),
+            lambda x, y: scan_box(x - r, y - r, x + r, y + r),
+        ),
+        ("radius", lambda x, y: index.query_radius(x, y, r), scan_radius),
+    ]
+    print(f"{args.shapes} shapes, cell size {index.cell_size:.1f} mm, build {build_ms:.1f} ms")
+    header = f"{'query':<8} {'index ms':>9} {'scan ms':>9} {'hits':>7}"
+    print(header)
+    print("-" * len(header))
+    for name, indexed, scan in cases:
+        found, index_ms = timed(lambda: [indexed(x, y) for x, y in centers])
+        expected, scan_ms = timed(lambda: [scan(x, y) for x, y in centers])
+        if found != expected:
+            raise SystemExit(f"{name}: index and scan disagree")
+        print(f"{name:<8} {index_ms:>9.1f} {scan_ms:>9.1f} {sum(map(len, found)):>7}")
+
+    pairs, pairs_ms = timed(index.candidate_pairs)
+    all_pairs, all_ms = timed(lambda: [
+        (a, b) for i, (a, ba) in enumerate(bounds) for b, bb in bounds[i + 1:]
+        if ba.min_x <= bb.max_x and ba.max_x >= bb.min_x and ba.min_y <= bb.max_y and ba.max_y >= bb.min_y
+    ])
+    if pairs != all_pairs:
+        raise SystemExit("pairs: index and all-pairs comparison disagree")
+    print(f"{'pairs':<8} {pairs_ms:>9.1f} {all_ms:>9.1f} {len(pairs):>7}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,95 @@
+"""Peak memory of the DOM and iterparse fieldset loaders on large exports.
+
+Usage::
+
+    python benchmarks/bench_streaming_loader.py [--fieldsets 50 200 800] [--points 200]
+
+Synthetic SdImportExport files with legacy inline polygons are written to a
+temporary directory. ``tracemalloc`` peaks include the returned payload,
+so the interesting number is the overhead on top of the payload itself.
+"""
+
+from __future__ import annotations
+
+import argparse
+import gc
+from pathlib import Path
+import sys
+import tempfile
+import time
+import tracemalloc
+from typing import Callable, List
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import main  # noqa: E402
+
+
+def write_synthetic_export(path: Path, fieldsets: int, points: int) -> None:
+    with path.open("w", encoding="utf-8") as handle:
+        handle.write('<?xml version="1.0" encoding="utf-8"?>\n<SdImportExport>\n')
+        handle.write("  <Export_FieldsetsAndFields>\n    <ScanPlane Index=\"0\">\n")
+        handle.write("      <Fieldsets>\n")
+        for fs_index in range(fieldsets):
+            handle.write(f'        <Fieldset Name="FS{fs_index}">\n')
+            for field_name in ("Protective", "Warning"):
+                handle.write(
+                    f'          <Field Name="{field_name}" Fieldtype="{field_name}SafeBlanking">\n'
+                )
+                handle.write('            <Polygon Type="Field">\n')
+                for p_index in range(points):
+                    handle.write(
+                        f'              <Point X="{fs_index + p_index}" Y="{p_index * 2}" />\n'
+                    )
+                handle.write("            </Polygon>\n          </Field>\n")
+            handle.write("        </Fieldset>\n")
+        handle.write("      </Fieldsets>\n    </ScanPlane>\n  </Export_FieldsetsAndFields>\n")
+        handle.write("</SdImportExport>\n")
+
+
+def _profile(loader: Callable[[], object]) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = loader()
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del result
+    return elapsed, current, peak
+
+
+def main_cli(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fieldsets", type=int, nargs="+", default=[50, 200, 800])
+    parser.add_argument("--points", type=int, default=200, help="points per polygon")
+    args = parser.parse_args(argv)
+
+    header = (
+        f"{'fieldsets':>9} {'MB':>6} {'loader':<9} {'sec':>7}"
+        f" {'payload MB':>10} {'peak MB':>8} {'overhead MB':>11}"
+    )
+    print(header)
+    print("-" * len(header))
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.fieldsets:
+            path = Path(tmp) / f"synthetic_{count}.sgexml"
+            write_synthetic_export(path, count, args.points)
+            size_mb = path.stat().st_size / 1e6
+            loaders = (
+                ("dom", lambda: main.load_fieldsets_and_shapes(main.SgexmlDocument.load(path))),
+                ("streaming", lambda: main.load_fieldsets_and_shapes_streaming(path)),
+            )
+            for label, loader in loaders:
+                elapsed, current, peak = _profile(loader)
+                print(
+                    f"{count:>9} {size_mb:>6.1f} {label:<9} {elapsed:>7.3f}"
+                    f" {current / 1e6:>10.1f} {peak / 1e6:>8.1f} {(peak - current) / 1e6:>11.1f}"
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
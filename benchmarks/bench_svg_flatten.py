@@ -0,0 +1,120 @@
+"""Compare the adaptive SVG path flattening with the old fixed sampling.
+
+Usage::
+
+    python benchmarks/bench_svg_flatten.py [drawing.svg ...] [--paths 200] [--tolerance 0.1]
+
+Without arguments a synthetic CAD-style drawing is used: rounded
+rectangles written with ``A`` (as Fusion 360 / Inkscape export fillets),
+spline outlines written with ``C`` and plain polylines as emitted by the
+Fusion 360 add-in. For every path the script reports how many points the
+old browser import produced (``getPointAtLength`` at one point per 4
+units, clamped to 200–2000) and how many :func:`svg_path.flatten_path`
+produces, together with the flattening time.
+"""
+
+from __future__ import annotations
+
+import argparse
+import math
+from pathlib import Path
+import sys
+import time
+from typing import List, Tuple
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+import svg_path  # noqa: E402
+
+
+def synthetic_paths(count: int) -> List[Tuple[str, str]]:
+    paths = []
+    for index in range(count):
+        ox, oy = (index % 20) * 400.0, (index // 20) * 400.0
+        kind = index % 3
+        if kind == 0:
+            width, height, radius = 200 + index % 7 * 20, 120 + index % 5 * 10, 5 + index % 4 * 5
+            d = (
+                f"M{ox + radius} {oy} H{ox + width - radius} A{radius} {radius} 0 0 1 {ox + width} {oy + radius} "
+                f"V{oy + height - radius} A{radius} {radius} 0 0 1 {ox + width - radius} {oy + height} "
+                f"H{ox + radius} A{radius} {radius} 0 0 1 {ox} {oy + height - radius} "
+                f"V{oy + radius} A{radius} {radius} 0 0 1 {ox + radius} {oy} Z"
+            )
+        elif kind == 1:
+            # 半径が波打つ閉曲線を、接線方向の制御点を持つ 3 次ベジエで繋いだスプライン。
+            steps = 24
+            step = 2 * math.pi / steps
+
+            def point(theta: float) -> Tuple[float, float]:
+                radius = 130 + 20 * math.cos(6 * theta)
+                return ox + 150 + radius * math.cos(theta), oy + 150 + radius * math.sin(theta)
+
+            def tangent(theta: float) -> Tuple[float, float]:
+                (ax, ay), (bx, by) = point(theta - 1e-6), point(theta + 1e-6)
+                scale = step / 3 / 2e-6
+                return (bx - ax) * scale, (by - ay) * scale
+
+            x, y = point(0)
+            parts = [f"M{x:.3f} {y:.3f}"]
+            for p_index in range(steps):
+                a, b = p_index * step, (p_index + 1) * step
+                (ax, ay), (bx, by) = point(a), point(b)
+                (tax, tay), (tbx, tby) = tangent(a), tangent(b)
+                parts.append(
+                    f"C{ax + tax:.3f} {ay + tay:.3f} {bx - tbx:.3f} {by - tby:.3f} {bx:.3f} {by:.3f}"
+                )
+            d = " ".join(parts) + " Z"
+        else:
+            coords = [
+                (ox + 150 + 140 * math.cos(2 * math.pi * p / 64), oy + 150 + 90 * math.sin(2 * math.pi * p / 64))
+                for p in range(64)
+            ]
+            d = "M" + " L".join(f"{x:.3f} {y:.3f}" for x, y in coords) + " Z"
+        paths.append((f"path{index + 1}", d))
+    return paths
+
+
+def polyline_length(points: List[Tuple[float, float]]) -> float:
+    closed = points + points[:1]
+    return sum(math.hypot(bx - ax, by - ay) for (ax, ay), (bx, by) in zip(closed, closed[1:]))
+
+
+def main_cli(argv: List[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("svg", nargs="*", type=Path, help="SVG files to flatten instead of the synthetic drawing")
+    parser.add_argument("--paths", type=int, default=200, help="synthetic paths")
+    parser.add_argument("--tolerance", type=float, default=svg_path.DEFAULT_TOLERANCE, help="chord error in mm")
+    args = parser.parse_args(argv)
+
+    if args.svg:
+        paths = [item for file in args.svg for item in svg_path.iter_svg_paths(file.read_text(encoding="utf-8"))]
+    else:
+        paths = synthetic_paths(args.paths)
+
+    start = time.perf_counter()
+    flattened = [svg_path.flatten_path(d, args.tolerance) for _, d in paths]
+    elapsed = time.perf_counter() - start
+
+    adaptive = sum(result.point_count for result in flattened)
+    # 旧実装は曲線を含むパスだけを一定密度で標本化していた（直線だけのパスはそのまま）。
+    fixed = 0
+    for (_, d), result in zip(paths, flattened):
+        if any(command in d for command in "AaCcQqSsTt"):
+            length = sum(polyline_length(subpath.points) for subpath in result.subpaths)
+            fixed += min(max(math.ceil(length / 4), 200), 2000) + 1
+        else:
+            fixed += result.point_count
+    errors = sum(1 for result in flattened if result.error)
+    print(f"{len(paths)} paths, tolerance {args.tolerance:g} mm")
+    print(f"fixed sampling points : {fixed}")
+    print(f"adaptive points       : {adaptive} ({adaptive / max(fixed, 1):.1%})")
+    print(f"flatten time          : {elapsed * 1000:.1f} ms")
+    if errors:
+        print(f"paths with errors     : {errors}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
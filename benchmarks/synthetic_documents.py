@@ -0,0 +1,299 @@
+"""Synthetic SdImportExport documents of configurable size for benchmarks.
+
+The layout follows the files in ``sample/``: FileInfo, Export_ScanPlanes and
+Export_FieldsetsAndFields (``scan_planes`` x ScanPlane, each with its own
+fieldsets), Export_CasetablesAndCases (``casetables`` x Configuration, Cases,
+Evals, FieldsConfiguration) and, for ``geometry="triorb"``, a
+TriOrb_SICK_SLS_Editor section whose Shapes are referenced by ID from the
+fields. With ``geometry="inline"`` every field carries its polygon
+directly, as in exports from the SICK tool.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+import math
+from pathlib import Path
+from typing import IO, List
+
+GEOMETRIES = ("inline", "triorb")
+_FIELD_TYPES = ("ProtectiveSafeBlanking", "WarningSafeBlanking")
+_STATIC_INPUT_COUNT = 8
+
+
+@dataclass(frozen=True)
+class SyntheticSpec:
+    """Size parameters of one synthetic document."""
+
+    fieldsets: int = 50
+    fields: int = 2
+    points: int = 200
+    cases: int = 128
+    evals: int = 5
+    geometry: str = "inline"
+    casetables: int = 1
+    scan_planes: int = 1
+
+    def __post_init__(self) -> None:
+        if self.geometry not in GEOMETRIES:
+            raise ValueError(f"Unknown geometry: {self.geometry!r}")
+
+    @property
+    def label(self) -> str:
+        planes = f"{self.scan_planes}sp x" if self.scan_planes != 1 else ""
+        tables = f"{self.casetables}ct x" if self.casetables != 1 else ""
+        return (
+            f"synthetic {self.geometry} {planes}{self.fieldsets}fs x{self.fields}f"
+            f" x{self.points}pt {tables}{self.cases}c/{self.evals}e"
+        )
+
+
+def _polygon_points(fieldset_index: int, field_index: int, count: int, plane_index: int = 0) -> List[str]:
+    # スキャナー周りの扇形に近い閉じた多角形。座標は整数 mm で、Fieldset・ScanPlane ごとに大きさを変える。
+    radius = 500 + 10 * fieldset_index + 200 * field_index + 1000 * plane_index
+    lines = []
+    for index in range(count):
+        angle = -135 + 270 * index / max(count - 1, 1)
+        x = round(radius * math.cos(math.radians(angle)))
+        y = round(radius * math.sin(math.radians(angle)))
+        lines.append(f'<Point X="{x}" Y="{y}" />')
+    return lines
+
+
+def _shape_id(fieldset_index: int, field_index: int, plane_index: int = 0) -> str:
+    prefix = f"shape-p{plane_index}-" if plane_index else "shape-"
+    return f"{prefix}{fieldset_index:05d}-{field_index:02d}"
+
+
+def _write(handle: IO[str], depth: int, *lines: str) -> None:
+    for line in lines:
+        handle.write("  " * depth + line + "\n")
+
+
+def _write_scan_planes(handle: IO[str], spec: SyntheticSpec) -> None:
+    _write(handle, 1, "<Export_ScanPlanes>")
+    for plane_index in range(spec.scan_planes):
+        _write(
+            handle,
+            1,
+            f'  <ScanPlane Index="{plane_index}" Name="Monitoring plane {plane_index + 1}" ScanPlaneDirection="Horizontal"'
+            ' UseReferenceContour="false" ObjectSize="70" MultipleSampling="2"'
+            ' MultipleSamplingOff2OnActivated="false" SelectedCaseSwitching="Fast">',
+            "    <Devices>",
+            '      <Device Index="0" Typekey="NANS3-CAAZ30ZA1P02" TypekeyVersion="1.0" DeviceName="Right" ResponseTime="30" ScanResolutionAddition="0" />',
+            '      <Device Index="1" Typekey="NANS3-CAAZ30ZA1P02" TypekeyVersion="1.0" DeviceName="Left" ResponseTime="30" ScanResolutionAddition="0" />',
+            "    </Devices>",
+            "  </ScanPlane>",
+        )
+    _write(handle, 1, "</Export_ScanPlanes>")
+
+
+def _write_triorb_shapes(handle: IO[str], spec: SyntheticSpec) -> None:
+    _write(handle, 1, '<TriOrb_SICK_SLS_Editor Source="TriOrb">', "  <Shapes>")
+    for plane_index in range(spec.scan_planes):
+        for fs_index in range(spec.fieldsets):
+            for field_index in range(spec.fields):
+                fieldtype = _FIELD_TYPES[field_index % 2]
+                _write(
+                    handle,
+                    3,
+                    f'<Shape ID="{_shape_id(fs_index, field_index, plane_index)}" Name="FS{fs_index} F{field_index}"'
+                    f' Type="Polygon" Fieldtype="{fieldtype}" Kind="Field">',
+                    '  <Polygon Type="Field">',
+                )
+                _write(handle, 5, *_polygon_points(fs_index, field_index, spec.points, plane_index))
+                _write(handle, 3, "  </Polygon>", "</Shape>")
+    _write(handle, 1, "  </Shapes>", "</TriOrb_SICK_SLS_Editor>")
+
+
+def _write_fieldsets(handle: IO[str], spec: SyntheticSpec) -> None:
+    _write(handle, 1, "<Export_FieldsetsAndFields>")
+    for plane_index in range(spec.scan_planes):
+        _write_fieldset_plane(handle, spec, plane_index)
+    _write(handle, 1, "</Export_FieldsetsAndFields>")
+
+
+def _write_fieldset_plane(handle: IO[str], spec: SyntheticSpec, plane_index: int) -> None:
+    _write(
+        handle,
+        1,
+        f'  <ScanPlane Index="{plane_index}">',
+        "    <Devices>",
+        '      <Device Typekey="NANS3-CAAZ30ZA1P02" TypekeyVersion="1.0" PositionX="170" PositionY="102" Rotation="290" StandingUpsideDown="true" />',
+        '      <Device Typekey="NANS3-CAAZ30ZA1P02" TypekeyVersion="1.0" PositionX="-170" PositionY="102" Rotation="70" StandingUpsideDown="true" />',
+        "    </Devices>",
+        '    <GlobalGeometry UseGlobalGeometry="false" />',
+        "    <Fieldsets>",
+    )
+    for fs_index in range(spec.fieldsets):
+        _write(handle, 4, f'<Fieldset Name="FS{fs_index}">')
+        for field_index in range(spec.fields):
+            fieldtype = _FIELD_TYPES[field_index % 2]
+            _write(
+                handle,
+                5,
+                f'<Field Name="Field{field_index}" Fieldtype="{fieldtype}" MultipleSampling="2"'
+                ' Resolution="70" TolerancePositive="0" ToleranceNegative="0">',
+            )
+            if spec.geometry == "triorb":
+                shape_id = _shape_id(fs_index, field_index, plane_index)
+                _write(handle, 6, "<Shapes>", f'  <Shape ID="{shape_id}" />', "</Shapes>")
+            else:
+                _write(handle, 6, '<Polygon Type="Field">')
+                _write(handle, 7, *_polygon_points(fs_index, field_index, spec.points, plane_index))
+                _write(handle, 6, "</Polygon>")
+            _write(handle, 5, "</Field>")
+        _write(handle, 4, "</Fieldset>")
+    _write(handle, 1, "    </Fieldsets>", "  </ScanPlane>")
+
+
+def _write_casetables(handle: IO[str], spec: SyntheticSpec) -> None:
+    _write(handle, 1, "<Export_CasetablesAndCases>")
+    for table_index in range(spec.casetables):
+        _write_casetable(handle, spec, table_index)
+    _write(handle, 1, "</Export_CasetablesAndCases>")
+
+
+def _write_casetable(handle: IO[str], spec: SyntheticSpec, table_index: int) -> None:
+    _write(
+        handle,
+        1,
+        f'  <Casetable Index="{table_index}">',
+        "    <Configuration>",
+        f"      <Name>Monitoring case table {table_index + 1}</Name>",
+        "      <StaticInputSource>",
+        "        <Source>Assembly_EIPEPRGWRX_105_with_StopAlarmDetection_and_Speed</Source>",
+        "        <StaticActivation>Antivalent</StaticActivation>",
+        "      </StaticInputSource>",
+        "      <StaticInputs>",
+    )
+    for ranking in range(1, _STATIC_INPUT_COUNT + 1):
+        _write(handle, 5, "<StaticInput>", f"  <Ranking>{ranking}</Ranking>", "  <Evaluate>true</Evaluate>", "</StaticInput>")
+    _write(handle, 3, "  </StaticInputs>", "</Configuration>", "<Cases>")
+    for case_index in range(spec.cases):
+        _write(
+            handle,
+            4,
+            f'<Case Id="{case_index}">',
+            f"  <Name>Case {case_index + 1}</Name>",
+            f"  <NameLatin9Key>_CASE_{case_index + 1:03d}</NameLatin9Key>",
+            "  <SleepMode>false</SleepMode>",
+            f"  <DisplayOrder>{case_index}</DisplayOrder>",
+            "  <Activation>",
+            "    <StaticInputs>",
+        )
+        for bit in range(_STATIC_INPUT_COUNT):
+            match = "High" if (case_index >> bit) & 1 else "Low"
+            _write(handle, 8, "<StaticInput>", f"  <Match>{match}</Match>", "</StaticInput>")
+        _write(
+            handle,
+            4,
+            "    </StaticInputs>",
+            "    <StaticInputs1ofNIndex>-1</StaticInputs1ofNIndex>",
+            "    <SpeedActivation>SpeedRange</SpeedActivation>",
+            f"    <MinSpeed>{case_index * 10 - 149}</MinSpeed>",
+            f"    <MaxSpeed>{case_index * 10 + 150}</MaxSpeed>",
+            f"    <CaseNumber>{case_index + 1}</CaseNumber>",
+            "  </Activation>",
+            "</Case>",
+        )
+    _write(handle, 3, "</Cases>", "<Evals>")
+    user_field_count = max(spec.fieldsets * spec.fields, 1)
+    for eval_index in range(spec.evals):
+        _write(
+            handle,
+            4,
+            f'<Eval Id="{eval_index + 1}">',
+            f"  <Name>Cut-off path {eval_index + 1}</Name>",
+            f"  <Q>{eval_index + 1}</Q>",
+            "  <Reset>",
+            "    <ResetType>NoReset</ResetType>",
+            "    <AutoResetTime>2</AutoResetTime>",
+            "  </Reset>",
+            "  <Cases>",
+        )
+        for case_index in range(spec.cases):
+            user_field_id = (case_index * spec.fields + eval_index) % user_field_count + 1
+            _write(
+                handle,
+                6,
+                f'<Case Id="{case_index}">',
+                "  <ScanPlanes>",
+                '    <ScanPlane Id="1">',
+                f"      <UserFieldId>{user_field_id}</UserFieldId>",
+                "      <IsSplitted>false</IsSplitted>",
+                "    </ScanPlane>",
+                "  </ScanPlanes>",
+                "</Case>",
+            )
+        _write(handle, 4, "  </Cases>", "</Eval>")
+    _write(
+        handle,
+        3,
+        "</Evals>",
+        "<FieldsConfiguration>",
+        "  <ScanPlanes>",
+    )
+    # UserField の Id は ScanPlane をまたいで通し番号にする。
+    user_field_id = 0
+    for plane_index in range(spec.scan_planes):
+        _write(
+            handle,
+            5,
+            f'<ScanPlane Id="{plane_index + 1}">',
+            f"  <Index>{plane_index}</Index>",
+            f"  <Name>Monitoring plane {plane_index + 1}</Name>",
+            "  <UserFieldsets>",
+        )
+        for fs_index in range(spec.fieldsets):
+            _write(
+                handle,
+                8,
+                f'<UserFieldset Id="{fs_index + 1}">',
+                f"  <Index>{fs_index}</Index>",
+                f"  <Name>FS{fs_index}</Name>",
+                f"  <NameLatin9Key>_FS_{fs_index:04d}</NameLatin9Key>",
+                "  <UserFields>",
+            )
+            for field_index in range(spec.fields):
+                user_field_id += 1
+                _write(
+                    handle,
+                    10,
+                    f'<UserField Id="{user_field_id}">',
+                    f"  <Index>{field_index}</Index>",
+                    f"  <Name>Field{field_index}</Name>",
+                    f"  <FieldType>{_FIELD_TYPES[field_index % 2]}</FieldType>",
+                    "  <MultipleSampling>2</MultipleSampling>",
+                    "  <ObjectResolution>70</ObjectResolution>",
+                    "</UserField>",
+                )
+            _write(handle, 8, "  </UserFields>", "</UserFieldset>")
+        _write(handle, 5, "  </UserFieldsets>", "</ScanPlane>")
+    _write(handle, 3, "  </ScanPlanes>", "</FieldsConfiguration>")
+    _write(handle, 1, "  </Casetable>")
+
+
+def write_synthetic_document(path: Path, spec: SyntheticSpec) -> Path:
+    """Write a synthetic document for ``spec`` to ``path`` and return the path."""
+
+    path = Path(path)
+    with path.open("w", encoding="utf-8") as handle:
+        handle.write('<?xml version="1.0" encoding="utf-8"?>\n<SdImportExport>\n')
+        _write(
+            handle,
+            1,
+            "<FileInfo>",
+            "  <ContentId>Scanner Complete Export</ContentId>",
+            "  <ContentVersion>1.6</ContentVersion>",
+            "  <Company>SICK AG</Company>",
+            "  <CreationToolName>SAFETY DESIGNER ENGINEERING TOOL</CreationToolName>",
+            "</FileInfo>",
+        )
+        if spec.geometry == "triorb":
+            _write_triorb_shapes(handle, spec)
+        _write_scan_planes(handle, spec)
+        _write_fieldsets(handle, spec)
+        _write_casetables(handle, spec)
+        handle.write("</SdImportExport>\n")
+    return path
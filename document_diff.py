@@ -0,0 +1,516 @@
+"""Structural diff of two sgexml documents built on the ``main.py`` payloads.
+
+Usage::
+
+    python document_diff.py OLD.sgexml NEW.sgexml [--tolerance 0.001] [--output diff.json] [--quiet]
+
+Items are paired through keyed indexes instead of comparing every pair:
+
+* TriOrb shapes by geometry fingerprint, then by name (a moved shape),
+* ScanPlanes and Casetables by ``Index``,
+* fieldsets and fields by ``Name``, then by ``Index``,
+* cases by name, then by ``Index``/``Id``, then by position.
+
+Each section lists ``added``/``removed`` items and ``changed`` ones with
+the differing attributes; changed polygons carry per-point deltas in mm.
+The same result is served by ``POST /api/diff``, which the editor draws as
+an overlay.
+"""
+
+from __future__ import annotations
+
+import argparse
+from collections import deque
+import json
+import math
+from pathlib import Path
+import sys
+import time
+from typing import Any, Callable, Deque, Dict, Hashable, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+from packed_points import PackedPoints
+from shape_index import shape_fingerprint
+
+# 差分に出す TriOrb 図形の形状以外の属性。
+SHAPE_PROPERTIES = ("name", "type", "fieldtype", "kind")
+# Rectangle / Circle の幾何属性を持つキー。
+_SHAPE_GEOMETRY_KEYS = {"Rectangle": "rectangle", "Circle": "circle"}
+# 座標差分の丸め桁数（mm 単位で 1 nm）。浮動小数点の誤差を差分として見せない。
+_DELTA_DIGITS = 6
+
+KeyFunction = Callable[[Any], Optional[Hashable]]
+
+
+def pair_items(
+    old_items: Iterable[Any], new_items: Iterable[Any], keys: Sequence[KeyFunction]
+) -> Tuple[List[Tuple[Any, Any]], List[Any], List[Any]]:
+    """Pair ``old_items`` with ``new_items`` through keyed indexes.
+
+    Each key function runs over the items the previous ones left unpaired;
+    items whose key is ``None`` skip that pass, and equal keys pair in
+    document order. Returns ``(pairs, removed, added)`` in linear time.
+    """
+
+    pairs: List[Tuple[Any, Any]] = []
+    old_left = list(old_items)
+    new_left = list(new_items)
+    for key in keys:
+        if not old_left or not new_left:
+            break
+        buckets: Dict[Hashable, Deque[int]] = {}
+        for position, item in enumerate(new_left):
+            value = key(item)
+            if value is not None:
+                buckets.setdefault(value, deque()).append(position)
+        taken = [False] * len(new_left)
+        unpaired: List[Any] = []
+        for item in old_left:
+            value = key(item)
+            queue = buckets.get(value) if value is not None else None
+            if queue:
+                position = queue.popleft()
+                taken[position] = True
+                pairs.append((item, new_left[position]))
+            else:
+                unpaired.append(item)
+        old_left = unpaired
+        new_left = [item for position, item in enumerate(new_left) if not taken[position]]
+    return pairs, old_left, new_left
+
+
+def _attribute_key(name: str) -> KeyFunction:
+    def key(item: Mapping[str, Any]) -> Optional[str]:
+        value = (item.get("attributes") or {}).get(name)
+        return str(value) if value not in (None, "") else None
+
+    return key
+
+
+def _number(value: Any) -> Optional[float]:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    return number if math.isfinite(number) else None
+
+
+def _changed_values(old: Mapping[str, Any], new: Mapping[str, Any]) -> Dict[str, List[Any]]:
+    # 値が異なるキーだけを {キー: [旧, 新]} で返す。片方にしか無いキーは None と比べる。
+    changes: Dict[str, List[Any]] = {}
+    for key in list(old) + [key for key in new if key not in old]:
+        if old.get(key) != new.get(key):
+            changes[key] = [old.get(key), new.get(key)]
+    return changes
+
+
+def _coordinates(points: Any) -> List[Tuple[Optional[float], Optional[float]]]:
+    if isinstance(points, PackedPoints):
+        flat = points.to_flat_list()
+        return list(zip(flat[0::2], flat[1::2]))
+    return [(_number(point.get("X")), _number(point.get("Y"))) for point in points or []]
+
+
+def point_deltas(old_points: Any, new_points: Any, tolerance: float = 0.0) -> Dict[str, Any]:
+    """Compare two polygon vertex lists by position.
+
+    ``moved`` lists ``{"index", "dx", "dy"}`` for vertices present in both
+    that moved by more than ``tolerance`` mm (``dx``/``dy`` are ``None``
+    when a coordinate is not a number); extra vertices at the end appear
+    in ``added``/``removed`` as ``[x, y]``.
+    """
+
+    old = _coordinates(old_points)
+    new = _coordinates(new_points)
+    moved: List[Dict[str, Any]] = []
+    max_delta = 0.0
+    for index, ((old_x, old_y), (new_x, new_y)) in enumerate(zip(old, new)):
+        if None in (old_x, old_y, new_x, new_y):
+            if (old_x, old_y) != (new_x, new_y):
+                moved.append({"index": index, "dx": None, "dy": None})
+            continue
+        dx, dy = new_x - old_x, new_y - old_y
+        distance = math.hypot(dx, dy)
+        if distance > tolerance:
+            moved.append({"index": index, "dx": round(dx, _DELTA_DIGITS), "dy": round(dy, _DELTA_DIGITS)})
+            max_delta = max(max_delta, distance)
+    return {
+        "points": [len(old), len(new)],
+        "moved": moved,
+        "added": [list(point) for point in new[len(old) :]],
+        "removed": [list(point) for point in old[len(new) :]],
+        "max_delta": round(max_delta, _DELTA_DIGITS),
+    }
+
+
+def attribute_deltas(old: Mapping[str, Any], new: Mapping[str, Any], tolerance: float = 0.0) -> Dict[str, Any]:
+    """Return ``{attribute: delta}`` for numeric attributes, ``[old, new]`` for the rest."""
+
+    deltas: Dict[str, Any] = {}
+    for key, (old_value, new_value) in _changed_values(old, new).items():
+        old_number, new_number = _number(old_value), _number(new_value)
+        if old_number is not None and new_number is not None:
+            if abs(new_number - old_number) > tolerance:
+                deltas[key] = round(new_number - old_number, _DELTA_DIGITS)
+        else:
+            deltas[key] = [old_value, new_value]
+    return deltas
+
+
+def _shape_geometry_delta(old: Mapping[str, Any], new: Mapping[str, Any], tolerance: float) -> Optional[Dict[str, Any]]:
+    shape_type = new.get("type")
+    if old.get("type") != shape_type:
+        return None
+    if shape_type == "Polygon":
+        old_polygon, new_polygon = old.get("polygon") or {}, new.get("polygon") or {}
+        delta = point_deltas(old_polygon.get("points"), new_polygon.get("points"), tolerance)
+        attributes = attribute_deltas(
+            {key: value for key, value in old_polygon.items() if key != "points"},
+            {key: value for key, value in new_polygon.items() if key != "points"},
+        )
+        if attributes:
+            delta["attributes"] = attributes
+        return delta
+    key = _SHAPE_GEOMETRY_KEYS.get(str(shape_type))
+    if key is None:
+        return None
+    return {"attributes": attribute_deltas(old.get(key) or {}, new.get(key) or {}, tolerance)}
+
+
+def _geometry_changed(delta: Optional[Dict[str, Any]]) -> bool:
+    if delta is None:
+        return True
+    return bool(
+        delta.get("moved") or delta.get("added") or delta.get("removed") or delta.get("attributes")
+    )
+
+
+def diff_shapes(
+    old_shapes: Sequence[Mapping[str, Any]], new_shapes: Sequence[Mapping[str, Any]], tolerance: float = 0.0
+) -> Tuple[Dict[str, Any], Dict[str, str]]:
+    """Diff two TriOrb shape lists; also return the old → new shape ID map.
+
+    Shapes with equal geometry pair first (renames and fieldtype changes
+    show up as property changes), the rest pair by name and report their
+    geometry delta.
+    """
+
+    fingerprints: Dict[int, Optional[bytes]] = {}
+
+    def by_geometry(shape: Mapping[str, Any]) -> Optional[bytes]:
+        # 各図形のフィンガープリントは 1 回だけ計算する。
+        if id(shape) not in fingerprints:
+            fingerprints[id(shape)] = shape_fingerprint(shape)
+        return fingerprints[id(shape)]
+
+    def by_name(shape: Mapping[str, Any]) -> Optional[Tuple[str, str]]:
+        name = shape.get("name")
+        return (str(shape.get("type")), str(name)) if name else None
+
+    pairs, removed, added = pair_items(old_shapes, new_shapes, (by_geometry, by_name))
+    changed: List[Dict[str, Any]] = []
+    id_map: Dict[str, str] = {}
+    unchanged = 0
+    for old, new in pairs:
+        id_map[str(old.get("id"))] = str(new.get("id"))
+        properties = _changed_values(
+            {key: old.get(key) for key in SHAPE_PROPERTIES}, {key: new.get(key) for key in SHAPE_PROPERTIES}
+        )
+        geometry = None
+        if by_geometry(old) is None or by_geometry(old) != by_geometry(new):
+            geometry = _shape_geometry_delta(old, new, tolerance)
+            if not _geometry_changed(geometry):
+                geometry = None
+        if not properties and geometry is None:
+            unchanged += 1
+            continue
+        changed.append(
+            {
+                "id": new.get("id"),
+                "previous_id": old.get("id"),
+                "name": new.get("name"),
+                "type": new.get("type"),
+                "changes": properties,
+                "geometry": geometry,
+                "shape": new,
+                "previous": old,
+            }
+        )
+    return {"added": list(added), "removed": list(removed), "changed": changed, "unchanged": unchanged}, id_map
+
+
+def _shape_names(shapes: Mapping[str, Mapping[str, Any]], ids: Iterable[str]) -> List[str]:
+    return [str((shapes.get(shape_id) or {}).get("name") or shape_id) for shape_id in ids]
+
+
+def _field_refs(field: Mapping[str, Any]) -> List[str]:
+    return [str(ref.get("shapeId")) for ref in field.get("shapeRefs") or [] if ref.get("shapeId")]
+
+
+class _ShapeContext:
+    """Shape lookups shared by the fieldset diff of every ScanPlane."""
+
+    def __init__(
+        self,
+        old: Sequence[Mapping[str, Any]],
+        new: Sequence[Mapping[str, Any]],
+        id_map: Dict[str, str],
+        changed: Iterable[str],
+    ) -> None:
+        self.old = {str(shape.get("id")): shape for shape in old}
+        self.new = {str(shape.get("id")): shape for shape in new}
+        self.id_map = id_map
+        self.changed = set(changed)
+
+
+def _diff_field(old: Mapping[str, Any], new: Mapping[str, Any], context: _ShapeContext) -> Optional[Dict[str, Any]]:
+    attributes = _changed_values(old.get("attributes") or {}, new.get("attributes") or {})
+    old_refs, new_refs = _field_refs(old), _field_refs(new)
+    # 旧文書の参照は図形の対応表で新文書の ID に読み替えてから比べる。
+    kept = {context.id_map.get(shape_id) for shape_id in old_refs}
+    current = set(new_refs)
+    shapes = {
+        "added": _shape_names(context.new, [shape_id for shape_id in new_refs if shape_id not in kept]),
+        "removed": _shape_names(
+            context.old, [shape_id for shape_id in old_refs if context.id_map.get(shape_id) not in current]
+        ),
+        "changed": _shape_names(
+            context.new, [shape_id for shape_id in new_refs if shape_id in kept and shape_id in context.changed]
+        ),
+    }
+    if not attributes and not any(shapes.values()):
+        return None
+    return {"name": (new.get("attributes") or {}).get("Name"), "attributes": attributes, "shapes": shapes}
+
+
+_BY_NAME_THEN_INDEX = (_attribute_key("Name"), _attribute_key("Index"))
+
+
+def _summary(item: Mapping[str, Any]) -> Dict[str, Any]:
+    attributes = item.get("attributes") or {}
+    return {"name": attributes.get("Name"), "index": attributes.get("Index")}
+
+
+def diff_fieldsets(
+    old_fieldsets: Sequence[Mapping[str, Any]],
+    new_fieldsets: Sequence[Mapping[str, Any]],
+    context: _ShapeContext,
+) -> Dict[str, Any]:
+    """Diff the fieldsets of one ScanPlane, pairing fieldsets and fields by name."""
+
+    pairs, removed, added = pair_items(old_fieldsets, new_fieldsets, _BY_NAME_THEN_INDEX)
+    changed: List[Dict[str, Any]] = []
+    for old, new in pairs:
+        field_pairs, removed_fields, added_fields = pair_items(
+            old.get("fields") or [], new.get("fields") or [], _BY_NAME_THEN_INDEX
+        )
+        fields = [entry for entry in (_diff_field(a, b, context) for a, b in field_pairs) if entry is not None]
+        attributes = _changed_values(old.get("attributes") or {}, new.get("attributes") or {})
+        if not (attributes or fields or removed_fields or added_fields):
+            continue
+        changed.append(
+            {
+                **_summary(new),
+                "attributes": attributes,
+                "fields": {
+                    "added": [_summary(field) for field in added_fields],
+                    "removed": [_summary(field) for field in removed_fields],
+                    "changed": fields,
+                },
+            }
+        )
+    return {
+        "added": [_summary(fieldset) for fieldset in added],
+        "removed": [_summary(fieldset) for fieldset in removed],
+        "changed": changed,
+    }
+
+
+def _case_user_fields(casetable: Mapping[str, Any], position: int) -> List[str]:
+    # Case の並び位置ごとに、各 Eval が選んでいる UserFieldId（Eval 直下の ScanPlane の userFieldId）。
+    selected = []
+    for eval_entry in (casetable.get("evals") or {}).get("evals") or []:
+        eval_cases = eval_entry.get("cases") or []
+        scan_plane = eval_cases[position].get("scanPlane") if position < len(eval_cases) else None
+        selected.append(str((scan_plane or {}).get("userFieldId") or "").strip())
+    return selected
+
+
+def _case_name(case: Mapping[str, Any]) -> Optional[str]:
+    # SICK の書き出しでは Case の名前は属性ではなく子要素 <Name> にある。
+    name = (case.get("attributes") or {}).get("Name")
+    if not name:
+        name = next(
+            (
+                entry["node"].get("text")
+                for entry in case.get("layout") or []
+                if entry.get("kind") == "node" and (entry.get("node") or {}).get("tag") == "Name"
+            ),
+            None,
+        )
+    if name is None:
+        return None
+    return str(name).strip() or None
+
+
+def _case_index(case: Mapping[str, Any]) -> Optional[str]:
+    attributes = case.get("attributes") or {}
+    value = attributes.get("Index", attributes.get("Id"))
+    return str(value) if value not in (None, "") else None
+
+
+def _case_summary(case: Mapping[str, Any]) -> Dict[str, Any]:
+    return {"name": _case_name(case), "index": _case_index(case)}
+
+
+def diff_cases(old_casetable: Mapping[str, Any], new_casetable: Mapping[str, Any]) -> Dict[str, Any]:
+    """Diff the cases of one Casetable, pairing them by name, then ``Index``/``Id``, then position."""
+
+    old_cases = list(enumerate(old_casetable.get("cases") or []))
+    new_cases = list(enumerate(new_casetable.get("cases") or []))
+    keys: List[KeyFunction] = [
+        lambda item: _case_name(item[1]),
+        lambda item: _case_index(item[1]),
+        lambda item: item[0],
+    ]
+    pairs, removed, added = pair_items(old_cases, new_cases, keys)
+    changed: List[Dict[str, Any]] = []
+    for (old_position, old), (new_position, new) in pairs:
+        parts = _changed_values(
+            {key: value for key, value in old.items() if key != "attributes"},
+            {key: value for key, value in new.items() if key != "attributes"},
+        )
+        attributes = _changed_values(old.get("attributes") or {}, new.get("attributes") or {})
+        old_fields = _case_user_fields(old_casetable, old_position)
+        new_fields = _case_user_fields(new_casetable, new_position)
+        if old_fields != new_fields:
+            parts["user_fields"] = [old_fields, new_fields]
+        if attributes or parts:
+            changed.append({**_case_summary(new), "attributes": attributes, "changes": parts})
+    return {
+        "added": [_case_summary(case) for _position, case in added],
+        "removed": [_case_summary(case) for _position, case in removed],
+        "changed": changed,
+    }
+
+
+def _document_shapes(payload: Mapping[str, Any]) -> List[Mapping[str, Any]]:
+    # 先頭以外の ScanPlane が昇格させたレガシー図形も含める。
+    planes = payload["fieldset_planes"]
+    shapes = list(payload["triorb_shapes"])
+    for key in planes.keys():
+        shapes.extend(planes.payload(key).get("shapes") or [])
+    return shapes
+
+
+def _keyed_sections(index: Any) -> Dict[str, Mapping[str, Any]]:
+    return {key: index.payload(key) for key in index.keys()}
+
+
+def diff_payloads(old: Mapping[str, Any], new: Mapping[str, Any], tolerance: float = 0.0) -> Dict[str, Any]:
+    """Diff two ``build_index_payload`` results.
+
+    ``tolerance`` (mm) hides coordinate changes at or below it. Every
+    ScanPlane and Casetable is compared, paired by ``Index``.
+    """
+
+    old_shapes, new_shapes = _document_shapes(old), _document_shapes(new)
+    shapes, id_map = diff_shapes(old_shapes, new_shapes, tolerance)
+    context = _ShapeContext(old_shapes, new_shapes, id_map, (entry["id"] for entry in shapes["changed"]))
+
+    old_planes, new_planes = _keyed_sections(old["fieldset_planes"]), _keyed_sections(new["fieldset_planes"])
+    planes = {
+        key: diff_fieldsets(old_planes[key].get("fieldsets") or [], new_planes[key].get("fieldsets") or [], context)
+        for key in old_planes
+        if key in new_planes
+    }
+    old_tables, new_tables = _keyed_sections(old["casetable_index"]), _keyed_sections(new["casetable_index"])
+    casetables = {key: diff_cases(old_tables[key], new_tables[key]) for key in old_tables if key in new_tables}
+
+    def count(sections: Iterable[Mapping[str, Any]], kind: str) -> int:
+        return sum(len(section[kind]) for section in sections)
+
+    fields = [fieldset["fields"] for plane in planes.values() for fieldset in plane["changed"]]
+    return {
+        "summary": {
+            "shapes": {kind: len(shapes[kind]) for kind in ("added", "removed", "changed")},
+            "fieldsets": {kind: count(planes.values(), kind) for kind in ("added", "removed", "changed")},
+            "fields": {kind: count(fields, kind) for kind in ("added", "removed", "changed")},
+            "cases": {kind: count(casetables.values(), kind) for kind in ("added", "removed", "changed")},
+        },
+        "shapes": shapes,
+        "scan_planes": {
+            "added": [key for key in new_planes if key not in old_planes],
+            "removed": [key for key in old_planes if key not in new_planes],
+            "fieldsets": planes,
+        },
+        "casetables": {
+            "added": [key for key in new_tables if key not in old_tables],
+            "removed": [key for key in old_tables if key not in new_tables],
+            "cases": casetables,
+        },
+    }
+
+
+def is_empty(diff: Mapping[str, Any]) -> bool:
+    """Return ``True`` when :func:`diff_payloads` found no difference at all."""
+
+    counts = [value for section in diff["summary"].values() for value in section.values()]
+    return not any(counts) and not any(
+        diff[section][kind] for section in ("scan_planes", "casetables") for kind in ("added", "removed")
+    )
+
+
+def _json_default(value: object) -> object:
+    if isinstance(value, PackedPoints):
+        return value.to_dicts()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _load_payload(path: Path) -> Mapping[str, Any]:
+    # main はエンドポイントのためにこのモジュールを import するので、CLI からの実行時だけ読み込む。
+    import main
+
+    document = main.SgexmlDocument.load(path)
+    if not document.is_loaded:
+        raise ValueError(f"{path}: not a well-formed XML document")
+    return main.build_index_payload(document)
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("old", type=Path)
+    parser.add_argument("new", type=Path)
+    parser.add_argument("--tolerance", type=float, default=0.0, help="ignore coordinate changes up to this many mm")
+    parser.add_argument("--output", type=Path, help="write the full diff as JSON")
+    parser.add_argument("--quiet", action="store_true", help="only print the summary")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    try:
+        diff = diff_payloads(_load_payload(args.old), _load_payload(args.new), args.tolerance)
+    except (OSError, ValueError) as exc:
+        print(f"error: {exc}", file=sys.stderr)
+        return 2
+    seconds = time.perf_counter() - start
+
+    if args.output:
+        args.output.write_text(
+            json.dumps(diff, ensure_ascii=False, indent=2, default=_json_default) + "\n", encoding="utf-8"
+        )
+    for section, counts in diff["summary"].items():
+        print(f"{section:<10} +{counts['added']} -{counts['removed']} ~{counts['changed']}")
+    if not args.quiet:
+        for entry in diff["shapes"]["changed"]:
+            geometry = entry["geometry"] or {}
+            moved = len(geometry.get("moved") or [])
+            print(f"  shape {entry['name']}: {', '.join(entry['changes']) or 'geometry'}, {moved} points moved")
+        for key, plane in diff["scan_planes"]["fieldsets"].items():
+            for fieldset in plane["changed"]:
+                names = [field["name"] for field in fieldset["fields"]["changed"]]
+                print(f"  plane {key} fieldset {fieldset['name']}: {', '.join(map(str, names)) or 'attributes'}")
+    print(f"compared in {seconds:.3f}s")
+    return 0 if is_empty(diff) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -7,6 +7,9 @@ from main import app
 # ルートパスが 404 になるため、相対 URL を生成するように設定する。
 app.config['FREEZER_DESTINATION'] = 'docs'
 app.config['FREEZER_RELATIVE_URLS'] = True
+# 静的ビルドには /api/document/<section> が存在しないため、
+# 全セクションを index.html に埋め込むフォールバックを使う。
+app.config['INLINE_BOOTSTRAP'] = True
 freezer = Freezer(app)
 
 if __name__ == '__main__':
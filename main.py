@@ -1,13 +1,36 @@
 from __future__ import annotations
 
+import base64
+import binascii
+from contextlib import contextmanager
+from functools import wraps
+import hashlib
+import io
+import json
+import math
+import mmap
+import os
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
-import uuid
+import threading
+import time
+from typing import IO, Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+from urllib.parse import unquote
 import xml.etree.ElementTree as ET
-
-from flask import Flask, render_template
-
-from plotly_panel import build_sample_figure
+import zlib
+
+from flask import Flask, Response, abort, g, jsonify, render_template, request, stream_with_context, url_for
+from flask.json.provider import DefaultJSONProvider
+
+from document_diff import diff_payloads
+from packed_points import POINT_ENCODINGS, PackedPoints, encode_shape_points, pack_points
+from payload_cache import DocumentPayloadCache
+from plotly_panel import sample_figure_spec
+from request_timing import current_timer, install_request_timing, timed_stage
+from response_compression import install_response_compression, matching_etag, negotiate_encoding
+import sgexml_writer
+from shape_index import ShapeIndex, geometry_fingerprint, shape_fingerprint
+import svg_path
+from upload_jobs import UploadJobs, UploadQueueFull
 
 # アプリで参照するサンプル XML のパス。
 # 実際の編集データがまだない環境でも UI が壊れないよう、
@@ -15,7 +38,71 @@ from plotly_panel import build_sample_figure
 SAMPLE_XML = Path("sample/ScannerDTM-Export_Mini.sgexml")
 
 
-def load_menu_items() -> List[Dict[str, str]]:
+class SgexmlDocument:
+    """Parsed SdImportExport document shared by the loaders of one request."""
+
+    def __init__(
+        self,
+        path: Path,
+        root: Optional[ET.Element],
+        content_hash: Optional[str] = None,
+    ) -> None:
+        self.path = path
+        # root が None の場合はファイル欠落またはパース失敗を表し、
+        # 各ローダーはそれぞれのフォールバックを返す。
+        self.root = root
+        self.content_hash = content_hash
+
+    @classmethod
+    def load(cls, path: Optional[Path] = None) -> "SgexmlDocument":
+        """Parse ``path`` (defaults to ``SAMPLE_XML``) exactly once."""
+
+        source = Path(path) if path is not None else SAMPLE_XML
+        if not source.exists():
+            return cls(source, None)
+        return cls.from_bytes(source, source.read_bytes())
+
+    @classmethod
+    def from_bytes(
+        cls, path: Path, data: bytes, content_hash: Optional[str] = None
+    ) -> "SgexmlDocument":
+        """Parse already-read file content, e.g. from the payload cache."""
+
+        digest = content_hash or hashlib.sha256(data).hexdigest()
+        # Save (TriOrb) のファイルは SdImportExport の後ろに TriOrb_SICK_SLS_Editor を
+        # 2 つ目のルート要素として書く。ET.parse は受け付けないため、ルートの子として読み込む。
+        split = _triorb_section_offset(data)
+        try:
+            with timed_stage("parse"):
+                if split is None:
+                    root = ET.parse(io.BytesIO(data)).getroot()
+                else:
+                    root = ET.fromstring(data[:split])
+                    root.append(ET.fromstring(data[split:]))
+        except ET.ParseError:
+            return cls(Path(path), None, digest)
+        return cls(Path(path), root, digest)
+
+    @property
+    def is_loaded(self) -> bool:
+        return self.root is not None
+
+
+def _triorb_section_offset(data: Union[bytes, mmap.mmap]) -> Optional[int]:
+    # SdImportExport の閉じタグより後ろに置かれた TriOrb_SICK_SLS_Editor の開始位置。
+    end = data.rfind(b"</SdImportExport>")
+    if end < 0:
+        return None
+    start = data.find(b"<TriOrb_SICK_SLS_Editor", end)
+    return start if start >= 0 else None
+
+
+def _resolve_document(document: Optional[SgexmlDocument]) -> SgexmlDocument:
+    # 引数なしで呼ばれた場合は従来どおり SAMPLE_XML をその場で読み込む。
+    return document if document is not None else SgexmlDocument.load()
+
+
+def load_menu_items(document: Optional[SgexmlDocument] = None) -> List[Dict[str, str]]:
     """Return second-level nodes for the side menu."""
 
     # メニューの最低限の構造はハードコードしておき、
@@ -27,16 +114,11 @@ def load_menu_items() -> List[Dict[str, str]]:
         {"tag": "Export_CasetablesAndCases", "summary": "Case tables (placeholder)"},
     ]
 
-    if not SAMPLE_XML.exists():
+    # ファイル欠落や XML の構造が壊れていた場合も即フォールバック。
+    root = _resolve_document(document).root
+    if root is None:
         return fallback
 
-    try:
-        tree = ET.parse(SAMPLE_XML)
-    except ET.ParseError:
-        # XML の構造が壊れていた場合も即フォールバック。
-        return fallback
-
-    root = tree.getroot()
     items: List[Dict[str, str]] = []
     for child in root:
         summary_parts = []
@@ -50,20 +132,15 @@ def load_menu_items() -> List[Dict[str, str]]:
     return items or fallback
 
 
-def load_fileinfo_fields() -> List[Dict[str, str]]:
+def load_fileinfo_fields(document: Optional[SgexmlDocument] = None) -> List[Dict[str, str]]:
     """Extract FileInfo child nodes for editing."""
 
     # FileInfo が存在しない場合は空配列を返し、テンプレート側で空状態を処理する。
-    if not SAMPLE_XML.exists():
-        return []
-
-    try:
-        tree = ET.parse(SAMPLE_XML)
-    except ET.ParseError:
-        # XML の読み込みに失敗してもアプリが落ちないよう防御的に扱う。
+    # XML の読み込みに失敗してもアプリが落ちないよう防御的に扱う。
+    root = _resolve_document(document).root
+    if root is None:
         return []
 
-    root = tree.getroot()
     file_info = root.find("FileInfo")
     if file_info is None:
         return []
@@ -243,48 +320,27 @@ def _serialize_evals_node(evals_element: ET.Element) -> Dict[str, Any]:
     }
 
 
-def load_casetable_payload() -> Dict[str, Any]:
-    """Extract Export_CasetablesAndCases content for the template."""
-
-    default_layout = [
+def _default_casetable_layout() -> List[Dict[str, Any]]:
+    return [
         {"kind": "configuration"},
         {"kind": "cases"},
         {"kind": "evals"},
         {"kind": "fields_configuration"},
     ]
-    fallback = {
+
+
+def _fallback_casetable_payload() -> Dict[str, Any]:
+    return {
         "casetable_attributes": {"Index": "0"},
         "configuration": None,
         "cases": [],
         "evals": {"attributes": {}, "evals": []},
         "fields_configuration": None,
-        "layout": default_layout,
+        "layout": _default_casetable_layout(),
     }
 
-    if not SAMPLE_XML.exists():
-        return fallback
-
-    try:
-        tree = ET.parse(SAMPLE_XML)
-    except ET.ParseError:
-        return fallback
-
-    root = tree.getroot()
-    export = root.find("Export_CasetablesAndCases")
-    if export is None:
-        return fallback
-
-    casetables = export.findall("Casetable")
-    target: Optional[ET.Element] = None
-    for node in casetables:
-        if node.get("Index") == "0":
-            target = node
-            break
-    if target is None and casetables:
-        target = casetables[0]
-    if target is None:
-        return fallback
 
+def _serialize_casetable(target: ET.Element) -> Dict[str, Any]:
     payload: Dict[str, Any] = {
         "casetable_attributes": dict(target.attrib) or {"Index": "0"},
         "configuration": None,
@@ -328,20 +384,130 @@ def load_casetable_payload() -> Dict[str, Any]:
     return payload
 
 
-def load_scan_planes() -> List[Dict[str, Any]]:
+class CasetableEntry:
+    """One ``Casetable`` element of a document, kept unserialized."""
+
+    def __init__(self, key: str, element: ET.Element) -> None:
+        self.key = key
+        self.element = element
+        self.attributes = dict(element.attrib)
+        self.name = (element.findtext("Configuration/Name") or "").strip()
+        cases = element.find("Cases")
+        self.case_count = len(cases.findall("Case")) if cases is not None else 0
+
+    def summary(self) -> Dict[str, Any]:
+        return {"index": self.key, "name": self.name, "cases": self.case_count, "attributes": dict(self.attributes)}
+
+
+def _unique_index_key(index: Optional[str], position: int, seen: set) -> str:
+    # Index が欠落・重複していれば出現順を使い、それも使用済みなら "<出現順>_1", "_2", ... と進める。
+    key = index or str(position)
+    if key in seen:
+        key = str(position)
+    suffix = 0
+    while key in seen:
+        suffix += 1
+        key = f"{position}_{suffix}"
+    seen.add(key)
+    return key
+
+
+class CasetableIndex:
+    """All Casetables of a document, keyed by their ``Index`` attribute.
+
+    Only the element handles are kept; :meth:`payload` serializes a
+    casetable the first time it is requested and memoizes the result, so
+    the casetable being viewed is the only one converted up front.
+    """
+
+    def __init__(self, entries: Iterable[CasetableEntry] = ()) -> None:
+        self._entries: Dict[str, CasetableEntry] = {}
+        for entry in entries:
+            self._entries[entry.key] = entry
+        self._payloads: Dict[str, Dict[str, Any]] = {}
+
+    @classmethod
+    def from_document(cls, document: Optional[SgexmlDocument] = None) -> "CasetableIndex":
+        root = _resolve_document(document).root
+        export = root.find("Export_CasetablesAndCases") if root is not None else None
+        if export is None:
+            return cls()
+        entries = []
+        seen = set()
+        for position, node in enumerate(export.findall("Casetable")):
+            # Index の欠落・重複時は出現順をキーにし、どの Casetable も取りこぼさない。
+            entries.append(CasetableEntry(_unique_index_key(node.get("Index"), position, seen), node))
+        return cls(entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def keys(self) -> List[str]:
+        return list(self._entries)
+
+    @property
+    def default_key(self) -> Optional[str]:
+        # 従来どおり Index="0" を優先し、無ければ先頭の Casetable を表示する。
+        if "0" in self._entries:
+            return "0"
+        return next(iter(self._entries), None)
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        return [entry.summary() for entry in self._entries.values()]
+
+    def payload(self, key: Optional[str] = None) -> Dict[str, Any]:
+        """Return the template payload of casetable ``key`` (default: the viewed one).
+
+        Raises ``KeyError`` for an unknown key; a document without any
+        Casetable yields the usual fallback payload.
+        """
+
+        if key is None:
+            key = self.default_key
+            if key is None:
+                return _fallback_casetable_payload()
+        cached = self._payloads.get(key)
+        if cached is None:
+            cached = self._payloads[key] = _serialize_casetable(self._entries[key].element)
+        return cached
+
+    def payloads(self) -> List[Dict[str, Any]]:
+        return [self.payload(key) for key in self._entries]
+
+
+def load_casetable_index(document: Optional[SgexmlDocument] = None) -> CasetableIndex:
+    """Index every Casetable in Export_CasetablesAndCases without serializing them."""
+
+    return CasetableIndex.from_document(document)
+
+
+def load_casetable_payload(
+    document: Optional[SgexmlDocument] = None, index: Optional[str] = None
+) -> Dict[str, Any]:
+    """Extract one Casetable of Export_CasetablesAndCases for the template.
+
+    ``index`` selects the casetable by its ``Index`` attribute; by default
+    ``Index="0"`` (or the first casetable) is returned.
+    """
+
+    return load_casetable_index(document).payload(index)
+
+
+def load_scan_planes(document: Optional[SgexmlDocument] = None) -> List[Dict[str, Any]]:
     """Return structured data for Export_ScanPlanes."""
 
     # ScanPlane 情報は TriOrb の扇形描画に利用されるため、
     # 解析できない場合は空配列を返し Plotly 側で分岐する。
-    if not SAMPLE_XML.exists():
-        return []
-
-    try:
-        tree = ET.parse(SAMPLE_XML)
-    except ET.ParseError:
+    root = _resolve_document(document).root
+    if root is None:
         return []
 
-    root = tree.getroot()
     export = root.find("Export_ScanPlanes")
     if export is None:
         return []
@@ -362,27 +528,18 @@ def load_scan_planes() -> List[Dict[str, Any]]:
     return scan_planes
 
 
-def _generate_shape_id() -> str:
-    # XML に ID が欠落している場合でも UI でユニークに扱えるよう、
-    # ランダムな ID を生成するユーティリティ。
-    return f"shape-{uuid.uuid4().hex[:8]}"
+def _generate_shape_id(seed: bytes) -> str:
+    # XML に ID が欠落している場合でも UI でユニークに扱えるよう ID を補う。
+    # セクションごとの応答が別のワーカーやキャッシュの再構築から来ても shapeRef と一致するよう、
+    # 乱数ではなく図形の出現位置やフィンガープリントから決める。
+    return f"shape-{hashlib.blake2b(seed, digest_size=4).hexdigest()}"
 
 
-def _build_shape_key(shape_type: str, attrs: Dict[str, str], points: Optional[List[Dict[str, str]]] = None) -> str:
-    # TriOrb 共有図形を同一性判定するためのキーを生成。
-    # 図形タイプと属性値、必要に応じて座標列を連結して比較する。
-    attr_items = "/".join(f"{key}={attrs.get(key, '')}" for key in sorted(attrs))
-    key_parts = [shape_type, attr_items]
-    if shape_type == "Polygon" and points is not None:
-        points_repr = ",".join(f"{point.get('X','')}:{point.get('Y','')}" for point in points)
-        key_parts.append(points_repr)
-    return "|".join(key_parts)
-
-
-def _parse_polygon_node(polygon_node: ET.Element) -> Tuple[Dict[str, str], List[Dict[str, str]]]:
+def _parse_polygon_node(polygon_node: ET.Element) -> Tuple[Dict[str, str], Sequence[Dict[str, str]]]:
     # Polygon 要素は座標リストを含むため、属性と座標を分離して返す。
+    # 座標は可逆に数値化できる限り PackedPoints（float 配列）で保持し、点ごとの dict を持たない。
     attrs = dict(polygon_node.attrib)
-    points = [dict(point.attrib) for point in polygon_node.findall("Point")]
+    points = pack_points([point.attrib for point in polygon_node.findall("Point")])
     return attrs, points
 
 
@@ -395,6 +552,41 @@ def _parse_circle_node(circle_node: ET.Element) -> Dict[str, str]:
     return dict(circle_node.attrib)
 
 
+def _serialize_triorb_shape_node(shape_node: ET.Element, position: int) -> Dict[str, Any]:
+    # Shape タグに図形タイプが記録されている前提で個別の辞書に展開する。
+    # position は Shapes 内の出現順で、ID の無い Shape の ID を決めるのに使う。
+    shape_type = shape_node.attrib.get("Type", "Polygon")
+    shape_data: Dict[str, Any] = {
+        "id": shape_node.attrib.get("ID") or _generate_shape_id(b"TriOrb Shape %d" % position),
+        "name": shape_node.attrib.get("Name", ""),
+        "type": shape_type,
+        "fieldtype": shape_node.attrib.get("Fieldtype", "ProtectiveSafeBlanking"),
+        "kind": shape_node.attrib.get("Kind"),
+    }
+    if shape_type == "Polygon":
+        polygon = shape_node.find("Polygon")
+        if polygon is not None:
+            polygon_attrs, points = _parse_polygon_node(polygon)
+            shape_data["polygon"] = {"Type": polygon_attrs.get("Type", "CutOut"), "points": points}
+            if not shape_data["kind"]:
+                shape_data["kind"] = polygon_attrs.get("Type")
+    elif shape_type == "Rectangle":
+        rectangle = shape_node.find("Rectangle")
+        if rectangle is not None:
+            shape_data["rectangle"] = _parse_rectangle_node(rectangle)
+            if not shape_data["kind"]:
+                shape_data["kind"] = shape_data["rectangle"].get("Type")
+    elif shape_type == "Circle":
+        circle = shape_node.find("Circle")
+        if circle is not None:
+            shape_data["circle"] = _parse_circle_node(circle)
+            if not shape_data["kind"]:
+                shape_data["kind"] = shape_data["circle"].get("Type")
+    if not shape_data.get("kind"):
+        shape_data["kind"] = "Field"
+    return shape_data
+
+
 def _load_triorb_shapes_from_root(root: ET.Element) -> Tuple[List[Dict[str, Any]], str]:
     # TriOrb_SICK_SLS_Editor セクションから共有図形を抽出する。
     # TriOrb は Fieldset とは独立に Shape を再利用できるため、
@@ -408,61 +600,33 @@ def _load_triorb_shapes_from_root(root: ET.Element) -> Tuple[List[Dict[str, Any]
     if shapes_parent is None:
         return [], tri_source
 
-    shapes: List[Dict[str, Any]] = []
-    for shape_node in shapes_parent.findall("Shape"):
-        # Shape タグに図形タイプが記録されている前提で個別の辞書に展開する。
-        shape_type = shape_node.attrib.get("Type", "Polygon")
-        shape_data: Dict[str, Any] = {
-            "id": shape_node.attrib.get("ID") or _generate_shape_id(),
-            "name": shape_node.attrib.get("Name", ""),
-            "type": shape_type,
-            "fieldtype": shape_node.attrib.get("Fieldtype", "ProtectiveSafeBlanking"),
-            "kind": shape_node.attrib.get("Kind"),
-        }
-        if shape_type == "Polygon":
-            polygon = shape_node.find("Polygon")
-            if polygon is not None:
-                polygon_attrs, points = _parse_polygon_node(polygon)
-                shape_data["polygon"] = {"Type": polygon_attrs.get("Type", "CutOut"), "points": points}
-                if not shape_data["kind"]:
-                    shape_data["kind"] = polygon_attrs.get("Type")
-        elif shape_type == "Rectangle":
-            rectangle = shape_node.find("Rectangle")
-            if rectangle is not None:
-                shape_data["rectangle"] = _parse_rectangle_node(rectangle)
-                if not shape_data["kind"]:
-                    shape_data["kind"] = shape_data["rectangle"].get("Type")
-        elif shape_type == "Circle":
-            circle = shape_node.find("Circle")
-            if circle is not None:
-                shape_data["circle"] = _parse_circle_node(circle)
-                if not shape_data["kind"]:
-                    shape_data["kind"] = shape_data["circle"].get("Type")
-        if not shape_data.get("kind"):
-            shape_data["kind"] = "Field"
-        shapes.append(shape_data)
+    shapes = [
+        _serialize_triorb_shape_node(shape_node, position)
+        for position, shape_node in enumerate(shapes_parent.findall("Shape"))
+    ]
     return shapes, tri_source
 
 
 def _ensure_shape(
     shapes: List[Dict[str, Any]],
-    registry: Dict[str, str],
+    registry: ShapeIndex,
     shape_type: str,
     attrs: Dict[str, str],
-    points: Optional[List[Dict[str, str]]],
+    points: Optional[Sequence[Dict[str, str]]],
     hint: Optional[str] = None,
     fieldtype: Optional[str] = None,
 ) -> str:
     # Fieldset 側に直接図形定義が書かれているケースでは、
     # TriOrb の共有図形へ昇格させつつ ID を再利用する必要がある。
-    # registry に登録されたキーを利用して重複を排除する。
-    key = _build_shape_key(shape_type, attrs, points)
+    # 座標列を連結した長いキーではなく固定長のフィンガープリントで重複を排除する。
+    key = geometry_fingerprint(shape_type, attrs, points)
     existing_id = registry.get(key)
     if existing_id:
         return existing_id
 
     # まだ登録されていない図形は新しく作成し、TriOrb Shapes に追記する。
-    shape_id = attrs.get("ID") or _generate_shape_id()
+    # 重複はフィンガープリントで排除済みなので、それ自体から ID を決めれば文書内で一意になる。
+    shape_id = attrs.get("ID") or _generate_shape_id(key)
     name = hint or f"{shape_type} Shape {len(shapes) + 1}"
     shape_entry: Dict[str, Any] = {
         "id": shape_id,
@@ -478,125 +642,436 @@ def _ensure_shape(
     elif shape_type == "Circle":
         shape_entry["circle"] = attrs
     shapes.append(shape_entry)
-    registry[key] = shape_id
+    registry.add(key, shape_id)
     return shape_id
 
 
-def load_fieldsets_and_shapes() -> Tuple[Dict[str, Any], List[Dict[str, Any]], str]:
-    """Return fieldset payload, shared TriOrb shapes, and TriOrb source marker."""
+def _read_fieldset_record(fieldset_node: ET.Element) -> Dict[str, Any]:
+    # Fieldset 要素を中間レコードへ変換する。Field 直下に図形定義がある古い XML は
+    # "inline" に生の図形を残し、TriOrb Shapes への登録は _resolve_fieldset_record で行う。
+    record: Dict[str, Any] = {
+        "attributes": dict(fieldset_node.attrib),
+        "fields": [],
+    }
+    for field_node in fieldset_node.findall("Field"):
+        field_record: Dict[str, Any] = {
+            "attributes": dict(field_node.attrib),
+            "shapeRefs": [],
+            "inline": None,
+        }
+        shapes_parent = field_node.find("Shapes")
+        if shapes_parent is not None:
+            for shape_node in shapes_parent.findall("Shape"):
+                shape_id = shape_node.attrib.get("ID")
+                if shape_id:
+                    field_record["shapeRefs"].append({"shapeId": shape_id})
+        else:
+            inline: List[Tuple[str, Dict[str, str], Optional[Sequence[Dict[str, str]]]]] = []
+            for polygon_node in field_node.findall("Polygon"):
+                attrs, points = _parse_polygon_node(polygon_node)
+                inline.append(("Polygon", attrs, points))
+            for rectangle_node in field_node.findall("Rectangle"):
+                inline.append(("Rectangle", _parse_rectangle_node(rectangle_node), None))
+            for circle_node in field_node.findall("Circle"):
+                inline.append(("Circle", _parse_circle_node(circle_node), None))
+            field_record["inline"] = inline
+        record["fields"].append(field_record)
+    return record
+
+
+def _resolve_fieldset_record(
+    record: Dict[str, Any],
+    shapes: List[Dict[str, Any]],
+    shape_registry: ShapeIndex,
+) -> Dict[str, Any]:
+    fieldset_data: Dict[str, Any] = {
+        "attributes": record["attributes"],
+        "fields": [],
+    }
+    for field_record in record["fields"]:
+        field_data: Dict[str, Any] = {
+            "attributes": field_record["attributes"],
+            "shapeRefs": field_record["shapeRefs"],
+        }
+        # 古い XML では Field 直下に図形定義が存在する場合があるため、
+        # TriOrb の Shapes に登録し直し、その ID を参照させる。
+        for shape_type, attrs, points in field_record["inline"] or []:
+            shape_id = _ensure_shape(
+                shapes,
+                shape_registry,
+                shape_type,
+                attrs,
+                points,
+                f"{fieldset_data['attributes'].get('Name','')} {field_data['attributes'].get('Name','')} {shape_type}",
+                field_data["attributes"].get("Fieldtype"),
+            )
+            field_data["shapeRefs"].append({"shapeId": shape_id})
+        fieldset_data["fields"].append(field_data)
+    return fieldset_data
+
 
-    default_payload: Dict[str, Any] = {
+def _empty_fieldset_payload() -> Dict[str, Any]:
+    return {
         "devices": [],
         "global_geometry": {},
         "fieldsets": [],
     }
 
-    # サンプル XML がない場合は空データを返し、テンプレートで空描画に切り替える。
-    if not SAMPLE_XML.exists():
-        return default_payload, [], ""
 
-    try:
-        tree = ET.parse(SAMPLE_XML)
-    except ET.ParseError:
-        return default_payload, [], ""
-
-    root = tree.getroot()
-    shapes, tri_source = _load_triorb_shapes_from_root(root)
-    shape_registry: Dict[str, str] = {}
-    for shape in shapes:
-        if shape["type"] == "Polygon":
-            polygon = shape.get("polygon", {})
-            key = _build_shape_key("Polygon", {"Type": polygon.get("Type", "CutOut")}, polygon.get("points", []))
-        elif shape["type"] == "Rectangle":
-            rectangle = shape.get("rectangle", {})
-            key = _build_shape_key("Rectangle", rectangle, None)
-        elif shape["type"] == "Circle":
-            circle = shape.get("circle", {})
-            key = _build_shape_key("Circle", circle, None)
-        else:
-            continue
-        shape_registry[key] = shape["id"]
+class FieldsetPlaneEntry:
+    """One ``ScanPlane`` of Export_FieldsetsAndFields, kept unresolved."""
+
+    def __init__(self, key: str, element: ET.Element) -> None:
+        self.key = key
+        self.element = element
+        self.attributes = dict(element.attrib)
+        fieldsets = element.find("Fieldsets")
+        self.fieldset_count = len(fieldsets.findall("Fieldset")) if fieldsets is not None else 0
+        devices = element.find("Devices")
+        self.device_count = len(devices.findall("Device")) if devices is not None else 0
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "index": self.key,
+            "fieldsets": self.fieldset_count,
+            "devices": self.device_count,
+            "attributes": dict(self.attributes),
+        }
 
-    # Fieldset 側を走査し、Shapes 要素がなくても TriOrb Shapes に登録されるよう補完する。
-    export = root.find("Export_FieldsetsAndFields")
-    if export is None:
-        return default_payload, shapes, tri_source
+    def resolve(self, shapes: List[Dict[str, Any]], shape_registry: ShapeIndex) -> Dict[str, Any]:
+        devices: List[Dict[str, Any]] = []
+        devices_parent = self.element.find("Devices")
+        if devices_parent is not None:
+            for device_node in devices_parent.findall("Device"):
+                devices.append({"attributes": dict(device_node.attrib)})
+
+        global_geometry = {}
+        global_node = self.element.find("GlobalGeometry")
+        if global_node is not None:
+            global_geometry = dict(global_node.attrib)
+
+        fieldsets: List[Dict[str, Any]] = []
+        fieldsets_parent = self.element.find("Fieldsets")
+        if fieldsets_parent is not None:
+            for fieldset_node in fieldsets_parent.findall("Fieldset"):
+                fieldsets.append(
+                    _resolve_fieldset_record(
+                        _read_fieldset_record(fieldset_node), shapes, shape_registry
+                    )
+                )
+        return {
+            "devices": devices,
+            "global_geometry": global_geometry,
+            "fieldsets": fieldsets,
+        }
 
-    scan_plane = export.find("ScanPlane")
-    if scan_plane is None:
-        return default_payload, shapes, tri_source
 
-    devices: List[Dict[str, Any]] = []
-    devices_parent = scan_plane.find("Devices")
-    if devices_parent is not None:
-        for device_node in devices_parent.findall("Device"):
-            devices.append({"attributes": dict(device_node.attrib)})
+class FieldsetPlaneIndex:
+    """All ScanPlanes of Export_FieldsetsAndFields, keyed by their ``Index``.
+
+    The TriOrb Shapes and the first (edited) plane are resolved up front;
+    :meth:`payload` resolves any other plane the first time it is requested
+    and memoizes it. Legacy inline geometry of those planes is promoted
+    into a separate list so ``shapes`` (already sent to the page) never
+    changes, and each lazy payload carries the extra shapes it references.
+    """
+
+    def __init__(
+        self,
+        entries: Iterable[FieldsetPlaneEntry] = (),
+        shapes: Optional[List[Dict[str, Any]]] = None,
+        tri_source: str = "",
+    ) -> None:
+        self._entries: Dict[str, FieldsetPlaneEntry] = {}
+        for entry in entries:
+            self._entries[entry.key] = entry
+        self.shapes: List[Dict[str, Any]] = shapes if shapes is not None else []
+        self.tri_source = tri_source
+        self._registry = ShapeIndex.from_shapes(self.shapes)
+        self._lazy_shapes: List[Dict[str, Any]] = []
+        self._payloads: Dict[str, Dict[str, Any]] = {}
+        # 遅延解決は共有のレジストリへ図形を追記するため、同時リクエストを直列化する。
+        self._lock = threading.Lock()
+        default_key = self.default_key
+        if default_key is not None:
+            self._payloads[default_key] = self._entries[default_key].resolve(self.shapes, self._registry)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        # プロセス間で受け渡しても使えるよう、ロックは pickle せず復元時に作り直す。
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_document(cls, document: Optional[SgexmlDocument] = None) -> "FieldsetPlaneIndex":
+        # サンプル XML がない場合は空データを返し、テンプレートで空描画に切り替える。
+        root = _resolve_document(document).root
+        if root is None:
+            return cls()
+        shapes, tri_source = _load_triorb_shapes_from_root(root)
+        export = root.find("Export_FieldsetsAndFields")
+        if export is None:
+            return cls(shapes=shapes, tri_source=tri_source)
+        entries = []
+        seen = set()
+        for position, node in enumerate(export.findall("ScanPlane")):
+            # Index の欠落・重複時は出現順をキーにする（CasetableIndex と同じ規則）。
+            entries.append(FieldsetPlaneEntry(_unique_index_key(node.get("Index"), position, seen), node))
+        return cls(entries, shapes, tri_source)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._entries)
+
+    def keys(self) -> List[str]:
+        return list(self._entries)
+
+    @property
+    def default_key(self) -> Optional[str]:
+        # 従来どおり先頭の ScanPlane を編集対象にする（ストリーミング版とも一致する）。
+        return next(iter(self._entries), None)
+
+    def summaries(self) -> List[Dict[str, Any]]:
+        return [entry.summary() for entry in self._entries.values()]
+
+    def payload(self, key: Optional[str] = None) -> Dict[str, Any]:
+        """Return the devices/global geometry/fieldsets of plane ``key`` (default: the first).
+
+        Payloads of other planes add ``shapes``: the promoted legacy shapes
+        they reference that are not part of :attr:`shapes`. Raises
+        ``KeyError`` for an unknown key; a document without any ScanPlane
+        yields an empty payload.
+        """
+
+        if key is None:
+            key = self.default_key
+            if key is None:
+                return _empty_fieldset_payload()
+        cached = self._payloads.get(key)
+        if cached is None:
+            entry = self._entries[key]
+            with self._lock:
+                cached = self._payloads.get(key)
+                if cached is None:
+                    cached = entry.resolve(self._lazy_shapes, self._registry)
+                    referenced = {
+                        ref["shapeId"]
+                        for fieldset in cached["fieldsets"]
+                        for field in fieldset["fields"]
+                        for ref in field["shapeRefs"]
+                    }
+                    cached["shapes"] = [shape for shape in self._lazy_shapes if shape["id"] in referenced]
+                    self._payloads[key] = cached
+        return cached
+
+    def payloads(self) -> List[Dict[str, Any]]:
+        return [self.payload(key) for key in self._entries]
+
+
+def load_fieldset_planes(document: Optional[SgexmlDocument] = None) -> FieldsetPlaneIndex:
+    """Index every ScanPlane of Export_FieldsetsAndFields, resolving only the first."""
+
+    return FieldsetPlaneIndex.from_document(document)
+
+
+def load_fieldsets_and_shapes(
+    document: Optional[SgexmlDocument] = None,
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]], str]:
+    """Return fieldset payload, shared TriOrb shapes, and TriOrb source marker.
+
+    The payload is the first ScanPlane; see :class:`FieldsetPlaneIndex`
+    for the others.
+    """
 
-    global_geometry = {}
-    global_node = scan_plane.find("GlobalGeometry")
-    if global_node is not None:
-        global_geometry = dict(global_node.attrib)
+    # Fieldset 側を走査し、Shapes 要素がなくても TriOrb Shapes に登録されるよう補完する。
+    planes = load_fieldset_planes(document)
+    return planes.payload(), planes.shapes, planes.tri_source
+
+
+class _SplicedReader:
+    """Read-only stream over a sequence of byte ranges of mmaps or bytes."""
+
+    def __init__(self, parts: Sequence[Tuple[Union[bytes, mmap.mmap], int, int]]) -> None:
+        self._parts = list(parts)
+
+    def read(self, size: int = -1) -> bytes:
+        chunks = []
+        while self._parts and size != 0:
+            data, start, end = self._parts[0]
+            stop = end if size < 0 else min(end, start + size)
+            chunks.append(data[start:stop])
+            if size > 0:
+                size -= stop - start
+            if stop == end:
+                self._parts.pop(0)
+            else:
+                self._parts[0] = (data, stop, end)
+        return b"".join(chunks)
+
+
+@contextmanager
+def _spliced_triorb_section(handle: IO[bytes]) -> Iterator[Any]:
+    # SdImportExport の後ろに 2 つ目のルートとして書かれた TriOrb_SICK_SLS_Editor を、
+    # SgexmlDocument.from_bytes と同じく SdImportExport の末尾の子として読めるよう並べ替える。
+    # ファイルは mmap で参照するだけなので、大きなファイルでもメモリに読み込まない。
+    try:
+        view = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    except ValueError:
+        # 空のファイルは mmap できない。そのまま iterparse に渡して ParseError にする。
+        yield handle
+        return
+    with view:
+        split = _triorb_section_offset(view)
+        if split is None:
+            yield handle
+            return
+        closing = b"</SdImportExport>"
+        end = view.rfind(closing)
+        yield _SplicedReader([(view, 0, end), (view, split, len(view)), (closing, 0, len(closing))])
+
+
+# iterparse で追跡する要素の役割。(親の役割, タグ) → 子の役割 の対応で、
+# 先頭の 1 要素だけを対象にするもの（DOM 版の find と同じ意味）は True を持つ。
+_STREAM_ROLE_TRANSITIONS: Dict[Tuple[str, str], Tuple[str, bool]] = {
+    ("root", "TriOrb_SICK_SLS_Editor"): ("triorb", True),
+    ("root", "Export_FieldsetsAndFields"): ("export", True),
+    ("triorb", "Shapes"): ("triorb_shapes", True),
+    ("triorb_shapes", "Shape"): ("triorb_shape", False),
+    ("export", "ScanPlane"): ("plane", True),
+    ("plane", "Devices"): ("devices", True),
+    ("plane", "GlobalGeometry"): ("global_geometry", True),
+    ("plane", "Fieldsets"): ("fieldsets", True),
+    ("devices", "Device"): ("device", False),
+    ("fieldsets", "Fieldset"): ("fieldset", False),
+}
+_STREAM_RECORD_ROLES = {"triorb_shape", "device", "global_geometry", "fieldset"}
+
+
+def iter_fieldset_records(path: Optional[Path] = None) -> Iterator[Tuple[str, Any]]:
+    """Stream Fieldset/Device/TriOrb Shape records with ``ET.iterparse``.
+
+    Yields ``(kind, record)`` pairs where kind is one of ``"triorb_source"``,
+    ``"triorb_shape"``, ``"device"``, ``"global_geometry"`` or
+    ``"fieldset"``. Fieldset records keep inline legacy geometry unresolved;
+    pass them to ``_resolve_fieldset_record``. Finished elements are cleared
+    and detached so memory stays bounded by the largest single record.
+    A TriOrb section saved after ``</SdImportExport>`` is read as the last
+    child of the root, as :meth:`SgexmlDocument.from_bytes` does.
+    Raises ``ET.ParseError`` for malformed input.
+    """
+
+    source = Path(path) if path is not None else SAMPLE_XML
+    # 各フレームは [要素, 役割, 既出タグ集合]。役割 None は対象外の要素。
+    stack: List[List[Any]] = []
+    triorb_shapes = 0
+    with open(source, "rb") as handle, _spliced_triorb_section(handle) as stream:
+        for event, element in ET.iterparse(stream, events=("start", "end")):
+            if event == "start":
+                if not stack:
+                    stack.append([element, "root", set()])
+                    continue
+                parent_role = stack[-1][1]
+                role: Optional[str]
+                if parent_role in _STREAM_RECORD_ROLES or parent_role == "record-child":
+                    role = "record-child"
+                else:
+                    role, first_only = _STREAM_ROLE_TRANSITIONS.get(
+                        (parent_role, element.tag), (None, False)
+                    )
+                    if role is not None and first_only:
+                        if element.tag in stack[-1][2]:
+                            role = None
+                        stack[-1][2].add(element.tag)
+                if role == "triorb":
+                    yield "triorb_source", element.attrib.get("Source", "")
+                stack.append([element, role, set()])
+                continue
+
+            _, role, _ = stack.pop()
+            if role == "record-child" or not stack:
+                continue
+            if role == "triorb_shape":
+                yield "triorb_shape", _serialize_triorb_shape_node(element, triorb_shapes)
+                triorb_shapes += 1
+            elif role == "device":
+                yield "device", {"attributes": dict(element.attrib)}
+            elif role == "global_geometry":
+                yield "global_geometry", dict(element.attrib)
+            elif role == "fieldset":
+                yield "fieldset", _read_fieldset_record(element)
+            # 処理済みの要素は中身を破棄し、親からも切り離してツリーを成長させない。
+            element.clear()
+            parent = stack[-1][0]
+            if len(parent) and parent[-1] is element:
+                del parent[-1]
+
+
+def load_fieldsets_and_shapes_streaming(
+    path: Optional[Path] = None,
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]], str]:
+    """Streaming equivalent of ``load_fieldsets_and_shapes`` for large exports.
+
+    Like the DOM loader it returns the first ScanPlane only.
+    """
+
+    default_payload = _empty_fieldset_payload()
+    source = Path(path) if path is not None else SAMPLE_XML
+    if not source.exists():
+        return default_payload, [], ""
 
+    triorb_shapes: List[Dict[str, Any]] = []
+    inline_shapes: List[Dict[str, Any]] = []
+    shape_registry = ShapeIndex()
+    late_triorb_shape = False
+    tri_source = ""
+    devices: List[Dict[str, Any]] = []
+    global_geometry: Dict[str, str] = {}
     fieldsets: List[Dict[str, Any]] = []
-    fieldsets_parent = scan_plane.find("Fieldsets")
-    if fieldsets_parent is not None:
-        for fieldset_node in fieldsets_parent.findall("Fieldset"):
-            fieldset_data: Dict[str, Any] = {
-                "attributes": dict(fieldset_node.attrib),
-                "fields": [],
-            }
-            for field_node in fieldset_node.findall("Field"):
-                field_data: Dict[str, Any] = {
-                    "attributes": dict(field_node.attrib),
-                    "shapeRefs": [],
-                }
-                shapes_parent = field_node.find("Shapes")
-                if shapes_parent is not None:
-                    for shape_node in shapes_parent.findall("Shape"):
-                        shape_id = shape_node.attrib.get("ID")
-                        if shape_id:
-                            field_data["shapeRefs"].append({"shapeId": shape_id})
-                else:
-                    # 古い XML では Field 直下に図形定義が存在する場合があるため、
-                    # TriOrb の Shapes に登録し直し、その ID を参照させる。
-                    for polygon_node in field_node.findall("Polygon"):
-                        attrs, points = _parse_polygon_node(polygon_node)
-                        shape_id = _ensure_shape(
-                            shapes,
-                            shape_registry,
-                            "Polygon",
-                            attrs,
-                            points,
-                            f"{fieldset_data['attributes'].get('Name','')} {field_data['attributes'].get('Name','')} Polygon",
-                            field_data["attributes"].get("Fieldtype"),
-                        )
-                        field_data["shapeRefs"].append({"shapeId": shape_id})
-                    for rectangle_node in field_node.findall("Rectangle"):
-                        attrs = _parse_rectangle_node(rectangle_node)
-                        shape_id = _ensure_shape(
-                            shapes,
-                            shape_registry,
-                            "Rectangle",
-                            attrs,
-                            None,
-                            f"{fieldset_data['attributes'].get('Name','')} {field_data['attributes'].get('Name','')} Rectangle",
-                            field_data["attributes"].get("Fieldtype"),
-                        )
-                        field_data["shapeRefs"].append({"shapeId": shape_id})
-                    for circle_node in field_node.findall("Circle"):
-                        attrs = _parse_circle_node(circle_node)
-                        shape_id = _ensure_shape(
-                            shapes,
-                            shape_registry,
-                            "Circle",
-                            attrs,
-                            None,
-                            f"{fieldset_data['attributes'].get('Name','')} {field_data['attributes'].get('Name','')} Circle",
-                            field_data["attributes"].get("Fieldtype"),
-                        )
-                        field_data["shapeRefs"].append({"shapeId": shape_id})
-                fieldset_data["fields"].append(field_data)
-            fieldsets.append(fieldset_data)
+    try:
+        for kind, record in iter_fieldset_records(source):
+            if kind == "triorb_shape":
+                triorb_shapes.append(record)
+                shape_registry.add_shape(record)
+                late_triorb_shape = late_triorb_shape or bool(inline_shapes)
+            elif kind == "triorb_source":
+                tri_source = record
+            elif kind == "device":
+                devices.append(record)
+            elif kind == "global_geometry":
+                global_geometry = record
+            elif kind == "fieldset":
+                # 重複する図形はその場で既存 ID に寄せ、座標を保持し続けないようにする。
+                fieldsets.append(_resolve_fieldset_record(record, inline_shapes, shape_registry))
+    except ET.ParseError:
+        return default_payload, [], ""
+
+    if late_triorb_shape:
+        # TriOrb セクションが Fieldset より後ろに書かれていた場合、先に昇格させた
+        # レガシー図形のうち TriOrb 側と一致するものを DOM 版と同じく TriOrb の ID に寄せる。
+        triorb_registry = ShapeIndex.from_shapes(triorb_shapes)
+        remap: Dict[str, str] = {}
+        kept: List[Dict[str, Any]] = []
+        for shape in inline_shapes:
+            key = shape_fingerprint(shape)
+            if key is not None and key in triorb_registry:
+                remap[shape["id"]] = triorb_registry.get(key)
+            else:
+                kept.append(shape)
+        inline_shapes = kept
+        if remap:
+            for fieldset in fieldsets:
+                for field in fieldset["fields"]:
+                    for ref in field["shapeRefs"]:
+                        ref["shapeId"] = remap.get(ref["shapeId"], ref["shapeId"])
 
     return (
         {
@@ -604,48 +1079,720 @@ def load_fieldsets_and_shapes() -> Tuple[Dict[str, Any], List[Dict[str, Any]], s
             "global_geometry": global_geometry,
             "fieldsets": fieldsets,
         },
-        shapes,
+        triorb_shapes + inline_shapes,
         tri_source,
     )
 
 
-def load_root_attributes() -> Dict[str, str]:
+def load_root_attributes(document: Optional[SgexmlDocument] = None) -> Dict[str, str]:
     """Capture attributes defined on the SdImportExport root."""
 
     # ルート属性は UI のメタ情報表示に利用される。
-    if not SAMPLE_XML.exists():
+    root = _resolve_document(document).root
+    if root is None:
         return {}
 
+    return dict(root.attrib)
+
+
+def build_index_payload(document: Optional[SgexmlDocument] = None) -> Dict[str, Any]:
+    """Run every loader over one document and return the template context."""
+
+    document = _resolve_document(document)
+    # リクエスト中はローダーごとの所要時間を Server-Timing に載せる（それ以外では何もしない）。
+    with timed_stage("fieldsets"):
+        # 全 ScanPlane の索引を作り、編集対象の先頭 ScanPlane だけを解決する。
+        fieldset_planes = load_fieldset_planes(document)
+        fieldsets_payload = fieldset_planes.payload()
+    with timed_stage("menu"):
+        menu_items = load_menu_items(document)
+    with timed_stage("fileinfo"):
+        fileinfo_fields = load_fileinfo_fields(document)
+    with timed_stage("root_attributes"):
+        root_attrs = load_root_attributes(document)
+    with timed_stage("scan_planes"):
+        scan_planes = load_scan_planes(document)
+    with timed_stage("casetable"):
+        # 全 Casetable の索引だけを作り、表示する 1 つだけを先に変換する。
+        casetable_index = load_casetable_index(document)
+        casetable_payload = casetable_index.payload()
+    return {
+        "menu_items": menu_items,
+        "fileinfo_fields": fileinfo_fields,
+        "root_attrs": root_attrs,
+        "scan_planes": scan_planes,
+        "fieldsets": fieldsets_payload,
+        "fieldset_planes": fieldset_planes,
+        "triorb_shapes": fieldset_planes.shapes,
+        "triorb_source": fieldset_planes.tri_source,
+        "casetable_payload": casetable_payload,
+        "casetable_index": casetable_index,
+        # XML を解析した場合は常に None。SnapshotIndexPayload だけが復号済みのスナップショットを持つ。
+        "state_snapshot": None,
+    }
+
+
+# /api/document/<section> で配信するセクションと、index ペイロードからの取り出し方。
+DOCUMENT_SECTIONS: Dict[str, Any] = {
+    "menu": lambda payload: payload["menu_items"],
+    "fileinfo": lambda payload: payload["fileinfo_fields"],
+    "root_attributes": lambda payload: payload["root_attrs"],
+    "scan_planes": lambda payload: payload["scan_planes"],
+    "fieldsets": lambda payload: payload["fieldsets"],
+    "fieldset_planes": lambda payload: payload["fieldset_planes"].summaries(),
+    "triorb_shapes": lambda payload: {
+        "shapes": payload["triorb_shapes"],
+        "source": payload["triorb_source"],
+    },
+    "casetable": lambda payload: payload["casetable_payload"],
+    "casetables": lambda payload: payload["casetable_index"].summaries(),
+    "state_snapshot": lambda payload: payload["state_snapshot"],
+}
+
+
+def encode_document_section(payload: Dict[str, Any], section: str, point_encoding: str) -> Any:
+    """Return one ``DOCUMENT_SECTIONS`` entry with polygon points in ``point_encoding``."""
+
+    return encode_section_points(section, DOCUMENT_SECTIONS[section](payload), point_encoding)
+
+
+def encode_section_points(section: str, data: Any, point_encoding: str) -> Any:
+    """Return already extracted ``section`` data with polygon points in ``point_encoding``."""
+
+    if section == "triorb_shapes":
+        data = {**data, "shapes": encode_shape_points(data["shapes"], point_encoding)}
+    return data
+
+
+def encode_fieldset_plane(planes: FieldsetPlaneIndex, key: str, point_encoding: str) -> Dict[str, Any]:
+    """Return the payload of ScanPlane ``key`` with its extra shapes in ``point_encoding``."""
+
+    return encode_plane_points(planes.payload(key), point_encoding)
+
+
+def encode_plane_points(data: Dict[str, Any], point_encoding: str) -> Dict[str, Any]:
+    """Return a ScanPlane payload with its extra shapes in ``point_encoding``."""
+
+    if "shapes" in data:
+        data = {**data, "shapes": encode_shape_points(data["shapes"], point_encoding)}
+    return data
+
+
+def decode_state_snapshot(text: str, encoding: Optional[str] = None) -> Dict[str, Any]:
+    """Decode a ``<StateSnapshot>`` body the way ``readTriOrbStateSnapshot`` does.
+
+    ``encoding`` is the element's ``Encoding`` attribute: ``base64`` (the
+    default), ``deflate+base64`` or anything else for plain JSON text.
+    Raises ``ValueError`` when the body does not decode to a JSON object.
+    """
+
+    encoding = (encoding or "base64").lower()
+    payload = text.strip()
+    if encoding.endswith("base64"):
+        # atob と同じく空白は読み飛ばす。
+        payload = "".join(payload.split())
     try:
-        tree = ET.parse(SAMPLE_XML)
-    except ET.ParseError:
-        return {}
+        if encoding == "base64":
+            payload = base64.b64decode(payload, validate=True).decode("utf-8")
+        elif encoding == "deflate+base64":
+            payload = zlib.decompress(base64.b64decode(payload, validate=True)).decode("utf-8")
+        snapshot = json.loads(payload)
+    except (binascii.Error, zlib.error, UnicodeDecodeError) as exc:
+        raise ValueError(f"StateSnapshot is not valid {encoding}: {exc}") from exc
+    if not isinstance(snapshot, dict):
+        raise ValueError("StateSnapshot is not a JSON object")
+    return snapshot
 
-    root = tree.getroot()
-    return dict(root.attrib)
+
+class StaleSnapshotError(ValueError):
+    """The StateSnapshot was saved with a different SdImportExport part."""
+
+
+def snapshot_fingerprint(section: bytes) -> str:
+    """Return the StateSnapshot ``Fingerprint`` for the file content before it.
+
+    ``section`` is everything before ``<TriOrb_SICK_SLS_Editor``; trailing
+    whitespace is ignored, so this is the SHA-256 of the SdImportExport
+    lines the editor wrote.
+    """
+
+    return "sha256:" + hashlib.sha256(section.rstrip()).hexdigest()
+
+
+def read_state_snapshot(data: bytes, verify: bool = False) -> Optional[Dict[str, Any]]:
+    """Return the decoded StateSnapshot of a ``Save (TriOrb)`` file, if any.
+
+    Those files append a ``TriOrb_SICK_SLS_Editor`` element after the
+    ``SdImportExport`` root; only its ``StateSnapshot`` child is parsed. With
+    ``verify``, a snapshot whose ``Fingerprint`` does not match the content
+    before it (the file was edited after saving) raises
+    :class:`StaleSnapshotError`; snapshots without one are trusted.
+    """
+
+    start = data.find(b"<TriOrb_SICK_SLS_Editor")
+    begin = data.find(b"<StateSnapshot", start) if start >= 0 else -1
+    end = data.find(b"</StateSnapshot>", begin) if begin >= 0 else -1
+    if end < 0:
+        return None
+    # 図形やトレースを含む TriOrb セクション全体は解析しない。
+    try:
+        node = ET.fromstring(data[begin : end + len(b"</StateSnapshot>")])
+    except ET.ParseError as exc:
+        raise ValueError(f"StateSnapshot is not well-formed: {exc}") from exc
+    if not (node.text or "").strip():
+        return None
+    # 展開より先に、安価なハッシュ比較で古いスナップショットを除外する。
+    fingerprint = node.get("Fingerprint")
+    if verify and fingerprint and fingerprint != snapshot_fingerprint(data[:start]):
+        raise StaleSnapshotError("StateSnapshot does not match the SdImportExport section")
+    return decode_state_snapshot(node.text or "", node.get("Encoding"))
+
+
+class SnapshotIndexPayload(Mapping[str, Any]):
+    """Index payload of a ``Save (TriOrb)`` file restored from its StateSnapshot.
+
+    ``state_snapshot`` is served as decoded. Every other key comes from
+    :func:`build_index_payload`, which parses the file only when one of
+    them is first read (section API, export), so the page load is a single
+    snapshot decode.
+    """
+
+    def __init__(self, path: Path, data: bytes, content_hash: Optional[str], snapshot: Dict[str, Any]) -> None:
+        self.snapshot = snapshot
+        self._path = path
+        self._data: Optional[bytes] = data
+        self._content_hash = content_hash
+        self._payload: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+
+    def _parsed(self) -> Dict[str, Any]:
+        # キャッシュ済みペイロードは複数リクエストで共有されるため、解析は 1 回だけ行う。
+        with self._lock:
+            if self._payload is None:
+                document = SgexmlDocument.from_bytes(self._path, self._data or b"", self._content_hash)
+                self._payload = {**build_index_payload(document), "state_snapshot": self.snapshot}
+                self._data = None
+            return self._payload
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "state_snapshot":
+            return self.snapshot
+        return self._parsed()[key]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self._parsed())
+
+    def __len__(self) -> int:
+        return len(self._parsed())
+
+
+def parse_uploaded_document(path: Path) -> Dict[str, Any]:
+    """Parse an uploaded file into its document sections (runs in the upload pool).
+
+    ``document`` holds every ``DOCUMENT_SECTIONS`` entry, and ``casetables``
+    and ``fieldset_planes`` every Casetable and ScanPlane payload by key.
+    Only these plain values cross back from the worker process; the element
+    tree and the indexes holding it stay behind.
+
+    Files saved by ``Save (TriOrb)`` carry a StateSnapshot and are reported
+    with ``state_snapshot``. When it matches the rest of the file the
+    decoded ``snapshot`` is returned with no document, so the browser
+    restores it without anything being parsed. A stale snapshot is ignored
+    and the file is parsed as usual; one that does not decode is returned
+    as ``None`` and the browser falls back to its own parser.
+    """
+
+    data = Path(path).read_bytes()
+    has_snapshot = b"<StateSnapshot" in data
+    if has_snapshot:
+        try:
+            snapshot = read_state_snapshot(data, verify=True)
+        except StaleSnapshotError:
+            snapshot = None
+        except ValueError:
+            return {"document": None, "state_snapshot": True, "snapshot": None}
+        else:
+            return {"document": None, "state_snapshot": True, "snapshot": snapshot}
+    document = SgexmlDocument.from_bytes(Path(path), data)
+    if not document.is_loaded:
+        raise ValueError("not a well-formed XML document")
+    payload = build_index_payload(document)
+    # 索引は要素ツリーを抱えているため、pickle で戻す前に全 Casetable・ScanPlane を変換しておく。
+    casetables, planes = payload["casetable_index"], payload["fieldset_planes"]
+    return {
+        "document": {section: extract(payload) for section, extract in DOCUMENT_SECTIONS.items()},
+        "casetables": {key: casetables.payload(key) for key in casetables},
+        "fieldset_planes": {key: planes.payload(key) for key in planes},
+        "state_snapshot": has_snapshot,
+    }
+
+
+class PayloadJSONProvider(DefaultJSONProvider):
+    """JSON provider that serialises ``PackedPoints`` as the classic point dicts."""
+
+    @staticmethod
+    def default(o: Any) -> Any:
+        if isinstance(o, PackedPoints):
+            return o.to_dicts()
+        return DefaultJSONProvider.default(o)
+
+
+def _build_cached_index_payload(data: Optional[bytes], digest: Optional[str]) -> Mapping[str, Any]:
+    if data is None:
+        return build_index_payload(SgexmlDocument(SAMPLE_XML, None))
+    if b"<StateSnapshot" in data:
+        # 保存時の状態と一致するスナップショットがあれば、XML を解析せずにそれを配信する。
+        with timed_stage("snapshot"):
+            try:
+                snapshot = read_state_snapshot(data, verify=True)
+            except ValueError:
+                snapshot = None
+        if snapshot is not None:
+            return SnapshotIndexPayload(SAMPLE_XML, data, digest, snapshot)
+    return build_index_payload(SgexmlDocument.from_bytes(SAMPLE_XML, data, digest))
+
+
+def _code_fingerprint() -> str:
+    # 応答の ETag に含める、ローダー・テンプレートのソースのハッシュ。
+    # コードを更新したあとに古い応答へ 304 を返さないようにする。
+    root = Path(__file__).resolve().parent
+    digest = hashlib.sha256()
+    for path in sorted([*root.glob("*.py"), *(root / "templates").glob("*.html")]):
+        digest.update(path.name.encode("utf-8") + b"\0" + path.read_bytes())
+    return digest.hexdigest()
 
 
 def create_app() -> Flask:
     # Flask アプリケーションのファクトリ。
     app = Flask(__name__)
+    app.json = PayloadJSONProvider(app)
+    app.config.setdefault("PAYLOAD_CACHE_SIZE", 8)
+    # index.html に埋め込む / app.js が API に要求する Polygon 座標の形式。
+    # "packed" は [x0, y0, x1, y1, ...] の数値配列で、点ごとの {"X": "..", "Y": ".."} より大幅に小さい。
+    app.config.setdefault("POINT_ENCODING", "packed")
+    # True の場合は従来どおり全セクションを index.html に埋め込む。
+    # API が存在しない freeze.py の静的ビルドではこちらを使う。
+    app.config.setdefault("INLINE_BOOTSTRAP", False)
+    # SAMPLE_XML はほとんど変わらないため、ローダーの出力をファイルの
+    # パス・mtime・サイズ・内容ハッシュ単位でキャッシュして再読み込みを軽くする。
+    payload_cache: DocumentPayloadCache[Mapping[str, Any]] = DocumentPayloadCache(
+        max_entries=app.config["PAYLOAD_CACHE_SIZE"]
+    )
+    app.extensions["payload_cache"] = payload_cache
+    # 各ステージの所要時間を Server-Timing ヘッダーとログに出す。
+    install_request_timing(app)
+    # Accept-Encoding に応じて br / gzip で圧縮する（Server-Timing より先に実行され、compress として計測される）。
+    install_response_compression(app)
+    # 文書由来の応答の ETag は文書の内容ハッシュ・コード・設定・URL から決まり、
+    # 一致すればページやセクションを組み立てずに 304 を返す。
+    app.config.setdefault("ETAG_VERSION", _code_fingerprint())
+    # アップロードされた XML は上限付きのワーカープールで解析し、Flask のワーカーは
+    # 受信とポーリング応答だけを担う。静的ビルドやテストでは "thread" も選べる。
+    app.config.setdefault("MAX_CONTENT_LENGTH", 256 * 1024 * 1024)
+    app.config.setdefault("UPLOAD_EXECUTOR", "process")
+    app.config.setdefault("UPLOAD_WORKERS", max(1, min(4, (os.cpu_count() or 2) // 2)))
+    app.config.setdefault("UPLOAD_MAX_PENDING", 8)
+    # 解析結果はポーリングされなくなってもこの秒数で破棄する。
+    app.config.setdefault("UPLOAD_RESULT_TTL", 600.0)
+    app.extensions["upload_jobs"] = UploadJobs(
+        parse_uploaded_document,
+        max_workers=app.config["UPLOAD_WORKERS"],
+        max_pending=max(app.config["UPLOAD_MAX_PENDING"], app.config["UPLOAD_WORKERS"]),
+        max_age=app.config["UPLOAD_RESULT_TTL"],
+        executor=app.config["UPLOAD_EXECUTOR"],
+    )
+
+    def current_entry():
+        # XML はキャッシュミス時に 1 回だけ解析し、各ローダーで共有する。
+        # ETag の判定と本文の生成で同じリクエスト内にファイルを読み直さない。
+        entry = g.get("document_entry")
+        if entry is not None:
+            return entry
+        hits = payload_cache.hits
+        start = time.perf_counter()
+        entry = payload_cache.lookup(SAMPLE_XML, _build_cached_index_payload)
+        timer = current_timer()
+        if timer is not None:
+            timer.record(
+                "payload",
+                (time.perf_counter() - start) * 1000.0,
+                "cache hit" if payload_cache.hits > hits else "cache miss",
+            )
+        g.document_entry = entry
+        return entry
+
+    def current_payload() -> Mapping[str, Any]:
+        return current_entry().value
+
+    def document_etag() -> str:
+        # 強い ETag なので、同じ入力からは必ず同じバイト列を返すこと（ID の無い図形の ID も
+        # _generate_shape_id が内容から決める）。乱数や時刻を本文に入れるなら弱い ETag にする。
+        parts = (
+            app.config["ETAG_VERSION"],
+            current_entry().digest,
+            app.config["POINT_ENCODING"],
+            str(app.config["INLINE_BOOTSTRAP"]),
+            request.full_path,
+        )
+        return hashlib.sha256("\0".join(parts).encode("utf-8")).hexdigest()[:40]
+
+    def conditional_document(view):
+        # 文書が変わっていなければ 304 だけを返す。圧縮した表現の ETag にも一致させる。
+        @wraps(view)
+        def wrapper(*args: Any, **kwargs: Any) -> Response:
+            etag = document_etag()
+            matched = matching_etag(etag, negotiate_encoding(request.headers.get("Accept-Encoding", "")))
+            if matched is not None:
+                response = app.response_class(status=304)
+                response.set_etag(matched)
+            else:
+                response = app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+                response.set_etag(etag)
+            # ブラウザにはキャッシュを使う前に毎回 ETag で再検証させる。
+            response.cache_control.no_cache = True
+            return response
+
+        return wrapper
 
     @app.route("/")
+    @conditional_document
     def index():
         # Plotly 図面とサイドメニューに必要な情報をまとめてテンプレートへ渡す。
-        fig = build_sample_figure()
-        plot_spec = fig.to_plotly_json()
-        fieldsets_payload, triorb_shapes, triorb_source = load_fieldsets_and_shapes()
-        return render_template(
-            "index.html",
-            plot_spec=plot_spec,
-            menu_items=load_menu_items(),
-            fileinfo_fields=load_fileinfo_fields(),
-            root_attrs=load_root_attributes(),
-            scan_planes=load_scan_planes(),
-            fieldsets=fieldsets_payload,
-            triorb_shapes=triorb_shapes,
-            triorb_source=triorb_source,
-            casetable_payload=load_casetable_payload(),
+        # 大きなセクションは既定で /api/document/<section> から遅延取得させ、
+        # HTML を小さく保って初回描画を早める。
+        # 図面 spec は軸設定ごとにメモ化された dict で、plotly.graph_objs を経由しない。
+        with timed_stage("figure"):
+            plot_spec = sample_figure_spec()
+        payload = current_payload()
+        point_encoding = app.config["POINT_ENCODING"]
+        snapshot = payload["state_snapshot"]
+        if snapshot is not None:
+            # StateSnapshot から復元する文書は XML を解析しない。app.js はスナップショットだけを
+            # 受け取って restoreTriOrbStateSnapshot で状態を組み立てる。
+            with timed_stage("render", "jinja"):
+                return render_template(
+                    "index.html",
+                    plot_spec=plot_spec,
+                    inline_bootstrap=app.config["INLINE_BOOTSTRAP"],
+                    point_encoding=point_encoding,
+                    state_snapshot=snapshot,
+                    root_attrs=snapshot.get("rootAttributes") or {},
+                    fileinfo_fields=[
+                        {"tag": tag, "value": value} for tag, value in (snapshot.get("fileInfo") or {}).items()
+                    ],
+                    casetables=[],
+                    fieldset_plane_summaries=[],
+                )
+        casetable_index = payload["casetable_index"]
+        fieldset_planes = payload["fieldset_planes"]
+        # 静的ビルドには API が無いため、表示していない Casetable / ScanPlane も埋め込んでおく。
+        casetable_payloads = (
+            {key: casetable_index.payload(key) for key in casetable_index.keys()}
+            if app.config["INLINE_BOOTSTRAP"] and len(casetable_index) > 1
+            else {}
+        )
+        fieldset_plane_payloads = (
+            {key: encode_fieldset_plane(fieldset_planes, key, point_encoding) for key in fieldset_planes.keys()}
+            if app.config["INLINE_BOOTSTRAP"] and len(fieldset_planes) > 1
+            else {}
+        )
+        # テンプレート内の tojson によるブートストラップの JSON 化もこのステージに含まれる。
+        with timed_stage("render", "jinja"):
+            return render_template(
+                "index.html",
+                plot_spec=plot_spec,
+                inline_bootstrap=app.config["INLINE_BOOTSTRAP"],
+                point_encoding=point_encoding,
+                casetables=casetable_index.summaries(),
+                casetable_payloads=casetable_payloads,
+                fieldset_plane_summaries=fieldset_planes.summaries(),
+                fieldset_plane_payloads=fieldset_plane_payloads,
+                **{
+                    **payload,
+                    "triorb_shapes": encode_shape_points(payload["triorb_shapes"], point_encoding),
+                },
+            )
+
+    @app.route("/api/document/<section>")
+    @conditional_document
+    def document_section(section: str):
+        extractor = DOCUMENT_SECTIONS.get(section)
+        if extractor is None:
+            abort(404)
+        # 外部クライアント向けの既定は従来形式。app.js は ?points=packed を付けて取得する。
+        point_encoding = request.args.get("points", "objects")
+        if point_encoding not in POINT_ENCODINGS:
+            abort(400)
+        data = encode_document_section(current_payload(), section, point_encoding)
+        with timed_stage("json"):
+            return jsonify(data)
+
+    @app.route("/api/document/casetables/<index>")
+    @conditional_document
+    def document_casetable(index: str):
+        # 表示中以外の Casetable は選択されたときにここから取得する。
+        casetable_index = current_payload()["casetable_index"]
+        if index not in casetable_index:
+            abort(404)
+        data = casetable_index.payload(index)
+        with timed_stage("json"):
+            return jsonify(data)
+
+    @app.route("/api/document/fieldsets/<plane>")
+    @conditional_document
+    def document_fieldset_plane(plane: str):
+        # 先頭以外の ScanPlane の Fieldset / Device / GlobalGeometry は選択されたときにここから取得する。
+        point_encoding = request.args.get("points", "objects")
+        if point_encoding not in POINT_ENCODINGS:
+            abort(400)
+        fieldset_planes = current_payload()["fieldset_planes"]
+        if plane not in fieldset_planes:
+            abort(404)
+        data = encode_fieldset_plane(fieldset_planes, plane, point_encoding)
+        with timed_stage("json"):
+            return jsonify(data)
+
+    @app.route("/api/uploads", methods=["POST"])
+    def upload_document():
+        # multipart の file フィールド、または生の XML 本文を受け付ける。
+        # 本文はチャンク単位でディスクへ書き出し、解析はワーカープールに任せてすぐ 202 を返す。
+        upload = request.files.get("file")
+        stream = upload.stream if upload is not None else request.stream
+        # X-Filename はヘッダーに載せられるよう app.js が encodeURIComponent している。
+        filename = (upload.filename if upload is not None else unquote(request.headers.get("X-Filename", ""))) or ""
+        try:
+            with timed_stage("upload"):
+                job = app.extensions["upload_jobs"].submit(stream, filename)
+        except UploadQueueFull:
+            response = jsonify({"error": "Too many uploads in progress. Retry shortly."})
+            response.status_code = 503
+            response.headers["Retry-After"] = "1"
+            return response
+        status_url = url_for("upload_status", job_id=job.id)
+        response = jsonify({"id": job.id, "status": job.status, "status_url": status_url})
+        response.status_code = 202
+        response.headers["Location"] = status_url
+        return response
+
+    @app.route("/api/uploads/<job_id>")
+    def upload_status(job_id: str):
+        job = app.extensions["upload_jobs"].get(job_id)
+        if job is None:
+            abort(404)
+        point_encoding = request.args.get("points", "objects")
+        if point_encoding not in POINT_ENCODINGS:
+            abort(400)
+        body: Dict[str, Any] = {"id": job.id, "status": job.status, "filename": job.filename, "size": job.size}
+        if job.status == "pending":
+            return jsonify(body), 202
+        if job.status == "failed":
+            body["error"] = job.error
+            return jsonify(body), 422
+        document = job.result["document"]
+        # ブートストラップの /api/document/<section> と同じ形でまとめて返す。
+        # StateSnapshot 付きのファイルは document の代わりに復号済みの snapshot を返し、
+        # ブラウザはそれをそのまま復元する（復号できなければブラウザ側で読み直す）。
+        body["state_snapshot"] = job.result["state_snapshot"]
+        body["snapshot"] = job.result.get("snapshot")
+        body["document"] = None
+        if document is not None:
+            body["document"] = {
+                section: encode_section_points(section, data, point_encoding) for section, data in document.items()
+            }
+            body["casetables_url"] = url_for("upload_status", job_id=job.id) + "/casetables"
+            body["fieldset_planes_url"] = url_for("upload_status", job_id=job.id) + "/fieldsets"
+        with timed_stage("json"):
+            return jsonify(body)
+
+    @app.route("/api/uploads/<job_id>/casetables/<index>")
+    def upload_casetable(job_id: str, index: str):
+        job = app.extensions["upload_jobs"].get(job_id)
+        casetables = job.result.get("casetables") if job is not None and job.status == "done" else None
+        if casetables is None or index not in casetables:
+            abort(404)
+        data = casetables[index]
+        with timed_stage("json"):
+            return jsonify(data)
+
+    @app.route("/api/uploads/<job_id>/fieldsets/<plane>")
+    def upload_fieldset_plane(job_id: str, plane: str):
+        point_encoding = request.args.get("points", "objects")
+        if point_encoding not in POINT_ENCODINGS:
+            abort(400)
+        job = app.extensions["upload_jobs"].get(job_id)
+        planes = job.result.get("fieldset_planes") if job is not None and job.status == "done" else None
+        if planes is None or plane not in planes:
+            abort(404)
+        data = encode_plane_points(planes[plane], point_encoding)
+        with timed_stage("json"):
+            return jsonify(data)
+
+    @app.route("/api/diff", methods=["POST"])
+    def diff_documents():
+        # multipart の file（新しい版）を base（省略時は表示中の文書）と構造比較する。
+        # 数百 KB の書き出しなら解析込みで 1 秒未満なので、ワーカープールは使わない。
+        upload = request.files.get("file")
+        try:
+            tolerance = float(request.form.get("tolerance") or 0)
+        except ValueError:
+            abort(400)
+        if upload is None:
+            abort(400)
+        payloads = []
+        for source in (request.files.get("base"), upload):
+            if source is None:
+                payloads.append(current_payload())
+                continue
+            document = SgexmlDocument.from_bytes(Path(source.filename or "upload.sgexml"), source.read())
+            if not document.is_loaded:
+                response = jsonify({"error": f"{source.filename or 'upload'} is not a well-formed XML document"})
+                response.status_code = 422
+                return response
+            payloads.append(build_index_payload(document))
+        with timed_stage("diff"):
+            data = diff_payloads(payloads[0], payloads[1], tolerance)
+        with timed_stage("json"):
+            return jsonify(data)
+
+    @app.route("/api/shapes/offset", methods=["POST"])
+    def offset_shapes():
+        # {"shapes": [TriOrb Shape...], "delta": mm, "join": ..., "miterLimit": ..., "arcTolerance": ...}
+        # の図形をまとめて Outset (delta > 0) / Inset (delta < 0) する。消えた Polygon は null。
+        # numpy を読み込むモジュールは起動を遅くしないよう、使うハンドラーの中で import する。
+        import polygon_offset
+
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get("shapes"), list):
+            abort(400)
+        try:
+            delta = float(body.get("delta", 0))
+            miter_limit = float(body.get("miterLimit", polygon_offset.DEFAULT_MITER_LIMIT))
+            arc_tolerance = float(body.get("arcTolerance", polygon_offset.DEFAULT_ARC_TOLERANCE))
+        except (TypeError, ValueError):
+            abort(400)
+        join = body.get("join", "miter")
+        if (
+            join not in polygon_offset.JOIN_STYLES
+            or not all(map(math.isfinite, (delta, miter_limit, arc_tolerance)))
+            or miter_limit < 1
+            or arc_tolerance <= 0
+            or not all(isinstance(shape, dict) for shape in body["shapes"])
+        ):
+            abort(400)
+        with timed_stage("offset"):
+            shapes = polygon_offset.offset_shapes(body["shapes"], delta, join, miter_limit, arc_tolerance)
+        with timed_stage("json"):
+            return jsonify({"shapes": shapes})
+
+    @app.route("/api/shapes/simplify", methods=["POST"])
+    def simplify_shapes():
+        # {"shapes": [TriOrb Shape...], "method": ..., "tolerance": mm | "fieldsets": [...]} の
+        # Polygon の頂点をまとめて間引く。許容誤差を省くと、fieldsets の各 Field の Resolution から決める。
+        import polygon_simplify
+
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get("shapes"), list):
+            abort(400)
+        method = body.get("method", "douglas-peucker")
+        fieldsets = body.get("fieldsets", [])
+        if (
+            method not in polygon_simplify.METHODS
+            or not isinstance(fieldsets, list)
+            or not all(isinstance(item, dict) for item in fieldsets + body["shapes"])
+        ):
+            abort(400)
+        tolerances: Any
+        if "tolerance" in body:
+            try:
+                tolerances = float(body["tolerance"])
+            except (TypeError, ValueError):
+                abort(400)
+            if not math.isfinite(tolerances) or tolerances <= 0:
+                abort(400)
+        else:
+            tolerances = polygon_simplify.shape_tolerances([{"fieldsets": fieldsets}])
+        with timed_stage("simplify"):
+            shapes, reports = polygon_simplify.simplify_shapes(body["shapes"], tolerances, method)
+        with timed_stage("json"):
+            return jsonify({"shapes": shapes, "reports": [report.to_dict() for report in reports]})
+
+    @app.route("/api/svg/flatten", methods=["POST"])
+    def flatten_svg_paths():
+        # {"paths": [d...], "tolerance": mm} の SVG パスを平坦化し、
+        # パスごとに Import (SVG) と同じ {X, Y} の点列と解析エラーを返す。
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get("paths"), list):
+            abort(400)
+        try:
+            tolerance = float(body.get("tolerance", svg_path.DEFAULT_TOLERANCE))
+        except (TypeError, ValueError):
+            abort(400)
+        if not math.isfinite(tolerance) or tolerance <= 0 or not all(isinstance(d, str) for d in body["paths"]):
+            abort(400)
+        with timed_stage("flatten"):
+            results = []
+            for d in body["paths"]:
+                polygons, error = svg_path.path_polygons(d, tolerance)
+                results.append({"polygons": polygons, "error": error})
+        with timed_stage("json"):
+            return jsonify({"paths": results})
+
+    @app.route("/api/shapes/query", methods=["POST"])
+    def query_shapes():
+        # {"shapes": [TriOrb Shape...], "point": [x, y], "radius": mm | "box": [x0, y0, x1, y1] | "pairs": true} を
+        # 外接矩形のグリッドで引き、該当する Shape の ID を返す。
+        from spatial_index import ShapeSpatialIndex
+
+        body = request.get_json(silent=True)
+        if not isinstance(body, dict) or not isinstance(body.get("shapes"), list):
+            abort(400)
+        if not all(isinstance(item, dict) for item in body["shapes"]):
+            abort(400)
+        try:
+            point = [float(value) for value in body["point"]] if body.get("point") is not None else None
+            box = [float(value) for value in body["box"]] if body.get("box") is not None else None
+            radius = float(body.get("radius", 0))
+        except (TypeError, ValueError):
+            abort(400)
+        values = (point or []) + (box or []) + [radius]
+        if (
+            (point is not None and len(point) != 2)
+            or (box is not None and len(box) != 4)
+            or not all(math.isfinite(value) for value in values)
+            or radius < 0
+        ):
+            abort(400)
+        with timed_stage("index"):
+            index = ShapeSpatialIndex(body["shapes"])
+            result: Dict[str, Any] = {"cellSize": index.cell_size, "reach": index.max_reach()}
+            if point is not None:
+                result["point"] = index.query_radius(point[0], point[1], radius)
+            if box is not None:
+                result["box"] = index.query_box(*box)
+            if body.get("pairs"):
+                result["pairs"] = index.candidate_pairs()
+        with timed_stage("json"):
+            return jsonify(result)
+
+    @app.route("/api/export/<mode>")
+    def export_document(mode: str):
+        # ブラウザの Save (TriOrb) / Save (SICK) と同じ XML をサーバー側で生成し、
+        # 行を溜め込まずにチャンク単位でレスポンスへ流す。
+        if mode not in sgexml_writer.EXPORT_MODES:
+            abort(404)
+        with timed_stage("figure"):
+            figure = sample_figure_spec()
+        # XML 本体はストリームで送るため、ヘッダーに載るのは生成開始までの時間だけになる。
+        # スナップショットから配信中の文書も、書き出しは XML を解析したペイロードから行う。
+        chunks = sgexml_writer.iter_sgexml(dict(current_payload()), mode, figure=figure)
+        prefix = "TriOrb" if mode == "triorb" else "sick"
+        filename = f"{prefix}_{int(time.time() * 1000)}.sgexml"
+        return Response(
+            stream_with_context(chunks),
+            mimetype="application/xml",
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'},
         )
 
     return app
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+from array import array
+from decimal import Decimal
+import math
+import re
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Union, overload
+
+# ブートストラップ/API で座標列をどう送るか。
+#   "objects": 従来どおり [{"X": "..", "Y": ".."}, ...]
+#   "packed":  [x0, y0, x1, y1, ...] の数値配列（app.js が文字列の点へ戻す）
+POINT_ENCODINGS = ("objects", "packed")
+
+_POINT_KEYS = frozenset(("X", "Y"))
+# 有効数字 15 桁以下の 10 進数は倍精度と 1 対 1 なので、末尾 0・先頭 0・"-0" を含まず
+# 指数表記にならない範囲 [1e-6, 1e21) の表記なら String(number) と一致する。
+_PLAIN_MAX_LENGTH = 15
+_PLAIN_NUMBER = r"-?(?:[1-9][0-9]*(?:\.[0-9]*[1-9])?|0\.0{0,5}[1-9](?:[0-9]*[1-9])?)|0"
+_SEPARATOR = ","
+_PLAIN_SEQUENCE = re.compile(f"(?:{_PLAIN_NUMBER})(?:{_SEPARATOR}(?:{_PLAIN_NUMBER}))*")
+
+
+def js_number_to_string(value: float) -> str:
+    """Format a number exactly like JavaScript's ``String(number)``."""
+
+    if isinstance(value, int) and not isinstance(value, bool):
+        if abs(value) < 10**21:
+            return str(value)
+        value = float(value)
+    if value != value:
+        return "NaN"
+    if value in (math.inf, -math.inf):
+        return "Infinity" if value > 0 else "-Infinity"
+    if value == 0:
+        return "0"
+    sign = "-" if value < 0 else ""
+    # repr は最短の往復可能な桁列を返すので、桁と指数だけ取り出して
+    # Number::toString の規則で並べ直す。
+    _, digit_tuple, exponent = Decimal(repr(abs(value))).as_tuple()
+    digits = "".join(str(digit) for digit in digit_tuple).rstrip("0") or "0"
+    k = len(digits)
+    n = exponent + len(digit_tuple)
+    if k <= n <= 21:
+        return sign + digits + "0" * (n - k)
+    if 0 < n <= 21:
+        return sign + digits[:n] + "." + digits[n:]
+    if -6 < n <= 0:
+        return sign + "0." + "0" * (-n) + digits
+    exponent_text = f"e{'+' if n - 1 >= 0 else '-'}{abs(n - 1)}"
+    if k == 1:
+        return sign + digits + exponent_text
+    return sign + digits[0] + "." + digits[1:] + exponent_text
+
+
+def _is_canonical(text: Any, number: float, shortest: str) -> bool:
+    # 数値へ変換して String(number) で元の文字列に戻る場合だけ詰められる。
+    # "100.0" や "007" のような表記は可逆でないため詰めない。
+    if number != 0 and "e" not in shortest and "n" not in shortest:
+        # 指数表記でなければ repr と String(number) は同じ桁列で、整数の ".0" だけが異なる。
+        return text == (shortest[:-2] if shortest.endswith(".0") else shortest)
+    return isinstance(text, str) and math.isfinite(number) and js_number_to_string(number) == text
+
+
+class PackedPoints(Sequence[Dict[str, str]]):
+    """Polygon vertices stored as one flat ``array('d')`` of X/Y pairs.
+
+    Behaves like the ``[{"X": "..", "Y": ".."}, ...]`` list it replaces:
+    items are rebuilt on access and compare equal to such lists, so loaders
+    and tests can treat both forms alike. Only built by :func:`pack_points`,
+    which guarantees every coordinate formats back to its source text.
+    """
+
+    __slots__ = ("_coords",)
+
+    def __init__(self, coords: array) -> None:
+        self._coords = coords
+
+    def __len__(self) -> int:
+        return len(self._coords) // 2
+
+    @overload
+    def __getitem__(self, index: int) -> Dict[str, str]: ...
+
+    @overload
+    def __getitem__(self, index: slice) -> List[Dict[str, str]]: ...
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("point index out of range")
+        return {
+            "X": js_number_to_string(self._coords[2 * index]),
+            "Y": js_number_to_string(self._coords[2 * index + 1]),
+        }
+
+    def __iter__(self) -> Iterator[Dict[str, str]]:
+        coords = self._coords
+        for offset in range(0, len(coords), 2):
+            yield {"X": js_number_to_string(coords[offset]), "Y": js_number_to_string(coords[offset + 1])}
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, PackedPoints):
+            return self._coords == other._coords
+        if isinstance(other, (list, tuple)):
+            return len(other) == len(self) and all(
+                isinstance(point, Mapping) and dict(point) == expected
+                for point, expected in zip(other, self)
+            )
+        return NotImplemented
+
+    __hash__ = None  # type: ignore[assignment]
+
+    def __repr__(self) -> str:
+        return f"PackedPoints({len(self)} points)"
+
+    @property
+    def nbytes(self) -> int:
+        return len(self._coords) * self._coords.itemsize
+
+    def tobytes(self) -> bytes:
+        return self._coords.tobytes()
+
+    def to_flat_list(self) -> List[Union[int, float]]:
+        # 整数値は int にして JSON 上で "100.0" ではなく "100" と書かせる。
+        return [int(value) if value.is_integer() and abs(value) < 2**53 else value for value in self._coords]
+
+    def to_dicts(self) -> List[Dict[str, str]]:
+        return list(self)
+
+
+def pack_points(points: Sequence[Mapping[str, Any]]) -> Union[PackedPoints, List[Dict[str, Any]]]:
+    """Return ``points`` as :class:`PackedPoints` when that is lossless.
+
+    Falls back to the plain list of dicts when a point carries attributes
+    other than ``X``/``Y``, a coordinate does not survive the number
+    round-trip verbatim, or the list is empty.
+    """
+
+    if not points or any(point.keys() != _POINT_KEYS for point in points):
+        return [dict(point) for point in points]
+    coords = pack_coordinates(points)
+    if coords is None:
+        return [dict(point) for point in points]
+    return PackedPoints(coords)
+
+
+def pack_coordinates(points: Iterable[Mapping[str, Any]]) -> Optional[array]:
+    """Return the ``X``/``Y`` values of ``points`` as a flat ``array('d')``.
+
+    Other point attributes are ignored. Returns ``None`` when a coordinate
+    does not survive the number round-trip verbatim.
+    """
+
+    texts: List[Any] = []
+    for point in points:
+        texts.append(point.get("X"))
+        texts.append(point.get("Y"))
+    try:
+        coords = array("d", map(float, texts))
+        # 文字列以外の座標（数値や None）は join で TypeError になる。
+        joined = _SEPARATOR.join(texts)
+    except (TypeError, ValueError):
+        return None
+    # 15 桁以下の正規表記は正規表現だけで判定でき、座標ごとの repr を省ける。
+    if max(map(len, texts), default=0) <= _PLAIN_MAX_LENGTH and _PLAIN_SEQUENCE.fullmatch(joined):
+        return coords
+    if not all(map(_is_canonical, texts, coords, map(repr, coords))):
+        return None
+    return coords
+
+
+def expand_points(value: Any) -> Any:
+    """Recursively replace :class:`PackedPoints` with plain lists of dicts."""
+
+    if isinstance(value, PackedPoints):
+        return value.to_dicts()
+    if isinstance(value, dict):
+        return {key: expand_points(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [expand_points(item) for item in value]
+    return value
+
+
+def encode_shape_points(shapes: Iterable[Dict[str, Any]], encoding: str) -> List[Dict[str, Any]]:
+    """Return TriOrb shapes with polygon points in the requested wire encoding.
+
+    Only the shape and polygon dicts are copied; everything else is shared
+    with the (read-only) cached payload.
+    """
+
+    if encoding not in POINT_ENCODINGS:
+        raise ValueError(f"Unknown point encoding: {encoding!r}")
+    encoded = []
+    for shape in shapes:
+        polygon = shape.get("polygon")
+        points = polygon.get("points") if isinstance(polygon, dict) else None
+        if isinstance(points, PackedPoints):
+            wire = points.to_flat_list() if encoding == "packed" else points.to_dicts()
+            shape = {**shape, "polygon": {**polygon, "points": wire}}
+        encoded.append(shape)
+    return encoded
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from dataclasses import dataclass
+import hashlib
+from pathlib import Path
+import threading
+from typing import Any, Callable, Dict, Generic, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# (絶対パス, mtime_ns, サイズ, SHA-256) をキーとし、どれか 1 つでも
+# 変われば別エントリとして扱う。
+CacheKey = Tuple[str, int, int, str]
+
+
+@dataclass(frozen=True)
+class CacheEntry(Generic[T]):
+    """Finished payload together with the source stamp it was built from."""
+
+    key: CacheKey
+    value: T
+
+    @property
+    def digest(self) -> str:
+        return self.key[3]
+
+
+class DocumentPayloadCache(Generic[T]):
+    """Bounded LRU cache of payloads derived from a source file.
+
+    Entries are keyed by the file's path, mtime, size and content hash, so a
+    rewritten file is rebuilt even when the filesystem keeps the old mtime.
+    Cached values are shared between callers and must be treated as
+    read-only.
+    """
+
+    def __init__(self, max_entries: int = 8) -> None:
+        if max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[CacheKey, CacheEntry[T]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(
+        self,
+        path: Path,
+        build: Callable[[Optional[bytes], Optional[str]], T],
+    ) -> CacheEntry[T]:
+        """Return the cached payload for ``path`` or build and store it.
+
+        ``build`` receives the file content and its hex digest. When the file
+        does not exist it is called with ``(None, None)`` and the result is
+        not cached, so the fallback payload never outlives the missing file.
+        """
+
+        source = Path(path)
+        try:
+            stat = source.stat()
+            data = source.read_bytes()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return CacheEntry(key=(str(source), 0, 0, ""), value=build(None, None))
+
+        digest = hashlib.sha256(data).hexdigest()
+        key: CacheKey = (str(source.resolve()), stat.st_mtime_ns, stat.st_size, digest)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+            self.misses += 1
+
+        # 構築中はロックを保持しない。同時ミスで二重に構築されても
+        # 結果は同じなので、後勝ちで格納すれば十分。
+        entry = CacheEntry(key=key, value=build(data, digest))
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        """Return hit/miss counters and the current occupancy."""
+
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+            }
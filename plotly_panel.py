@@ -1,69 +1,123 @@
 from __future__ import annotations
 
-import plotly.graph_objs as go
+from functools import lru_cache
+import importlib.util
+import json
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, Optional, Tuple
 
+if TYPE_CHECKING:  # pragma: no cover - 型注釈専用。実行時は plotly を読み込まない。
+    import plotly.graph_objs as go
 
-def build_sample_figure() -> go.Figure:
-    """Return an empty Plotly figure with axis/grid styling."""
+# 軸設定。これらが変わったときだけ図面 spec を作り直す。
+AXIS_RANGE: Tuple[int, int] = (-1000, 1000)
+AXIS_DTICK = 100
+MINOR_DTICK = 50
+# 250mm 間隔の補助線の位置。
+HELPER_LINE_VALUES: Tuple[int, ...] = (-750, -500, -250, 250, 500, 750)
 
-    # 空の Figure を基点に、Plotly 上で図形を描画しやすいグリッドと補助線を整える。
-    fig = go.Figure(data=[])
+# plotly.py が既定で layout.template に埋め込むテンプレート。
+_TEMPLATE_NAME = "plotly"
 
+
+def _axis_style(axis_range: Tuple[int, int], dtick: int, minor_dtick: int) -> Dict[str, Any]:
     # X/Y 共通の軸設定。原点付近での編集を想定してゼロラインとグリッドを濃いめにする。
-    axis_style = dict(
-        showgrid=True,
-        gridcolor="#d9dee7",
-        gridwidth=1,
-        zeroline=True,
-        zerolinecolor="#9fb3d1",
-        zerolinewidth=2,
-        showline=True,
-        linewidth=2,
-        linecolor="#6b7a99",
-        range=[-1000, 1000],
-        constrain="range",
-        tick0=0,
-        dtick=100,
-        minor=dict(showgrid=True, gridcolor="#f2f5fb", gridwidth=0.5, dtick=50),
-    )
-    fig.update_xaxes(title="X[mm]", **axis_style)
-    fig.update_yaxes(title="Y[mm]", scaleanchor="x", scaleratio=1, **axis_style)
+    return {
+        "showgrid": True,
+        "gridcolor": "#d9dee7",
+        "gridwidth": 1,
+        "zeroline": True,
+        "zerolinecolor": "#9fb3d1",
+        "zerolinewidth": 2,
+        "showline": True,
+        "linewidth": 2,
+        "linecolor": "#6b7a99",
+        "range": list(axis_range),
+        "constrain": "range",
+        "tick0": 0,
+        "dtick": dtick,
+        "minor": {"showgrid": True, "gridcolor": "#f2f5fb", "gridwidth": 0.5, "dtick": minor_dtick},
+    }
+
 
+def _helper_lines(axis_range: Tuple[int, int], values: Tuple[int, ...]) -> list:
     # 250mm 間隔の補助線で安全領域のバランスを視覚的に把握しやすくする。
+    low, high = axis_range
+    line = {"color": "#cbd5f5", "width": 1, "dash": "dot"}
     helper_lines = []
-    for value in (-750, -500, -250, 250, 500, 750):
+    for value in values:
         helper_lines.append(
-            dict(
-                type="line",
-                xref="x",
-                yref="y",
-                x0=-1000,
-                x1=1000,
-                y0=value,
-                y1=value,
-                line=dict(color="#cbd5f5", width=1, dash="dot"),
-            )
+            {"type": "line", "xref": "x", "yref": "y", "x0": low, "x1": high, "y0": value, "y1": value}
         )
         helper_lines.append(
-            dict(
-                type="line",
-                xref="x",
-                yref="y",
-                x0=value,
-                x1=value,
-                y0=-1000,
-                y1=1000,
-                line=dict(color="#cbd5f5", width=1, dash="dot"),
-            )
+            {"type": "line", "xref": "x", "yref": "y", "x0": value, "x1": value, "y0": low, "y1": high}
         )
+    for helper_line in helper_lines:
+        helper_line["line"] = dict(line)
+    return helper_lines
+
+
+@lru_cache(maxsize=1)
+def load_default_template() -> Optional[Dict[str, Any]]:
+    """Return plotly.py's default layout template without importing plotly.
+
+    The template ships as JSON inside the plotly package; only its location
+    is looked up. Returns ``None`` when plotly is not installed, in which
+    case Plotly.js falls back to its built-in defaults.
+    """
+
+    spec = importlib.util.find_spec("plotly")
+    if spec is None or not spec.submodule_search_locations:
+        return None
+    for location in spec.submodule_search_locations:
+        path = Path(location) / "package_data" / "templates" / f"{_TEMPLATE_NAME}.json"
+        if path.is_file():
+            return json.loads(path.read_text(encoding="utf-8"))
+    return None
+
+
+@lru_cache(maxsize=8)
+def sample_figure_spec(
+    axis_range: Tuple[int, int] = AXIS_RANGE,
+    dtick: int = AXIS_DTICK,
+    minor_dtick: int = MINOR_DTICK,
+    helper_line_values: Tuple[int, ...] = HELPER_LINE_VALUES,
+) -> Dict[str, Any]:
+    """Return the base figure as a plain ``{"data", "layout"}`` dict.
+
+    Equal to ``build_sample_figure().to_plotly_json()`` but built without
+    plotly.graph_objs and memoized per axis setting. The returned dict is
+    shared between callers and must be treated as read-only.
+    """
+
+    layout: Dict[str, Any] = {
+        "xaxis": {"title": {"text": "X[mm]"}, **_axis_style(axis_range, dtick, minor_dtick)},
+        "yaxis": {
+            "title": {"text": "Y[mm]"},
+            "scaleanchor": "x",
+            "scaleratio": 1,
+            **_axis_style(axis_range, dtick, minor_dtick),
+        },
+        # 背景を白で固定し、Legend を上部にまとめて UI と馴染ませる。
+        "plot_bgcolor": "#ffffff",
+        "paper_bgcolor": "#ffffff",
+        "margin": {"l": 60, "r": 20, "t": 30, "b": 60},
+        "legend": {"orientation": "h", "yanchor": "bottom", "y": 1.02},
+        "shapes": _helper_lines(axis_range, helper_line_values),
+    }
+    template = load_default_template()
+    if template is not None:
+        layout["template"] = template
+    return {"data": [], "layout": layout}
+
+
+def build_sample_figure() -> "go.Figure":
+    """Return an empty Plotly figure with axis/grid styling.
+
+    Imports plotly lazily; the server itself only needs
+    :func:`sample_figure_spec`.
+    """
 
-    # 背景を白で固定し、Legend を上部にまとめて UI と馴染ませる。
-    fig.update_layout(
-        plot_bgcolor="#ffffff",
-        paper_bgcolor="#ffffff",
-        margin=dict(l=60, r=20, t=30, b=60),
-        legend=dict(orientation="h", yanchor="bottom", y=1.02),
-        shapes=helper_lines,
-    )
+    import plotly.graph_objs as go
 
-    return fig
+    return go.Figure(sample_figure_spec())
@@ -0,0 +1,621 @@
+"""Polygon offsetting (inset/outset) for TriOrb shapes.
+
+Every edge is moved ``delta`` along its outward normal and neighbouring
+edges are joined with a mitre, round arc or bevel. Where the moved edges
+cross each other (concave corners on an outset, narrow necks on an inset)
+the raw curve is resolved with the non-zero winding rule, so the result
+is the true offset region and may split into several rings.
+
+The raw curves of all rings are built in one vectorised NumPy pass, which
+is what makes :func:`offset_shapes` cheap for hundreds of shapes.
+``static/js/modules/polygonOffset.js`` implements the same algorithm for
+the browser preview.
+
+Usage::
+
+    from polygon_offset import offset_polygon, offset_shapes
+
+    rings = offset_polygon([(0, 0), (100, 0), (100, 50), (0, 50)], 10, join="round")
+    shapes = offset_shapes(payload["triorb_shapes"]["shapes"], -5)
+"""
+
+from __future__ import annotations
+
+import copy
+import math
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from packed_points import PackedPoints, js_number_to_string
+
+JOIN_STYLES = ("miter", "round", "bevel")
+DEFAULT_MITER_LIMIT = 2.0
+# 円弧で近似するときの弦と円弧の最大距離 (mm)。
+DEFAULT_ARC_TOLERANCE = 0.25
+
+# 内積・外積がこれ未満の角はまっすぐとみなす。
+_STRAIGHT_EPSILON = 1e-12
+# 閉じる角のうち cos がこれ以上のほぼ平らな角は、元の頂点を経由させない。
+_FLAT_FOLD_COS = 0.99
+# 候補の組（線分と線分、点と線分）を一度に作る数の上限。
+_PAIR_BLOCK = 1 << 20
+
+
+def ring_array(points: Any) -> np.ndarray:
+    """Return ``{X, Y}`` points, ``(x, y)`` pairs or a :class:`PackedPoints` as an ``(n, 2)`` array."""
+
+    if isinstance(points, PackedPoints):
+        return np.frombuffer(points.tobytes(), dtype=np.float64).reshape(-1, 2).copy()
+    if isinstance(points, np.ndarray):
+        return np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    try:
+        # 大半は数値文字列の {X, Y} なので、まとめて変換してから非有限値だけ 0 にする。
+        ring = np.array(
+            [(float(point["X"]), float(point["Y"])) for point in points or []], dtype=np.float64
+        ).reshape(-1, 2)
+    except (KeyError, TypeError, ValueError):
+        pass
+    else:
+        ring[~np.isfinite(ring)] = 0.0
+        return ring
+    coords = []
+    for point in points or []:
+        if isinstance(point, Mapping):
+            x, y = _to_float(point.get("X")), _to_float(point.get("Y"))
+        else:
+            x, y = (float(value) for value in point)
+        coords.append((x, y))
+    return np.array(coords, dtype=np.float64).reshape(-1, 2)
+
+
+def _to_float(value: Any) -> float:
+    # parseNumeric(value, 0) 相当。解釈できない値は 0 とする。
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return number if math.isfinite(number) else 0.0
+
+
+def _clean_ring(ring: np.ndarray) -> np.ndarray:
+    # 連続する重複点（閉じるための末尾の点も含む）を落とす。
+    if len(ring) < 2:
+        return ring
+    keep = np.any(ring != np.roll(ring, 1, axis=0), axis=1)
+    if not keep.any():
+        return ring[:1]
+    return ring[keep]
+
+
+def signed_area(ring: np.ndarray) -> float:
+    """Return the shoelace area of ``ring``; positive when counter-clockwise."""
+
+    x, y = ring[:, 0], ring[:, 1]
+    return 0.5 * float(np.dot(x, np.roll(y, -1)) - np.dot(np.roll(x, -1), y))
+
+
+def _arc_step(delta: float, tolerance: float) -> float:
+    # 弦の高さが tolerance 以下になる 1 区間あたりの角度。
+    radius = abs(delta)
+    if tolerance <= 0 or tolerance >= radius:
+        return math.pi / 2
+    return 2.0 * math.acos(1.0 - tolerance / radius)
+
+
+def raw_offset_curves(
+    rings: Sequence[np.ndarray],
+    delta: Union[float, Sequence[float]],
+    join: str = "miter",
+    miter_limit: float = DEFAULT_MITER_LIMIT,
+    arc_tolerance: float = DEFAULT_ARC_TOLERANCE,
+) -> List[np.ndarray]:
+    """Return the unresolved offset curve of every ring.
+
+    The rings are concatenated and processed together; each must already
+    be counter-clockwise with at least three distinct points. ``delta``
+    is one distance for all rings or one per ring (all of the same sign).
+    The curves may cross themselves and are meant to be passed to
+    :func:`resolve_offset_curve`.
+    """
+
+    if join not in JOIN_STYLES:
+        raise ValueError(f"Unsupported join style: {join!r}")
+    if not rings:
+        return []
+    ring_deltas = np.broadcast_to(np.asarray(delta, dtype=np.float64), (len(rings),))
+    if (ring_deltas > 0).any() and (ring_deltas < 0).any():
+        raise ValueError("per-ring deltas must share one sign")
+    sign = 1.0 if (ring_deltas >= 0).all() else -1.0
+    counts = np.array([len(ring) for ring in rings], dtype=np.intp)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    points = np.concatenate(rings)
+    ring_of = np.repeat(np.arange(len(rings)), counts)
+    # 頂点ごとのオフセット量（全リング共通の値なら従来と同じ演算になる）。
+    delta = ring_deltas[ring_of]
+    local = np.arange(len(points)) - starts[ring_of]
+    nxt = starts[ring_of] + (local + 1) % counts[ring_of]
+    prv = starts[ring_of] + (local - 1) % counts[ring_of]
+
+    # 辺 i は点 i → 点 i+1。反時計回りなので外向き法線は進行方向の右側。
+    edges = points[nxt] - points
+    # hypot ではなく sqrt を使い、JS 版と同じ丸めにする。
+    lengths = np.sqrt(edges[:, 0] * edges[:, 0] + edges[:, 1] * edges[:, 1])
+    tangents = edges / lengths[:, None]
+    normals = np.column_stack((tangents[:, 1], -tangents[:, 0]))
+
+    # 頂点 v には入ってくる辺 prv[v] と出ていく辺 v が接する。
+    t_in, t_out = tangents[prv], tangents
+    n_in, n_out = normals[prv], normals
+    cross = t_in[:, 0] * t_out[:, 1] - t_in[:, 1] * t_out[:, 0]
+    dot = np.einsum("ij,ij->i", t_in, t_out)
+    straight = (np.abs(cross) < _STRAIGHT_EPSILON) & (dot > 0)
+    spike = (np.abs(cross) < _STRAIGHT_EPSILON) & (dot <= 0)
+    # オフセット側が開く角には継ぎ目を足し、閉じる角は頂点を経由させて後で解消する。
+    joined = ~straight & (spike | (cross * delta > 0))
+    folded = ~straight & ~joined
+    turn = np.where(spike, math.copysign(math.pi, sign), np.arctan2(cross, dot))
+
+    # 閉じる角は元の頂点を経由させると、縮めすぎて反転した部分も巻き数で確実に消せる。
+    # ほぼ平らな角では不要なうえ、細かい点列では無駄な交点を大量に生むので省く。
+    through_origin = folded & (dot < _FLAT_FOLD_COS)
+    counts_out = np.ones(len(points), dtype=np.intp)
+    counts_out[folded] = 2
+    counts_out[through_origin] = 3
+    miter = np.zeros(len(points), dtype=bool)
+    segments = np.zeros(len(points), dtype=np.intp)
+    half_cos = np.cos(np.abs(turn) / 2.0)
+    if join == "round":
+        # 尖った角との差が許容誤差以内のゆるい角は、円弧にせず 1 点で表す。
+        miter = joined & ~spike & (np.abs(delta) * (1.0 - half_cos) <= arc_tolerance * half_cos)
+        step = np.array([_arc_step(value, arc_tolerance) for value in ring_deltas])[ring_of]
+        segments = np.maximum(1, np.ceil(np.abs(turn) / step - 1e-9).astype(np.intp))
+        counts_out[joined & ~miter] = segments[joined & ~miter] + 1
+    elif join == "miter":
+        # 1 / cos(θ/2) が miter_limit 以下なら尖った角を 1 点で、超えたら切り詰めて 2 点で表す。
+        miter = joined & ~spike & (half_cos * miter_limit >= 1.0)
+        counts_out[joined & ~miter] = 2
+    else:
+        counts_out[joined] = 2
+
+    total = int(counts_out.sum())
+    vertex = np.repeat(np.arange(len(points)), counts_out)
+    offsets = np.concatenate(([0], np.cumsum(counts_out)[:-1]))
+    slot = np.arange(total) - offsets[vertex]
+    origin = points[vertex]
+    reach_delta = delta[vertex][:, None]
+    start = origin + reach_delta * n_in[vertex]
+    end = origin + reach_delta * n_out[vertex]
+    out = np.where((slot == 0)[:, None], start, end)
+
+    # 直線上の頂点: 前後の辺のオフセット線は同じ点で接する。
+    out[straight[vertex]] = end[straight[vertex]]
+    # 閉じる角: 始点 →（元の頂点 →）終点。
+    middle = through_origin[vertex] & (slot == 1)
+    out[middle] = origin[middle]
+
+    if join == "round":
+        arc = (joined & ~miter)[vertex]
+        fraction = slot[arc] / segments[vertex[arc]]
+        angle = turn[vertex[arc]] * fraction
+        cos_a, sin_a = np.cos(angle), np.sin(angle)
+        base = n_in[vertex[arc]]
+        rotated = np.column_stack(
+            (base[:, 0] * cos_a - base[:, 1] * sin_a, base[:, 0] * sin_a + base[:, 1] * cos_a)
+        )
+        out[arc] = origin[arc] + reach_delta[arc] * rotated
+    sharp = miter[vertex]
+    bisector = n_in[vertex[sharp]] + n_out[vertex[sharp]]
+    scale = 1.0 + np.einsum("ij,ij->i", n_in[vertex[sharp]], n_out[vertex[sharp]])
+    out[sharp] = origin[sharp] + reach_delta[sharp] * bisector / scale[:, None]
+    if join == "miter":
+        clipped = joined & ~miter
+        if clipped.any():
+            # 角の二等分方向に |delta| * miter_limit の位置で切り落とす。
+            direction = n_in + n_out
+            direction[spike] = t_in[spike] * sign
+            direction *= sign
+            direction /= np.sqrt(direction[:, 0] * direction[:, 0] + direction[:, 1] * direction[:, 1])[:, None]
+            reach = np.abs(delta) * miter_limit
+            first = clipped[vertex] & (slot == 0)
+            last = clipped[vertex] & (slot == 1)
+            for mask, normal, tangent in ((first, n_in, t_in), (last, n_out, t_out)):
+                v = vertex[mask]
+                along = np.einsum("ij,ij->i", tangent[v], direction[v])
+                across = np.einsum("ij,ij->i", normal[v], direction[v])
+                distance = (reach[v] - delta[v] * across) / along
+                out[mask] = origin[mask] + delta[v][:, None] * normal[v] + distance[:, None] * tangent[v]
+
+    ring_totals = np.add.reduceat(counts_out, starts)
+    return np.split(out, np.cumsum(ring_totals)[:-1])
+
+
+def _ordered_keys(rings: Sequence[np.ndarray], values: Sequence[np.ndarray]) -> List[np.ndarray]:
+    # (曲線, 値) の辞書順を保つ整数キー。値は全体での順位に置き換えるので、
+    # 等号を含む浮動小数点の比較結果はそのまま保たれる。
+    ranks = np.unique(np.concatenate(values), return_inverse=True)[1].reshape(-1)
+    scale = len(ranks) + 1
+    keys = []
+    offset = 0
+    for ring, value in zip(rings, values):
+        keys.append(ring.astype(np.int64) * scale + ranks[offset : offset + len(value)])
+        offset += len(value)
+    return keys
+
+
+def _range_pairs(begin: np.ndarray, end: np.ndarray) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    # begin[owner] <= position < end[owner] を満たす (owner, position) の組を、
+    # 一度に作る組の数を抑えながら返す。
+    counts = np.maximum(end - begin, 0)
+    totals = np.cumsum(counts)
+    first = 0
+    while first < len(counts):
+        done = int(totals[first - 1]) if first else 0
+        last = max(first + 1, int(np.searchsorted(totals, done + _PAIR_BLOCK, side="right")))
+        block = counts[first:last]
+        owner = np.repeat(np.arange(first, last), block)
+        skipped = np.repeat(np.cumsum(block) - block, block)
+        position = np.arange(len(owner)) - skipped + np.repeat(begin[first:last], block)
+        if len(owner):
+            yield owner, position
+        first = last
+
+
+def _group_rows(rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    # np.unique(rows, axis=0, return_index=True, return_inverse=True) と同じ結果を
+    # 整数の列ごとの lexsort で求める（行を void 型として並べるより速い）。
+    order = np.lexsort(rows.T[::-1])
+    ordered = rows[order]
+    starts = np.concatenate(([True], np.any(ordered[1:] != ordered[:-1], axis=1)))
+    inverse = np.empty(len(rows), dtype=np.intp)
+    inverse[order] = np.cumsum(starts) - 1
+    return order[starts], inverse
+
+
+def _split_points(
+    a: np.ndarray, b: np.ndarray, ring_of: np.ndarray, nxt: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    # 同じ曲線の線分どうしが交わる・重なる位置を (線分, 線分上の位置 t, 座標) の組で返す。
+    d = b - a
+    lo, hi = np.minimum(a, b), np.maximum(a, b)
+    # 曲線ごとに y の下端で並べ、下端が自分の y の範囲に入る後ろの線分とだけ組にする。
+    lo_key, hi_key = _ordered_keys((ring_of, ring_of), (lo[:, 1], hi[:, 1]))
+    order = np.argsort(lo_key, kind="stable")
+    end = np.searchsorted(lo_key[order], hi_key[order], side="right")
+    found_segment: List[np.ndarray] = []
+    found_param: List[np.ndarray] = []
+    found_point: List[np.ndarray] = []
+    for first, second in _range_pairs(np.arange(1, len(order) + 1), end):
+        i, j = np.minimum(order[first], order[second]), np.maximum(order[first], order[second])
+        # x 方向の外接範囲も重なる組だけを調べる。
+        overlap = (lo[i, 0] <= hi[j, 0]) & (lo[j, 0] <= hi[i, 0])
+        i, j = i[overlap], j[overlap]
+        di, dj = d[i], d[j]
+        denom = di[:, 0] * dj[:, 1] - di[:, 1] * dj[:, 0]
+        r = a[j] - a[i]
+        r_cross = r[:, 0] * di[:, 1] - r[:, 1] * di[:, 0]
+        adjacent = (nxt[i] == j) | (nxt[j] == i)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            t = (r[:, 0] * dj[:, 1] - r[:, 1] * dj[:, 0]) / denom
+            u = r_cross / denom
+        # 交差: 交点は一度だけ計算し、交わる 2 本の線分に同じ座標で割り込ませる。
+        hit = (denom != 0) & ~adjacent & (t >= 0) & (t <= 1) & (u >= 0) & (u <= 1)
+        crossing = a[i[hit]] + t[hit, None] * di[hit]
+        found_segment += [i[hit], j[hit]]
+        found_param += [t[hit], u[hit]]
+        found_point += [crossing, crossing]
+        # 同一直線上で重なる場合は、互いの端点でもう一方を分割する（隣接する線分も含む）。
+        length_i = np.einsum("ij,ij->i", di, di)
+        length_j = np.einsum("ij,ij->i", dj, dj)
+        collinear = (denom == 0) & (np.abs(r_cross) <= 1e-12 * (length_i + np.einsum("ij,ij->i", r, r)))
+        if collinear.any():
+            ci, cj = i[collinear], j[collinear]
+            for segment, length, origin, direction, other in (
+                (ci, length_i[collinear], a[ci], di[collinear], cj),
+                (cj, length_j[collinear], a[cj], dj[collinear], ci),
+            ):
+                for endpoint in (a[other], b[other]):
+                    param = np.einsum("ij,ij->i", endpoint - origin, direction) / length
+                    inside = (param > 0) & (param < 1)
+                    found_segment.append(segment[inside])
+                    found_param.append(param[inside])
+                    found_point.append(endpoint[inside])
+    if not found_segment:
+        return np.zeros(0, dtype=np.intp), np.zeros(0), np.zeros((0, 2))
+    return np.concatenate(found_segment), np.concatenate(found_param), np.concatenate(found_point)
+
+
+def _winding_numbers(
+    points: np.ndarray, exclude: np.ndarray, a: np.ndarray, b: np.ndarray, ring_of: np.ndarray
+) -> np.ndarray:
+    # 点 k について、線分 exclude[k] と同じ曲線の巻き数（+x 方向の半直線との
+    # 符号付き交差数）。点は線分 exclude[k] の上にあるため、その線分は数えない。
+    point_ring = ring_of[exclude]
+    lo = np.minimum(a[:, 1], b[:, 1])
+    hi = np.maximum(a[:, 1], b[:, 1])
+    # 線分ごとに、同じ曲線で lo <= y < hi の点（半直線と交わりうる点）とだけ組にする。
+    point_key, lo_key, hi_key = _ordered_keys((point_ring, ring_of, ring_of), (points[:, 1], lo, hi))
+    order = np.argsort(point_key, kind="stable")
+    sorted_keys = point_key[order]
+    begin = np.searchsorted(sorted_keys, lo_key, side="left")
+    end = np.searchsorted(sorted_keys, hi_key, side="left")
+    winding = np.zeros(len(points), dtype=np.intp)
+    for segment, position in _range_pairs(begin, end):
+        k = order[position]
+        counted = segment != exclude[k]
+        segment, k = segment[counted], k[counted]
+        start, p = a[segment], points[k]
+        cd = b[segment] - start
+        px, py = p[:, 0] - start[:, 0], p[:, 1] - start[:, 1]
+        side = cd[:, 0] * py - px * cd[:, 1]
+        # 点がちょうど乗っている線分（重なった逆向きの区間など）は数えない。
+        crossing = np.abs(side) > 1e-12 * ((cd[:, 0] ** 2 + cd[:, 1] ** 2) + px**2 + py**2)
+        # 半開区間の判定は差ではなく座標そのもので比べる（自身の線分の判定と揃える）。
+        upward = crossing & (p[:, 1] >= start[:, 1]) & (side > 0)
+        downward = crossing & (p[:, 1] < start[:, 1]) & (side < 0)
+        winding += np.bincount(k[upward], minlength=len(points))
+        winding -= np.bincount(k[downward], minlength=len(points))
+    return winding
+
+
+def resolve_offset_curves(curves: Sequence[np.ndarray]) -> List[List[np.ndarray]]:
+    """Resolve many raw offset curves at once.
+
+    Each self-intersecting closed curve is split into the rings bounding
+    its positive-winding (non-zero, counter-clockwise) region; outer rings
+    come back counter-clockwise and holes clockwise. The curves are
+    processed together, but never interact with each other.
+    """
+
+    curves = [_clean_ring(curve) for curve in curves]
+    results: List[List[np.ndarray]] = [[] for _ in curves]
+    usable = [index for index, curve in enumerate(curves) if len(curve) >= 3]
+    if not usable:
+        return results
+    counts = np.array([len(curves[index]) for index in usable], dtype=np.intp)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    a = np.concatenate([curves[index] for index in usable])
+    ring_of = np.repeat(np.arange(len(usable)), counts)
+    local = np.arange(len(a)) - starts[ring_of]
+    nxt = starts[ring_of] + (local + 1) % counts[ring_of]
+    b = a[nxt]
+    extent = float(np.ptp(a, axis=0).max()) or 1.0
+    quantum = extent * 1e-12
+
+    split_segment, split_param, split_point = _split_points(a, b, ring_of, nxt)
+    # 交差の無い単純な曲線: 反時計回りならそのまま、反転していれば何も残らない。
+    crossed = np.zeros(len(usable), dtype=bool)
+    crossed[ring_of[split_segment]] = True
+    for ring in np.nonzero(~crossed)[0]:
+        curve = curves[usable[ring]]
+        if signed_area(curve) > quantum * extent:
+            results[usable[ring]] = [curve]
+    if not crossed.any():
+        return results
+
+    base = np.nonzero(crossed[ring_of])[0]
+    split_segment = np.concatenate((base, split_segment))
+    split_param = np.concatenate((np.zeros(len(base)), split_param))
+    split_point = np.concatenate((a[base], split_point))
+    order = np.lexsort((split_param, split_segment))
+    split_segment, split_point = split_segment[order], split_point[order]
+    # 各線分の区間: 分割点から次の分割点（線分の最後なら線分の終点）まで。
+    next_point = np.roll(split_point, -1, axis=0)
+    last = np.roll(split_segment != np.roll(split_segment, 1), -1)
+    next_point[last] = b[split_segment[last]]
+    piece_a, piece_b, piece_segment = split_point, next_point, split_segment
+
+    key_a = np.round(piece_a / quantum).astype(np.int64)
+    key_b = np.round(piece_b / quantum).astype(np.int64)
+    nonzero = np.any(key_a != key_b, axis=1)
+    piece_a, piece_b, key_a, key_b = piece_a[nonzero], piece_b[nonzero], key_a[nonzero], key_b[nonzero]
+    piece_segment = piece_segment[nonzero]
+    piece_ring = ring_of[piece_segment]
+
+    # 重なった区間は向きの総和で 1 本にまとめる（往復して打ち消し合うものは消える）。
+    forward = (key_a[:, 0] < key_b[:, 0]) | ((key_a[:, 0] == key_b[:, 0]) & (key_a[:, 1] < key_b[:, 1]))
+    ends = np.column_stack(
+        (piece_ring, np.where(forward[:, None], key_a, key_b), np.where(forward[:, None], key_b, key_a))
+    )
+    first, inverse = _group_rows(ends)
+    net = np.bincount(inverse, weights=np.where(forward, 1.0, -1.0), minlength=len(first))
+    # 代表の区間は曲線上の順に並べ直す（輪の始点を app.js と揃えるため）。
+    order = np.argsort(first[net != 0], kind="stable")
+    first, net = first[net != 0][order], net[net != 0][order]
+    multiplicity = np.abs(net).astype(np.intp)
+    flip = forward[first] != (net > 0)
+    piece_a, piece_b = np.where(flip[:, None], piece_b[first], piece_a[first]), np.where(
+        flip[:, None], piece_a[first], piece_b[first]
+    )
+    key_a, key_b = np.where(flip[:, None], key_b[first], key_a[first]), np.where(
+        flip[:, None], key_a[first], key_b[first]
+    )
+    piece_segment, piece_ring = piece_segment[first], piece_ring[first]
+
+    # 区間の左側が正・右側が 0 以下なら、正の領域の境界（右側は左側から重なり数を
+    # 引いた値）。細い輪を飛び越えないよう、点をずらさずに中点で他の線分の巻き数を
+    # 数え、自身の線分は中点のすぐ -x 側の点として同じ半開区間の規則で数える
+    # （丸めで中点が端点に重なっても整合する）。-x 側は上向きの区間では左側、
+    # 下向きの区間では右側なので、後者は重なり数を足す。水平な区間は上側の値に
+    # なるため、左向きのときだけ足す。
+    low = np.minimum(a[piece_segment, 1], b[piece_segment, 1])
+    high = np.maximum(a[piece_segment, 1], b[piece_segment, 1])
+    direction = (b[piece_segment] - a[piece_segment]) * np.where(flip, -1.0, 1.0)[:, None]
+    middle = (piece_a + piece_b) / 2.0
+    spans = (low <= middle[:, 1]) & (middle[:, 1] < high)
+    own = np.where(direction[:, 1] > 0, spans, -spans.astype(np.intp)) * multiplicity
+    right_side = (direction[:, 1] < 0) | ((direction[:, 1] == 0) & (direction[:, 0] < 0))
+    left = _winding_numbers(middle, piece_segment, a, b, ring_of) + own + right_side * multiplicity
+    keep = np.nonzero((left > 0) & (left - multiplicity <= 0))[0]
+    if not len(keep):
+        return results
+
+    # 残った区間を端点でつないで輪にする。端点は (曲線, キー) ごとの番号に置き換え、
+    # 同じ端点から複数の区間が出る場合は曲線上の順で未使用の最初のものを選ぶ。
+    ends = np.column_stack((np.tile(piece_ring[keep], 2), np.concatenate((key_a[keep], key_b[keep]))))
+    node = _group_rows(ends)[1]
+    node_a, node_b = node[: len(keep)], node[len(keep) :]
+    outgoing = np.argsort(node_a, kind="stable")
+    cursor = np.searchsorted(node_a[outgoing], np.arange(node.max() + 2)).tolist()
+    outgoing_list, node_b_list = outgoing.tolist(), node_b.tolist()
+    used = [False] * len(keep)
+    for first_index in range(len(keep)):
+        if used[first_index]:
+            continue
+        chain = []
+        index: Optional[int] = first_index
+        while index is not None and not used[index]:
+            used[index] = True
+            chain.append(index)
+            target, index = node_b_list[index], None
+            while cursor[target] < cursor[target + 1] and index is None:
+                candidate = outgoing_list[cursor[target]]
+                if used[candidate]:
+                    cursor[target] += 1
+                else:
+                    index = candidate
+        if len(chain) >= 3:
+            loop = piece_a[keep[chain]]
+            if abs(signed_area(loop)) > quantum * extent:
+                results[usable[int(piece_ring[keep[first_index]])]].append(loop)
+    return results
+
+
+def resolve_offset_curve(curve: np.ndarray) -> List[np.ndarray]:
+    """Resolve one raw offset curve; see :func:`resolve_offset_curves`."""
+
+    return resolve_offset_curves([curve])[0]
+
+
+def offset_polygons(
+    polygons: Iterable[Any],
+    delta: float,
+    join: str = "miter",
+    miter_limit: float = DEFAULT_MITER_LIMIT,
+    arc_tolerance: float = DEFAULT_ARC_TOLERANCE,
+) -> List[List[np.ndarray]]:
+    """Offset many polygons at once.
+
+    Each polygon may be a list of ``{"X", "Y"}`` points, ``(x, y)`` pairs,
+    a :class:`PackedPoints` or an ``(n, 2)`` array. Positive ``delta``
+    grows the polygon and negative shrinks it, whichever way the input
+    is wound. Returns, per polygon, the list of resulting rings (empty
+    when an inset consumes the polygon). Rings keep the winding of the
+    input, so a clockwise polygon yields clockwise outer rings.
+    """
+
+    cleaned = [_clean_ring(ring_array(points)) for points in polygons]
+    results: List[List[np.ndarray]] = [[] for _ in cleaned]
+    usable, oriented, reversed_input = [], [], []
+    for index, ring in enumerate(cleaned):
+        area = signed_area(ring) if len(ring) >= 3 else 0.0
+        if area == 0.0:
+            if delta >= 0 and len(ring) >= 3:
+                results[index] = [ring]
+            continue
+        usable.append(index)
+        oriented.append(ring if area > 0 else ring[::-1])
+        reversed_input.append(area < 0)
+    if delta == 0:
+        for index, ring, flipped in zip(usable, oriented, reversed_input):
+            results[index] = [ring[::-1] if flipped else ring]
+        return results
+    curves = raw_offset_curves(oriented, delta, join, miter_limit, arc_tolerance)
+    for index, rings, flipped in zip(usable, resolve_offset_curves(curves), reversed_input):
+        results[index] = [ring[::-1] for ring in rings] if flipped else rings
+    return results
+
+
+def offset_polygon(
+    points: Any,
+    delta: float,
+    join: str = "miter",
+    miter_limit: float = DEFAULT_MITER_LIMIT,
+    arc_tolerance: float = DEFAULT_ARC_TOLERANCE,
+) -> List[List[Tuple[float, float]]]:
+    """Offset one polygon and return its rings as lists of ``(x, y)``."""
+
+    rings = offset_polygons([points], delta, join, miter_limit, arc_tolerance)[0]
+    return [[(float(x), float(y)) for x, y in ring] for ring in rings]
+
+
+def format_coordinate(value: float) -> str:
+    """Format a coordinate like ``formatReplicateNumber`` in ``app.js`` (0.001 mm steps)."""
+
+    rounded = math.floor(value * 1000 + 0.5) / 1000
+    if rounded.is_integer():
+        return js_number_to_string(int(rounded))
+    # 0.001 以上 1e15 未満なら repr の最短表記が String(number) と一致する。
+    return repr(rounded) if abs(rounded) < 1e15 else js_number_to_string(rounded)
+
+
+def _outer_ring(rings: List[np.ndarray]) -> Optional[np.ndarray]:
+    # 1 つの Polygon では穴や複数領域を表せないため、最大の外周を採る。
+    if not rings:
+        return None
+    return max(rings, key=lambda ring: abs(signed_area(ring)))
+
+
+def offset_shapes(
+    shapes: Iterable[Mapping[str, Any]],
+    delta: float,
+    join: str = "miter",
+    miter_limit: float = DEFAULT_MITER_LIMIT,
+    arc_tolerance: float = DEFAULT_ARC_TOLERANCE,
+) -> List[Optional[Dict[str, Any]]]:
+    """Return offset copies of TriOrb shapes (``triorb_shapes`` entries).
+
+    Polygons are offset together in one batch; when the result splits,
+    the largest ring is kept. Rectangles and circles are grown or shrunk
+    in closed form around their centre, as ``applyShapeInsetOutset`` in
+    ``app.js`` does. An entry is ``None`` when an inset leaves nothing of
+    a polygon. Input shapes are not modified.
+    """
+
+    results: List[Optional[Dict[str, Any]]] = []
+    polygon_slots: List[int] = []
+    polygon_points: List[Any] = []
+    for shape in shapes:
+        if delta == 0:
+            results.append(copy.deepcopy(dict(shape)))
+            continue
+        # 書き換えるのは形状の dict だけなので、そこまでを複製する（Polygon の点列は作り直す）。
+        result = dict(shape)
+        for key in ("polygon", "rectangle", "circle"):
+            if isinstance(result.get(key), Mapping):
+                result[key] = dict(result[key])
+        results.append(result)
+        shape_type = result.get("type")
+        if shape_type == "Polygon" and isinstance(result.get("polygon"), Mapping):
+            polygon_slots.append(len(results) - 1)
+            polygon_points.append(result["polygon"].get("points") or [])
+        elif shape_type == "Rectangle" and isinstance(result.get("rectangle"), Mapping):
+            _offset_rectangle(result["rectangle"], delta)
+        elif shape_type == "Circle" and isinstance(result.get("circle"), Mapping):
+            radius = _to_float(result["circle"].get("Radius"))
+            result["circle"]["Radius"] = format_coordinate(max(0.0, radius + delta))
+    if polygon_points:
+        for slot, rings in zip(polygon_slots, offset_polygons(polygon_points, delta, join, miter_limit, arc_tolerance)):
+            ring = _outer_ring(rings)
+            if ring is None:
+                results[slot] = None
+                continue
+            results[slot]["polygon"]["points"] = [
+                {"X": format_coordinate(x), "Y": format_coordinate(y)} for x, y in ring.tolist()
+            ]
+    return results
+
+
+def _offset_rectangle(rectangle: Dict[str, Any], delta: float) -> None:
+    # OriginX/OriginY は左上。中心を保ったまま幅・高さを 2 * delta 変える。
+    width = _to_float(rectangle.get("Width"))
+    height = _to_float(rectangle.get("Height"))
+    origin_x = _to_float(rectangle.get("OriginX"))
+    origin_y = _to_float(rectangle.get("OriginY"))
+    center_x, center_y = origin_x + width / 2, origin_y - height / 2
+    next_width = max(0.0, width + 2 * delta)
+    next_height = max(0.0, height + 2 * delta)
+    rectangle["Width"] = format_coordinate(next_width)
+    rectangle["Height"] = format_coordinate(next_height)
+    rectangle["OriginX"] = format_coordinate(center_x - next_width / 2)
+    rectangle["OriginY"] = format_coordinate(center_y + next_height / 2)
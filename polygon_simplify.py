@@ -0,0 +1,506 @@
+"""Vertex reduction for TriOrb field polygons.
+
+Usage::
+
+    python polygon_simplify.py INPUT.sgexml [--method visvalingam] [--tolerance 2] [--output OUT.sgexml]
+
+Imported and replicated polygons often carry far more vertices than the
+scanner's object resolution can use. Every polygon of a batch is reduced
+together with NumPy, either top-down (Douglas–Peucker: split each chord at
+its farthest vertex) or bottom-up (Visvalingam–Whyatt: repeatedly drop the
+vertices spanning the smallest triangles). Both stop when dropping another
+vertex would leave a removed vertex more than ``tolerance / 2`` from its
+chord.
+
+A protective field must never shrink, so where removed vertices lie
+outside the simplified outline the whole polygon is then grown by that
+distance (mitre offset from :mod:`polygon_offset`). The result always
+contains the original polygon; its edges lie at most ``tolerance``
+outside it (mitred corners up to ``1.5 * tolerance``). CutOut polygons
+remove area from the field, so they are handled the other way round:
+they are shrunk by the distance of removed vertices left inside, and the
+result always lies within the original cut-out. Polygons whose
+simplified outline would cross itself (or that an inset would consume)
+are left unchanged.
+
+The tolerance of a shape follows the fields using it: ``Resolution`` ×
+:data:`RESOLUTION_FRACTION`, capped by a positive ``TolerancePositive``,
+and the smallest value wins when several fields share the shape.
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+import math
+from pathlib import Path
+import sys
+import time
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from polygon_offset import (
+    format_coordinate,
+    raw_offset_curves,
+    resolve_offset_curves,
+    ring_array,
+    signed_area,
+)
+
+METHODS = ("douglas-peucker", "visvalingam")
+# Field の Resolution（検出できる最小物体の大きさ, mm）に対する許容誤差の比率。
+RESOLUTION_FRACTION = 0.05
+# Resolution を持つ Field から参照されていない図形に使う値（sgexml_writer の既定値と同じ）。
+DEFAULT_RESOLUTION = 70.0
+DEFAULT_TOLERANCE = DEFAULT_RESOLUTION * RESOLUTION_FRACTION
+# 出力座標は 0.001 mm に丸めるため、外側へ広げる量にその分を足しておく。
+_ROUNDING_MARGIN = 0.001
+# Visvalingam で面積が同じ頂点（円弧など）の順位を散らす乗数（Knuth の乗法ハッシュ）。
+_TIE_MULTIPLIER = np.uint64(2654435761)
+
+
+@dataclass(frozen=True)
+class SimplifiedPolygon:
+    """Result of simplifying one polygon.
+
+    ``ring`` keeps the winding of the input. ``kept`` lists the indices of
+    the input points it is made of, or is ``None`` when the polygon had to
+    be grown by ``growth`` mm (shrunk for a negative value) and its
+    vertices are new. ``changed`` is false when no vertex could be removed.
+    """
+
+    ring: np.ndarray
+    kept: Optional[np.ndarray]
+    before: int
+    growth: float = 0.0
+    changed: bool = False
+
+
+@dataclass(frozen=True)
+class SimplifyReport:
+    """Vertex reduction of one TriOrb shape."""
+
+    shape_id: str
+    tolerance: float
+    before: int
+    after: int
+    growth: float
+
+    @property
+    def removed(self) -> int:
+        return self.before - self.after
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": self.shape_id,
+            "tolerance": self.tolerance,
+            "before": self.before,
+            "after": self.after,
+            "growth": self.growth,
+        }
+
+
+def _number(value: Any, fallback: float) -> float:
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return fallback
+    return number if math.isfinite(number) else fallback
+
+
+def field_tolerance(attributes: Mapping[str, Any]) -> float:
+    """Return the simplification tolerance (mm) allowed by one Field's attributes."""
+
+    resolution = _number(attributes.get("Resolution"), DEFAULT_RESOLUTION)
+    tolerance = max(resolution, 0.0) * RESOLUTION_FRACTION
+    positive = _number(attributes.get("TolerancePositive"), 0.0)
+    return min(tolerance, positive) if positive > 0 else tolerance
+
+
+def shape_tolerances(fieldsets_payloads: Iterable[Mapping[str, Any]]) -> Dict[str, float]:
+    """Map every shape ID referenced by a field to the smallest tolerance of those fields."""
+
+    tolerances: Dict[str, float] = {}
+    for fieldsets_payload in fieldsets_payloads:
+        for fieldset in fieldsets_payload.get("fieldsets") or []:
+            for field in fieldset.get("fields") or []:
+                tolerance = field_tolerance(field.get("attributes") or {})
+                for ref in field.get("shapeRefs") or []:
+                    shape_id = ref.get("shapeId")
+                    if shape_id:
+                        key = str(shape_id)
+                        tolerances[key] = min(tolerance, tolerances.get(key, math.inf))
+    return tolerances
+
+
+def _span_distances(
+    points: np.ndarray,
+    starts: np.ndarray,
+    counts: np.ndarray,
+    ring: np.ndarray,
+    first: np.ndarray,
+    length: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    # 区間 = リング ring の頂点 first から length 先の頂点までの弦。
+    # 区間内部の頂点ごとに、弦（線分）までの距離と弦の外側（右側）にあるかを返す。
+    inner = np.maximum(length - 1, 0)
+    span_of = np.repeat(np.arange(len(ring)), inner)
+    offsets = np.concatenate(([0], np.cumsum(inner)[:-1])).astype(np.intp)
+    step = np.arange(len(span_of)) - offsets[span_of] + 1
+    size, base = counts[ring], starts[ring]
+    a = points[base + first]
+    b = points[base + (first + length) % size]
+    p = points[base[span_of] + (first[span_of] + step) % size[span_of]]
+    ab = (b - a)[span_of]
+    ap = p - a[span_of]
+    squared = ab[:, 0] * ab[:, 0] + ab[:, 1] * ab[:, 1]
+    along = ap[:, 0] * ab[:, 0] + ap[:, 1] * ab[:, 1]
+    t = np.clip(np.divide(along, squared, out=np.zeros_like(along), where=squared > 0), 0.0, 1.0)
+    gap = ap - t[:, None] * ab
+    distance = np.sqrt(gap[:, 0] * gap[:, 0] + gap[:, 1] * gap[:, 1])
+    exterior = ab[:, 0] * ap[:, 1] - ab[:, 1] * ap[:, 0] < 0
+    return span_of, offsets, step, distance, exterior
+
+
+def _span_max(values: np.ndarray, offsets: np.ndarray, length: np.ndarray) -> np.ndarray:
+    # 区間ごとの最大値（内部の頂点が無い区間は 0）。
+    result = np.zeros(len(length))
+    nonempty = length > 1
+    if values.size:
+        result[nonempty] = np.maximum.reduceat(values, offsets[nonempty])
+    return result
+
+
+def _first_per_group(positions: np.ndarray, groups: np.ndarray) -> np.ndarray:
+    # 昇順の positions のうち、各グループで最初のものだけを残す。
+    if not positions.size:
+        return positions
+    group = groups[positions]
+    return positions[np.concatenate(([True], group[1:] != group[:-1]))]
+
+
+def _douglas_peucker(
+    points: np.ndarray, starts: np.ndarray, counts: np.ndarray, limits: np.ndarray
+) -> np.ndarray:
+    ring_of = np.repeat(np.arange(len(counts)), counts)
+    # 閉じたリングは、必ず凸包上にある左下の頂点と、そこから最も遠い頂点で 2 本の区間に分ける。
+    x, y = points[:, 0], points[:, 1]
+    leftmost = x == np.minimum.reduceat(x, starts)[ring_of]
+    lowest = np.where(leftmost, y, np.inf)
+    lowest_left = leftmost & (lowest == np.minimum.reduceat(lowest, starts)[ring_of])
+    anchor = _first_per_group(np.flatnonzero(lowest_left), ring_of)
+    gap = points - points[anchor[ring_of]]
+    reach = gap[:, 0] * gap[:, 0] + gap[:, 1] * gap[:, 1]
+    farthest = np.maximum.reduceat(reach, starts)
+    far = _first_per_group(np.flatnonzero(reach == farthest[ring_of]), ring_of)
+    keep = np.zeros(len(points), dtype=bool)
+    keep[anchor] = True
+    keep[far] = True
+    rings = np.arange(len(counts))
+    ring = np.concatenate((rings, rings))
+    first = np.concatenate((anchor - starts, far - starts))
+    length = (far - anchor) % counts
+    length = np.concatenate((length, counts - length))
+    # 全リングの区間をまとめて、許容誤差を超えた区間だけを最も遠い頂点で 2 分割していく。
+    while ring.size:
+        span_of, offsets, step, distance, _ = _span_distances(points, starts, counts, ring, first, length)
+        worst = _span_max(distance, offsets, length)
+        split = worst > limits[ring]
+        if not split.any():
+            break
+        at = _first_per_group(np.flatnonzero(split[span_of] & (distance == worst[span_of])), span_of)
+        spans, k = span_of[at], step[at]
+        middle = (first[spans] + k) % counts[ring[spans]]
+        keep[starts[ring[spans]] + middle] = True
+        ring = np.concatenate((ring[spans], ring[spans]))
+        first = np.concatenate((first[spans], middle))
+        length = np.concatenate((k, length[spans] - k))
+    return keep
+
+
+def _visvalingam(
+    points: np.ndarray, starts: np.ndarray, counts: np.ndarray, limits: np.ndarray
+) -> np.ndarray:
+    total = len(points)
+    ring_of = np.repeat(np.arange(len(counts)), counts)
+    local = np.arange(total) - starts[ring_of]
+    nxt = starts[ring_of] + (local + 1) % counts[ring_of]
+    prv = starts[ring_of] + (local - 1) % counts[ring_of]
+    alive = np.ones(total, dtype=bool)
+    alive_count = counts.copy()
+    tie = np.arange(total, dtype=np.uint64) * _TIE_MULTIPLIER % np.uint64(1 << 32)
+    area = np.full(total, np.inf)
+    # 両隣が変わった頂点だけ、消したときの誤差を測り直す。
+    allowed = np.zeros(total, dtype=bool)
+    dirty = np.ones(total, dtype=bool)
+    # 消しても許容誤差に収まる頂点のうち、生きている両隣より三角形が小さい頂点を 1 回でまとめて消す
+    # （互いに隣り合わないので、連結リストの付け替えがぶつからない）。
+    while True:
+        candidates = np.flatnonzero(alive & (alive_count[ring_of] > 3))
+        if not candidates.size:
+            break
+        stale = candidates[dirty[candidates]]
+        ring = ring_of[stale]
+        a, b = prv[stale], nxt[stale]
+        length = (local[b] - local[a]) % counts[ring]
+        _, offsets, _, distance, _ = _span_distances(points, starts, counts, ring, local[a], length)
+        allowed[stale] = _span_max(distance, offsets, length) <= limits[ring]
+        dirty[stale] = False
+        v = candidates[allowed[candidates]]
+        if not v.size:
+            break
+        before, after = points[prv[v]] - points[v], points[nxt[v]] - points[v]
+        area.fill(np.inf)
+        area[v] = 0.5 * np.abs(before[:, 0] * after[:, 1] - before[:, 1] * after[:, 0])
+
+        def smaller(other: np.ndarray) -> np.ndarray:
+            return (area[v] < area[other]) | ((area[v] == area[other]) & (tie[v] < tie[other]))
+
+        chosen = v[smaller(prv[v]) & smaller(nxt[v])]
+        # 1 つのリングに 3 頂点は残す。
+        chosen_ring = ring_of[chosen]
+        rank = np.arange(len(chosen)) - np.searchsorted(chosen_ring, chosen_ring)
+        chosen = chosen[rank < alive_count[chosen_ring] - 3]
+        alive[chosen] = False
+        nxt[prv[chosen]] = nxt[chosen]
+        prv[nxt[chosen]] = prv[chosen]
+        dirty[prv[chosen]] = True
+        dirty[nxt[chosen]] = True
+        alive_count -= np.bincount(ring_of[chosen], minlength=len(counts))
+    return alive
+
+
+def simplify_polygons(
+    polygons: Iterable[Any],
+    tolerance: Union[float, Sequence[float]],
+    method: str = "douglas-peucker",
+    inset: Union[bool, Sequence[bool]] = False,
+) -> List[SimplifiedPolygon]:
+    """Simplify many polygons at once.
+
+    Polygons take the same forms as :func:`polygon_offset.offset_polygons`.
+    ``tolerance`` is one value in mm or one per polygon. Each result
+    contains its input polygon; see the module docstring for how far
+    outside it may reach. Polygons flagged by ``inset`` (one flag or one
+    per polygon, e.g. CutOut rings) instead lie inside their input.
+    """
+
+    if method not in METHODS:
+        raise ValueError(f"Unsupported simplification method: {method!r}")
+    arrays = [ring_array(points) for points in polygons]
+    tolerances = np.broadcast_to(np.asarray(tolerance, dtype=np.float64), (len(arrays),))
+    insets = np.broadcast_to(np.asarray(inset, dtype=bool), (len(arrays),))
+    results: List[Optional[SimplifiedPolygon]] = [None] * len(arrays)
+    usable, oriented, sources, flipped = [], [], [], []
+    for index, ring in enumerate(arrays):
+        # 連続する重複点と、閉じるための末尾の点を落とす。元の添字は出力に使う。
+        source = np.arange(len(ring))
+        if len(ring) > 1:
+            source = np.flatnonzero(np.concatenate(([True], np.any(ring[1:] != ring[:-1], axis=1))))
+            if len(source) > 1 and (ring[source[-1]] == ring[0]).all():
+                source = source[:-1]
+        cleaned = ring[source]
+        area = signed_area(cleaned) if len(cleaned) >= 3 else 0.0
+        if area == 0.0 or len(cleaned) <= 3 or not tolerances[index] > 0:
+            results[index] = SimplifiedPolygon(cleaned, source, len(ring))
+            continue
+        usable.append(index)
+        oriented.append(cleaned if area > 0 else cleaned[::-1])
+        sources.append(source if area > 0 else source[::-1])
+        flipped.append(area < 0)
+
+    if usable:
+        counts = np.array([len(ring) for ring in oriented], dtype=np.intp)
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1])).astype(np.intp)
+        points = np.concatenate(oriented)
+        limits = tolerances[usable] / 2.0
+        reduce = _douglas_peucker if method == "douglas-peucker" else _visvalingam
+        keep = reduce(points, starts, counts, limits)
+
+        # 残った頂点の間で、外側に取り残された頂点の最大距離を測る（ここで外側へ広げる）。
+        # inset の輪は逆に、内側に取り残された頂点の最大距離だけ内側へ縮める。
+        kept = np.flatnonzero(keep)
+        ring_of = np.repeat(np.arange(len(counts)), counts)
+        kept_ring = ring_of[kept]
+        kept_counts = np.bincount(kept_ring, minlength=len(counts))
+        kept_starts = np.concatenate(([0], np.cumsum(kept_counts)[:-1])).astype(np.intp)
+        local = kept - starts[kept_ring]
+        following = np.roll(local, -1)
+        following[kept_starts + kept_counts - 1] = local[kept_starts]
+        length = (following - local) % counts[kept_ring]
+        span_of, offsets, _, distance, exterior = _span_distances(points, starts, counts, kept_ring, local, length)
+        inward = insets[usable]
+        outside = exterior != inward[kept_ring][span_of]
+        span_growth = _span_max(np.where(outside, distance, 0.0), offsets, length)
+        growth = np.maximum.reduceat(span_growth, kept_starts)
+
+        kept_rings = np.split(points[kept], kept_starts[1:])
+        kept_sources = [
+            source[indices] for source, indices in zip(sources, np.split(local, kept_starts[1:]))
+        ]
+        changed = [slot for slot in range(len(usable)) if 3 <= kept_counts[slot] < counts[slot]]
+        grown = [slot for slot in changed if growth[slot] > 0 and not inward[slot]]
+        shrunk = [slot for slot in changed if growth[slot] > 0 and inward[slot]]
+        # 簡略化した輪が自己交差していないか（解消しても頂点が増えないか）を、広げた・縮めた輪と一緒に確かめる。
+        # raw_offset_curves は 1 回の呼び出しで符号をそろえる必要があるため、広げる輪と縮める輪は分ける。
+        curves = [kept_rings[slot] for slot in changed]
+        for slots, sign in ((grown, 1.0), (shrunk, -1.0)):
+            if slots:
+                curves += raw_offset_curves(
+                    [kept_rings[slot] for slot in slots], sign * (growth[slots] + _ROUNDING_MARGIN), "miter"
+                )
+        resolved = resolve_offset_curves(curves)
+        plain = dict(zip(changed, resolved))
+        offset_of = dict(zip(grown + shrunk, resolved[len(changed):]))
+        for slot, index in enumerate(usable):
+            before = len(arrays[index])
+            rings = plain.get(slot)
+            if rings is None or len(rings) != 1 or len(rings[0]) != kept_counts[slot]:
+                # 何も消せなかった・3 点未満になった・自己交差した場合は元のまま。
+                ring, source = oriented[slot], sources[slot]
+            elif slot not in offset_of:
+                ring, source = kept_rings[slot], kept_sources[slot]
+                if flipped[slot]:
+                    ring, source = ring[::-1], source[::-1]
+                results[index] = SimplifiedPolygon(ring, source, before, changed=True)
+                continue
+            else:
+                outer = offset_of[slot]
+                # 広げた輪は元の多角形を含み、縮めた輪は元の多角形に収まる（面積で念のため確かめる）。
+                # 縮めて消えた・分かれた輪も元のまま残す。
+                area = signed_area(outer[0]) if len(outer) == 1 else None
+                original = signed_area(oriented[slot])
+                if area is None or (area > original if inward[slot] else area < original):
+                    ring, source = oriented[slot], sources[slot]
+                else:
+                    ring = outer[0]
+                    offset = -float(growth[slot]) if inward[slot] else float(growth[slot])
+                    results[index] = SimplifiedPolygon(
+                        ring[::-1] if flipped[slot] else ring, None, before, offset, True
+                    )
+                    continue
+            if flipped[slot]:
+                ring, source = ring[::-1], source[::-1]
+            results[index] = SimplifiedPolygon(ring, source, before)
+    return results  # type: ignore[return-value]
+
+
+def simplify_shapes(
+    shapes: Iterable[Mapping[str, Any]],
+    tolerances: Union[float, Mapping[str, float]] = DEFAULT_TOLERANCE,
+    method: str = "douglas-peucker",
+) -> Tuple[List[Dict[str, Any]], List[SimplifyReport]]:
+    """Simplify the polygons of TriOrb shapes (``triorb_shapes`` entries).
+
+    ``tolerances`` is one value in mm or a map from shape ID to mm (see
+    :func:`shape_tolerances`); shapes missing from the map use
+    :data:`DEFAULT_TOLERANCE`. Rectangles and circles are returned as is,
+    and ``CutOut`` polygons are only ever shrunk. Returns the new shapes
+    and one report per polygon. Input shapes are not modified.
+    """
+
+    results: List[Dict[str, Any]] = []
+    slots: List[int] = []
+    polygon_points: List[Any] = []
+    shape_tolerance: List[float] = []
+    cutouts: List[bool] = []
+    for shape in shapes:
+        result = dict(shape)
+        results.append(result)
+        if result.get("type") != "Polygon" or not isinstance(result.get("polygon"), Mapping):
+            continue
+        result["polygon"] = dict(result["polygon"])
+        slots.append(len(results) - 1)
+        polygon_points.append(result["polygon"].get("points") or [])
+        # CutOut はフィールドから削る領域なので、広げるとフィールドが縮む。
+        cutouts.append(result["polygon"].get("Type") == "CutOut")
+        if isinstance(tolerances, Mapping):
+            shape_tolerance.append(float(tolerances.get(str(result.get("id")), DEFAULT_TOLERANCE)))
+        else:
+            shape_tolerance.append(float(tolerances))
+    reports: List[SimplifyReport] = []
+    if not slots:
+        return results, reports
+    simplified = simplify_polygons(polygon_points, shape_tolerance, method, cutouts)
+    for slot, points, tolerance, outcome in zip(slots, polygon_points, shape_tolerance, simplified):
+        polygon = results[slot]["polygon"]
+        if outcome.kept is None:
+            polygon["points"] = [_point_dict(point) for point in outcome.ring]
+        elif outcome.changed:
+            # 残った頂点は元の座標文字列のまま使う。
+            polygon["points"] = [_kept_point(points, int(index)) for index in outcome.kept]
+        after = len(polygon["points"])
+        reports.append(
+            SimplifyReport(str(results[slot].get("id") or ""), tolerance, outcome.before, after, outcome.growth)
+        )
+    return results, reports
+
+
+def _point_dict(point: Sequence[float]) -> Dict[str, str]:
+    return {"X": format_coordinate(float(point[0])), "Y": format_coordinate(float(point[1]))}
+
+
+def _kept_point(points: Any, index: int) -> Dict[str, Any]:
+    point = points[index]
+    return dict(point) if isinstance(point, Mapping) else _point_dict(point)
+
+
+def simplify_payload(
+    payload: Mapping[str, Any], method: str = "douglas-peucker", tolerance: Optional[float] = None
+) -> Tuple[List[Dict[str, Any]], List[SimplifyReport]]:
+    """Simplify every TriOrb shape of a ``build_index_payload`` dict.
+
+    Without ``tolerance`` each shape uses the tolerance of the fields
+    referencing it, across every ScanPlane of the document.
+    """
+
+    if tolerance is None:
+        planes = payload.get("fieldset_planes")
+        fieldsets_payloads = planes.payloads() if hasattr(planes, "payloads") else [payload.get("fieldsets") or {}]
+        tolerances: Union[float, Mapping[str, float]] = shape_tolerances(fieldsets_payloads)
+    else:
+        tolerances = tolerance
+    return simplify_shapes(payload.get("triorb_shapes") or [], tolerances, method)
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    import main
+    import sgexml_writer
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("input", type=Path)
+    parser.add_argument("--method", choices=METHODS, default="douglas-peucker")
+    parser.add_argument("--tolerance", type=float, help="mm for every shape (default: from each field's Resolution)")
+    parser.add_argument("--output", type=Path, help="write the simplified document (Save (TriOrb) format)")
+    args = parser.parse_args(argv)
+    if args.tolerance is not None and not args.tolerance > 0:
+        parser.error("--tolerance must be positive")
+
+    document = main.SgexmlDocument.load(args.input)
+    if not document.is_loaded:
+        print(f"{args.input}: not a well-formed XML document", file=sys.stderr)
+        return 1
+    payload = main.build_index_payload(document)
+    start = time.perf_counter()
+    shapes, reports = simplify_payload(payload, args.method, args.tolerance)
+    elapsed = time.perf_counter() - start
+
+    header = f"{'shape':<24} {'tol mm':>7} {'before':>7} {'after':>7} {'grown mm':>9}"
+    print(header)
+    print("-" * len(header))
+    for report in reports:
+        print(
+            f"{report.shape_id[:24]:<24} {report.tolerance:>7.3g} {report.before:>7} {report.after:>7}"
+            f" {report.growth:>9.3f}"
+        )
+    before = sum(report.before for report in reports)
+    after = sum(report.after for report in reports)
+    print(f"{len(reports)} polygon(s): {before} -> {after} points in {elapsed * 1000:.1f} ms")
+    if args.output:
+        sgexml_writer.write_sgexml({**payload, "triorb_shapes": shapes}, args.output, "triorb")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -0,0 +1,138 @@
+from __future__ import annotations
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+import logging
+import re
+import time
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+from flask import Flask, Response, g, request
+
+SERVER_TIMING_HEADER = "Server-Timing"
+
+logger = logging.getLogger("sick_sls_editor.timing")
+
+# Server-Timing のメトリクス名は HTTP の token でなければならない。
+_TOKEN_PATTERN = re.compile(r"^[!#$%&'*+\-.^_`|~0-9A-Za-z]+$")
+
+_active_timer: ContextVar[Optional["RequestTimer"]] = ContextVar("request_timer", default=None)
+
+
+@dataclass(frozen=True)
+class StageTiming:
+    """Duration of one named stage of a request."""
+
+    name: str
+    duration_ms: float
+    description: Optional[str] = None
+
+    def to_header(self) -> str:
+        value = f"{self.name};dur={self.duration_ms:.2f}"
+        if self.description:
+            escaped = self.description.replace("\\", "\\\\").replace('"', '\\"')
+            value += f';desc="{escaped}"'
+        return value
+
+
+class RequestTimer:
+    """Collects stage durations for one request in the order they finish.
+
+    A stage that runs more than once (e.g. a loader called twice) is
+    recorded once per run; :meth:`totals` sums them by name.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self._clock = clock
+        self._start = clock()
+        self.stages: List[StageTiming] = []
+
+    @contextmanager
+    def stage(self, name: str, description: Optional[str] = None) -> Iterator[None]:
+        if not _TOKEN_PATTERN.match(name):
+            raise ValueError(f"Invalid Server-Timing metric name: {name!r}")
+        start = self._clock()
+        try:
+            yield
+        finally:
+            self.record(name, (self._clock() - start) * 1000.0, description)
+
+    def record(self, name: str, duration_ms: float, description: Optional[str] = None) -> None:
+        self.stages.append(StageTiming(name, duration_ms, description))
+
+    def elapsed_ms(self) -> float:
+        return (self._clock() - self._start) * 1000.0
+
+    def totals(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for stage in self.stages:
+            totals[stage.name] = totals.get(stage.name, 0.0) + stage.duration_ms
+        return totals
+
+
+def format_server_timing(stages: Iterable[StageTiming]) -> str:
+    """Render stages as a ``Server-Timing`` header value."""
+
+    return ", ".join(stage.to_header() for stage in stages)
+
+
+def current_timer() -> Optional[RequestTimer]:
+    return _active_timer.get()
+
+
+@contextmanager
+def timed_stage(name: str, description: Optional[str] = None) -> Iterator[None]:
+    """Time the enclosed block as ``name`` when a request timer is active.
+
+    Outside a request (CLI, tests, batch conversion) this is a no-op, so the
+    loaders can be instrumented unconditionally.
+    """
+
+    timer = _active_timer.get()
+    if timer is None:
+        yield
+        return
+    with timer.stage(name, description):
+        yield
+
+
+def install_request_timing(app: Flask) -> None:
+    """Time every request and report the stages via header and log."""
+
+    @app.before_request
+    def _start_request_timer() -> None:
+        timer = RequestTimer()
+        g.request_timer = timer
+        g.request_timer_token = _active_timer.set(timer)
+
+    @app.after_request
+    def _emit_server_timing(response: Response) -> Response:
+        timer: Optional[RequestTimer] = g.pop("request_timer", None)
+        if timer is None:
+            return response
+        stages = [*timer.stages, StageTiming("total", timer.elapsed_ms())]
+        response.headers[SERVER_TIMING_HEADER] = format_server_timing(stages)
+        # ログ集計しやすいよう、ステージ別の合計を extra に dict のまま載せる。
+        timings = {name: round(value, 3) for name, value in timer.totals().items()}
+        timings["total"] = round(stages[-1].duration_ms, 3)
+        logger.info(
+            "%s %s %s %s",
+            request.method,
+            request.path,
+            response.status_code,
+            " ".join(f"{name}={value:.2f}ms" for name, value in timings.items()),
+            extra={"method": request.method, "path": request.path, "timings": timings},
+        )
+        return response
+
+    @app.teardown_request
+    def _reset_request_timer(_exc: Optional[BaseException]) -> None:
+        token = g.pop("request_timer_token", None)
+        if token is None:
+            return
+        try:
+            _active_timer.reset(token)
+        except ValueError:
+            # ストリーミング応答の終了時など、別コンテキストで teardown された場合。
+            _active_timer.set(None)
@@ -0,0 +1,188 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+import gzip
+import threading
+from typing import Optional, Sequence, Tuple
+
+from flask import Flask, Response, request
+
+from request_timing import timed_stage
+
+try:  # Brotli は任意依存。無ければ gzip だけを提示する。
+    import brotli
+except ImportError:  # pragma: no cover - depends on the environment
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = frozenset(
+    {
+        "application/javascript",
+        "application/json",
+        "application/xml",
+        "image/svg+xml",
+        "text/css",
+        "text/html",
+        "text/javascript",
+        "text/plain",
+    }
+)
+
+# 圧縮した表現は別の強い ETag を持つ必要があるため、元の ETag に付ける接尾辞。
+ENCODING_SUFFIXES = {"br": "br", "gzip": "gz"}
+
+
+def available_encodings() -> Tuple[str, ...]:
+    """Return the content codings this server can produce, preferred first."""
+
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def negotiate_encoding(accept_encoding: str, available: Optional[Sequence[str]] = None) -> Optional[str]:
+    """Pick the coding to use for an ``Accept-Encoding`` header value.
+
+    The highest ``q`` wins; ties go to the order of ``available``. ``*``
+    matches any coding not listed explicitly and ``q=0`` refuses a coding.
+    Returns ``None`` when the response should be sent as is.
+    """
+
+    codings = tuple(available or available_encodings())
+    weights = {}
+    wildcard: Optional[float] = None
+    for item in accept_encoding.split(","):
+        name, _, params = item.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if name == "*":
+            wildcard = quality
+        else:
+            weights[name] = quality
+    best: Optional[str] = None
+    best_quality = 0.0
+    for coding in codings:
+        quality = weights.get(coding, wildcard if wildcard is not None else 0.0)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+def compress(data: bytes, encoding: str, level: int = 6) -> bytes:
+    """Compress ``data`` deterministically so equal bodies keep equal bytes."""
+
+    if encoding == "br":
+        if brotli is None:
+            raise ValueError("brotli is not installed")
+        return brotli.compress(data, quality=min(11, max(0, level)))
+    if encoding == "gzip":
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    raise ValueError(f"Unsupported content coding: {encoding!r}")
+
+
+def encoded_etag(etag: str, encoding: Optional[str]) -> str:
+    return f"{etag}-{ENCODING_SUFFIXES[encoding]}" if encoding else etag
+
+
+def matching_etag(etag: str, encoding: Optional[str]) -> Optional[str]:
+    """Return the form of ``etag`` the request's ``If-None-Match`` holds, if any.
+
+    Clients hold the suffixed tag when they got the body compressed with
+    ``encoding`` and the plain one when it was sent uncompressed.
+    """
+
+    # If-None-Match は弱い比較。"*" は対象の存在確認が要るため、ここでは一致扱いにしない。
+    if_none_match = request.if_none_match
+    for candidate in (encoded_etag(etag, encoding), etag):
+        if if_none_match.is_strong(candidate) or if_none_match.is_weak(candidate):
+            return candidate
+    return None
+
+
+class CompressedBodyCache:
+    """Bounded LRU of compressed bodies keyed by strong ETag and coding."""
+
+    def __init__(self, max_entries: int = 32) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, str], bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, etag: str, encoding: str) -> Optional[bytes]:
+        with self._lock:
+            body = self._entries.get((etag, encoding))
+            if body is not None:
+                self._entries.move_to_end((etag, encoding))
+            return body
+
+    def put(self, etag: str, encoding: str, body: bytes) -> None:
+        if self.max_entries < 1:
+            return
+        with self._lock:
+            self._entries[(etag, encoding)] = body
+            self._entries.move_to_end((etag, encoding))
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def install_response_compression(app: Flask) -> None:
+    """Compress text responses according to ``Accept-Encoding``.
+
+    Streamed responses (e.g. the XML export) are left alone. When the
+    response carries an ETag, the compressed body gets a suffixed ETag,
+    is cached under it and the response is made conditional again, so
+    static files answer ``304`` for the compressed representation too.
+    """
+
+    app.config.setdefault("COMPRESS_MIN_SIZE", 1024)
+    app.config.setdefault("COMPRESS_LEVEL", 6)
+    app.config.setdefault("COMPRESS_CACHE_SIZE", 32)
+    cache = CompressedBodyCache(app.config["COMPRESS_CACHE_SIZE"])
+    app.extensions["compressed_bodies"] = cache
+
+    @app.after_request
+    def _compress_response(response: Response) -> Response:
+        if response.mimetype not in COMPRESSIBLE_MIMETYPES:
+            return response
+        # 圧縮の有無にかかわらず、中継キャッシュが表現を取り違えないようにする。
+        response.vary.add("Accept-Encoding")
+        if (
+            response.status_code != 200
+            or (response.is_streamed and not response.direct_passthrough)
+            or "Content-Encoding" in response.headers
+            or response.cache_control.no_transform
+        ):
+            return response
+        encoding = negotiate_encoding(request.headers.get("Accept-Encoding", ""))
+        min_size = app.config["COMPRESS_MIN_SIZE"]
+        if encoding is None or (response.content_length is not None and response.content_length < min_size):
+            return response
+        etag, weak = response.get_etag()
+        body = cache.get(etag, encoding) if etag and not weak else None
+        if body is None:
+            response.direct_passthrough = False
+            data = response.get_data()
+            if len(data) < min_size:
+                return response
+            with timed_stage("compress", encoding):
+                body = compress(data, encoding, app.config["COMPRESS_LEVEL"])
+            if etag and not weak:
+                cache.put(etag, encoding, body)
+        elif response.direct_passthrough:
+            # キャッシュ済みの場合、send_file が開いたファイルは読まずに閉じる。
+            close = getattr(response.response, "close", None)
+            if close is not None:
+                close()
+            response.direct_passthrough = False
+        response.set_data(body)
+        response.headers["Content-Encoding"] = encoding
+        response.headers.pop("Accept-Ranges", None)
+        if etag:
+            response.set_etag(encoded_etag(etag, encoding), weak)
+            response.make_conditional(request)
+        return response
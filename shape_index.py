@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import hashlib
+from typing import Any, Dict, Iterable, Iterator, List, Mapping, Optional
+
+from packed_points import PackedPoints, pack_coordinates
+
+# 16 バイトあれば数百万図形でも偶然の衝突は実質起こらない。
+FINGERPRINT_SIZE = 16
+
+# XML 1.0 の属性値には NUL を書けないため、区切りに使っても値と衝突しない。
+_SEPARATOR = "\x00"
+# Polygon の座標列が存在することを表す目印（None と空リストを区別する）。
+_POINTS_MARKER = "\x01"
+# 全座標が正規表記の数値なら、文字列ではなく倍精度のバイト列を入れる。正規表記と数値は
+# 1 対 1 なので、文字列の点列とは決して一致せず、別の目印の後ろに置けば区別できる。
+_PACKED_POINTS_MARKER = "\x02"
+
+
+def geometry_fingerprint(
+    shape_type: str,
+    attrs: Mapping[str, Any],
+    points: Optional[Iterable[Mapping[str, Any]]] = None,
+) -> bytes:
+    """Return a fixed-size digest identifying a shape's geometry.
+
+    Two shapes get the same fingerprint exactly when the type, every
+    attribute value and (for polygons) the ``X``/``Y`` sequence are equal as
+    strings, the same rule the previous concatenated registry key used.
+    Values are compared verbatim, so ``"100"`` and ``"100.0"`` stay distinct.
+    Only ``X``/``Y`` of each point count: :class:`PackedPoints` and point
+    dicts with extra attributes hash like the plain ``X``/``Y`` list.
+    """
+
+    # 属性数を先頭に入れ、属性部と座標部の境界を一意にする。
+    parts: List[str] = [shape_type, str(len(attrs))]
+    for key in sorted(attrs):
+        parts.append(key)
+        parts.append(str(attrs.get(key, "")))
+    if shape_type == "Polygon" and points is not None:
+        if not isinstance(points, PackedPoints):
+            points = list(points)
+            coords = pack_coordinates(points)
+        else:
+            coords = points
+        if coords is not None:
+            parts.append(_PACKED_POINTS_MARKER)
+            canonical = _SEPARATOR.join(parts).encode("utf-8") + coords.tobytes()
+            return hashlib.blake2b(canonical, digest_size=FINGERPRINT_SIZE).digest()
+        parts.append(_POINTS_MARKER)
+        for point in points:
+            parts.append(str(point.get("X", "")))
+            parts.append(str(point.get("Y", "")))
+    canonical = _SEPARATOR.join(parts).encode("utf-8")
+    return hashlib.blake2b(canonical, digest_size=FINGERPRINT_SIZE).digest()
+
+
+def shape_fingerprint(shape: Mapping[str, Any]) -> Optional[bytes]:
+    """Fingerprint a TriOrb shape payload entry, or ``None`` for unknown types."""
+
+    shape_type = shape.get("type")
+    if shape_type == "Polygon":
+        polygon = shape.get("polygon", {})
+        return geometry_fingerprint(
+            "Polygon", {"Type": polygon.get("Type", "CutOut")}, polygon.get("points", [])
+        )
+    if shape_type == "Rectangle":
+        return geometry_fingerprint("Rectangle", shape.get("rectangle", {}))
+    if shape_type == "Circle":
+        return geometry_fingerprint("Circle", shape.get("circle", {}))
+    return None
+
+
+class ShapeIndex:
+    """Fingerprint → shape ID index used to deduplicate TriOrb shapes.
+
+    Built once from the TriOrb section of a document and then extended while
+    legacy inline geometry is promoted, instead of re-keying every shape.
+    When two shapes share a fingerprint the later one wins, matching the
+    order in which the loaders register them.
+    """
+
+    def __init__(self) -> None:
+        self._ids: Dict[bytes, str] = {}
+
+    @classmethod
+    def from_shapes(cls, shapes: Iterable[Mapping[str, Any]]) -> "ShapeIndex":
+        index = cls()
+        for shape in shapes:
+            index.add_shape(shape)
+        return index
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def __contains__(self, fingerprint: object) -> bool:
+        return fingerprint in self._ids
+
+    def __iter__(self) -> Iterator[bytes]:
+        return iter(self._ids)
+
+    def get(self, fingerprint: Optional[bytes]) -> Optional[str]:
+        if fingerprint is None:
+            return None
+        return self._ids.get(fingerprint)
+
+    def add(self, fingerprint: bytes, shape_id: str) -> None:
+        self._ids[fingerprint] = shape_id
+
+    def add_shape(self, shape: Mapping[str, Any]) -> Optional[bytes]:
+        """Register ``shape`` under its fingerprint and return the fingerprint."""
+
+        fingerprint = shape_fingerprint(shape)
+        if fingerprint is not None:
+            self._ids[fingerprint] = shape["id"]
+        return fingerprint
@@ -0,0 +1,264 @@
+"""Uniform-grid spatial index over the bounding boxes of TriOrb shapes.
+
+The server-side counterpart of ``static/js/modules/spatialIndex.js``: both
+compute the same per-shape bounds (polygon points, rotated rectangle
+corners, circle extents) and answer point, box and radius queries, plus
+candidate overlap pairs, by looking only at the grid cells a query
+touches. Results are bounding-box level; exact containment is left to the
+caller, as the editor does for its own hit-tests.
+
+Usage::
+
+    python spatial_index.py document.sgexml [--point X Y] [--radius R] [--box X0 Y0 X1 Y1]
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass
+import json
+import math
+from pathlib import Path
+import sys
+from typing import Any, Dict, Iterable, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from polygon_offset import ring_array
+
+# 1 つの図形が登録されるセル数の上限。これを超える大きな図形は別のリストに置き、毎回まとめて判定する。
+MAX_CELLS_PER_SHAPE = 64
+# セル幅は図形の外接矩形の大きさの中央値にする（極端に小さい図形ばかりのときの下限）。
+MIN_CELL_SIZE = 1.0
+
+
+@dataclass(frozen=True)
+class Bounds:
+    """Axis-aligned bounding box of a shape and its farthest distance from the origin."""
+
+    min_x: float
+    min_y: float
+    max_x: float
+    max_y: float
+    reach: float
+
+    def to_dict(self) -> Dict[str, float]:
+        return {
+            "minX": self.min_x,
+            "minY": self.min_y,
+            "maxX": self.max_x,
+            "maxY": self.max_y,
+            "reach": self.reach,
+        }
+
+
+def _number(value: Any, fallback: float) -> float:
+    # parseNumeric(value, fallback) 相当。
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return fallback
+    return number if math.isfinite(number) else fallback
+
+
+def rectangle_corners(rectangle: Mapping[str, Any]) -> Optional[List[Tuple[float, float]]]:
+    """Corners as ``getRectangleCornerPoints`` in ``geometry.js`` returns them (rotated about the top left)."""
+    width = _number(rectangle.get("Width"), math.nan)
+    height = _number(rectangle.get("Height"), math.nan)
+    if not math.isfinite(width) or not math.isfinite(height) or width == 0 or height == 0:
+        return None
+    origin_x = _number(rectangle.get("OriginX"), 0.0)
+    origin_y = _number(rectangle.get("OriginY"), 0.0)
+    corners = [(origin_x, origin_y), (origin_x + width, origin_y), (origin_x + width, origin_y - height),
+               (origin_x, origin_y - height)]
+    rotation = math.radians(_number(rectangle.get("Rotation"), 0.0))
+    if rotation == 0:
+        return corners
+    cos, sin = math.cos(rotation), math.sin(rotation)
+    return [
+        (origin_x + (x - origin_x) * cos - (y - origin_y) * sin, origin_y + (x - origin_x) * sin + (y - origin_y) * cos)
+        for x, y in corners
+    ]
+
+
+def shape_bounds(shape: Mapping[str, Any]) -> Optional[Bounds]:
+    """Return the bounds of a ``triorb_shapes`` entry, or ``None`` when it has no usable geometry."""
+    shape_type = shape.get("type")
+    if shape_type == "Polygon" and isinstance(shape.get("polygon"), Mapping):
+        ring = ring_array(shape["polygon"].get("points") or [])
+        if not len(ring):
+            return None
+        low, high = ring.min(axis=0), ring.max(axis=0)
+        reach = float(np.sqrt((ring**2).sum(axis=1)).max())
+        return Bounds(float(low[0]), float(low[1]), float(high[0]), float(high[1]), reach)
+    if shape_type == "Rectangle" and isinstance(shape.get("rectangle"), Mapping):
+        corners = rectangle_corners(shape["rectangle"])
+        if corners is None:
+            return None
+        xs, ys = [x for x, _ in corners], [y for _, y in corners]
+        return Bounds(min(xs), min(ys), max(xs), max(ys), max(math.hypot(x, y) for x, y in corners))
+    if shape_type == "Circle" and isinstance(shape.get("circle"), Mapping):
+        circle = shape["circle"]
+        center_x = _number(circle.get("CenterX"), 0.0)
+        center_y = _number(circle.get("CenterY"), 0.0)
+        radius = max(0.0, _number(circle.get("Radius"), 0.0))
+        return Bounds(
+            center_x - radius, center_y - radius, center_x + radius, center_y + radius,
+            math.hypot(center_x, center_y) + radius,
+        )
+    return None
+
+
+def default_cell_size(extents: Iterable[float]) -> float:
+    """Median of the shapes' larger bounding-box side, so a typical shape spans one to four cells."""
+    values = sorted(extent for extent in extents if extent > 0)
+    if not values:
+        return MIN_CELL_SIZE
+    return max(MIN_CELL_SIZE, values[len(values) // 2])
+
+
+class ShapeSpatialIndex:
+    """Grid of shape bounding boxes supporting point, box and radius queries."""
+
+    def __init__(self, shapes: Sequence[Mapping[str, Any]] = (), cell_size: Optional[float] = None) -> None:
+        self.ids: List[Any] = []
+        self._bounds: List[Bounds] = []
+        for shape in shapes:
+            bounds = shape_bounds(shape)
+            if bounds is not None:
+                self.ids.append(shape.get("id"))
+                self._bounds.append(bounds)
+        self._boxes = np.array(
+            [(b.min_x, b.min_y, b.max_x, b.max_y) for b in self._bounds], dtype=np.float64
+        ).reshape(-1, 4)
+        self._slots = {shape_id: slot for slot, shape_id in enumerate(self.ids)}
+        if cell_size is None:
+            cell_size = default_cell_size(max(b.max_x - b.min_x, b.max_y - b.min_y) for b in self._bounds)
+        if not cell_size > 0:
+            raise ValueError("cell_size must be positive")
+        self.cell_size = float(cell_size)
+        self._cells: Dict[Tuple[int, int], List[int]] = {}
+        self._large: List[int] = []
+        for slot, bounds in enumerate(self._bounds):
+            x0, y0, x1, y1 = self._cell_range(bounds.min_x, bounds.min_y, bounds.max_x, bounds.max_y)
+            if (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_CELLS_PER_SHAPE:
+                self._large.append(slot)
+                continue
+            for cx in range(x0, x1 + 1):
+                for cy in range(y0, y1 + 1):
+                    self._cells.setdefault((cx, cy), []).append(slot)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def bounds(self, shape_id: Any) -> Optional[Bounds]:
+        slot = self._slots.get(shape_id)
+        return None if slot is None else self._bounds[slot]
+
+    def _cell_range(self, min_x: float, min_y: float, max_x: float, max_y: float) -> Tuple[int, int, int, int]:
+        size = self.cell_size
+        return (
+            math.floor(min_x / size),
+            math.floor(min_y / size),
+            math.floor(max_x / size),
+            math.floor(max_y / size),
+        )
+
+    def _candidates(self, min_x: float, min_y: float, max_x: float, max_y: float) -> np.ndarray:
+        x0, y0, x1, y1 = self._cell_range(min_x, min_y, max_x, max_y)
+        if (x1 - x0 + 1) * (y1 - y0 + 1) >= len(self._cells):
+            # 問い合わせがセルの総数より広いときは全件をまとめて判定するほうが速い。
+            return np.arange(len(self.ids))
+        found = set(self._large)
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                found.update(self._cells.get((cx, cy), ()))
+        return np.fromiter(sorted(found), dtype=np.intp, count=len(found))
+
+    def _box_slots(self, min_x: float, min_y: float, max_x: float, max_y: float) -> np.ndarray:
+        if not len(self.ids) or min_x > max_x or min_y > max_y:
+            return np.empty(0, dtype=np.intp)
+        slots = self._candidates(min_x, min_y, max_x, max_y)
+        boxes = self._boxes[slots]
+        hit = (boxes[:, 0] <= max_x) & (boxes[:, 2] >= min_x) & (boxes[:, 1] <= max_y) & (boxes[:, 3] >= min_y)
+        return slots[hit]
+
+    def query_box(self, min_x: float, min_y: float, max_x: float, max_y: float) -> List[Any]:
+        """IDs of shapes whose bounding box intersects the box, in shape order."""
+        return [self.ids[slot] for slot in self._box_slots(min_x, min_y, max_x, max_y)]
+
+    def query_point(self, x: float, y: float, tolerance: float = 0.0) -> List[Any]:
+        """IDs of shapes whose bounding box contains the point (grown by ``tolerance``)."""
+        return self.query_box(x - tolerance, y - tolerance, x + tolerance, y + tolerance)
+
+    def query_radius(self, x: float, y: float, radius: float) -> List[Any]:
+        """IDs of shapes whose bounding box comes within ``radius`` of the point."""
+        slots = self._box_slots(x - radius, y - radius, x + radius, y + radius)
+        boxes = self._boxes[slots]
+        dx = np.maximum(np.maximum(boxes[:, 0] - x, x - boxes[:, 2]), 0.0)
+        dy = np.maximum(np.maximum(boxes[:, 1] - y, y - boxes[:, 3]), 0.0)
+        return [self.ids[slot] for slot in slots[dx * dx + dy * dy <= radius * radius]]
+
+    def candidate_pairs(self) -> List[Tuple[Any, Any]]:
+        """Pairs of shapes whose bounding boxes intersect (overlap candidates), in shape order."""
+        pairs = set()
+        for members in self._cells.values():
+            for index, first in enumerate(members):
+                for second in members[index + 1:]:
+                    pairs.add((first, second) if first < second else (second, first))
+        for slot in self._large:
+            b = self._boxes[slot]
+            others = np.nonzero(
+                (self._boxes[:, 0] <= b[2]) & (self._boxes[:, 2] >= b[0])
+                & (self._boxes[:, 1] <= b[3]) & (self._boxes[:, 3] >= b[1])
+            )[0]
+            pairs.update((min(slot, other), max(slot, other)) for other in others.tolist() if other != slot)
+        result = []
+        for first, second in sorted(pairs):
+            a, b = self._boxes[first], self._boxes[second]
+            if a[0] <= b[2] and a[2] >= b[0] and a[1] <= b[3] and a[3] >= b[1]:
+                result.append((self.ids[first], self.ids[second]))
+        return result
+
+    def max_reach(self, shape_ids: Optional[Iterable[Any]] = None) -> float:
+        """Farthest distance from the origin over the given shapes (all shapes by default)."""
+        if shape_ids is None:
+            return max((bounds.reach for bounds in self._bounds), default=0.0)
+        reach = 0.0
+        for shape_id in shape_ids:
+            slot = self._slots.get(shape_id)
+            if slot is not None and self._bounds[slot].reach > reach:
+                reach = self._bounds[slot].reach
+        return reach
+
+
+def main_cli(argv: List[str] | None = None) -> int:
+    import main
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("document", type=Path)
+    parser.add_argument("--point", type=float, nargs=2, metavar=("X", "Y"))
+    parser.add_argument("--radius", type=float, default=0.0, help="with --point: search radius in mm")
+    parser.add_argument("--box", type=float, nargs=4, metavar=("X0", "Y0", "X1", "Y1"))
+    parser.add_argument("--pairs", action="store_true", help="list shapes with overlapping bounding boxes")
+    args = parser.parse_args(argv)
+
+    document = main.SgexmlDocument.load(args.document)
+    if not document.is_loaded:
+        print(f"{args.document}: not a well-formed XML document", file=sys.stderr)
+        return 1
+    payload = main.build_index_payload(document)
+    index = ShapeSpatialIndex(payload["triorb_shapes"])
+    result: Dict[str, Any] = {"shapes": len(index), "cellSize": index.cell_size, "reach": index.max_reach()}
+    if args.point:
+        result["point"] = index.query_radius(args.point[0], args.point[1], args.radius)
+    if args.box:
+        result["box"] = index.query_box(*args.box)
+    if args.pairs:
+        result["pairs"] = index.candidate_pairs()
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
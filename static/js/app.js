@@ -22,6 +22,11 @@ import {
   sanitizeLoadedShapeName,
   setPolygonTypeValue,
 } from "./modules/triorbData.js";
+import { offsetPolygon, signedArea } from "./modules/polygonOffset.js";
+import { DEFAULT_SVG_TOLERANCE, pathDataToPolygons } from "./modules/svgPath.js";
+import { isShapeExchangeFileName, parseShapeExchange } from "./modules/shapeExchange.js";
+import { ShapeSpatialIndex } from "./modules/spatialIndex.js";
+import { createStageTimer, renderTimingPanel } from "./modules/timing.js";
 
 document.addEventListener("DOMContentLoaded", () => {
         const bootstrapData = window.appBootstrapData || {};
@@ -206,6 +211,8 @@ document.addEventListener("DOMContentLoaded", () => {
         const statusText = document.getElementById("status-text");
         const fileInput = document.getElementById("file-input");
         const svgFileInput = document.getElementById("svg-file-input");
+        const diffFileInput = document.getElementById("diff-file-input");
+        const clearDiffBtn = document.getElementById("btn-clear-diff");
         const plotWrapper = document.querySelector(".plot-wrapper");
         const scanPlanesContainer = document.getElementById("scanplanes-editor");
         const addScanPlaneBtn = document.getElementById("btn-add-scanplane");
@@ -215,6 +222,10 @@ document.addEventListener("DOMContentLoaded", () => {
         const fieldsetGlobalContainer = document.getElementById("fieldset-global");
         const addFieldsetBtn = document.getElementById("btn-add-fieldset");
         const casetableConfigurationContainer = document.getElementById("casetable-configuration");
+        const fieldsetPlaneSelectorRow = document.getElementById("fieldset-plane-selector");
+        const fieldsetPlaneSelect = document.getElementById("fieldset-plane-select");
+        const casetableSelectorRow = document.getElementById("casetable-selector");
+        const casetableSelect = document.getElementById("casetable-select");
         const casetableFieldsConfigurationContainer = document.getElementById(
           "casetable-fields-configuration"
         );
@@ -317,6 +328,7 @@ document.addEventListener("DOMContentLoaded", () => {
         const bulkStaticNumberInput = document.getElementById("bulk-static-number");
         const bulkStaticValueSelect = document.getElementById("bulk-static-value");
         const bulkShapeOutsetInput = document.getElementById("bulk-shape-outset");
+        const bulkShapeJoinSelect = document.getElementById("bulk-shape-join");
         const bulkShapeMoveXInput = document.getElementById("bulk-shape-move-x");
         const bulkShapeMoveYInput = document.getElementById("bulk-shape-move-y");
         const svgImportModal = document.getElementById("svg-import-modal");
@@ -369,6 +381,7 @@ document.addEventListener("DOMContentLoaded", () => {
         const replicateWidthSineGainInput = document.getElementById("replicate-width-sine-gain");
         const replicateHeightSineGainInput = document.getElementById("replicate-height-sine-gain");
         const replicateScalePercentInput = document.getElementById("replicate-scale-percent");
+        const replicateOutsetStepInput = document.getElementById("replicate-outset-step");
         const replicateIncludeCutoutsInput = document.getElementById("replicate-include-cutouts");
         const replicatePreserveOrientationInput = document.getElementById(
           "replicate-preserve-orientation"
@@ -385,6 +398,8 @@ document.addEventListener("DOMContentLoaded", () => {
         const fieldTypeLabels = ["ProtectiveSafeBlanking", "WarningSafeBlanking"];
         const defaultFieldNames = ["Protective", "Warning"];
         const triOrbStateSnapshotVersion = 1;
+        // Save (TriOrb) は CompressionStream があれば StateSnapshot を zlib 形式の deflate で圧縮する。
+        const triOrbStateSnapshotEncoding = "deflate+base64";
         const createRectOriginXInput = document.getElementById("create-rect-originx");
         const createRectOriginYInput = document.getElementById("create-rect-originy");
         const createRectWidthInput = document.getElementById("create-rect-width");
@@ -398,6 +413,26 @@ document.addEventListener("DOMContentLoaded", () => {
         const newPlotBtn = document.getElementById("btn-new");
         const originTrace = findOriginTrace(defaultFigure);
 
+        // 既定 Fieldset の生成時にもキャッシュ無効化が走るため、状態の初期化より前に宣言する。
+        const plotTraceCache = {
+          baseFigure: { version: -1, traces: [] },
+          deviceOverlay: { version: -1, traces: [] },
+          triOrbShapes: { version: -1, traces: [] },
+          fieldsets: { version: -1, traces: [] },
+        };
+        let baseFigureVersion = 0;
+        let deviceOverlayVersion = 0;
+        let triOrbShapeTraceVersion = 0;
+        let fieldsetTraceVersion = 0;
+        // UserFieldId ⇔ Fieldset / Field / Shape の対応表。Case / Eval の描画で毎回 Fieldset を
+        // 走査しないよう、Fieldset・Shape・ScanPlane の変更で版を上げて次の参照時に作り直す。
+        let userFieldReferenceVersion = 0;
+        let userFieldReferenceCache = null;
+        // TriOrb Shape の外接矩形グリッド。rebuildTriOrbShapeRegistry で作り直し、
+        // それ以外の Shape の変更は triOrbShapeTraceVersion を見て次の問い合わせで作り直す。
+        const triOrbShapeSpatialIndex = new ShapeSpatialIndex();
+        let triOrbShapeSpatialIndexVersion = -1;
+
         let currentFigure = cloneFigure(defaultFigure);
         let scanPlanes = initializeScanPlanes(initialScanPlanes);
         let triorbShapes = initializeTriOrbShapes(initialTriOrbShapes);
@@ -408,12 +443,23 @@ document.addEventListener("DOMContentLoaded", () => {
         const triOrbShapeCardCache = new Map();
         let triOrbShapesListInitialized = false;
         let pendingSvgImportContext = null;
+        // ファイル読み込み等で状態が置き換わったら、遅れて届いた初期セクションは破棄する。
+        let documentLoadToken = 0;
+        // 遅延取得でジオメトリを Casetable より先に適用したときの、Fieldset ペイロード上の UserFieldId。
+        let bootstrapPayloadUserFieldIds = null;
         let triorbSource = bootstrapData.triorbSource || "";
         let fieldsets = initializeFieldsets(initialFieldsets);
         let fieldsetDevices = initializeFieldsetDevices(initialFieldsetDevices, {
           supplementDefaults: true,
         });
         let fieldsetGlobalGeometry = initializeGlobalGeometry(initialFieldsetGlobal);
+        // 文書内の全 ScanPlane（Export_FieldsetsAndFields）。編集中のものだけが上の fieldset* 変数に
+        // 展開され、それ以外は選択されたときに payload / DOM ノード / API から変換する。
+        let fieldsetPlaneCatalog = createFieldsetPlaneCatalog(bootstrapData.fieldsetPlanes, {
+          payloads: bootstrapData.fieldsetPlanePayloads,
+          url: bootstrapData.documentApi?.fieldsetPlanes,
+        });
+        let activeFieldsetPlaneKey = defaultFieldsetPlaneKey(fieldsetPlaneCatalog);
         const casetableCasesLimit = 128;
         const casetableEvalsLimit = 5;
         const casetableConfigurationStaticInputsCount = 8;
@@ -443,12 +489,20 @@ document.addEventListener("DOMContentLoaded", () => {
           { tag: "PermGreen", id: "60", label: "PermGreen" },
           { tag: "PermGreenWf", id: "61", label: "PermGreenWf" },
         ];
+        assignBootstrapUserFieldIds(casetablePayload?.fields_configuration);
         let casetableEvals = normalizeCasetableEvals(
           casetablePayload?.evals,
           casetableCases.length
         );
         let casetableFieldsConfiguration = null;
         let caseToggleStates = casetableCases.map(() => false);
+        // 文書内の全 Casetable。表示中のものだけが上の casetable* 変数に展開され、
+        // それ以外は選択されたときに payload / DOM ノード / API から変換する。
+        let casetableCatalog = createCasetableCatalog(bootstrapData.casetables, {
+          payloads: bootstrapData.casetablePayloads,
+          url: bootstrapData.documentApi?.casetables,
+        });
+        let activeCasetableKey = defaultCasetableKey(casetableCatalog);
         let caseFieldAssignments = [];
         globalMultipleSampling = deriveInitialMultipleSampling(fieldsets);
         let legendVisible = true;
@@ -457,6 +511,19 @@ document.addEventListener("DOMContentLoaded", () => {
         if (debugMode) {
           document.body.classList.add("debug-mode");
         }
+        const timingPanel = document.getElementById("debug-timing-panel");
+        let timingPanelFrame = 0;
+        const stageTimer = createStageTimer({
+          enabled: debugMode,
+          onUpdate: () => {
+            // 描画ごとに表を作り直さないよう、次のフレームでまとめて更新する。
+            if (timingPanelFrame) return;
+            timingPanelFrame = requestAnimationFrame(() => {
+              timingPanelFrame = 0;
+              renderTimingPanel(timingPanel, stageTimer);
+            });
+          },
+        });
         let globalResolution = parseNumeric(globalResolutionInput?.value, 70);
         let globalTolerancePositive = parseNumeric(globalTolerancePositiveInput?.value, 0);
         let globalToleranceNegative = parseNumeric(globalToleranceNegativeInput?.value, 0);
@@ -508,6 +575,7 @@ document.addEventListener("DOMContentLoaded", () => {
           widthSineGain: 0,
           heightSineGain: 0,
           scalePercent: 0,
+          outsetStep: 0,
           casePrefix: "",
           includeCutouts: false,
           preserveOrientation: false,
@@ -523,16 +591,8 @@ document.addEventListener("DOMContentLoaded", () => {
           lastShapeIndex: null,
         };
         let replicatePreviewState = null;
-        const plotTraceCache = {
-          baseFigure: { version: -1, traces: [] },
-          deviceOverlay: { version: -1, traces: [] },
-          triOrbShapes: { version: -1, traces: [] },
-          fieldsets: { version: -1, traces: [] },
-        };
-        let baseFigureVersion = 0;
-        let deviceOverlayVersion = 0;
-        let triOrbShapeTraceVersion = 0;
-        let fieldsetTraceVersion = 0;
+        // /api/diff の結果。表示中は追加・削除・変更された図形を図面に重ねる。
+        let documentDiffOverlay = null;
         invalidateBaseFigureTraces();
 
         rebuildTriOrbShapeRegistry();
@@ -543,6 +603,8 @@ document.addEventListener("DOMContentLoaded", () => {
         renderFieldsetCheckboxes();
         renderTriOrbShapes();
         renderTriOrbShapeCheckboxes();
+        renderFieldsetPlaneSelector();
+        renderCasetableSelector();
         renderCasetableConfiguration();
         renderCasetableCases();
         renderCasetableFieldsConfiguration();
@@ -607,19 +669,26 @@ document.addEventListener("DOMContentLoaded", () => {
 
         function encodeBase64Unicode(value) {
           const encoder = new TextEncoder();
-          const bytes = encoder.encode(String(value ?? ""));
-          let binary = "";
-          bytes.forEach((byte) => {
-            binary += String.fromCharCode(byte);
-          });
-          return btoa(binary);
+          return encodeBase64Bytes(encoder.encode(String(value ?? "")));
+        }
+
+        function encodeBase64Bytes(bytes) {
+          // 1 文字ずつ連結せず、引数の上限に収まる塊ごとに文字列化する。
+          const chunks = [];
+          for (let offset = 0; offset < bytes.length; offset += 0x8000) {
+            chunks.push(String.fromCharCode.apply(null, bytes.subarray(offset, offset + 0x8000)));
+          }
+          return btoa(chunks.join(""));
         }
 
         function decodeBase64Unicode(value) {
-          const binary = atob(String(value ?? ""));
-          const bytes = Uint8Array.from(binary, (char) => char.charCodeAt(0));
           const decoder = new TextDecoder();
-          return decoder.decode(bytes);
+          return decoder.decode(decodeBase64Bytes(value));
+        }
+
+        function decodeBase64Bytes(value) {
+          const binary = atob(String(value ?? ""));
+          return Uint8Array.from(binary, (char) => char.charCodeAt(0));
         }
 
         function clampValue(value, min, max) {
@@ -766,8 +835,13 @@ document.addEventListener("DOMContentLoaded", () => {
           deviceOverlayVersion += 1;
         }
 
+        function invalidateUserFieldReferences() {
+          userFieldReferenceVersion += 1;
+        }
+
         function invalidateFieldsetTraces({ skipDeviceCache = false } = {}) {
           fieldsetTraceVersion += 1;
+          invalidateUserFieldReferences();
           if (!skipDeviceCache) {
             invalidateDeviceTraceCache();
           }
@@ -778,6 +852,14 @@ document.addEventListener("DOMContentLoaded", () => {
           invalidateFieldsetTraces({ skipDeviceCache: true });
         }
 
+        function resolveTriOrbShapeSpatialIndex() {
+          if (triOrbShapeSpatialIndexVersion !== triOrbShapeTraceVersion) {
+            triOrbShapeSpatialIndex.rebuild(triorbShapes);
+            triOrbShapeSpatialIndexVersion = triOrbShapeTraceVersion;
+          }
+          return triOrbShapeSpatialIndex;
+        }
+
         function buildBaseFigureTraces() {
           return (currentFigure.data || []).map((trace, index) => {
             const copy = { ...trace };
@@ -824,6 +906,10 @@ document.addEventListener("DOMContentLoaded", () => {
         }
 
         function renderFigure() {
+          stageTimer.measure("renderFigure", renderFigureNow);
+        }
+
+        function renderFigureNow() {
           syncPlotSize();
           const baseData = resolveBaseFigureTraces();
           const deviceTraces = resolveDeviceOverlayTraces();
@@ -833,6 +919,7 @@ document.addEventListener("DOMContentLoaded", () => {
           const fieldModalPreviewTraces = buildFieldModalPreviewTraces();
           const replicatePreviewTraces = buildReplicatePreviewTraces();
           const bulkEditPreviewTraces = buildBulkEditPreviewTraces();
+          const diffOverlayTraces = buildDocumentDiffOverlayTraces();
           const layout = {
             ...(currentFigure.layout || {}),
             uirevision: `${baseFigureVersion}:${triOrbShapeTraceVersion}:${fieldsetTraceVersion}:${deviceOverlayVersion}`,
@@ -886,6 +973,9 @@ document.addEventListener("DOMContentLoaded", () => {
           if (bulkEditPreviewTraces.length) {
             combinedTraces.push(...bulkEditPreviewTraces);
           }
+          if (diffOverlayTraces.length) {
+            combinedTraces.push(...diffOverlayTraces);
+          }
           Plotly.react(plotNode, combinedTraces, layout, figureConfig);
         }
 
@@ -1050,6 +1140,7 @@ document.addEventListener("DOMContentLoaded", () => {
             const moveY = parseNumeric(bulkShapeMoveYInput?.value, 0) || 0;
             return {
               delta,
+              join: bulkShapeJoinSelect?.value || "miter",
               offsetX: moveX,
               offsetY: moveY,
             };
@@ -1120,12 +1211,76 @@ document.addEventListener("DOMContentLoaded", () => {
           return trace;
         }
 
+        function buildDocumentDiffOverlayTraces() {
+          const shapes = documentDiffOverlay?.shapes;
+          if (!shapes) {
+            return [];
+          }
+          const colorSets = {
+            added: { stroke: "rgba(22, 163, 74, 0.95)", fill: withAlpha("#16a34a", 0.12) },
+            removed: { stroke: "rgba(220, 38, 38, 0.95)", fill: withAlpha("#dc2626", 0.06) },
+            changed: { stroke: "rgba(234, 88, 12, 0.95)", fill: withAlpha("#ea580c", 0.1) },
+            previous: { stroke: "rgba(100, 116, 139, 0.9)", fill: withAlpha("#64748b", 0.04) },
+          };
+          const traces = [];
+          const pushTrace = (shape, colorSet, label, options) => {
+            const trace = buildBulkShapePreviewTrace(shape, colorSet, label, options);
+            if (trace) {
+              traces.push(trace);
+            }
+          };
+          (shapes.added || []).forEach((shape) => {
+            pushTrace(shape, colorSets.added, `${shape.name || shape.id} (追加)`);
+          });
+          (shapes.removed || []).forEach((shape) => {
+            pushTrace(shape, colorSets.removed, `${shape.name || shape.id} (削除)`, { lineDash: "dash" });
+          });
+          (shapes.changed || []).forEach((entry) => {
+            const label = entry.name || entry.id;
+            pushTrace(entry.previous, colorSets.previous, `${label} (変更前)`, { lineDash: "dot" });
+            pushTrace(entry.shape, colorSets.changed, `${label} (変更後)`);
+          });
+          return traces;
+        }
+
+        function describeDocumentDiff(diff) {
+          const parts = Object.entries(diff?.summary || {}).map(
+            ([section, counts]) => `${section} +${counts.added} -${counts.removed} ~${counts.changed}`
+          );
+          return parts.join(", ");
+        }
+
+        function setDocumentDiffOverlay(diff) {
+          documentDiffOverlay = diff || null;
+          if (clearDiffBtn) {
+            clearDiffBtn.hidden = !documentDiffOverlay;
+          }
+          renderFigure();
+        }
+
+        async function compareWithFile(file) {
+          // 表示中の状態を TriOrb 形式で書き出して base とし、選んだファイルとの差分をサーバーで求める。
+          const api = bootstrapData.uploadApi;
+          if (!api?.diff) {
+            throw new Error("Compare requires the server.");
+          }
+          const form = new FormData();
+          form.append("base", new Blob([buildTriOrbXml()], { type: "application/xml" }), "current.sgexml");
+          form.append("file", file, file.name || "revision.sgexml");
+          const response = await fetch(api.diff, { method: "POST", body: form });
+          const body = await response.json().catch(() => ({}));
+          if (!response.ok) {
+            throw new Error(body.error || `Compare failed (${response.status})`);
+          }
+          return body;
+        }
+
         function buildBulkEditPreviewTraces() {
           if (!bulkEditState.selectedShapes.size) {
             return [];
           }
           syncBulkEditSelections();
-          const { delta, offsetX, offsetY } = resolveBulkShapeTransform();
+          const { delta, join, offsetX, offsetY } = resolveBulkShapeTransform();
           const colorSets = {
             selected: {
               stroke: "rgba(14, 165, 233, 0.9)",
@@ -1155,7 +1310,7 @@ document.addEventListener("DOMContentLoaded", () => {
             const previewShape = cloneTriOrbShape(shape);
             let previewChanged = false;
             if (delta !== 0) {
-              previewChanged = applyShapeInsetOutset(previewShape, delta) || previewChanged;
+              previewChanged = applyShapeInsetOutset(previewShape, delta, join) || previewChanged;
             }
             if (offsetX || offsetY) {
               applyReplicationTransform(previewShape, { offsetX, offsetY });
@@ -1295,11 +1450,17 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
 
         function calculateVisibleFieldsetRadius() {
           let maxDistance = 0;
+          // 参照している TriOrb Shape は点を読み直さず、空間インデックスの最遠距離を使う。
+          const shapeIndex = resolveTriOrbShapeSpatialIndex();
           fieldsets.forEach((fieldset) => {
             if (fieldset.visible === false) {
               return;
             }
             (fieldset.fields || []).forEach((field) => {
+              maxDistance = Math.max(
+                maxDistance,
+                shapeIndex.maxReach(normalizeFieldShapeRefs(field).map((ref) => ref.shapeId))
+              );
               (field.polygons || []).forEach((polygon) => {
                 (polygon.points || []).forEach((point) => {
                   const x = parseNumeric(point.X, 0);
@@ -2318,6 +2479,11 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
               ? Number(transform.heightSineGain)
               : 0;
           const rotationRadians = hasRotation ? degreesToRadians(rotation) : 0;
+          // Outset / Inset は移動・回転・拡縮の前の形状に対して行う。
+          const delta = Number(transform.delta) || 0;
+          if (delta !== 0) {
+            applyShapeInsetOutset(shape, delta, transform.join);
+          }
           if (!offsetX && !offsetY && !hasRotation && !hasScale) {
             return;
           }
@@ -2421,38 +2587,26 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           }
         }
 
-        function offsetPolygonPoints(points, delta) {
-          if (!Array.isArray(points) || !points.length || delta === 0) {
+        function offsetPolygonPoints(points, delta, join = "miter") {
+          if (!Array.isArray(points) || points.length < 3 || delta === 0) {
             return null;
           }
-          const numericPoints = points.map((point) => ({
-            x: parseNumeric(point.X, 0),
-            y: parseNumeric(point.Y, 0),
-          }));
-          const centroid = computePointCentroid(numericPoints);
-          if (!centroid) {
+          // 1 つの Polygon では穴や複数領域を表せないため、最大の外周を採る
+          // （polygon_offset.offset_shapes と同じ）。縮めて消えた場合は変更しない。
+          const rings = offsetPolygon(points, delta, { join });
+          if (!rings.length) {
             return null;
           }
-          return numericPoints.map((point) => {
-            const deltaX = point.x - centroid.x;
-            const deltaY = point.y - centroid.y;
-            const adjustAxis = (component) => {
-              if (!Number.isFinite(component)) {
-                return 0;
-              }
-              const magnitude = Math.abs(component);
-              const nextMagnitude = Math.max(0, magnitude + delta);
-              const sign = component >= 0 ? 1 : -1;
-              return sign * nextMagnitude;
-            };
-            return {
-              X: formatReplicateNumber(centroid.x + adjustAxis(deltaX)),
-              Y: formatReplicateNumber(centroid.y + adjustAxis(deltaY)),
-            };
-          });
+          const largest = rings.reduce((best, ring) =>
+            Math.abs(signedArea(ring)) > Math.abs(signedArea(best)) ? ring : best
+          );
+          return largest.map(([x, y]) => ({
+            X: formatReplicateNumber(x),
+            Y: formatReplicateNumber(y),
+          }));
         }
 
-        function applyShapeInsetOutset(shape, delta) {
+        function applyShapeInsetOutset(shape, delta, join = "miter") {
           if (!shape || delta === 0) {
             return false;
           }
@@ -2484,7 +2638,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
             return true;
           }
           if (shape.type === "Polygon" && shape.polygon) {
-            const adjustedPoints = offsetPolygonPoints(shape.polygon.points || [], delta);
+            const adjustedPoints = offsetPolygonPoints(shape.polygon.points || [], delta, join);
             if (adjustedPoints) {
               shape.polygon.points = adjustedPoints;
               return true;
@@ -2584,18 +2738,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           if (!shapeId) {
             return "";
           }
-          const userFieldDefinitions = collectUserFieldDefinitions();
-          for (const entry of userFieldDefinitions) {
-            const shapeRefs = Array.isArray(entry.field?.shapeRefs)
-              ? entry.field.shapeRefs
-              : [];
-            if (
-              shapeRefs.some((ref) => ref?.shapeId && String(ref.shapeId) === String(shapeId))
-            ) {
-              return entry.id;
-            }
-          }
-          return "";
+          return resolveUserFieldReferences().idByShapeId.get(String(shapeId)) || "";
         }
 
         function getFieldsetIndexesForCase(caseIndex) {
@@ -3482,6 +3625,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
               offsetY = 0,
               rotation = 0,
               scalePercent = 0,
+              outsetStep = 0,
               includeCutouts = false,
               preserveOrientation = false,
             } = replicatePreviewState;
@@ -3509,6 +3653,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
                 widthSineGain: replicatePreviewState.widthSineGain,
                 heightSineGain: replicatePreviewState.heightSineGain,
                 scale: computeReplicationScale(scalePercent, step),
+                delta: outsetStep * step,
                 preserveOrientation,
               };
                   const copyLabel = `${caseName} / ${fieldsetName} (Copy ${step})`;
@@ -3537,6 +3682,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
             offsetY,
             rotation,
             scalePercent,
+            outsetStep = 0,
             includeCutouts,
             preserveOrientation = false,
           } = replicatePreviewState;
@@ -3557,6 +3703,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
               widthSineGain: replicatePreviewState.widthSineGain,
               heightSineGain: replicatePreviewState.heightSineGain,
               scale: computeReplicationScale(scalePercent, step),
+              delta: outsetStep * step,
               preserveOrientation,
             };
             const copyLabel = `${fieldsetName} (Copy ${step})`;
@@ -3929,6 +4076,9 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           if (replicateScalePercentInput) {
             replicateScalePercentInput.value = replicateFormState.scalePercent ?? 0;
           }
+          if (replicateOutsetStepInput) {
+            replicateOutsetStepInput.value = replicateFormState.outsetStep ?? 0;
+          }
           if (replicateIncludeCutoutsInput) {
             replicateIncludeCutoutsInput.checked = Boolean(
               replicateFormState.includeCutouts
@@ -4030,6 +4180,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           const widthSineGain = preserveOrientation ? rawWidthSineGain : 0;
           const heightSineGain = preserveOrientation ? rawHeightSineGain : 0;
           const scalePercent = parseNumeric(replicateScalePercentInput?.value, 0) || 0;
+          const outsetStep = parseNumeric(replicateOutsetStepInput?.value, 0) || 0;
           const includeCutouts = Boolean(replicateIncludeCutoutsInput?.checked);
           const prefixInput = replicateCasePrefixInput?.value?.trim();
           const casePrefix = prefixInput || resolveReplicatePrefixFallback();
@@ -4044,6 +4195,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           replicateFormState.widthSineGain = widthSineGain;
           replicateFormState.heightSineGain = heightSineGain;
           replicateFormState.scalePercent = scalePercent;
+          replicateFormState.outsetStep = outsetStep;
           replicateFormState.casePrefix = casePrefix;
           replicateFormState.includeCutouts = includeCutouts;
           replicateFormState.preserveOrientation = preserveOrientation;
@@ -4060,6 +4212,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
               widthSineGain,
               heightSineGain,
               scale: computeReplicationScale(scalePercent, step),
+              delta: outsetStep * step,
               preserveOrientation,
             };
             const nextFieldsetIndex = baseFieldsetCount + createdFieldsets.length + 1;
@@ -4148,6 +4301,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
             parseNumeric(replicateEllipseRatioInput?.value, 1) || 1
           );
           const scalePercent = parseNumeric(replicateScalePercentInput?.value, 0) || 0;
+          const outsetStep = parseNumeric(replicateOutsetStepInput?.value, 0) || 0;
           const includeCutouts = Boolean(replicateIncludeCutoutsInput?.checked);
           const preserveOrientation = Boolean(replicatePreserveOrientationInput?.checked);
           const rawWidthSineGain = parseNumeric(replicateWidthSineGainInput?.value, 0) || 0;
@@ -4177,6 +4331,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           replicateFormState.widthSineGain = widthSineGain;
           replicateFormState.heightSineGain = heightSineGain;
           replicateFormState.scalePercent = scalePercent;
+          replicateFormState.outsetStep = outsetStep;
           replicateFormState.includeCutouts = includeCutouts;
           replicateFormState.preserveOrientation = preserveOrientation;
           replicateFormState.autoStaticInputs = autoStaticInputs;
@@ -4234,6 +4389,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
                 widthSineGain,
                 heightSineGain,
                 scale: computeReplicationScale(scalePercent, step),
+                delta: outsetStep * step,
                 preserveOrientation,
               };
               const replicatedFieldsetsForCase = [];
@@ -4392,6 +4548,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
             parseNumeric(replicateEllipseRatioInput?.value, 1) || 1
           );
           const scalePercent = parseNumeric(replicateScalePercentInput?.value, 0) || 0;
+          const outsetStep = parseNumeric(replicateOutsetStepInput?.value, 0) || 0;
           const includeCutouts = Boolean(replicateIncludeCutoutsInput?.checked);
           const preserveOrientation = Boolean(replicatePreserveOrientationInput?.checked);
           const widthSineGain = parseNumeric(replicateWidthSineGainInput?.value, 0) || 0;
@@ -4421,6 +4578,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
               widthSineGain: effectiveWidthSineGain,
               heightSineGain: effectiveHeightSineGain,
               scalePercent,
+              outsetStep,
               includeCutouts,
               preserveOrientation,
               autoStaticInputs: Boolean(replicateStaticInputsAutoInput?.checked),
@@ -4457,6 +4615,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
             widthSineGain: effectiveWidthSineGain,
             heightSineGain: effectiveHeightSineGain,
             scalePercent,
+            outsetStep,
             includeCutouts,
             preserveOrientation,
           };
@@ -4510,6 +4669,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           rebuildTriOrbShapeLookup();
           triorbShapes.forEach((shape, index) => registerTriOrbShapeInRegistry(shape, index));
           invalidateTriOrbShapeCaches();
+          resolveTriOrbShapeSpatialIndex();
         }
 
         function ensureTriOrbShapeFromGeometry(shapeType, attrs = {}, points = [], context = {}) {
@@ -5526,22 +5686,51 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           };
         }
 
-        function captureTriOrbStateSnapshot() {
+        function captureTriOrbStateSnapshot({ clone = true } = {}) {
+          // clone: false はすぐに JSON.stringify する保存用。状態を複製せず、そのまま参照する。
+          const copy = clone ? (value) => JSON.parse(JSON.stringify(value)) : (value) => value;
           return {
             version: triOrbStateSnapshotVersion,
             rootAttributes: { ...(rootAttributes || {}) },
             fileInfo: captureFileInfoValues(),
-            scanPlanes: JSON.parse(JSON.stringify(scanPlanes || [])),
-            triorbShapes: JSON.parse(JSON.stringify(triorbShapes || [])),
+            scanPlanes: copy(scanPlanes || []),
+            triorbShapes: copy(triorbShapes || []),
             triorbSource: triorbSource || "TriOrb",
-            fieldsets: JSON.parse(JSON.stringify(fieldsets || [])),
-            fieldsetDevices: JSON.parse(JSON.stringify(fieldsetDevices || [])),
-            fieldsetGlobalGeometry: JSON.parse(JSON.stringify(fieldsetGlobalGeometry || {})),
+            fieldsets: copy(fieldsets || []),
+            fieldsetDevices: copy(fieldsetDevices || []),
+            fieldsetGlobalGeometry: copy(fieldsetGlobalGeometry || {}),
+            ...(fieldsetPlaneCatalog.length > 1
+              ? {
+                  activeFieldsetPlaneKey,
+                  fieldsetPlanes: fieldsetPlaneCatalog.map((entry) => ({
+                    key: entry.key,
+                    fieldsets: entry.fieldsets,
+                    state:
+                      entry.key === activeFieldsetPlaneKey
+                        ? null
+                        : copy(fieldsetPlaneStateFor(entry) || null),
+                  })),
+                }
+              : {}),
             casetableAttributes: cloneAttributes(casetableAttributes || {}),
             casetableConfiguration: cloneGenericNode(casetableConfiguration),
-            casetableCases: JSON.parse(JSON.stringify(casetableCases || [])),
-            casetableLayout: JSON.parse(JSON.stringify(casetableLayout || [])),
-            casetableEvals: JSON.parse(JSON.stringify(casetableEvals || null)),
+            casetableCases: copy(casetableCases || []),
+            casetableLayout: copy(casetableLayout || []),
+            casetableEvals: copy(casetableEvals || null),
+            ...(casetableCatalog.length > 1
+              ? {
+                  activeCasetableKey,
+                  casetables: casetableCatalog.map((entry) => ({
+                    key: entry.key,
+                    name: entry.name,
+                    cases: entry.cases,
+                    state:
+                      entry.key === activeCasetableKey
+                        ? null
+                        : copy(casetableStateFor(entry)),
+                  })),
+                }
+              : {}),
             fieldOfViewDegrees,
             globalMultipleSampling,
             globalResolution,
@@ -5594,6 +5783,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
         }
 
         function restoreTriOrbStateSnapshot(snapshot = {}) {
+          documentLoadToken += 1;
           applyFileInfoValues(snapshot.fileInfo || {});
           scanPlanes = initializeScanPlanes(snapshot.scanPlanes);
           triorbShapes = initializeTriOrbShapes(snapshot.triorbShapes);
@@ -5607,12 +5797,40 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
             supplementDefaults: false,
           });
           fieldsetGlobalGeometry = initializeGlobalGeometry(snapshot.fieldsetGlobalGeometry);
+          fieldsetPlaneCatalog = Array.isArray(snapshot.fieldsetPlanes)
+            ? snapshot.fieldsetPlanes.map((entry) => ({
+                key: String(entry.key),
+                fieldsets: Number(entry.fieldsets) || 0,
+                state: entry.state || null,
+                payload: null,
+                node: null,
+                url: null,
+                userFieldIds: null,
+              }))
+            : [];
+          activeFieldsetPlaneKey = String(
+            snapshot.activeFieldsetPlaneKey ?? defaultFieldsetPlaneKey(fieldsetPlaneCatalog)
+          );
+          renderFieldsetPlaneSelector();
           casetableAttributes = cloneAttributes(snapshot.casetableAttributes || { Index: "0" });
           casetableConfiguration = normalizeCasetableConfiguration(snapshot.casetableConfiguration);
           casetableCases = initializeCasetableCases(snapshot.casetableCases);
           casetableLayout = normalizeCasetableLayout(snapshot.casetableLayout);
           casetableEvals = normalizeCasetableEvals(snapshot.casetableEvals, casetableCases.length);
           casetableFieldsConfiguration = null;
+          casetableCatalog = Array.isArray(snapshot.casetables)
+            ? snapshot.casetables.map((entry) => ({
+                key: String(entry.key),
+                name: entry.name || "",
+                cases: Number(entry.cases) || 0,
+                state: entry.state || null,
+                payload: null,
+                node: null,
+                url: null,
+              }))
+            : [];
+          activeCasetableKey = String(snapshot.activeCasetableKey ?? defaultCasetableKey(casetableCatalog));
+          renderCasetableSelector();
           caseToggleStates =
             Array.isArray(snapshot.caseToggleStates) &&
             snapshot.caseToggleStates.length === casetableCases.length
@@ -5642,7 +5860,674 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           renderFieldsetCheckboxes();
         }
 
-        function readTriOrbStateSnapshot(triOrbNode) {
+        function fetchBootstrapSection(url) {
+          return fetch(url, { headers: { Accept: "application/json" } }).then((response) => {
+            if (!response.ok) {
+              throw new Error(`Failed to load ${url} (${response.status})`);
+            }
+            return response.json();
+          });
+        }
+
+        function applyBootstrapScanPlanes(data) {
+          scanPlanes = initializeScanPlanes(data);
+          invalidateDeviceTraceCache();
+          renderScanPlanes();
+        }
+
+        function assignBootstrapUserFieldIds(fieldsConfiguration) {
+          // 初期データの UserFieldId は FieldsConfiguration の指定を優先し、残りは
+          // Fieldset の並び順で採番する。Shape レジストリの構築順に依存させないことで、
+          // 埋め込み／遅延取得のどちらでも、サーバー側の sgexml_writer とも同じ ID になる。
+          applyFieldsConfigurationNodeUserFieldIds(fieldsConfiguration);
+          collectUserFieldDefinitions({ useShapeIndex: false });
+          invalidateUserFieldReferences();
+        }
+
+        function reassignBootstrapUserFieldIds(fieldsConfiguration) {
+          // ジオメトリを先に描画した場合は仮に採番した ID をペイロードの値へ戻し、
+          // 揃ってから適用した場合と同じ順序（FieldsConfiguration → 採番）でやり直す。
+          (bootstrapPayloadUserFieldIds || []).forEach((ids, fieldsetIndex) => {
+            const fields = fieldsets[fieldsetIndex]?.fields || [];
+            ids.forEach((id, fieldIndex) => {
+              const field = fields[fieldIndex];
+              if (!field) {
+                return;
+              }
+              const { UserFieldId: _assigned, ...attributes } = field.attributes || {};
+              field.attributes = id === undefined ? attributes : { ...attributes, UserFieldId: id };
+            });
+          });
+          bootstrapPayloadUserFieldIds = null;
+          assignBootstrapUserFieldIds(fieldsConfiguration);
+        }
+
+        function applyBootstrapFieldsetDevices(devices) {
+          // DeviceName が無い Device は ScanPlane の Device から補う。
+          fieldsetDevices = initializeFieldsetDevices(devices || [], { supplementDefaults: true });
+        }
+
+        function applyBootstrapGeometry(shapeSection = {}, fieldsetSection = {}, casetableSection = {}) {
+          triorbShapes = initializeTriOrbShapes(shapeSection?.shapes || []);
+          triorbSource = shapeSection?.source || "";
+          rebuildTriOrbShapeRegistry();
+          triOrbShapeCardCache.clear();
+          triOrbShapesListInitialized = false;
+          fieldsets = initializeFieldsets(fieldsetSection?.fieldsets || []);
+          // casetableSection が null なら Casetable はまだ届いていない。
+          bootstrapPayloadUserFieldIds =
+            casetableSection === null
+              ? fieldsets.map((fieldset) =>
+                  (fieldset.fields || []).map((field) => field.attributes?.UserFieldId)
+                )
+              : null;
+          assignBootstrapUserFieldIds(casetableSection?.fields_configuration);
+          applyBootstrapFieldsetDevices(fieldsetSection?.devices);
+          fieldsetGlobalGeometry = initializeGlobalGeometry(fieldsetSection?.global_geometry || {});
+          applySnapshotGlobals({
+            fieldOfViewDegrees,
+            legendVisible,
+            globalMultipleSampling: deriveInitialMultipleSampling(fieldsets),
+            globalResolution: deriveFieldAttribute(fieldsets, "Resolution", globalResolution),
+            globalTolerancePositive: deriveFieldAttribute(
+              fieldsets,
+              "TolerancePositive",
+              globalTolerancePositive
+            ),
+            globalToleranceNegative: deriveFieldAttribute(
+              fieldsets,
+              "ToleranceNegative",
+              globalToleranceNegative
+            ),
+          });
+          invalidateFieldsetTraces();
+          invalidateTriOrbShapeCaches();
+          renderFieldsets();
+          renderFieldsetDevices();
+          renderFieldsetGlobal();
+          renderFieldsetCheckboxes();
+          renderTriOrbShapes();
+          renderTriOrbShapeCheckboxes();
+        }
+
+        function applyBootstrapCasetable(raw = {}) {
+          restoreCasetableState(casetableStateFromPayload(raw));
+        }
+
+        function createCasetableCatalog(summaries, { payloads = null, nodes = null, url = null } = {}) {
+          if (!Array.isArray(summaries)) {
+            return [];
+          }
+          return summaries.map((summary, position) => {
+            const key = String(summary?.index ?? position);
+            return {
+              key,
+              name: summary?.name || "",
+              cases: Number(summary?.cases) || 0,
+              state: null,
+              payload: payloads?.[key] || null,
+              node: nodes?.[position] || null,
+              url: url ? `${url}/${encodeURIComponent(key)}` : null,
+            };
+          });
+        }
+
+        function defaultCasetableKey(catalog) {
+          // サーバーと同じく Index="0" を優先し、無ければ先頭の Casetable を表示する。
+          const preferred = catalog.find((entry) => entry.key === "0") || catalog[0];
+          return preferred ? preferred.key : "0";
+        }
+
+        function uniqueIndexKey(index, position, seen) {
+          // 出現順も使用済みなら "<出現順>_1", "_2", ... と進める（main._unique_index_key と同じ）。
+          let key = index || String(position);
+          if (seen.has(key)) {
+            key = String(position);
+          }
+          for (let suffix = 1; seen.has(key); suffix += 1) {
+            key = `${position}_${suffix}`;
+          }
+          seen.add(key);
+          return key;
+        }
+
+        function summarizeCasetableNodes(nodes) {
+          const seen = new Set();
+          return nodes.map((node, position) => {
+            // Index の欠落・重複時は出現順をキーにする（main.CasetableIndex と同じ規則）。
+            const key = uniqueIndexKey(node.getAttribute("Index"), position, seen);
+            const casesNode = node.querySelector(":scope > Cases");
+            return {
+              index: key,
+              name: (node.querySelector(":scope > Configuration > Name")?.textContent || "").trim(),
+              cases: casesNode ? casesNode.querySelectorAll(":scope > Case").length : 0,
+            };
+          });
+        }
+
+        function casetablePayloadFromNode(casetableNode) {
+          // load_casetable_payload と同じ形に変換する。FieldsConfiguration は保存時に再生成される。
+          const payload = {
+            casetable_attributes: Array.from(casetableNode.attributes || []).reduce((acc, attr) => {
+              acc[attr.name] = attr.value;
+              return acc;
+            }, {}),
+            configuration: null,
+            cases: [],
+            evals: null,
+            fields_configuration: null,
+            layout: [],
+          };
+          Array.from(casetableNode.children || []).forEach((child) => {
+            if (child.tagName === "Configuration") {
+              payload.configuration = convertElementToGenericNode(child);
+              payload.layout.push({ kind: "configuration" });
+            } else if (child.tagName === "Cases") {
+              payload.cases = Array.from(child.querySelectorAll(":scope > Case")).map((caseElement) =>
+                serializeCaseElement(caseElement)
+              );
+              payload.layout.push({ kind: "cases" });
+            } else if (child.tagName === "Evals") {
+              payload.evals = serializeEvalsElement(child);
+              payload.layout.push({ kind: "evals" });
+            } else if (child.tagName === "FieldsConfiguration") {
+              payload.layout.push({ kind: "fields_configuration" });
+            } else {
+              payload.layout.push({ kind: "node", node: convertElementToGenericNode(child) });
+            }
+          });
+          return payload;
+        }
+
+        function casetableStateFromPayload(raw = {}) {
+          const payload = {
+            casetable_attributes: { Index: "0" },
+            configuration: null,
+            cases: [],
+            evals: null,
+            fields_configuration: null,
+            layout: [
+              { kind: "configuration" },
+              { kind: "cases" },
+              { kind: "evals" },
+              { kind: "fields_configuration" },
+            ],
+            ...(raw || {}),
+          };
+          const attributes = cloneAttributes(payload.casetable_attributes || { Index: "0" });
+          const configuration = normalizeCasetableConfiguration(payload.configuration);
+          const cases = initializeCasetableCases(payload.cases);
+          const layout = normalizeCasetableLayout(payload.layout);
+          const evals = normalizeCasetableEvals(payload.evals, cases.length);
+          return { attributes, configuration, cases, layout, evals };
+        }
+
+        function liveCasetableState() {
+          return {
+            attributes: casetableAttributes,
+            configuration: casetableConfiguration,
+            cases: casetableCases,
+            layout: casetableLayout,
+            evals: casetableEvals,
+          };
+        }
+
+        function restoreCasetableState(state) {
+          casetableAttributes = state.attributes;
+          casetableConfiguration = state.configuration;
+          casetableCases = state.cases;
+          casetableLayout = state.layout;
+          casetableEvals = state.evals;
+          casetableFieldsConfiguration = null;
+          caseToggleStates = casetableCases.map(() => false);
+          renderCasetableSelector();
+          renderCasetableConfiguration();
+          renderCasetableCases();
+          renderCasetableEvals();
+          renderCasetableFieldsConfiguration();
+          refreshCaseFieldAssignments({ rerenderCaseToggles: true, rerenderFigure: false });
+          renderCaseCheckboxes();
+        }
+
+        function casetableStateFor(entry) {
+          // 表示中は編集中の変数、それ以外は退避済み state → payload → DOM ノードの順に使う。
+          if (entry.key === activeCasetableKey) {
+            return liveCasetableState();
+          }
+          if (!entry.state) {
+            if (!entry.payload && entry.node) {
+              entry.payload = casetablePayloadFromNode(entry.node);
+              entry.node = null;
+            }
+            if (entry.payload) {
+              entry.state = casetableStateFromPayload(entry.payload);
+              entry.payload = null;
+            }
+          }
+          return entry.state;
+        }
+
+        async function loadCasetableEntry(entry) {
+          if (entry.key !== activeCasetableKey && !entry.state && !entry.payload && !entry.node) {
+            if (!entry.url) {
+              throw new Error(`Casetable ${entry.key} is not available.`);
+            }
+            entry.payload = await fetchBootstrapSection(entry.url);
+          }
+          return casetableStateFor(entry);
+        }
+
+        function ensureCasetablesLoaded() {
+          // 保存前に、まだ取得していない Casetable をすべて揃える。
+          return Promise.all(casetableCatalog.map((entry) => loadCasetableEntry(entry)));
+        }
+
+        async function selectCasetable(key) {
+          const target = casetableCatalog.find((entry) => entry.key === key);
+          if (!target || key === activeCasetableKey) {
+            return;
+          }
+          const loadToken = documentLoadToken;
+          setStatus(`Loading casetable ${key}...`, "warning");
+          const state = await loadCasetableEntry(target);
+          if (loadToken !== documentLoadToken) {
+            return;
+          }
+          // 取得中の編集も含めて、切り替え直前の状態を退避する。
+          const current = casetableCatalog.find((entry) => entry.key === activeCasetableKey);
+          if (current) {
+            current.state = captureCasetableState();
+            current.cases = casetableCases.length;
+          }
+          activeCasetableKey = key;
+          target.state = null;
+          stageTimer.measure("restoreCasetableState", () => restoreCasetableState(state));
+          renderFigure();
+          setStatus(`Casetable ${key} loaded.`);
+        }
+
+        function captureCasetableState() {
+          return JSON.parse(JSON.stringify(liveCasetableState()));
+        }
+
+        function renderCasetableSelector() {
+          if (!casetableSelect) {
+            return;
+          }
+          if (casetableSelectorRow) {
+            casetableSelectorRow.hidden = casetableCatalog.length < 2;
+          }
+          casetableSelect.innerHTML = casetableCatalog
+            .map((entry) => {
+              const cases = entry.key === activeCasetableKey ? casetableCases.length : entry.cases;
+              const label = `Index ${entry.key}: ${entry.name || "(unnamed)"} (${cases} cases)`;
+              return `<option value="${escapeHtml(entry.key)}">${escapeHtml(label)}</option>`;
+            })
+            .join("");
+          casetableSelect.value = activeCasetableKey;
+        }
+
+        function createFieldsetPlaneCatalog(summaries, { payloads = null, nodes = null, url = null } = {}) {
+          if (!Array.isArray(summaries)) {
+            return [];
+          }
+          // 先頭以外の ScanPlane は昇格済みの図形を含むため、初期表示と同じ座標形式で取得する。
+          const points = encodeURIComponent(bootstrapData.uploadApi?.points || "objects");
+          return summaries.map((summary, position) => {
+            const key = String(summary?.index ?? position);
+            return {
+              key,
+              fieldsets: Number(summary?.fieldsets) || 0,
+              state: null,
+              payload: payloads?.[key] || null,
+              node: nodes?.[position] || null,
+              userFieldIds: null,
+              url: url ? `${url}/${encodeURIComponent(key)}?points=${points}` : null,
+            };
+          });
+        }
+
+        function defaultFieldsetPlaneKey(catalog) {
+          // サーバーと同じく先頭の ScanPlane を編集対象にする。
+          return catalog[0] ? catalog[0].key : "0";
+        }
+
+        function summarizeFieldsetPlaneNodes(nodes) {
+          const seen = new Set();
+          return nodes.map((node, position) => {
+            // Index の欠落・重複時は出現順をキーにする（main.FieldsetPlaneIndex と同じ規則）。
+            const key = uniqueIndexKey(node.getAttribute("Index"), position, seen);
+            const fieldsetsNode = node.querySelector(":scope > Fieldsets");
+            return {
+              index: key,
+              fieldsets: fieldsetsNode ? fieldsetsNode.querySelectorAll(":scope > Fieldset").length : 0,
+            };
+          });
+        }
+
+        function mergeFieldsetPlaneShapes(shapes) {
+          // 先頭以外の ScanPlane が参照する、サーバーで昇格されたレガシー図形を TriOrb Shapes に加える。
+          const known = new Set(triorbShapes.map((shape) => shape.id));
+          const added = (Array.isArray(shapes) ? shapes : []).filter((shape) => !known.has(shape.id));
+          if (!added.length) {
+            return;
+          }
+          triorbShapes.push(...initializeTriOrbShapes(added));
+          rebuildTriOrbShapeRegistry();
+          triOrbShapesListInitialized = false;
+        }
+
+        function fieldsetPlaneStateFromPayload(raw = {}) {
+          mergeFieldsetPlaneShapes(raw?.shapes);
+          return {
+            devices: initializeFieldsetDevices(raw?.devices || [], { supplementDefaults: false }),
+            globalGeometry: initializeGlobalGeometry(raw?.global_geometry || {}),
+            fieldsets: initializeFieldsets(raw?.fieldsets || []),
+          };
+        }
+
+        function liveFieldsetPlaneState() {
+          return {
+            devices: fieldsetDevices,
+            globalGeometry: fieldsetGlobalGeometry,
+            fieldsets,
+          };
+        }
+
+        function fieldsetPlaneStateFor(entry) {
+          // 編集中は現在の変数、それ以外は退避済み state → payload → DOM ノードの順に使う。
+          if (entry.key === activeFieldsetPlaneKey) {
+            return liveFieldsetPlaneState();
+          }
+          if (!entry.state) {
+            if (entry.payload) {
+              entry.state = fieldsetPlaneStateFromPayload(entry.payload);
+              entry.payload = null;
+            } else if (entry.node) {
+              entry.state = readFieldsetPlaneNode(entry.node);
+              entry.node = null;
+            }
+            if (entry.state && entry.userFieldIds) {
+              applyUserFieldIdAssignments(entry.state.fieldsets, entry.userFieldIds);
+            }
+            invalidateUserFieldReferences();
+          }
+          return entry.state;
+        }
+
+        function reservedFieldsetPlaneUserFieldIds() {
+          // 編集中以外の ScanPlane が使う UserFieldId。UserFieldId は ScanPlane をまたいで一意なので、
+          // 編集中の ScanPlane の採番ではこれらを避け、Case からの参照は有効なまま残す。
+          const reserved = new Set();
+          fieldsetPlaneCatalog.forEach((entry) => {
+            if (entry.key === activeFieldsetPlaneKey) {
+              return;
+            }
+            if (entry.state) {
+              collectExplicitUserFieldIds(entry.state.fieldsets, reserved);
+            } else {
+              (entry.userFieldIds || []).forEach(({ id }) => reserved.add(String(id)));
+            }
+          });
+          return reserved;
+        }
+
+        function collectExplicitUserFieldIds(planeFieldsets, target = new Set()) {
+          (Array.isArray(planeFieldsets) ? planeFieldsets : []).forEach((fieldset) => {
+            (Array.isArray(fieldset?.fields) ? fieldset.fields : []).forEach((field) => {
+              const explicitId = field?.attributes?.UserFieldId ?? field?.attributes?.Id;
+              if (explicitId !== undefined && explicitId !== null && explicitId !== "") {
+                target.add(String(explicitId));
+              }
+            });
+          });
+          return target;
+        }
+
+        async function fetchFieldsetPlaneEntry(entry) {
+          if (entry.key !== activeFieldsetPlaneKey && !entry.state && !entry.payload && !entry.node) {
+            if (!entry.url) {
+              throw new Error(`ScanPlane ${entry.key} is not available.`);
+            }
+            entry.payload = await fetchBootstrapSection(entry.url);
+          }
+        }
+
+        async function ensureFieldsetPlanesLoaded() {
+          // 保存前に、まだ取得していない ScanPlane をすべて揃える。図形の追加順が応答順に
+          // 左右されないよう、変換は取得がすべて終わってから並び順に行う。
+          await Promise.all(fieldsetPlaneCatalog.map((entry) => fetchFieldsetPlaneEntry(entry)));
+          fieldsetPlaneCatalog.forEach((entry) => fieldsetPlaneStateFor(entry));
+        }
+
+        async function selectFieldsetPlane(key) {
+          const target = fieldsetPlaneCatalog.find((entry) => entry.key === key);
+          if (!target || key === activeFieldsetPlaneKey) {
+            return;
+          }
+          const loadToken = documentLoadToken;
+          setStatus(`Loading ScanPlane ${key}...`, "warning");
+          await fetchFieldsetPlaneEntry(target);
+          if (loadToken !== documentLoadToken) {
+            return;
+          }
+          const state = fieldsetPlaneStateFor(target);
+          // 取得中の編集も含めて、切り替え直前の状態を退避する。
+          const current = fieldsetPlaneCatalog.find((entry) => entry.key === activeFieldsetPlaneKey);
+          if (current) {
+            current.state = captureFieldsetPlaneState();
+            current.fieldsets = fieldsets.length;
+          }
+          activeFieldsetPlaneKey = key;
+          target.state = null;
+          stageTimer.measure("restoreFieldsetPlaneState", () => restoreFieldsetPlaneState(state));
+          renderFigure();
+          setStatus(`ScanPlane ${key} loaded.`);
+        }
+
+        function captureFieldsetPlaneState() {
+          return JSON.parse(JSON.stringify(liveFieldsetPlaneState()));
+        }
+
+        function restoreFieldsetPlaneState(state) {
+          fieldsets = state.fieldsets;
+          fieldsetDevices = state.devices;
+          fieldsetGlobalGeometry = state.globalGeometry;
+          rebuildTriOrbShapeRegistry();
+          triOrbShapeCardCache.clear();
+          triOrbShapesListInitialized = false;
+          invalidateDeviceTraceCache();
+          invalidateFieldsetTraces();
+          invalidateTriOrbShapeCaches();
+          renderFieldsetPlaneSelector();
+          renderFieldsets();
+          renderFieldsetDevices();
+          renderFieldsetGlobal();
+          renderFieldsetCheckboxes();
+          renderTriOrbShapes();
+          renderTriOrbShapeCheckboxes();
+          regenerateFieldsConfiguration();
+          refreshCaseFieldAssignments({ rerenderCaseToggles: true, rerenderFigure: false });
+        }
+
+        function renderFieldsetPlaneSelector() {
+          if (!fieldsetPlaneSelect) {
+            return;
+          }
+          if (fieldsetPlaneSelectorRow) {
+            fieldsetPlaneSelectorRow.hidden = fieldsetPlaneCatalog.length < 2;
+          }
+          fieldsetPlaneSelect.innerHTML = fieldsetPlaneCatalog
+            .map((entry) => {
+              const count = entry.key === activeFieldsetPlaneKey ? fieldsets.length : entry.fieldsets;
+              const label = `Index ${entry.key} (${count} fieldsets)`;
+              return `<option value="${escapeHtml(entry.key)}">${escapeHtml(label)}</option>`;
+            })
+            .join("");
+          fieldsetPlaneSelect.value = activeFieldsetPlaneKey;
+        }
+
+        function loadBootstrapStateSnapshot(snapshot, url) {
+          // サーバーが StateSnapshot をそのまま配信した文書は、セクションを個別に取得せずに復元する。
+          const loadToken = documentLoadToken;
+          setStatus("Loading configuration...", "warning");
+          const request = snapshot ? Promise.resolve(snapshot) : fetchBootstrapSection(url);
+          return request
+            .then((data) => {
+              if (loadToken !== documentLoadToken) return false;
+              stageTimer.measure("restoreTriOrbStateSnapshot", () => restoreTriOrbStateSnapshot(data));
+              invalidateBaseFigureTraces();
+              renderFigure();
+              setStatus("Configuration loaded (TriOrb).");
+              return true;
+            })
+            .catch((error) => {
+              console.error(error);
+              if (loadToken === documentLoadToken) {
+                setStatus(error.message || "Failed to load configuration.", "error");
+              }
+              return false;
+            });
+        }
+
+        function loadDeferredBootstrapSections() {
+          // index.html が小さなシェルだけを返した場合、重いセクションを並列に取得し、
+          // 届いた順（依存関係を満たした順）に描画していく。
+          const api = bootstrapData.documentApi;
+          if (bootstrapData.stateSnapshot || api?.stateSnapshot) {
+            return loadBootstrapStateSnapshot(bootstrapData.stateSnapshot, api?.stateSnapshot);
+          }
+          if (!api) {
+            return Promise.resolve(false);
+          }
+          const loadToken = documentLoadToken;
+          const isCurrent = () => loadToken === documentLoadToken;
+          setStatus("Loading configuration...", "warning");
+          const scanPlanesRequest = fetchBootstrapSection(api.scanPlanes);
+          const shapesRequest = fetchBootstrapSection(api.triorbShapes);
+          const fieldsetsRequest = fetchBootstrapSection(api.fieldsets);
+          const casetableRequest = fetchBootstrapSection(api.casetable);
+          let scanPlanesApplied = false;
+          const scanPlanesReady = scanPlanesRequest.then((data) => {
+            if (!isCurrent()) return;
+            stageTimer.measure("applyBootstrapScanPlanes", () => applyBootstrapScanPlanes(data));
+            scanPlanesApplied = true;
+            renderFigure();
+          });
+          // ジオメトリは Shape と Fieldset が揃った時点で描画する。ScanPlane 由来の DeviceName と
+          // Casetable の FieldsConfiguration 由来の UserFieldId は、それぞれが届いた時点で補い直す。
+          let devicesNeedScanPlanes = false;
+          const geometryReady = Promise.all([shapesRequest, fieldsetsRequest]).then(
+            ([shapeSection, fieldsetSection]) => {
+              if (!isCurrent()) return;
+              devicesNeedScanPlanes = !scanPlanesApplied;
+              stageTimer.measure("applyBootstrapGeometry", () =>
+                applyBootstrapGeometry(shapeSection, fieldsetSection, null)
+              );
+              renderFigure();
+            }
+          );
+          const devicesReady = Promise.all([fieldsetsRequest, geometryReady, scanPlanesReady]).then(
+            ([fieldsetSection]) => {
+              if (!isCurrent() || !devicesNeedScanPlanes) return;
+              applyBootstrapFieldsetDevices(fieldsetSection?.devices);
+              invalidateDeviceTraceCache();
+              renderFieldsetDevices();
+              renderFigure();
+            }
+          );
+          // Eval の UserField 候補や FieldsConfiguration は Fieldset に依存するため後から適用する。
+          const casetableReady = Promise.all([casetableRequest, geometryReady]).then(
+            ([casetable]) => {
+              if (!isCurrent()) return;
+              stageTimer.measure("applyBootstrapCasetable", () => {
+                reassignBootstrapUserFieldIds(casetable?.fields_configuration);
+                applyBootstrapCasetable(casetable);
+              });
+              renderFigure();
+            }
+          );
+          return Promise.all([scanPlanesReady, geometryReady, devicesReady, casetableReady])
+            .then(() => {
+              if (!isCurrent()) return false;
+              setStatus("Configuration loaded.");
+              return true;
+            })
+            .catch((error) => {
+              console.error(error);
+              if (isCurrent()) {
+                setStatus(error.message || "Failed to load configuration.", "error");
+              }
+              return false;
+            });
+        }
+
+        function waitMilliseconds(ms) {
+          return new Promise((resolve) => setTimeout(resolve, ms));
+        }
+
+        async function uploadDocumentToServer(file) {
+          // XML の解析はサーバーのワーカープールで行い、UI スレッドで DOMParser を走らせない。
+          const api = bootstrapData.uploadApi;
+          const response = await fetch(api.upload, {
+            method: "POST",
+            body: file,
+            headers: {
+              "Content-Type": "application/xml",
+              "X-Filename": encodeURIComponent(file.name || ""),
+            },
+          });
+          const accepted = await response.json().catch(() => ({}));
+          if (!response.ok) {
+            throw new Error(accepted.error || `Upload failed (${response.status})`);
+          }
+          const statusUrl = new URL(accepted.status_url, window.location.href);
+          statusUrl.searchParams.set("points", api.points || "objects");
+          let interval = 50;
+          for (;;) {
+            const poll = await fetch(statusUrl, { headers: { Accept: "application/json" } });
+            const body = await poll.json().catch(() => ({}));
+            if (poll.status === 202) {
+              await waitMilliseconds(interval);
+              interval = Math.min(interval * 2, 500);
+              continue;
+            }
+            if (!poll.ok) {
+              throw new Error(body.error || `Upload failed (${poll.status})`);
+            }
+            return body;
+          }
+        }
+
+        function applyUploadedDocument(sections = {}, casetablesUrl = null, fieldsetPlanesUrl = null) {
+          // 初期表示の遅延取得と同じ適用順（ScanPlane → ジオメトリ → Casetable）で反映する。
+          documentLoadToken += 1;
+          fieldsetPlaneCatalog = createFieldsetPlaneCatalog(sections.fieldset_planes, {
+            url: fieldsetPlanesUrl,
+          });
+          activeFieldsetPlaneKey = defaultFieldsetPlaneKey(fieldsetPlaneCatalog);
+          renderFieldsetPlaneSelector();
+          casetableCatalog = createCasetableCatalog(sections.casetables, { url: casetablesUrl });
+          activeCasetableKey = defaultCasetableKey(casetableCatalog);
+          applyFileInfoValues(
+            Object.fromEntries((sections.fileinfo || []).map((field) => [field.tag, field.value]))
+          );
+          triOrbImportContext = { triOrbRootFound: Boolean(sections.triorb_shapes?.source) };
+          stageTimer.measure("applyBootstrapScanPlanes", () =>
+            applyBootstrapScanPlanes(sections.scan_planes || [])
+          );
+          stageTimer.measure("applyBootstrapGeometry", () =>
+            applyBootstrapGeometry(sections.triorb_shapes, sections.fieldsets, sections.casetable)
+          );
+          stageTimer.measure("applyBootstrapCasetable", () =>
+            applyBootstrapCasetable(sections.casetable || {})
+          );
+          currentFigure = cloneFigure(defaultFigure);
+          invalidateBaseFigureTraces();
+          renderFigure();
+        }
+
+        function readTriOrbStateSnapshot(triOrbNode, inflatedSnapshot = null) {
           if (!triOrbNode) {
             return null;
           }
@@ -5652,11 +6537,50 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
             return null;
           }
           const encoding = (snapshotNode.getAttribute("Encoding") || "base64").toLowerCase();
+          if (encoding === triOrbStateSnapshotEncoding) {
+            // 展開は非同期のため、inflateTriOrbStateSnapshot で事前に展開した JSON を受け取る。
+            if (inflatedSnapshot === null) {
+              throw new Error("The compressed TriOrb snapshot could not be decompressed.");
+            }
+            return JSON.parse(inflatedSnapshot);
+          }
           const decoded =
             encoding === "base64" ? decodeBase64Unicode(payload) : payload;
           return JSON.parse(decoded);
         }
 
+        async function inflateTriOrbStateSnapshot(xmlText) {
+          // deflate+base64 の StateSnapshot を DOM 解析の前に展開する。該当しなければ null。
+          const match = /<StateSnapshot\b[^>]*\bEncoding="deflate\+base64"[^>]*>([^<]*)<\/StateSnapshot>/i.exec(
+            xmlText || ""
+          );
+          if (!match || typeof DecompressionStream === "undefined") {
+            return null;
+          }
+          const stream = new Blob([decodeBase64Bytes(match[1].trim())])
+            .stream()
+            .pipeThrough(new DecompressionStream("deflate"));
+          return new Response(stream).text();
+        }
+
+        function encodeBase64StateSnapshot() {
+          return {
+            encoding: "base64",
+            payload: encodeBase64Unicode(JSON.stringify(captureTriOrbStateSnapshot({ clone: false }))),
+          };
+        }
+
+        async function encodeTriOrbStateSnapshot() {
+          // 状態の複製はせず、JSON 化した時点の内容を圧縮する。CompressionStream が無ければ従来の base64。
+          if (typeof CompressionStream === "undefined") {
+            return encodeBase64StateSnapshot();
+          }
+          const json = JSON.stringify(captureTriOrbStateSnapshot({ clone: false }));
+          const stream = new Blob([json]).stream().pipeThrough(new CompressionStream("deflate"));
+          const bytes = new Uint8Array(await new Response(stream).arrayBuffer());
+          return { encoding: triOrbStateSnapshotEncoding, payload: encodeBase64Bytes(bytes) };
+        }
+
         function normalizeCasetableConfiguration(node) {
           const cloned = cloneGenericNode(node);
           if (cloned) {
@@ -5873,8 +6797,58 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           return `Eval ${index + 1}`;
         }
 
+        function resolveUserFieldReferences() {
+          const cached = userFieldReferenceCache;
+          if (
+            cached &&
+            cached.version === userFieldReferenceVersion &&
+            cached.fieldsets === fieldsets &&
+            cached.triorbShapes === triorbShapes &&
+            cached.fieldsetPlaneCatalog === fieldsetPlaneCatalog &&
+            cached.activeFieldsetPlaneKey === activeFieldsetPlaneKey
+          ) {
+            return cached;
+          }
+          const definitions = collectUserFieldDefinitions({ includeStatFields: true });
+          const idByShapeId = new Map();
+          const fieldsetIndexesById = new Map();
+          // Shape / Fieldset の逆引きは従来どおり Fieldset の Field だけを対象にし、
+          // PermRed などの Stat Field は Eval の選択肢にだけ含める。
+          definitions.forEach((definition) => {
+            if (definition.type !== "fieldset") {
+              return;
+            }
+            if (Number.isFinite(definition.fieldsetIndex)) {
+              fieldsetIndexesById.set(definition.id, [definition.fieldsetIndex]);
+            }
+            const shapeRefs = Array.isArray(definition.field?.shapeRefs) ? definition.field.shapeRefs : [];
+            shapeRefs.forEach((ref) => {
+              const key = ref?.shapeId ? String(ref.shapeId) : "";
+              if (key && !idByShapeId.has(key)) {
+                idByShapeId.set(key, definition.id);
+              }
+            });
+          });
+          userFieldReferenceCache = {
+            version: userFieldReferenceVersion,
+            fieldsets,
+            triorbShapes,
+            fieldsetPlaneCatalog,
+            activeFieldsetPlaneKey,
+            options: buildEvalUserFieldOptions(definitions),
+            reserved: reservedFieldsetPlaneUserFieldIds(),
+            idByShapeId,
+            fieldsetIndexesById,
+            optionsHtml: new Map(),
+          };
+          return userFieldReferenceCache;
+        }
+
         function resolveEvalUserFieldOptions() {
-          const userFieldDefinitions = collectUserFieldDefinitions({ includeStatFields: true });
+          return resolveUserFieldReferences().options;
+        }
+
+        function buildEvalUserFieldOptions(userFieldDefinitions) {
           const options = userFieldDefinitions.map((definition) => {
             const label = formatUserFieldLabel(definition) || definition.id;
             return {
@@ -5901,15 +6875,31 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
         }
 
         function normalizeUserFieldIdValue(value) {
-          const { values, defaultValue } = resolveEvalUserFieldOptions();
+          const { options, reserved } = resolveUserFieldReferences();
+          const { values, defaultValue } = options;
           const normalized = (value || "").trim();
           if (!normalized) {
             return defaultValue || "";
           }
-          return values.has(normalized) ? normalized : defaultValue || "";
+          if (values.has(normalized) || reserved.has(normalized)) {
+            return normalized;
+          }
+          return defaultValue || "";
         }
 
         function buildEvalUserFieldOptionsHtml(selectedValue) {
+          // 同じ選択値の <option> 列は Case × Eval の数だけ繰り返し作られるため、対応表と一緒に使い回す。
+          const { optionsHtml } = resolveUserFieldReferences();
+          const cacheKey = selectedValue ?? "";
+          let result = optionsHtml.get(cacheKey);
+          if (!result) {
+            result = renderEvalUserFieldOptionsHtml(selectedValue);
+            optionsHtml.set(cacheKey, result);
+          }
+          return result;
+        }
+
+        function renderEvalUserFieldOptionsHtml(selectedValue) {
           const { options, defaultValue } = resolveEvalUserFieldOptions();
           let value = selectedValue;
           if (!value && defaultValue) {
@@ -6843,13 +7833,32 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           return lines.join("\n");
         }
 
-        function buildTriOrbXml() {
-          const lines = buildBaseSdImportExportLines({
+        function buildTriOrbBaseLines() {
+          return buildBaseSdImportExportLines({
             deviceIndexStrategy: "sequential",
           }).slice();
-          const snapshotPayload = encodeBase64Unicode(
-            JSON.stringify(captureTriOrbStateSnapshot())
-          );
+        }
+
+        async function fingerprintTriOrbBaseLines(lines) {
+          // サーバーはこの値が SdImportExport 部分と一致する場合だけ、XML を解析せずにスナップショットを使う。
+          if (!globalThis.crypto?.subtle) {
+            return null;
+          }
+          const digest = await crypto.subtle.digest("SHA-256", new TextEncoder().encode(lines.join("\n")));
+          const hex = Array.from(new Uint8Array(digest), (byte) => byte.toString(16).padStart(2, "0"));
+          return `sha256:${hex.join("")}`;
+        }
+
+        async function buildCompressedTriOrbXml() {
+          // スナップショットは SdImportExport 部分の書き出し（Device Index の採番など）を反映した後に取る。
+          const lines = buildTriOrbBaseLines();
+          const fingerprint = await fingerprintTriOrbBaseLines(lines);
+          const snapshot = await encodeTriOrbStateSnapshot();
+          return buildTriOrbXml(lines, { ...snapshot, fingerprint });
+        }
+
+        function buildTriOrbXml(lines = buildTriOrbBaseLines(), snapshot = encodeBase64StateSnapshot()) {
+          // snapshot は encode*StateSnapshot の結果。triorbSource の補完より前に取得しておく。
           lines.push("");
           if (!triorbSource) {
             triorbSource = "TriOrbAware";
@@ -6893,8 +7902,9 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           const shapeLines = buildTriOrbShapesXml();
           shapeLines.forEach((line) => lines.push(line));
           lines.push("  </TriOrbMenu>");
+          const fingerprintAttr = snapshot.fingerprint ? ` Fingerprint="${snapshot.fingerprint}"` : "";
           lines.push(
-            `  <StateSnapshot Format="json" Encoding="base64" Version="${triOrbStateSnapshotVersion}">${snapshotPayload}</StateSnapshot>`
+            `  <StateSnapshot Format="json" Encoding="${snapshot.encoding}" Version="${triOrbStateSnapshotVersion}"${fingerprintAttr}>${snapshot.payload}</StateSnapshot>`
           );
           lines.push("</TriOrb_SICK_SLS_Editor>");
           return lines.join("\n");
@@ -7036,12 +8046,30 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
 
         function buildFieldsetsXml(fieldsetDeviceAttrs = null, { includeUserFieldIds = true } = {}) {
           const lines = [];
-          lines.push('    <ScanPlane Index="0">');
+          const entries = fieldsetPlaneCatalog.length
+            ? fieldsetPlaneCatalog
+            : [{ key: activeFieldsetPlaneKey }];
+          entries.forEach((entry) => {
+            const state = fieldsetPlaneStateFor(entry);
+            if (!state) {
+              return;
+            }
+            // SICK 形式のデバイス別出力で差し替えるのは、編集中の ScanPlane の Devices だけ。
+            const deviceAttrs = entry.key === activeFieldsetPlaneKey ? fieldsetDeviceAttrs : null;
+            lines.push(...buildFieldsetPlaneLines(entry.key, state, deviceAttrs, { includeUserFieldIds }));
+          });
+          return lines;
+        }
+
+        function buildFieldsetPlaneLines(planeKey, state, fieldsetDeviceAttrs = null, { includeUserFieldIds = true } = {}) {
+          const lines = [];
+          const planeAttr = buildAttributeString({ Index: planeKey }, getAttributeOrder("ScanPlane"));
+          lines.push(`    <ScanPlane ${planeAttr}>`);
 
           lines.push("      <Devices>");
           const devicesToRender = fieldsetDeviceAttrs
             ? [{ attributes: fieldsetDeviceAttrs }]
-            : fieldsetDevices;
+            : state.devices;
           if (devicesToRender && devicesToRender.length) {
             devicesToRender.forEach((device) => {
               const deviceAttrs = buildDeviceAttributeString(device.attributes, {
@@ -7056,7 +8084,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           lines.push("      </Devices>");
 
           const globalAttr = buildAttributeString(
-            fieldsetGlobalGeometry,
+            state.globalGeometry,
             getAttributeOrder("GlobalGeometry")
           );
           lines.push(
@@ -7111,8 +8139,8 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
             return wrote;
           };
 
-          if (fieldsets.length) {
-            fieldsets.forEach((fieldset) => {
+          if (state.fieldsets.length) {
+            state.fieldsets.forEach((fieldset) => {
               const mergedFields = mergeFieldsByAttributes(fieldset.fields || []);
               const serializableFields = mergedFields.filter((field) =>
                 fieldHasSerializableContent(field)
@@ -7674,10 +8702,13 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           return lines;
         }
 
-        function collectUserFieldDefinitions({ includeStatFields = false } = {}) {
+        function collectUserFieldDefinitions({
+          includeStatFields = false,
+          useShapeIndex = true,
+        } = {}) {
           const entries = [];
           const shapeIdLookup = buildShapeIdLookup();
-          const seenIds = new Set();
+          const seenIds = reservedFieldsetPlaneUserFieldIds();
           let counter = 1;
 
           const reserveId = (rawId) => {
@@ -7717,7 +8748,9 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
                 const attributes = field?.attributes || {};
                 const explicitId = attributes.UserFieldId ?? attributes.Id ?? null;
                 const primaryShapeId = findPrimaryShapeIdForField(field);
-                const shapeIndex = shapeIdLookup.get(String(primaryShapeId)) || null;
+                const shapeIndex = useShapeIndex
+                  ? shapeIdLookup.get(String(primaryShapeId)) || null
+                  : null;
                 const id = allocateId(explicitId, shapeIndex);
                 if (!id) {
                   return;
@@ -7793,6 +8826,15 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
               : [createDefaultScanPlane(0)];
           const counter = { value: 1 };
           let fieldsetsAssigned = false;
+          // ScanPlane が複数ある文書では、同じ Index の Export_FieldsetsAndFields の Fieldset を割り当てる。
+          const multiplePlanes = fieldsetPlaneCatalog.length > 1;
+          if (multiplePlanes) {
+            // 明示的な UserFieldId をすべて予約し、Id のない Field がほかの ScanPlane と重ならないようにする。
+            counter.seen = new Set();
+            fieldsetPlaneCatalog.forEach((entry) =>
+              collectExplicitUserFieldIds(fieldsetPlaneStateFor(entry)?.fieldsets, counter.seen)
+            );
+          }
           return planes.map((plane, planeIndex) => {
             const attrs = plane?.attributes || {};
             const indexValue = attrs.Index ?? String(planeIndex);
@@ -7803,7 +8845,16 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
               { tag: "Index", attributes: {}, text: String(indexValue), children: [] },
               { tag: "Name", attributes: {}, text: nameValue, children: [] },
             ];
-            if (!fieldsetsAssigned) {
+            if (multiplePlanes) {
+              const entry = fieldsetPlaneCatalog.find((item) => item.key === String(indexValue));
+              const state = entry ? fieldsetPlaneStateFor(entry) : null;
+              const userFieldsetsNode = state
+                ? buildFieldsConfigurationUserFieldsets(counter, state.fieldsets)
+                : null;
+              if (userFieldsetsNode) {
+                children.push(userFieldsetsNode);
+              }
+            } else if (!fieldsetsAssigned) {
               const userFieldsetsNode = buildFieldsConfigurationUserFieldsets(counter);
               if (userFieldsetsNode) {
                 children.push(userFieldsetsNode);
@@ -7819,9 +8870,9 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           });
         }
 
-        function buildFieldsConfigurationUserFieldsets(counter) {
-          const fieldsetNodes = Array.isArray(fieldsets)
-            ? fieldsets.map((fieldset, fieldsetIndex) => {
+        function buildFieldsConfigurationUserFieldsets(counter, planeFieldsets = fieldsets) {
+          const fieldsetNodes = Array.isArray(planeFieldsets)
+            ? planeFieldsets.map((fieldset, fieldsetIndex) => {
                 const userFields = buildFieldsConfigurationUserFields(fieldset, fieldsetIndex, counter);
                 if (!userFields.length) {
                   return null;
@@ -7860,7 +8911,16 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
             const shapeIdLookup = buildShapeIdLookup();
             const shapeIndex = shapeIdLookup.get(String(primaryShapeId)) || null;
             const explicitId = attrs.UserFieldId ?? attrs.Id;
-            const id = explicitId ?? shapeIndex ?? counter.value;
+            let id = explicitId ?? shapeIndex ?? counter.value;
+            if (counter.seen) {
+              if ((explicitId === undefined || explicitId === null) && counter.seen.has(String(id))) {
+                id = counter.value;
+                while (counter.seen.has(String(id))) {
+                  id += 1;
+                }
+              }
+              counter.seen.add(String(id));
+            }
             const numericId = Number.parseInt(id, 10);
             counter.value = Number.isFinite(numericId)
               ? Math.max(counter.value, numericId + 1)
@@ -7908,27 +8968,43 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           regenerateFieldsConfiguration({ rerender: false });
           const lines = [];
           lines.push("  <Export_CasetablesAndCases>");
-          const attrs = { ...(casetableAttributes || {}) };
+          const entries = casetableCatalog.length ? casetableCatalog : [{ key: activeCasetableKey }];
+          entries.forEach((entry) => {
+            const state = casetableStateFor(entry);
+            if (!state) {
+              throw new Error(`Casetable ${entry.key} is not loaded yet.`);
+            }
+            lines.push(...buildCasetableLines(state));
+          });
+          lines.push("  </Export_CasetablesAndCases>");
+          return lines;
+        }
+
+        function buildCasetableLines(state) {
+          // FieldsConfiguration は Fieldset から再生成したものをすべての Casetable で共有する。
+          const lines = [];
+          const attrs = { ...(state.attributes || {}) };
           if (!("Index" in attrs)) {
             attrs.Index = "0";
           }
           const attrText = buildRootAttributes(attrs, getAttributeOrder("Casetable"));
           const layout =
-            Array.isArray(casetableLayout) && casetableLayout.length
-              ? casetableLayout
+            Array.isArray(state.layout) && state.layout.length
+              ? state.layout
               : normalizeCasetableLayout([]);
+          const cases = state.cases || [];
           lines.push(`    <Casetable${attrText ? ` ${attrText}` : ""}>`);
           layout.forEach((segment) => {
             if (segment.kind === "configuration") {
-              if (casetableConfiguration) {
-                lines.push(...buildGenericNodeLines(casetableConfiguration, 3));
+              if (state.configuration) {
+                lines.push(...buildGenericNodeLines(state.configuration, 3));
               } else {
                 lines.push("      <Configuration />");
               }
             } else if (segment.kind === "cases") {
               lines.push("      <Cases>");
-              if (casetableCases.length) {
-                casetableCases.forEach((caseData, index) => {
+              if (cases.length) {
+                cases.forEach((caseData, index) => {
                   lines.push(...buildCaseLines(caseData, index, 4));
                 });
               } else {
@@ -7936,7 +9012,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
               }
               lines.push("      </Cases>");
             } else if (segment.kind === "evals") {
-              lines.push(...buildEvalsLines(casetableEvals, 3));
+              lines.push(...buildEvalsLines(state.evals, 3));
             } else if (segment.kind === "fields_configuration") {
               if (casetableFieldsConfiguration) {
                 lines.push(...buildGenericNodeLines(casetableFieldsConfiguration, 3));
@@ -7948,7 +9024,6 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
             }
           });
           lines.push("    </Casetable>");
-          lines.push("  </Export_CasetablesAndCases>");
           return lines;
         }
 
@@ -8256,192 +9331,16 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
 
         function parseSvgPathToPolygons(d = "") {
           const trimmed = (d || "").trim();
-          const pathWarnings = new Set();
           if (!trimmed) {
             return { polygons: [], warnings: [] };
           }
-
-          const unsupportedCommands = (trimmed.match(/[AaCcQqSsTt]/g) || []).map((command) =>
-            command.toUpperCase()
-          );
-          if (unsupportedCommands.length) {
-            unsupportedCommands.forEach((command) => pathWarnings.add(`path (${command})`));
-          }
-
-          const fallback =
-            unsupportedCommands.length > 0
-              ? { polygons: [] }
-              : parseSvgPathToPolygonsLegacy(trimmed, pathWarnings);
-          if (fallback.polygons.length && pathWarnings.size === 0) {
-            return { polygons: fallback.polygons, warnings: Array.from(pathWarnings) };
-          }
-
-          const sampled = sampleSvgPathToPolygon(trimmed, pathWarnings);
-          return { polygons: sampled, warnings: Array.from(pathWarnings) };
+          // 曲線（C / S / Q / T / A）は弦の誤差が許容値以内になるよう適応的に分割する。
+          const { polygons, error } = pathDataToPolygons(trimmed, {
+            tolerance: DEFAULT_SVG_TOLERANCE,
+          });
+          return { polygons, warnings: error ? ["path (invalid data)"] : [] };
         }
 
-          function sampleSvgPathToPolygon(d, pathWarnings) {
-            try {
-              const path = document.createElementNS(
-                "http://www.w3.org/2000/svg",
-                "path"
-              );
-              path.setAttribute("d", d);
-
-              const totalLength = path.getTotalLength();
-              if (!Number.isFinite(totalLength) || totalLength <= 0) {
-                pathWarnings.add("path (empty length)");
-                return [];
-              }
-
-              const moveCommands = (d.match(/[mM]/g) || []).length;
-              if (moveCommands > 1) {
-                pathWarnings.add("path (multiple subpaths approximated)");
-              }
-
-              const sampleCount = Math.min(
-                Math.max(Math.ceil(totalLength / 4), 200),
-                2000
-              );
-              const points = [];
-              for (let i = 0; i <= sampleCount; i += 1) {
-                const distance = (totalLength * i) / sampleCount;
-                const { x, y } = path.getPointAtLength(distance);
-                points.push({ X: String(x), Y: String(y) });
-              }
-
-              const hasCloseCommand = /[Zz]/.test(d);
-              const first = points[0];
-              const last = points[points.length - 1];
-              if (
-                hasCloseCommand &&
-                first &&
-                last &&
-                (first.X !== last.X || first.Y !== last.Y)
-              ) {
-                points.push({ ...first });
-              }
-
-              return points.length >= 3 ? [points] : [];
-            } catch (error) {
-              pathWarnings.add("path (sampling failed)");
-              return [];
-            }
-          }
-
-          function parseSvgPathToPolygonsLegacy(d = "", pathWarnings = new Set()) {
-            const tokens = [];
-            const regex = /([MLHVZmlhvz])|([-+]?\d*\.?\d+(?:[eE][-+]?\d+)?)/g;
-            let match;
-            while ((match = regex.exec(d)) !== null) {
-              tokens.push(match[0]);
-            }
-
-            const isCommand = (token) => /[MLHVZmlhvz]/.test(token);
-            const toNumber = (value) => {
-              const parsed = Number.parseFloat(value);
-              return Number.isFinite(parsed) ? parsed : null;
-            };
-
-            let index = 0;
-            let command = null;
-            let current = { x: 0, y: 0 };
-            let subpathStart = { x: 0, y: 0 };
-            let points = [];
-            const polygons = [];
-
-            const pushSubpath = () => {
-              if (points.length) {
-                const closedPoints = [...points];
-                const first = closedPoints[0];
-                const last = closedPoints[closedPoints.length - 1];
-                if (first && (first.X !== last.X || first.Y !== last.Y)) {
-                  closedPoints.push({ ...first });
-                }
-                polygons.push(closedPoints);
-                points = [];
-              }
-            };
-
-            while (index < tokens.length) {
-              const token = tokens[index];
-              if (isCommand(token)) {
-                command = token;
-                index += 1;
-                if (command === "Z" || command === "z") {
-                  pushSubpath();
-                  current = { ...subpathStart };
-                }
-                continue;
-              }
-              if (!command) {
-                index += 1;
-                continue;
-              }
-              if (command === "M" || command === "m") {
-                const xValue = toNumber(tokens[index]);
-                const yValue = toNumber(tokens[index + 1]);
-                if (xValue === null || yValue === null) {
-                  break;
-                }
-                index += 2;
-                const targetX = command === "m" ? current.x + xValue : xValue;
-                const targetY = command === "m" ? current.y + yValue : yValue;
-                pushSubpath();
-                const point = { X: String(targetX), Y: String(targetY) };
-                points.push(point);
-                current = { x: targetX, y: targetY };
-                subpathStart = { ...current };
-                command = command === "m" ? "l" : "L";
-                continue;
-              }
-              if (command === "L" || command === "l") {
-                const xValue = toNumber(tokens[index]);
-                const yValue = toNumber(tokens[index + 1]);
-                if (xValue === null || yValue === null) {
-                  break;
-                }
-                index += 2;
-                const targetX = command === "l" ? current.x + xValue : xValue;
-                const targetY = command === "l" ? current.y + yValue : yValue;
-                const point = { X: String(targetX), Y: String(targetY) };
-                points.push(point);
-                current = { x: targetX, y: targetY };
-                continue;
-              }
-              if (command === "H" || command === "h") {
-                const xValue = toNumber(tokens[index]);
-                if (xValue === null) {
-                  break;
-                }
-                index += 1;
-                const targetX = command === "h" ? current.x + xValue : xValue;
-                const point = { X: String(targetX), Y: String(current.y) };
-                points.push(point);
-                current = { x: targetX, y: current.y };
-                continue;
-              }
-              if (command === "V" || command === "v") {
-                const yValue = toNumber(tokens[index]);
-                if (yValue === null) {
-                  break;
-                }
-                index += 1;
-                const targetY = command === "v" ? current.y + yValue : yValue;
-                const point = { X: String(current.x), Y: String(targetY) };
-                points.push(point);
-                current = { x: current.x, y: targetY };
-                continue;
-              }
-              pathWarnings.add(`path (${command})`);
-              index += 1;
-            }
-
-            pushSubpath();
-            const validPolygons = polygons.filter((polygon) => polygon.length >= 3);
-            return { polygons: validPolygons, warnings: Array.from(pathWarnings) };
-          }
-
         function extractRotationFromTransform(transformText) {
           if (!transformText) {
             return "0";
@@ -8642,9 +9541,23 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           const shape = createDefaultTriOrbShape(triorbShapes.length + index, shapeType);
           shape.id = entry.id || shape.id || createShapeId();
           shape.name = entry.name || `SVG ${shapeType} ${index + 1}`;
+          shape.type = shapeType;
+          if (entry.coordinates === "editor") {
+            // TriOrb Shapes の取り込みは座標・Kind・Fieldtype をそのまま使う。
+            shape.fieldtype = entry.fieldtype || "ProtectiveSafeBlanking";
+            shape.kind = entry.kind || "Field";
+            if (shapeType === "Polygon" && entry.polygon) {
+              shape.polygon = { Type: entry.polygon.Type || shape.kind, points: entry.polygon.points || [] };
+            } else if (shapeType === "Rectangle" && entry.rectangle) {
+              shape.rectangle = { ...shape.rectangle, ...entry.rectangle };
+            } else if (shapeType === "Circle" && entry.circle) {
+              shape.circle = { ...shape.circle, ...entry.circle };
+            }
+            applyShapeKind(shape, shape.kind);
+            return shape;
+          }
           shape.fieldtype = "ProtectiveSafeBlanking";
           shape.kind = "Field";
-          shape.type = shapeType;
           if (shapeType === "Polygon" && entry.polygon) {
             shape.polygon = {
               Type: "Field",
@@ -8857,7 +9770,8 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           applySvgImportChanges({ additions: shapes, warnings, fileName });
         }
 
-        function parseXmlToFigure(xmlText) {
+        function parseXmlToFigure(xmlText, { inflatedSnapshot = null } = {}) {
+          documentLoadToken += 1;
           const parser = new DOMParser();
           let warningMessage = "";
           console.log("parseXmlToFigure start", {
@@ -8910,7 +9824,7 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           console.log("parseXmlToFigure TriOrb root exists", Boolean(triOrbRoot));
           if (triOrbRoot) {
             try {
-              const snapshot = readTriOrbStateSnapshot(triOrbRoot);
+              const snapshot = readTriOrbStateSnapshot(triOrbRoot, inflatedSnapshot);
               if (snapshot) {
                 restoreTriOrbStateSnapshot(snapshot);
                 const restoredFigure = cloneFigure(currentFigure || defaultFigure);
@@ -9116,11 +10030,13 @@ function buildCircleTrace(circle, colorSet, label, fieldType, fieldsetIndex, fie
           triorbSource = "";
           rebuildTriOrbShapeRegistry();
 
-          populateFileInfoFromDoc(doc);
-          populateScanPlanesFromDoc(doc);
-          populateTriOrbShapesFromDoc(triOrbRoot);
-          populateFieldsetsFromDoc(doc);
-          populateCasetablesFromDoc(doc);
+          stageTimer.measure("populateFileInfoFromDoc", () => populateFileInfoFromDoc(doc));
+          stageTimer.measure("populateScanPlanesFromDoc", () => populateScanPlanesFromDoc(doc));
+          stageTimer.measure("populateTriOrbShapesFromDoc", () =>
+            populateTriOrbShapesFromDoc(triOrbRoot)
+          );
+          stageTimer.measure("populateFieldsetsFromDoc", () => populateFieldsetsFromDoc(doc));
+          stageTimer.measure("populateCasetablesFromDoc", () => populateCasetablesFromDoc(doc));
 
           const tracesFromPlotData = parsePlotDataTraces(doc);
           if (tracesFromPlotData.length) {
@@ -9504,22 +10420,53 @@ function parsePolygonTrace(doc) {
         }
 
         function populateFieldsetsFromDoc(doc) {
-          const scanPlaneNode = doc.querySelector(
-            "Export_FieldsetsAndFields > ScanPlane"
+          // 先頭以外の ScanPlane は選択・保存されるまで DOM ノードのまま保持する。
+          const scanPlaneNodes = Array.from(
+            doc.querySelectorAll("Export_FieldsetsAndFields > ScanPlane")
           );
+          fieldsetPlaneCatalog = createFieldsetPlaneCatalog(
+            summarizeFieldsetPlaneNodes(scanPlaneNodes),
+            { nodes: scanPlaneNodes }
+          );
+          activeFieldsetPlaneKey = defaultFieldsetPlaneKey(fieldsetPlaneCatalog);
+          const scanPlaneNode = scanPlaneNodes[0];
           if (!scanPlaneNode) {
             fieldsets = [createDefaultFieldset(0)];
             fieldsetDevices = [createDefaultFieldsetDevice(0)];
             fieldsetGlobalGeometry = initializeGlobalGeometry({});
+            renderFieldsetPlaneSelector();
             renderFieldsets();
             renderFieldsetDevices();
             renderFieldsetGlobal();
             return;
           }
+          fieldsetPlaneCatalog[0].node = null;
+
+          const planeState = readFieldsetPlaneNode(scanPlaneNode);
+          fieldsetDevices = planeState.devices;
+          fieldsetGlobalGeometry = planeState.globalGeometry;
+          fieldsets = planeState.fieldsets;
+
+          globalMultipleSampling = deriveInitialMultipleSampling(fieldsets);
+          if (globalMultipleSamplingInput) {
+            globalMultipleSamplingInput.value = globalMultipleSampling;
+          }
+          applyGlobalMultipleSampling(globalMultipleSampling, { rerender: false });
+          renderFieldsetPlaneSelector();
+          renderFieldsets();
+          renderFieldsetDevices();
+          renderFieldsetGlobal();
+          renderTriOrbShapes();
+          renderTriOrbShapeCheckboxes();
+        }
 
+        function readFieldsetPlaneNode(scanPlaneNode) {
+          // Export_FieldsetsAndFields の ScanPlane 1 つを Devices / GlobalGeometry / Fieldsets に変換する。
+          // Field 直下のレガシー図形はここで TriOrb Shapes に登録される。
+          let devices;
           const devicesParent = scanPlaneNode.querySelector("Devices");
           if (devicesParent) {
-            fieldsetDevices = Array.from(
+            devices = Array.from(
               devicesParent.querySelectorAll("Device")
             ).map((deviceNode, deviceIndex) => {
               const attrs = {};
@@ -9535,11 +10482,11 @@ function parsePolygonTrace(doc) {
               return { attributes: attrs };
             });
           } else {
-            fieldsetDevices = [];
+            devices = [];
           }
 
           const globalNode = scanPlaneNode.querySelector("GlobalGeometry");
-          fieldsetGlobalGeometry = globalNode
+          const globalGeometry = globalNode
             ? Array.from(globalNode.attributes).reduce((acc, attr) => {
                 acc[attr.name] = attr.value;
                 return acc;
@@ -9551,8 +10498,9 @@ function parsePolygonTrace(doc) {
             ? fieldsetsParent.querySelectorAll("Fieldset")
             : [];
 
+          let planeFieldsets;
           if (!fieldsetNodes.length) {
-            fieldsets = [createDefaultFieldset(0)];
+            planeFieldsets = [createDefaultFieldset(0)];
           } else {
             const fieldImportDiag = {
               fieldsetCount: fieldsetNodes.length,
@@ -9563,7 +10511,7 @@ function parsePolygonTrace(doc) {
               shapeRefsFromInline: 0,
               inlineGeometryFields: 0,
             };
-            fieldsets = Array.from(fieldsetNodes).map((fieldsetNode, fieldsetIndex) => {
+            planeFieldsets = Array.from(fieldsetNodes).map((fieldsetNode, fieldsetIndex) => {
               const attributes = {};
               Array.from(fieldsetNode.attributes).forEach((attr) => {
                 attributes[attr.name] = attr.value;
@@ -9666,16 +10614,7 @@ function parsePolygonTrace(doc) {
             });
           }
 
-          globalMultipleSampling = deriveInitialMultipleSampling(fieldsets);
-          if (globalMultipleSamplingInput) {
-            globalMultipleSamplingInput.value = globalMultipleSampling;
-          }
-          applyGlobalMultipleSampling(globalMultipleSampling, { rerender: false });
-          renderFieldsets();
-          renderFieldsetDevices();
-          renderFieldsetGlobal();
-          renderTriOrbShapes();
-          renderTriOrbShapeCheckboxes();
+          return { devices, globalGeometry, fieldsets: planeFieldsets };
         }
 
         function convertElementToGenericNode(element) {
@@ -9891,6 +10830,11 @@ function parsePolygonTrace(doc) {
           return { attributes, evals };
         }
 
+        function isActiveFieldsetPlaneIndex(indexText) {
+          // ScanPlane が 1 つだけの文書では、どの Index もその ScanPlane を指すものとして扱う。
+          return fieldsetPlaneCatalog.length < 2 || String(indexText ?? "").trim() === activeFieldsetPlaneKey;
+        }
+
         function applyFieldsConfigurationUserFieldIds(fieldsConfigurationElement) {
           if (!fieldsConfigurationElement || !Array.isArray(fieldsets)) {
             return;
@@ -9899,20 +10843,13 @@ function parsePolygonTrace(doc) {
             fieldsConfigurationElement.querySelectorAll(":scope > ScanPlanes > ScanPlane")
           );
           scanPlaneNodes.forEach((scanPlaneNode) => {
+            const assignments = [];
             const userFieldsetNodes = Array.from(
               scanPlaneNode.querySelectorAll(":scope > UserFieldsets > UserFieldset")
             );
             userFieldsetNodes.forEach((fieldsetNode) => {
               const fieldsetIndexNode = fieldsetNode.querySelector(":scope > Index");
               const fieldsetIndex = Number.parseInt(fieldsetIndexNode?.textContent ?? "", 10);
-              if (
-                !Number.isInteger(fieldsetIndex) ||
-                fieldsetIndex < 0 ||
-                fieldsetIndex >= fieldsets.length
-              ) {
-                return;
-              }
-              const targetFieldset = fieldsets[fieldsetIndex];
               const userFieldNodes = Array.from(
                 fieldsetNode.querySelectorAll(":scope > UserFields > UserField")
               );
@@ -9923,21 +10860,82 @@ function parsePolygonTrace(doc) {
                 }
                 const fieldIndexNode = userFieldNode.querySelector(":scope > Index");
                 const fieldIndex = Number.parseInt(fieldIndexNode?.textContent ?? "", 10);
-                if (
-                  !Number.isInteger(fieldIndex) ||
-                  fieldIndex < 0 ||
-                  fieldIndex >= targetFieldset.fields.length
-                ) {
-                  return;
-                }
-                const targetField = targetFieldset.fields[fieldIndex];
-                targetField.attributes = targetField.attributes || {};
-                targetField.attributes.UserFieldId = idAttr;
+                assignments.push({ fieldsetIndex, fieldIndex, id: idAttr });
               });
             });
+            assignFieldsetPlaneUserFieldIds(scanPlaneNode.querySelector(":scope > Index")?.textContent, assignments);
+          });
+        }
+
+        function assignFieldsetPlaneUserFieldIds(indexText, assignments) {
+          // 編集中の ScanPlane は現在の Fieldset に書き込み、それ以外は Fieldset を変換するときに適用する。
+          invalidateUserFieldReferences();
+          if (isActiveFieldsetPlaneIndex(indexText)) {
+            applyUserFieldIdAssignments(fieldsets, assignments);
+            return;
+          }
+          const entry = fieldsetPlaneCatalog.find((item) => item.key === String(indexText ?? "").trim());
+          if (!entry) {
+            return;
+          }
+          entry.userFieldIds = [...(entry.userFieldIds || []), ...assignments];
+          if (entry.state) {
+            applyUserFieldIdAssignments(entry.state.fieldsets, assignments);
+          }
+        }
+
+        function applyUserFieldIdAssignments(targetFieldsets, assignments) {
+          assignments.forEach(({ fieldsetIndex, fieldIndex, id }) => {
+            if (
+              !Number.isInteger(fieldsetIndex) ||
+              fieldsetIndex < 0 ||
+              fieldsetIndex >= targetFieldsets.length
+            ) {
+              return;
+            }
+            const targetFieldset = targetFieldsets[fieldsetIndex];
+            if (!Number.isInteger(fieldIndex) || fieldIndex < 0 || fieldIndex >= targetFieldset.fields.length) {
+              return;
+            }
+            const targetField = targetFieldset.fields[fieldIndex];
+            targetField.attributes = targetField.attributes || {};
+            targetField.attributes.UserFieldId = id;
           });
         }
 
+        function applyFieldsConfigurationNodeUserFieldIds(fieldsConfigurationNode) {
+          // applyFieldsConfigurationUserFieldIds の汎用ノード（サーバーのペイロード）版。
+          if (!fieldsConfigurationNode || !Array.isArray(fieldsets)) {
+            return;
+          }
+          const childrenByTag = (node, tag) =>
+            (Array.isArray(node?.children) ? node.children : []).filter(
+              (child) => child?.tag === tag
+            );
+          const childText = (node, tag) => childrenByTag(node, tag)[0]?.text ?? "";
+          childrenByTag(fieldsConfigurationNode, "ScanPlanes")
+            .flatMap((node) => childrenByTag(node, "ScanPlane"))
+            .forEach((scanPlaneNode) => {
+              const assignments = [];
+              childrenByTag(scanPlaneNode, "UserFieldsets")
+                .flatMap((node) => childrenByTag(node, "UserFieldset"))
+                .forEach((fieldsetNode) => {
+                  const fieldsetIndex = Number.parseInt(childText(fieldsetNode, "Index"), 10);
+                  childrenByTag(fieldsetNode, "UserFields")
+                    .flatMap((node) => childrenByTag(node, "UserField"))
+                    .forEach((userFieldNode) => {
+                      const idAttr = userFieldNode.attributes?.Id;
+                      if (!idAttr) {
+                        return;
+                      }
+                      const fieldIndex = Number.parseInt(childText(userFieldNode, "Index"), 10);
+                      assignments.push({ fieldsetIndex, fieldIndex, id: idAttr });
+                    });
+                });
+              assignFieldsetPlaneUserFieldIds(childText(scanPlaneNode, "Index"), assignments);
+            });
+        }
+
         function populateCasetablesFromDoc(doc) {
           const casetableNodes = Array.from(
             doc.querySelectorAll("Export_CasetablesAndCases > Casetable")
@@ -9946,6 +10944,15 @@ function parsePolygonTrace(doc) {
             casetableNodes.find((node) => node.getAttribute("Index") === "0") ||
             casetableNodes[0] ||
             null;
+          const casetableSummaries = summarizeCasetableNodes(casetableNodes);
+          casetableCatalog = createCasetableCatalog(casetableSummaries, { nodes: casetableNodes });
+          activeCasetableKey = casetableNode
+            ? casetableSummaries[casetableNodes.indexOf(casetableNode)].key
+            : "0";
+          const activeEntry = casetableCatalog.find((entry) => entry.key === activeCasetableKey);
+          if (activeEntry) {
+            activeEntry.node = null;
+          }
           if (!casetableNode) {
             casetableAttributes = { Index: "0" };
             casetableConfiguration = createDefaultCasetableConfiguration();
@@ -9954,6 +10961,7 @@ function parsePolygonTrace(doc) {
             casetableLayout = normalizeCasetableLayout([]);
             casetableEvals = normalizeCasetableEvals(null, casetableCases.length);
             casetableFieldsConfiguration = null;
+            renderCasetableSelector();
             renderCasetableConfiguration();
             renderCasetableCases();
             renderCasetableFieldsConfiguration();
@@ -10003,6 +11011,7 @@ function parsePolygonTrace(doc) {
           if (!layout.some((segment) => segment.kind === "evals")) {
             casetableEvals = normalizeCasetableEvals(null, casetableCases.length);
           }
+          renderCasetableSelector();
           renderCasetableConfiguration();
           renderCasetableCases();
           renderCasetableFieldsConfiguration();
@@ -11228,6 +12237,9 @@ function parsePolygonTrace(doc) {
                 input.value = "0";
             }
           });
+          if (bulkShapeJoinSelect) {
+            bulkShapeJoinSelect.value = "miter";
+          }
           renderBulkEditCaseToggles();
           renderBulkEditShapeToggles();
           renderFigure();
@@ -11285,7 +12297,7 @@ function parsePolygonTrace(doc) {
           return updated;
         }
 
-        function applyBulkShapeAdjustments(delta, offsetX, offsetY) {
+        function applyBulkShapeAdjustments(delta, offsetX, offsetY, join = "miter") {
           let changedCount = 0;
           bulkEditState.selectedShapes.forEach((shapeIndex) => {
             const shape = triorbShapes[shapeIndex];
@@ -11294,7 +12306,7 @@ function parsePolygonTrace(doc) {
             }
             let changed = false;
             if (delta !== 0) {
-              changed = applyShapeInsetOutset(shape, delta) || changed;
+              changed = applyShapeInsetOutset(shape, delta, join) || changed;
             }
             if (offsetX || offsetY) {
               applyReplicationTransform(shape, { offsetX, offsetY });
@@ -11322,9 +12334,9 @@ function parsePolygonTrace(doc) {
             bulkStaticNumberInput.value = String(staticNumber);
           }
           const staticValue = bulkStaticValueSelect?.value || "DontCare";
-          const { delta, offsetX: moveX, offsetY: moveY } = resolveBulkShapeTransform();
+          const { delta, join, offsetX: moveX, offsetY: moveY } = resolveBulkShapeTransform();
           const updatedCases = applyBulkCaseStaticInputs(staticNumber - 1, staticValue);
-          const updatedShapes = applyBulkShapeAdjustments(delta, moveX, moveY);
+          const updatedShapes = applyBulkShapeAdjustments(delta, moveX, moveY, join);
           if (!updatedCases && !updatedShapes) {
             setStatus("一括編集の対象が選択されていません。", "warning");
             return;
@@ -11437,15 +12449,7 @@ function parsePolygonTrace(doc) {
         }
 
         function buildUserFieldLookup() {
-          const lookup = new Map();
-          const userFieldDefinitions = collectUserFieldDefinitions();
-          userFieldDefinitions.forEach((definition) => {
-            if (!Number.isFinite(definition.fieldsetIndex)) {
-              return;
-            }
-            lookup.set(definition.id, [definition.fieldsetIndex]);
-          });
-          return lookup;
+          return resolveUserFieldReferences().fieldsetIndexesById;
         }
 
         function applyCaseToggleVisibility({ rerenderFieldsetToggles = true, rerenderFigure = true } = {}) {
@@ -12120,15 +13124,53 @@ function parsePolygonTrace(doc) {
           renderFigure();
         }
 
+        if (casetableSelect) {
+          casetableSelect.addEventListener("change", () => {
+            selectCasetable(casetableSelect.value).catch((error) => {
+              console.error(error);
+              setStatus(error.message || "Failed to load casetable.", "error");
+              renderCasetableSelector();
+            });
+          });
+        }
+
+        if (fieldsetPlaneSelect) {
+          fieldsetPlaneSelect.addEventListener("change", () => {
+            selectFieldsetPlane(fieldsetPlaneSelect.value).catch((error) => {
+              console.error(error);
+              setStatus(error.message || "Failed to load ScanPlane.", "error");
+              renderFieldsetPlaneSelector();
+            });
+          });
+        }
+
+        async function prepareDocumentForSave() {
+          // 表示していない Casetable / ScanPlane も保存に含めるため、未取得のものを先に読み込む。
+          try {
+            await Promise.all([ensureCasetablesLoaded(), ensureFieldsetPlanesLoaded()]);
+            return true;
+          } catch (error) {
+            console.error(error);
+            setStatus(error.message || "Failed to load the document.", "error");
+            return false;
+          }
+        }
+
         if (saveTriOrbBtn) {
-          saveTriOrbBtn.addEventListener("click", () => {
-            const xml = buildTriOrbXml();
+          saveTriOrbBtn.addEventListener("click", async () => {
+            if (!(await prepareDocumentForSave())) {
+              return;
+            }
+            const xml = await buildCompressedTriOrbXml();
             downloadXml(xml, `TriOrb_${Date.now()}.sgexml`);
             setStatus("TriOrb XML downloaded.");
           });
         }
         if (saveSickBtn) {
-          saveSickBtn.addEventListener("click", () => {
+          saveSickBtn.addEventListener("click", async () => {
+            if (!(await prepareDocumentForSave())) {
+              return;
+            }
             console.debug("Save (SICK) start", {
               fieldsetDeviceCount: fieldsetDevices.length,
               fieldsetDevices: fieldsetDevices
@@ -12854,6 +13896,11 @@ function parsePolygonTrace(doc) {
               });
           }
         });
+        if (bulkShapeJoinSelect) {
+          bulkShapeJoinSelect.addEventListener("change", () => {
+            renderFigure();
+          });
+        }
         createFieldShapeLists.forEach((listObj) => {
           Object.values(listObj).forEach((list) => {
             if (list) {
@@ -12900,6 +13947,7 @@ function parsePolygonTrace(doc) {
           replicateWidthSineGainInput,
           replicateHeightSineGainInput,
           replicateScalePercentInput,
+          replicateOutsetStepInput,
           replicateSpeedMinStepInput,
           replicateSpeedMaxStepInput,
         ].forEach((input) => {
@@ -13277,16 +14325,24 @@ function parsePolygonTrace(doc) {
           });
         }
 
-        fileInput.addEventListener("change", (event) => {
-          const file = event.target.files?.[0];
-          if (!file) {
-            return;
+        async function inflateTriOrbStateSnapshotOrNull(xmlText) {
+          try {
+            return await inflateTriOrbStateSnapshot(xmlText);
+          } catch (error) {
+            // 展開できなければ readTriOrbStateSnapshot が失敗し、XML からの読み込みに切り替わる。
+            console.warn("TriOrb snapshot decompression failed", error);
+            return null;
           }
+        }
 
+        function loadFileInBrowser(file) {
           const reader = new FileReader();
-          reader.onload = () => {
+          reader.onload = async () => {
             try {
-              const { traces, layout, warning, triOrbPresent } = parseXmlToFigure(reader.result);
+              const inflatedSnapshot = await inflateTriOrbStateSnapshotOrNull(reader.result);
+              const { traces, layout, warning, triOrbPresent } = parseXmlToFigure(reader.result, {
+                inflatedSnapshot,
+              });
               currentFigure = { data: traces, layout };
               invalidateBaseFigureTraces();
               renderFigure();
@@ -13305,6 +14361,58 @@ function parsePolygonTrace(doc) {
             }
           };
           reader.readAsText(file, "utf-8");
+        }
+
+        async function loadFileViaServer(file) {
+          setStatus(`Uploading ${file.name}...`, "warning");
+          let result = null;
+          try {
+            result = await uploadDocumentToServer(file);
+          } catch (error) {
+            // サーバーが混雑中・解析不能などの場合は従来のブラウザ内読み込みに切り替える。
+            console.warn("Server-side load failed; parsing in the browser", error);
+          }
+          if (result?.snapshot) {
+            // TriOrb 保存ファイルはサーバーが復号した StateSnapshot をそのまま復元する。
+            try {
+              restoreTriOrbStateSnapshot(result.snapshot);
+              invalidateBaseFigureTraces();
+              renderFigure();
+              setStatus(`${file.name} loaded (TriOrb).`);
+              return;
+            } catch (error) {
+              console.warn("TriOrb snapshot restore failed; parsing in the browser", error);
+            } finally {
+              fileInput.value = "";
+            }
+          }
+          if (!result?.document) {
+            loadFileInBrowser(file);
+            return;
+          }
+          try {
+            applyUploadedDocument(result.document, result.casetables_url, result.fieldset_planes_url);
+            const triOrbPresent = Boolean(result.document.triorb_shapes?.source);
+            setStatus(`${file.name} loaded${triOrbPresent ? " (TriOrb)" : ""}.`);
+          } catch (error) {
+            console.error(error);
+            setStatus(error.message || "Failed to load file.", "error");
+          } finally {
+            fileInput.value = "";
+          }
+        }
+
+        fileInput.addEventListener("change", (event) => {
+          const file = event.target.files?.[0];
+          if (!file) {
+            return;
+          }
+          // サーバーがある場合は解析をワーカープールへ任せ、静的ビルドではブラウザ内で解析する。
+          if (bootstrapData.uploadApi) {
+            loadFileViaServer(file);
+          } else {
+            loadFileInBrowser(file);
+          }
         });
 
         if (svgFileInput) {
@@ -13316,7 +14424,9 @@ function parsePolygonTrace(doc) {
             const reader = new FileReader();
             reader.onload = () => {
               try {
-                const { shapes, warnings } = parseSvgToShapes(reader.result || "");
+                const { shapes, warnings } = isShapeExchangeFileName(file.name)
+                  ? parseShapeExchange(reader.result || "")
+                  : parseSvgToShapes(reader.result || "");
                 handleSvgImportResult(file.name, shapes, warnings);
               } catch (error) {
                 console.error(error);
@@ -13329,6 +14439,29 @@ function parsePolygonTrace(doc) {
           });
         }
 
+        if (diffFileInput) {
+          diffFileInput.addEventListener("change", async (event) => {
+            const file = event.target.files?.[0];
+            if (!file) {
+              return;
+            }
+            setStatus(`Comparing with ${file.name}...`, "warning");
+            try {
+              const diff = await compareWithFile(file);
+              setDocumentDiffOverlay(diff);
+              setStatus(`Diff with ${file.name}: ${describeDocumentDiff(diff)}`);
+            } catch (error) {
+              console.error(error);
+              setStatus(error.message || "Compare failed.", "error");
+            } finally {
+              diffFileInput.value = "";
+            }
+          });
+        }
+        if (clearDiffBtn) {
+          clearDiffBtn.addEventListener("click", () => setDocumentDiffOverlay(null));
+        }
+
         if (svgImportApplyBtn) {
           svgImportApplyBtn.addEventListener("click", applyPendingSvgImport);
         }
@@ -13438,13 +14571,43 @@ function parsePolygonTrace(doc) {
 
         setupLayoutObservers();
         renderFigure();
+        const deferredBootstrapReady = loadDeferredBootstrapSections();
 
         window.__triorbTestApi = {
-          buildTriOrbXml: () => buildTriOrbXml(),
+          whenBootstrapReady: () => deferredBootstrapReady,
+          loadFileViaServer: (file) => loadFileViaServer(file),
+          selectCasetable: (key) => selectCasetable(String(key)),
+          ensureCasetablesLoaded: () => ensureCasetablesLoaded(),
+          getCasetableCatalog: () =>
+            casetableCatalog.map((entry) => ({
+              key: entry.key,
+              name: entry.name,
+              active: entry.key === activeCasetableKey,
+              loaded: entry.key === activeCasetableKey || Boolean(entry.state || entry.payload || entry.node),
+            })),
+          selectFieldsetPlane: (key) => selectFieldsetPlane(String(key)),
+          ensureFieldsetPlanesLoaded: () => ensureFieldsetPlanesLoaded(),
+          getFieldsetPlaneCatalog: () =>
+            fieldsetPlaneCatalog.map((entry) => ({
+              key: entry.key,
+              active: entry.key === activeFieldsetPlaneKey,
+              loaded:
+                entry.key === activeFieldsetPlaneKey || Boolean(entry.state || entry.payload || entry.node),
+            })),
+          getStageTimings: () => stageTimer.snapshot(),
+          buildTriOrbXml: () => buildCompressedTriOrbXml(),
           buildLegacyXml: () => buildLegacyXml(),
           getStateSnapshot: () => captureTriOrbStateSnapshot(),
-          loadXml: (xmlText) => {
-            const parsed = parseXmlToFigure(xmlText);
+          queryTriOrbShapes: ({ point = null, radius = 0, box = null } = {}) => {
+            const index = resolveTriOrbShapeSpatialIndex();
+            if (box) {
+              return index.queryBox(...box);
+            }
+            return point ? index.queryRadius(point[0], point[1], radius) : index.candidatePairs();
+          },
+          loadXml: async (xmlText) => {
+            const inflatedSnapshot = await inflateTriOrbStateSnapshotOrNull(xmlText);
+            const parsed = parseXmlToFigure(xmlText, { inflatedSnapshot });
             currentFigure = { data: parsed.traces, layout: parsed.layout };
             invalidateBaseFigureTraces();
             renderFigure();
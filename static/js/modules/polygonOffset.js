@@ -0,0 +1,391 @@
+// polygon_offset.py と同じアルゴリズムのブラウザ版（プレビューを同期的に描くため）。
+// 辺を法線方向に delta 動かして角を継ぎ、自己交差した部分を非ゼロ巻き数で解消する。
+import { parseNumeric } from "./geometry.js";
+
+export const JOIN_STYLES = ["miter", "round", "bevel"];
+export const DEFAULT_MITER_LIMIT = 2;
+// 円弧で近似するときの弦と円弧の最大距離 (mm)。
+export const DEFAULT_ARC_TOLERANCE = 0.25;
+
+// 内積・外積がこれ未満の角はまっすぐとみなす。
+const STRAIGHT_EPSILON = 1e-12;
+// 閉じる角のうち cos がこれ以上のほぼ平らな角は、元の頂点を経由させない。
+const FLAT_FOLD_COS = 0.99;
+
+function toRing(points) {
+  // {X, Y} の点列・[x, y] の組のどちらも [x, y] の配列にする。
+  return (points || []).map((point) =>
+    Array.isArray(point)
+      ? [parseNumeric(point[0], 0), parseNumeric(point[1], 0)]
+      : [parseNumeric(point?.X, 0), parseNumeric(point?.Y, 0)]
+  );
+}
+
+function cleanRing(ring) {
+  // 連続する重複点（閉じるための末尾の点も含む）を落とす。
+  if (ring.length < 2) {
+    return ring;
+  }
+  const kept = ring.filter((point, index) => {
+    const previous = ring[(index + ring.length - 1) % ring.length];
+    return point[0] !== previous[0] || point[1] !== previous[1];
+  });
+  return kept.length ? kept : [ring[0]];
+}
+
+export function signedArea(ring) {
+  // 反時計回りなら正。
+  let forward = 0;
+  let backward = 0;
+  ring.forEach((point, index) => {
+    const next = ring[(index + 1) % ring.length];
+    forward += point[0] * next[1];
+    backward += next[0] * point[1];
+  });
+  return 0.5 * (forward - backward);
+}
+
+function arcStep(delta, tolerance) {
+  // 弦の高さが tolerance 以下になる 1 区間あたりの角度。
+  const radius = Math.abs(delta);
+  if (tolerance <= 0 || tolerance >= radius) {
+    return Math.PI / 2;
+  }
+  return 2 * Math.acos(1 - tolerance / radius);
+}
+
+export function rawOffsetCurve(
+  ring,
+  delta,
+  { join = "miter", miterLimit = DEFAULT_MITER_LIMIT, arcTolerance = DEFAULT_ARC_TOLERANCE } = {}
+) {
+  // ring は反時計回りで 3 点以上。戻り値は自己交差しうる未解消の曲線。
+  if (!JOIN_STYLES.includes(join)) {
+    throw new Error(`Unsupported join style: ${join}`);
+  }
+  const count = ring.length;
+  // 辺 i は点 i → 点 i+1。反時計回りなので外向き法線は進行方向の右側。
+  const tangents = ring.map((point, index) => {
+    const next = ring[(index + 1) % count];
+    const dx = next[0] - point[0];
+    const dy = next[1] - point[1];
+    const length = Math.sqrt(dx * dx + dy * dy);
+    return [dx / length, dy / length];
+  });
+  const normals = tangents.map((tangent) => [tangent[1], -tangent[0]]);
+  const step = arcStep(delta, arcTolerance);
+  const sign = Math.sign(delta);
+  const out = [];
+  ring.forEach(([ox, oy], vertex) => {
+    const previous = (vertex + count - 1) % count;
+    const tIn = tangents[previous];
+    const tOut = tangents[vertex];
+    const nIn = normals[previous];
+    const nOut = normals[vertex];
+    const cross = tIn[0] * tOut[1] - tIn[1] * tOut[0];
+    const dot = tIn[0] * tOut[0] + tIn[1] * tOut[1];
+    const start = [ox + delta * nIn[0], oy + delta * nIn[1]];
+    const end = [ox + delta * nOut[0], oy + delta * nOut[1]];
+    const flat = Math.abs(cross) < STRAIGHT_EPSILON;
+    if (flat && dot > 0) {
+      // 直線上の頂点: 前後の辺のオフセット線は同じ点で接する。
+      out.push(end);
+      return;
+    }
+    const spike = flat;
+    if (!spike && !(cross * delta > 0)) {
+      // 閉じる角: 始点 →（元の頂点 →）終点。後で巻き数により解消する。
+      out.push(start);
+      if (dot < FLAT_FOLD_COS) {
+        out.push([ox, oy]);
+      }
+      out.push(end);
+      return;
+    }
+    const turn = spike ? (delta < 0 ? -Math.PI : Math.PI) : Math.atan2(cross, dot);
+    const halfCos = Math.cos(Math.abs(turn) / 2);
+    let sharp = false;
+    if (join === "round") {
+      sharp = !spike && Math.abs(delta) * (1 - halfCos) <= arcTolerance * halfCos;
+    } else if (join === "miter") {
+      sharp = !spike && halfCos * miterLimit >= 1;
+    }
+    if (sharp) {
+      const scale = 1 + (nIn[0] * nOut[0] + nIn[1] * nOut[1]);
+      out.push([ox + (delta * (nIn[0] + nOut[0])) / scale, oy + (delta * (nIn[1] + nOut[1])) / scale]);
+      return;
+    }
+    if (join === "round") {
+      const segments = Math.max(1, Math.ceil(Math.abs(turn) / step - 1e-9));
+      for (let slot = 0; slot <= segments; slot += 1) {
+        const angle = turn * (slot / segments);
+        const cos = Math.cos(angle);
+        const sin = Math.sin(angle);
+        out.push([
+          ox + delta * (nIn[0] * cos - nIn[1] * sin),
+          oy + delta * (nIn[0] * sin + nIn[1] * cos),
+        ]);
+      }
+      return;
+    }
+    if (join === "bevel") {
+      out.push(start, end);
+      return;
+    }
+    // 角の二等分方向に |delta| * miterLimit の位置で切り落とす。
+    let dx = spike ? tIn[0] * sign : nIn[0] + nOut[0];
+    let dy = spike ? tIn[1] * sign : nIn[1] + nOut[1];
+    dx *= sign;
+    dy *= sign;
+    const norm = Math.sqrt(dx * dx + dy * dy);
+    dx /= norm;
+    dy /= norm;
+    const reach = Math.abs(delta) * miterLimit;
+    [
+      [nIn, tIn],
+      [nOut, tOut],
+    ].forEach(([normal, tangent]) => {
+      const along = tangent[0] * dx + tangent[1] * dy;
+      const across = normal[0] * dx + normal[1] * dy;
+      const distance = (reach - delta * across) / along;
+      out.push([ox + delta * normal[0] + distance * tangent[0], oy + delta * normal[1] + distance * tangent[1]]);
+    });
+  });
+  return out;
+}
+
+function splitPoints(a, b) {
+  // 線分どうしが交わる・重なる位置を線分ごとに [t, 座標] で集める。
+  const count = a.length;
+  const splits = a.map(() => []);
+  const d = a.map((point, index) => [b[index][0] - point[0], b[index][1] - point[1]]);
+  const lo = a.map((point, index) => [Math.min(point[0], b[index][0]), Math.min(point[1], b[index][1])]);
+  const hi = a.map((point, index) => [Math.max(point[0], b[index][0]), Math.max(point[1], b[index][1])]);
+  // y の下端で並べ、y の範囲が重なる線分の組だけを調べる。
+  const order = a.map((_, index) => index).sort((left, right) => lo[left][1] - lo[right][1]);
+  for (let position = 0; position < count; position += 1) {
+    const first = order[position];
+    for (let other = position + 1; other < count && lo[order[other]][1] <= hi[first][1]; other += 1) {
+      const i = Math.min(first, order[other]);
+      const j = Math.max(first, order[other]);
+      if (lo[i][0] > hi[j][0] || lo[j][0] > hi[i][0]) {
+        continue;
+      }
+      const di = d[i];
+      const dj = d[j];
+      const denom = di[0] * dj[1] - di[1] * dj[0];
+      const rx = a[j][0] - a[i][0];
+      const ry = a[j][1] - a[i][1];
+      const rCross = rx * di[1] - ry * di[0];
+      const adjacent = (i + 1) % count === j || (j + 1) % count === i;
+      if (denom !== 0) {
+        if (adjacent) {
+          continue;
+        }
+        const t = (rx * dj[1] - ry * dj[0]) / denom;
+        const u = rCross / denom;
+        if (t >= 0 && t <= 1 && u >= 0 && u <= 1) {
+          // 交点は一度だけ計算し、交わる 2 本の線分に同じ座標で割り込ませる。
+          const crossing = [a[i][0] + t * di[0], a[i][1] + t * di[1]];
+          splits[i].push([t, crossing]);
+          splits[j].push([u, crossing]);
+        }
+        continue;
+      }
+      const lengthI = di[0] * di[0] + di[1] * di[1];
+      const lengthJ = dj[0] * dj[0] + dj[1] * dj[1];
+      if (Math.abs(rCross) > 1e-12 * (lengthI + (rx * rx + ry * ry))) {
+        continue;
+      }
+      // 同一直線上で重なる場合は、互いの端点でもう一方を分割する（隣接する線分も含む）。
+      [
+        [i, lengthI, di, j],
+        [j, lengthJ, dj, i],
+      ].forEach(([segment, length, direction, other]) => {
+        const origin = a[segment];
+        [a[other], b[other]].forEach((endpoint) => {
+          const param =
+            ((endpoint[0] - origin[0]) * direction[0] + (endpoint[1] - origin[1]) * direction[1]) / length;
+          if (param > 0 && param < 1) {
+            splits[segment].push([param, endpoint]);
+          }
+        });
+      });
+    }
+  }
+  return splits;
+}
+
+function buildBands(a, b) {
+  // y 方向の帯ごとに、その高さにかかる線分の番号を持つ（巻き数の候補を絞るため）。
+  const ys = a.map((point) => point[1]);
+  const bottom = Math.min(...ys);
+  const size = (Math.max(...ys) - bottom) / Math.max(1, Math.round(Math.sqrt(a.length))) || 1;
+  const bandOf = (y) => Math.floor((y - bottom) / size);
+  const bands = new Map();
+  a.forEach((start, index) => {
+    const last = bandOf(Math.max(start[1], b[index][1]));
+    for (let band = bandOf(Math.min(start[1], b[index][1])); band <= last; band += 1) {
+      if (!bands.has(band)) {
+        bands.set(band, []);
+      }
+      bands.get(band).push(index);
+    }
+  });
+  return (y) => bands.get(bandOf(y)) || [];
+}
+
+function windingNumber(x, y, exclude, a, b, candidates) {
+  // (x, y) から +x 方向への半直線と交わる線分の符号付き数。点が乗っている線分は数えない。
+  let winding = 0;
+  candidates(y).forEach((index) => {
+    if (index === exclude) {
+      return;
+    }
+    const start = a[index];
+    const end = b[index];
+    const cdx = end[0] - start[0];
+    const cdy = end[1] - start[1];
+    const px = x - start[0];
+    const py = y - start[1];
+    const side = cdx * py - px * cdy;
+    if (Math.abs(side) <= 1e-12 * (cdx * cdx + cdy * cdy + px * px + py * py)) {
+      return;
+    }
+    const aboveStart = y >= start[1];
+    const aboveEnd = y >= end[1];
+    if (aboveStart && !aboveEnd && side > 0) {
+      winding += 1;
+    } else if (!aboveStart && aboveEnd && side < 0) {
+      winding -= 1;
+    }
+  });
+  return winding;
+}
+
+export function resolveOffsetCurve(curve) {
+  // 自己交差する閉曲線を、巻き数が正の領域の境界の輪に分ける。
+  const a = cleanRing(curve);
+  if (a.length < 3) {
+    return [];
+  }
+  const count = a.length;
+  const b = a.map((_, index) => a[(index + 1) % count]);
+  const xs = a.map((point) => point[0]);
+  const ys = a.map((point) => point[1]);
+  const extent = Math.max(Math.max(...xs) - Math.min(...xs), Math.max(...ys) - Math.min(...ys)) || 1;
+  const quantum = extent * 1e-12;
+
+  const splits = splitPoints(a, b);
+  if (splits.every((entries) => !entries.length)) {
+    // 交差の無い単純な曲線: 反時計回りならそのまま、反転していれば何も残らない。
+    return signedArea(a) > quantum * extent ? [a] : [];
+  }
+
+  // 各線分の区間: 分割点から次の分割点（線分の最後なら線分の終点）まで。
+  const keyOf = (point) => [Math.round(point[0] / quantum), Math.round(point[1] / quantum)];
+  const pieces = [];
+  splits.forEach((entries, segment) => {
+    const sorted = [[0, a[segment]], ...entries].sort((left, right) => left[0] - right[0]);
+    sorted.forEach(([, point], index) => {
+      const next = index + 1 < sorted.length ? sorted[index + 1][1] : b[segment];
+      const keyA = keyOf(point);
+      const keyB = keyOf(next);
+      if (keyA[0] !== keyB[0] || keyA[1] !== keyB[1]) {
+        pieces.push({ segment, a: point, b: next, keyA, keyB });
+      }
+    });
+  });
+
+  // 重なった区間は向きの総和で 1 本にまとめる（往復して打ち消し合うものは消える）。
+  const groups = new Map();
+  pieces.forEach((piece) => {
+    const forward =
+      piece.keyA[0] < piece.keyB[0] || (piece.keyA[0] === piece.keyB[0] && piece.keyA[1] < piece.keyB[1]);
+    const [low, high] = forward ? [piece.keyA, piece.keyB] : [piece.keyB, piece.keyA];
+    const id = `${low[0]},${low[1]},${high[0]},${high[1]}`;
+    const group = groups.get(id);
+    if (group) {
+      group.net += forward ? 1 : -1;
+    } else {
+      groups.set(id, { piece, forward, net: forward ? 1 : -1 });
+    }
+  });
+
+  // 区間の左側が正・右側が 0 以下なら正の領域の境界（右側は左側から重なり数を引いた値）。
+  // 中点で他の線分の巻き数を数え、自身の線分は中点のすぐ -x 側の点として同じ半開区間の
+  // 規則で数える（Python 版の説明を参照）。
+  const candidates = buildBands(a, b);
+  const kept = [];
+  groups.forEach(({ piece, forward, net }) => {
+    if (net === 0) {
+      return;
+    }
+    const multiplicity = Math.abs(net);
+    const flip = forward !== net > 0;
+    const start = flip ? piece.b : piece.a;
+    const end = flip ? piece.a : piece.b;
+    const segmentStart = a[piece.segment];
+    const segmentEnd = b[piece.segment];
+    const directionX = (segmentEnd[0] - segmentStart[0]) * (flip ? -1 : 1);
+    const directionY = (segmentEnd[1] - segmentStart[1]) * (flip ? -1 : 1);
+    const middleX = (start[0] + end[0]) / 2;
+    const middleY = (start[1] + end[1]) / 2;
+    const low = Math.min(segmentStart[1], segmentEnd[1]);
+    const high = Math.max(segmentStart[1], segmentEnd[1]);
+    const spans = low <= middleY && middleY < high ? 1 : 0;
+    const own = (directionY > 0 ? spans : -spans) * multiplicity;
+    const rightSide = directionY < 0 || (directionY === 0 && directionX < 0) ? 1 : 0;
+    const left = windingNumber(middleX, middleY, piece.segment, a, b, candidates) + own + rightSide * multiplicity;
+    if (left > 0 && left - multiplicity <= 0) {
+      kept.push({
+        a: start,
+        keyA: (flip ? piece.keyB : piece.keyA).join(","),
+        keyB: (flip ? piece.keyA : piece.keyB).join(","),
+      });
+    }
+  });
+
+  // 残った区間を端点でつないで輪にする。
+  const outgoing = new Map();
+  kept.forEach((piece) => {
+    if (!outgoing.has(piece.keyA)) {
+      outgoing.set(piece.keyA, []);
+    }
+    outgoing.get(piece.keyA).push(piece);
+  });
+  const used = new Set();
+  const rings = [];
+  kept.forEach((first) => {
+    if (used.has(first)) {
+      return;
+    }
+    const chain = [];
+    let piece = first;
+    while (piece && !used.has(piece)) {
+      used.add(piece);
+      chain.push(piece.a);
+      piece = (outgoing.get(piece.keyB) || []).find((candidate) => !used.has(candidate));
+    }
+    if (chain.length >= 3 && Math.abs(signedArea(chain)) > quantum * extent) {
+      rings.push(chain);
+    }
+  });
+  return rings;
+}
+
+export function offsetPolygon(points, delta, options = {}) {
+  // 正の delta で広げ、負で縮める（入力の回転方向によらない）。結果の輪は入力と同じ
+  // 回転方向の [x, y] 配列で、縮めて消えたときは空配列。
+  const ring = cleanRing(toRing(points));
+  const area = ring.length >= 3 ? signedArea(ring) : 0;
+  if (area === 0) {
+    return delta >= 0 && ring.length >= 3 ? [ring] : [];
+  }
+  if (delta === 0) {
+    return [ring];
+  }
+  const oriented = area > 0 ? ring : ring.slice().reverse();
+  const rings = resolveOffsetCurve(rawOffsetCurve(oriented, delta, options));
+  return area > 0 ? rings : rings.map((result) => result.slice().reverse());
+}
@@ -0,0 +1,132 @@
+// Fusion 360 アドインなどが書き出す TriOrb Shapes（JSON / <TriOrb_SICK_SLS_Editor><Shapes> 断片）の読み込み。
+// SVG と違って座標はエディターの mm（Y 上向き）のままなので、反転や再サンプリングをせずに取り込む。
+
+// tools/fusion360_svg_export/geometry_core.py の SHAPES_FORMAT と同じ。
+export const SHAPES_FORMAT = "triorb-shapes";
+
+const SHAPE_TYPES = ["Polygon", "Rectangle", "Circle"];
+
+// JSON は [x, y] の組、XML / エディター形式は { X, Y } の文字列。
+function normalizePoints(points) {
+  if (!Array.isArray(points)) {
+    return [];
+  }
+  return points
+    .map((point) => (Array.isArray(point) ? { X: point[0], Y: point[1] } : point))
+    .filter((point) => point && point.X !== undefined && point.Y !== undefined)
+    .map((point) => ({ X: String(point.X), Y: String(point.Y) }));
+}
+
+function toEntry(shape, index, warnings) {
+  const type = shape?.type;
+  if (!SHAPE_TYPES.includes(type)) {
+    warnings.add(`Shape ${index + 1} (type ${type || "?"})`);
+    return null;
+  }
+  const entry = {
+    type,
+    id: shape.id || undefined,
+    name: shape.name || undefined,
+    kind: shape.kind || undefined,
+    fieldtype: shape.fieldtype || undefined,
+    coordinates: "editor",
+  };
+  if (type === "Polygon") {
+    const points = normalizePoints(shape.polygon?.points);
+    if (points.length < 3) {
+      warnings.add(`Shape ${index + 1} (fewer than 3 points)`);
+      return null;
+    }
+    entry.polygon = { Type: shape.polygon?.Type || shape.kind || "Field", points };
+  } else if (type === "Rectangle") {
+    entry.rectangle = { ...(shape.rectangle || {}) };
+  } else {
+    entry.circle = { ...(shape.circle || {}) };
+  }
+  return entry;
+}
+
+function parseShapesJson(text) {
+  let data;
+  try {
+    data = JSON.parse(text);
+  } catch (error) {
+    throw new Error("Shapes JSON の解析に失敗しました。");
+  }
+  const shapes = Array.isArray(data) ? data : data?.shapes;
+  if (!Array.isArray(shapes)) {
+    throw new Error('Shapes JSON に "shapes" の配列がありません。');
+  }
+  if (!Array.isArray(data) && data.format && data.format !== SHAPES_FORMAT) {
+    throw new Error(`Shapes JSON の format ${data.format} には対応していません。`);
+  }
+  if (!Array.isArray(data) && data.unit && data.unit !== "mm") {
+    throw new Error(`Shapes JSON の単位 ${data.unit} には対応していません（mm のみ）。`);
+  }
+  return shapes;
+}
+
+function readAttributes(node) {
+  const attrs = {};
+  Array.from(node?.attributes || []).forEach((attr) => {
+    attrs[attr.name] = attr.value;
+  });
+  return attrs;
+}
+
+function parseShapesXml(text, DOMParserImpl) {
+  if (!DOMParserImpl) {
+    throw new Error("XML を解析できません。");
+  }
+  const doc = new DOMParserImpl().parseFromString(text, "application/xml");
+  if (doc.querySelector("parsererror")) {
+    throw new Error("Shapes XML の解析に失敗しました。");
+  }
+  const root = doc.querySelector("TriOrb_SICK_SLS_Editor");
+  const shapesParent = root ? Array.from(root.children).find((node) => node.tagName === "Shapes") : null;
+  if (!shapesParent) {
+    throw new Error("TriOrb_SICK_SLS_Editor > Shapes が見つかりませんでした。");
+  }
+  return Array.from(shapesParent.children)
+    .filter((node) => node.tagName === "Shape")
+    .map((node) => {
+      const attrs = readAttributes(node);
+      const shape = {
+        id: attrs.ID,
+        name: attrs.Name,
+        type: attrs.Type,
+        fieldtype: attrs.Fieldtype,
+        kind: attrs.Kind,
+      };
+      const geometry = Array.from(node.children).find((child) => child.tagName === attrs.Type);
+      if (attrs.Type === "Polygon" && geometry) {
+        shape.polygon = {
+          ...readAttributes(geometry),
+          points: Array.from(geometry.children)
+            .filter((child) => child.tagName === "Point")
+            .map(readAttributes),
+        };
+      } else if (attrs.Type === "Rectangle" && geometry) {
+        shape.rectangle = readAttributes(geometry);
+      } else if (attrs.Type === "Circle" && geometry) {
+        shape.circle = readAttributes(geometry);
+      }
+      return shape;
+    });
+}
+
+// JSON か XML かを先頭の文字で判定し、Import (SVG) と同じ { shapes, warnings } を返す。
+export function parseShapeExchange(text, { DOMParserImpl = globalThis.DOMParser } = {}) {
+  const trimmed = (text || "").trim();
+  const rawShapes =
+    trimmed.startsWith("{") || trimmed.startsWith("[")
+      ? parseShapesJson(trimmed)
+      : parseShapesXml(trimmed, DOMParserImpl);
+  const warnings = new Set();
+  const shapes = rawShapes.map((shape, index) => toEntry(shape, index, warnings)).filter(Boolean);
+  return { shapes, warnings: Array.from(warnings) };
+}
+
+export function isShapeExchangeFileName(fileName = "") {
+  return /\.(json|xml)$/i.test(fileName);
+}
@@ -0,0 +1,231 @@
+// TriOrb Shape の外接矩形の一様グリッド（spatial_index.py と同じ判定）。
+// 点・矩形・半径の問い合わせと重なり候補の列挙を、問い合わせが触れるセルだけを見て行う。
+// 結果は外接矩形の段階までで、厳密な内外判定は呼び出し側で行う。
+import { getRectangleCornerPoints, parseNumeric } from "./geometry.js";
+
+// 1 つの図形が登録されるセル数の上限。超える大きな図形は別リストに置き、毎回まとめて判定する。
+export const MAX_CELLS_PER_SHAPE = 64;
+// セル幅は外接矩形の長辺の中央値（小さい図形ばかりのときの下限）。
+export const MIN_CELL_SIZE = 1;
+
+function boundsFromPoints(points) {
+  let minX = Infinity;
+  let minY = Infinity;
+  let maxX = -Infinity;
+  let maxY = -Infinity;
+  let reach = 0;
+  points.forEach(({ x, y }) => {
+    if (x < minX) minX = x;
+    if (x > maxX) maxX = x;
+    if (y < minY) minY = y;
+    if (y > maxY) maxY = y;
+    const distance = Math.hypot(x, y);
+    if (distance > reach) reach = distance;
+  });
+  return { minX, minY, maxX, maxY, reach };
+}
+
+// calculateVisibleFieldsetRadius と同じく、解釈できない座標は 0 として扱う。
+export function shapeBounds(shape) {
+  if (!shape) {
+    return null;
+  }
+  if (shape.type === "Polygon" && shape.polygon) {
+    const points = (shape.polygon.points || []).map((point) => ({
+      x: parseNumeric(point.X, 0),
+      y: parseNumeric(point.Y, 0),
+    }));
+    if (!points.length) {
+      return null;
+    }
+    return boundsFromPoints(points);
+  }
+  if (shape.type === "Rectangle" && shape.rectangle) {
+    const corners = getRectangleCornerPoints(shape.rectangle);
+    if (!corners) {
+      return null;
+    }
+    return boundsFromPoints(corners);
+  }
+  if (shape.type === "Circle" && shape.circle) {
+    const centerX = parseNumeric(shape.circle.CenterX, 0);
+    const centerY = parseNumeric(shape.circle.CenterY, 0);
+    const radius = Math.max(0, parseNumeric(shape.circle.Radius, 0));
+    return {
+      minX: centerX - radius,
+      minY: centerY - radius,
+      maxX: centerX + radius,
+      maxY: centerY + radius,
+      reach: Math.hypot(centerX, centerY) + radius,
+    };
+  }
+  return null;
+}
+
+export function defaultCellSize(boundsList) {
+  const extents = boundsList
+    .map((bounds) => Math.max(bounds.maxX - bounds.minX, bounds.maxY - bounds.minY))
+    .filter((extent) => extent > 0)
+    .sort((a, b) => a - b);
+  if (!extents.length) {
+    return MIN_CELL_SIZE;
+  }
+  return Math.max(MIN_CELL_SIZE, extents[Math.floor(extents.length / 2)]);
+}
+
+function boxesIntersect(a, minX, minY, maxX, maxY) {
+  return a.minX <= maxX && a.maxX >= minX && a.minY <= maxY && a.maxY >= minY;
+}
+
+export class ShapeSpatialIndex {
+  constructor(shapes = [], { cellSize = null } = {}) {
+    this.rebuild(shapes, { cellSize });
+  }
+
+  // 全図形から作り直す（rebuildTriOrbShapeRegistry と同じ単位）。
+  rebuild(shapes = [], { cellSize = null } = {}) {
+    this.ids = [];
+    this.boundsList = [];
+    this.slots = new Map();
+    (shapes || []).forEach((shape) => {
+      const bounds = shapeBounds(shape);
+      if (bounds) {
+        this.slots.set(shape.id, this.ids.length);
+        this.ids.push(shape.id);
+        this.boundsList.push(bounds);
+      }
+    });
+    const size = cellSize ?? defaultCellSize(this.boundsList);
+    if (!(size > 0)) {
+      throw new Error("cellSize must be positive");
+    }
+    this.cellSize = size;
+    this.cells = new Map();
+    this.large = [];
+    this.boundsList.forEach((bounds, slot) => {
+      const [x0, y0, x1, y1] = this.cellRange(bounds.minX, bounds.minY, bounds.maxX, bounds.maxY);
+      if ((x1 - x0 + 1) * (y1 - y0 + 1) > MAX_CELLS_PER_SHAPE) {
+        this.large.push(slot);
+        return;
+      }
+      for (let cx = x0; cx <= x1; cx += 1) {
+        for (let cy = y0; cy <= y1; cy += 1) {
+          const key = `${cx},${cy}`;
+          const members = this.cells.get(key);
+          if (members) {
+            members.push(slot);
+          } else {
+            this.cells.set(key, [slot]);
+          }
+        }
+      }
+    });
+    return this;
+  }
+
+  get size() {
+    return this.ids.length;
+  }
+
+  bounds(shapeId) {
+    const slot = this.slots.get(shapeId);
+    return slot === undefined ? null : this.boundsList[slot];
+  }
+
+  cellRange(minX, minY, maxX, maxY) {
+    const size = this.cellSize;
+    return [
+      Math.floor(minX / size),
+      Math.floor(minY / size),
+      Math.floor(maxX / size),
+      Math.floor(maxY / size),
+    ];
+  }
+
+  boxSlots(minX, minY, maxX, maxY) {
+    if (!this.ids.length || minX > maxX || minY > maxY) {
+      return [];
+    }
+    const [x0, y0, x1, y1] = this.cellRange(minX, minY, maxX, maxY);
+    let candidates;
+    if ((x1 - x0 + 1) * (y1 - y0 + 1) >= this.cells.size) {
+      // 問い合わせがセルの総数より広いときは全件を判定するほうが速い。
+      candidates = this.ids.map((_, slot) => slot);
+    } else {
+      const found = new Set(this.large);
+      for (let cx = x0; cx <= x1; cx += 1) {
+        for (let cy = y0; cy <= y1; cy += 1) {
+          (this.cells.get(`${cx},${cy}`) || []).forEach((slot) => found.add(slot));
+        }
+      }
+      candidates = Array.from(found).sort((a, b) => a - b);
+    }
+    return candidates.filter((slot) => boxesIntersect(this.boundsList[slot], minX, minY, maxX, maxY));
+  }
+
+  queryBox(minX, minY, maxX, maxY) {
+    return this.boxSlots(minX, minY, maxX, maxY).map((slot) => this.ids[slot]);
+  }
+
+  queryPoint(x, y, tolerance = 0) {
+    return this.queryBox(x - tolerance, y - tolerance, x + tolerance, y + tolerance);
+  }
+
+  queryRadius(x, y, radius) {
+    return this.boxSlots(x - radius, y - radius, x + radius, y + radius)
+      .filter((slot) => {
+        const bounds = this.boundsList[slot];
+        const dx = Math.max(bounds.minX - x, x - bounds.maxX, 0);
+        const dy = Math.max(bounds.minY - y, y - bounds.maxY, 0);
+        return dx * dx + dy * dy <= radius * radius;
+      })
+      .map((slot) => this.ids[slot]);
+  }
+
+  // 外接矩形が重なる図形の組（重なり判定の候補）を図形順で返す。
+  candidatePairs() {
+    const pairs = new Set();
+    const addPair = (a, b) => {
+      if (a !== b) {
+        pairs.add(a < b ? `${a},${b}` : `${b},${a}`);
+      }
+    };
+    this.cells.forEach((members) => {
+      for (let i = 0; i < members.length; i += 1) {
+        for (let j = i + 1; j < members.length; j += 1) {
+          addPair(members[i], members[j]);
+        }
+      }
+    });
+    this.large.forEach((slot) => {
+      const { minX, minY, maxX, maxY } = this.boundsList[slot];
+      this.boundsList.forEach((bounds, other) => {
+        if (boxesIntersect(bounds, minX, minY, maxX, maxY)) {
+          addPair(slot, other);
+        }
+      });
+    });
+    return Array.from(pairs)
+      .map((key) => key.split(",").map(Number))
+      .sort((a, b) => a[0] - b[0] || a[1] - b[1])
+      .filter(([a, b]) => {
+        const { minX, minY, maxX, maxY } = this.boundsList[b];
+        return boxesIntersect(this.boundsList[a], minX, minY, maxX, maxY);
+      })
+      .map(([a, b]) => [this.ids[a], this.ids[b]]);
+  }
+
+  maxReach(shapeIds = null) {
+    if (shapeIds === null) {
+      return this.boundsList.reduce((reach, bounds) => Math.max(reach, bounds.reach), 0);
+    }
+    let reach = 0;
+    shapeIds.forEach((shapeId) => {
+      const bounds = this.bounds(shapeId);
+      if (bounds && bounds.reach > reach) {
+        reach = bounds.reach;
+      }
+    });
+    return reach;
+  }
+}
@@ -0,0 +1,336 @@
+// svg_path.py と同じ SVG パスの平坦化（Import (SVG) を同期的に行うためのブラウザ版）。
+// 直線は端点そのまま、ベジエ曲線と円弧は弦との距離が tolerance 以内になる最少の分割にする。
+
+// 曲線と弦の最大距離 (mm)。
+export const DEFAULT_SVG_TOLERANCE = 0.1;
+// 1 本の曲線を分割する上限（許容誤差が極端に小さい場合の保険）。
+const MAX_CURVE_SEGMENTS = 4096;
+
+const ARGUMENT_COUNTS = { M: 2, L: 2, H: 1, V: 1, C: 6, S: 4, Q: 4, T: 2, A: 7, Z: 0 };
+const NUMBER = /[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?/y;
+const SEPARATORS = " \t\r\n\f,";
+
+// パスデータを絶対座標の M / L / C / Q / A / Z に正規化する。
+export function parsePathData(d) {
+  const commands = [];
+  let x = 0;
+  let y = 0;
+  let startX = 0;
+  let startY = 0;
+  // S / T で反射させる直前の制御点。
+  let lastCubic = null;
+  let lastQuadratic = null;
+  let position = 0;
+  let command = null;
+  const length = d.length;
+
+  const skipSeparators = (index) => {
+    while (index < length && SEPARATORS.includes(d[index])) {
+      index += 1;
+    }
+    return index;
+  };
+
+  position = skipSeparators(position);
+  while (position < length) {
+    const char = d[position];
+    if (/[A-Za-z]/.test(char)) {
+      if (!(char.toUpperCase() in ARGUMENT_COUNTS)) {
+        return { commands, error: `unknown command '${char}' at ${position}` };
+      }
+      command = char;
+      position = skipSeparators(position + 1);
+      if (command === "Z" || command === "z") {
+        commands.push(["Z"]);
+        x = startX;
+        y = startY;
+        lastCubic = null;
+        lastQuadratic = null;
+        continue;
+      }
+    } else if (command === null) {
+      return { commands, error: `path data must start with a command (at ${position})` };
+    } else if (command === "Z" || command === "z") {
+      return { commands, error: `unexpected number after Z at ${position}` };
+    }
+
+    const upper = command.toUpperCase();
+    const relative = command !== upper;
+    const values = [];
+    for (let index = 0; index < ARGUMENT_COUNTS[upper]; index += 1) {
+      if (upper === "A" && (index === 3 || index === 4)) {
+        // 円弧のフラグは区切り無しで続けて書ける 1 文字の 0 / 1。
+        if (position >= length || (d[position] !== "0" && d[position] !== "1")) {
+          return { commands, error: `bad arc flag at ${position}` };
+        }
+        values.push(Number(d[position]));
+        position = skipSeparators(position + 1);
+        continue;
+      }
+      NUMBER.lastIndex = position;
+      const match = NUMBER.exec(d);
+      if (!match) {
+        return { commands, error: `expected a number for ${command} at ${position}` };
+      }
+      values.push(Number(match[0]));
+      position = skipSeparators(NUMBER.lastIndex);
+    }
+
+    const dx = relative ? x : 0;
+    const dy = relative ? y : 0;
+    let cubic = null;
+    let quadratic = null;
+    if (upper === "M") {
+      x = values[0] + dx;
+      y = values[1] + dy;
+      startX = x;
+      startY = y;
+      commands.push(["M", x, y]);
+      // M に続く座標の組は L として扱う。
+      command = relative ? "l" : "L";
+    } else if (upper === "L" || upper === "H" || upper === "V") {
+      if (upper === "H") {
+        x = values[0] + dx;
+      } else if (upper === "V") {
+        y = values[0] + dy;
+      } else {
+        x = values[0] + dx;
+        y = values[1] + dy;
+      }
+      commands.push(["L", x, y]);
+    } else if (upper === "C" || upper === "S") {
+      let x1;
+      let y1;
+      let rest;
+      if (upper === "C") {
+        x1 = values[0] + dx;
+        y1 = values[1] + dy;
+        rest = values.slice(2);
+      } else {
+        [x1, y1] = lastCubic ? [2 * x - lastCubic[0], 2 * y - lastCubic[1]] : [x, y];
+        rest = values;
+      }
+      const x2 = rest[0] + dx;
+      const y2 = rest[1] + dy;
+      x = rest[2] + dx;
+      y = rest[3] + dy;
+      commands.push(["C", x1, y1, x2, y2, x, y]);
+      cubic = [x2, y2];
+    } else if (upper === "Q" || upper === "T") {
+      let x1;
+      let y1;
+      if (upper === "Q") {
+        x1 = values[0] + dx;
+        y1 = values[1] + dy;
+        x = values[2] + dx;
+        y = values[3] + dy;
+      } else {
+        [x1, y1] = lastQuadratic ? [2 * x - lastQuadratic[0], 2 * y - lastQuadratic[1]] : [x, y];
+        x = values[0] + dx;
+        y = values[1] + dy;
+      }
+      commands.push(["Q", x1, y1, x, y]);
+      quadratic = [x1, y1];
+    } else {
+      const [rx, ry, rotation, largeArc, sweep] = values;
+      x = values[5] + dx;
+      y = values[6] + dy;
+      commands.push(["A", rx, ry, rotation, largeArc === 1, sweep === 1, x, y]);
+    }
+    lastCubic = cubic;
+    lastQuadratic = quadratic;
+  }
+  return { commands, error: null };
+}
+
+// Wang の式: 次数 d のベジエを n 等分した弦の誤差は d(d-1)/8 * max|P[i] - 2P[i+1] + P[i+2]| / n² 以下。
+export function bezierSegments(control, tolerance) {
+  const degree = control.length - 1;
+  let largest = 0;
+  for (let index = 0; index + 2 < control.length; index += 1) {
+    const ddx = control[index][0] - 2 * control[index + 1][0] + control[index + 2][0];
+    const ddy = control[index][1] - 2 * control[index + 1][1] + control[index + 2][1];
+    largest = Math.max(largest, Math.sqrt(ddx * ddx + ddy * ddy));
+  }
+  if (largest === 0) {
+    return 1;
+  }
+  const segments = Math.ceil(Math.sqrt(((degree * (degree - 1)) / 8) * (largest / tolerance)));
+  return Math.min(MAX_CURVE_SEGMENTS, Math.max(1, segments));
+}
+
+function arcStep(radius, tolerance) {
+  // 弦の高さ（サジッタ）が tolerance 以下になる 1 区間あたりの角度。
+  if (tolerance >= radius) {
+    return Math.PI / 2;
+  }
+  return 2 * Math.acos(1 - tolerance / radius);
+}
+
+function roundCurvePoint(value) {
+  // 曲線上に作った点は 0.001 mm に丸める（formatReplicateNumber と同じ丸め）。
+  return Math.floor(value * 1000 + 0.5) / 1000;
+}
+
+function arcPoints(x1, y1, rx, ry, rotation, largeArc, sweep, x2, y2, tolerance) {
+  // SVG 1.1 F.6.5: 端点表現から中心表現へ変換し、角度を等分する。
+  const phi = (rotation * Math.PI) / 180;
+  const cosPhi = Math.cos(phi);
+  const sinPhi = Math.sin(phi);
+  const halfDx = (x1 - x2) / 2;
+  const halfDy = (y1 - y2) / 2;
+  const x1p = cosPhi * halfDx + sinPhi * halfDy;
+  const y1p = -sinPhi * halfDx + cosPhi * halfDy;
+  rx = Math.abs(rx);
+  ry = Math.abs(ry);
+  // 半径が足りなければ端点を通るまで拡大する（F.6.6）。
+  const scale = (x1p * x1p) / (rx * rx) + (y1p * y1p) / (ry * ry);
+  if (scale > 1) {
+    rx *= Math.sqrt(scale);
+    ry *= Math.sqrt(scale);
+  }
+  const numerator = rx * rx * ry * ry - rx * rx * y1p * y1p - ry * ry * x1p * x1p;
+  const denominator = rx * rx * y1p * y1p + ry * ry * x1p * x1p;
+  let coefficient = denominator ? Math.sqrt(Math.max(0, numerator / denominator)) : 0;
+  if (largeArc === sweep) {
+    coefficient = -coefficient;
+  }
+  const cxp = (coefficient * rx * y1p) / ry;
+  const cyp = (-coefficient * ry * x1p) / rx;
+  const cx = cosPhi * cxp - sinPhi * cyp + (x1 + x2) / 2;
+  const cy = sinPhi * cxp + cosPhi * cyp + (y1 + y2) / 2;
+  const ux = (x1p - cxp) / rx;
+  const uy = (y1p - cyp) / ry;
+  const vx = (-x1p - cxp) / rx;
+  const vy = (-y1p - cyp) / ry;
+  const start = Math.atan2(uy, ux);
+  let sweepAngle = Math.atan2(ux * vy - uy * vx, ux * vx + uy * vy);
+  if (!sweep && sweepAngle > 0) {
+    sweepAngle -= 2 * Math.PI;
+  } else if (sweep && sweepAngle < 0) {
+    sweepAngle += 2 * Math.PI;
+  }
+  const segments = Math.min(
+    MAX_CURVE_SEGMENTS,
+    Math.max(1, Math.ceil(Math.abs(sweepAngle) / arcStep(Math.max(rx, ry), tolerance)))
+  );
+  const points = [];
+  for (let index = 1; index < segments; index += 1) {
+    const angle = start + (sweepAngle * index) / segments;
+    const cosA = Math.cos(angle);
+    const sinA = Math.sin(angle);
+    points.push([
+      roundCurvePoint(cx + rx * cosA * cosPhi - ry * sinA * sinPhi),
+      roundCurvePoint(cy + rx * cosA * sinPhi + ry * sinA * cosPhi),
+    ]);
+  }
+  points.push([x2, y2]);
+  return points;
+}
+
+function bezierPoints(control, tolerance) {
+  const segments = bezierSegments(control, tolerance);
+  const points = [];
+  for (let index = 1; index < segments; index += 1) {
+    const t = index / segments;
+    // de Casteljau で評価する。
+    let current = control;
+    while (current.length > 1) {
+      current = current.slice(1).map((b, i) => {
+        const a = current[i];
+        return [a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t];
+      });
+    }
+    points.push([roundCurvePoint(current[0][0]), roundCurvePoint(current[0][1])]);
+  }
+  points.push(control[control.length - 1]);
+  return points;
+}
+
+// パスデータを部分パスごとの折れ線にする。エラー以降は捨て、それまでの結果と error を返す。
+export function flattenPathData(d, { tolerance = DEFAULT_SVG_TOLERANCE } = {}) {
+  if (!(tolerance > 0)) {
+    throw new RangeError("tolerance must be positive");
+  }
+  const { commands, error } = parsePathData(d || "");
+  const subpaths = [];
+  let current = null;
+  let x = 0;
+  let y = 0;
+  let startX = 0;
+  let startY = 0;
+
+  const samePoint = (a, b) => a[0] === b[0] && a[1] === b[1];
+  const extend = (points) => {
+    if (!current) {
+      // Z の後に M 無しで描画が続く場合は、直前の開始点から新しい部分パスを始める。
+      current = { points: [[startX, startY]], closed: false };
+      subpaths.push(current);
+    }
+    points.forEach((point) => {
+      if (!samePoint(point, current.points[current.points.length - 1])) {
+        current.points.push(point);
+      }
+    });
+  };
+
+  commands.forEach((command) => {
+    const name = command[0];
+    if (name === "M") {
+      [, x, y] = command;
+      startX = x;
+      startY = y;
+      current = { points: [[x, y]], closed: false };
+      subpaths.push(current);
+      return;
+    }
+    if (name === "Z") {
+      if (current) {
+        current.closed = true;
+        const { points } = current;
+        if (points.length > 1 && samePoint(points[points.length - 1], points[0])) {
+          points.pop();
+        }
+      }
+      current = null;
+      x = startX;
+      y = startY;
+      return;
+    }
+    let points;
+    if (name === "L") {
+      points = [[command[1], command[2]]];
+    } else if (name === "C") {
+      points = bezierPoints([[x, y], command.slice(1, 3), command.slice(3, 5), command.slice(5, 7)], tolerance);
+    } else if (name === "Q") {
+      points = bezierPoints([[x, y], command.slice(1, 3), command.slice(3, 5)], tolerance);
+    } else {
+      const [, rx, ry, rotation, largeArc, sweep, endX, endY] = command;
+      if (endX === x && endY === y) {
+        // 始点と終点が同じ円弧は描かない。
+        return;
+      }
+      points =
+        rx === 0 || ry === 0
+          ? [[endX, endY]]
+          : arcPoints(x, y, rx, ry, rotation, largeArc, sweep, endX, endY, tolerance);
+    }
+    extend(points);
+    [x, y] = points[points.length - 1];
+  });
+  // M だけの部分パスは何も描かない。
+  return { subpaths: subpaths.filter((subpath) => subpath.points.length > 1), error };
+}
+
+// エディタの {X, Y} 点列にする（先頭の点で閉じ、3 点未満は捨てる）。
+export function pathDataToPolygons(d, options = {}) {
+  const { subpaths, error } = flattenPathData(d, options);
+  const polygons = subpaths
+    .map((subpath) => {
+      const points = subpath.points.map(([x, y]) => ({ X: String(x), Y: String(y) }));
+      points.push({ ...points[0] });
+      return points;
+    })
+    .filter((points) => points.length >= 3);
+  return { polygons, error };
+}
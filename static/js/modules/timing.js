@@ -0,0 +1,115 @@
+// ?debug=1 のときだけクライアント側の処理時間を performance.mark/measure で計測し、
+// サーバーの Server-Timing と並べてデバッグパネルに表示する。
+
+export function createStageTimer({ enabled = false, onUpdate = null } = {}) {
+  const stats = new Map();
+  let sequence = 0;
+
+  function record(name, duration) {
+    const entry = stats.get(name) || { name, count: 0, last: 0, total: 0, max: 0 };
+    entry.count += 1;
+    entry.last = duration;
+    entry.total += duration;
+    entry.max = Math.max(entry.max, duration);
+    stats.set(name, entry);
+    if (typeof onUpdate === "function") {
+      onUpdate(entry);
+    }
+  }
+
+  function measure(name, fn) {
+    if (!enabled) {
+      return fn();
+    }
+    // 入れ子や再入でも衝突しないよう、呼び出しごとに別名の mark を使う。
+    sequence += 1;
+    const startMark = `${name}:start:${sequence}`;
+    const start = performance.now();
+    performance.mark(startMark);
+    try {
+      return fn();
+    } finally {
+      const duration = performance.now() - start;
+      // DevTools のタイムラインには残るので、バッファが溜まらないよう都度消す。
+      performance.measure(name, startMark);
+      performance.clearMarks(startMark);
+      performance.clearMeasures(name);
+      record(name, duration);
+    }
+  }
+
+  return {
+    enabled,
+    measure,
+    snapshot: () => Array.from(stats.values(), (entry) => ({ ...entry })),
+  };
+}
+
+export function collectServerTimings() {
+  // 同一オリジンのナビゲーション/fetch には PerformanceEntry.serverTiming が付く。
+  if (typeof performance === "undefined" || !performance.getEntriesByType) {
+    return [];
+  }
+  const entries = [
+    ...performance.getEntriesByType("navigation"),
+    ...performance.getEntriesByType("resource"),
+  ];
+  return entries
+    .filter((entry) => Array.isArray(entry.serverTiming) && entry.serverTiming.length)
+    .map((entry) => {
+      const url = new URL(entry.name, window.location.href);
+      return {
+        source: `${url.pathname}${url.search}`,
+        metrics: entry.serverTiming.map((metric) => ({
+          name: metric.name,
+          duration: metric.duration,
+          description: metric.description,
+        })),
+      };
+    });
+}
+
+function formatMs(value) {
+  return `${Number(value || 0).toFixed(1)} ms`;
+}
+
+export function renderTimingPanel(container, stageTimer) {
+  if (!container) {
+    return;
+  }
+  const rows = [];
+  collectServerTimings().forEach(({ source, metrics }) => {
+    metrics.forEach((metric) => {
+      rows.push([
+        "server",
+        source,
+        metric.description ? `${metric.name} (${metric.description})` : metric.name,
+        formatMs(metric.duration),
+      ]);
+    });
+  });
+  stageTimer.snapshot().forEach((entry) => {
+    rows.push([
+      "client",
+      `x${entry.count}`,
+      entry.name,
+      `${formatMs(entry.last)} (max ${formatMs(entry.max)})`,
+    ]);
+  });
+  const body = container.querySelector("tbody");
+  if (!body) {
+    return;
+  }
+  body.replaceChildren(
+    ...rows.map((cells) => {
+      const tr = document.createElement("tr");
+      cells.forEach((text) => {
+        const td = document.createElement("td");
+        td.textContent = text;
+        tr.appendChild(td);
+      });
+      return tr;
+    })
+  );
+  container.hidden = false;
+}
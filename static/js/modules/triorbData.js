@@ -67,6 +67,19 @@ export function createDefaultCircleDetails() {
   };
 }
 
+export function expandPackedPoints(points) {
+  // サーバーが ?points=packed で返す [x0, y0, x1, y1, ...] を従来の点オブジェクトへ戻す。
+  // サーバー側は String(number) で元の文字列に戻る座標だけを数値化している。
+  if (!Array.isArray(points) || !points.length || typeof points[0] !== "number") {
+    return points;
+  }
+  const expanded = [];
+  for (let index = 0; index + 1 < points.length; index += 2) {
+    expanded.push({ X: String(points[index]), Y: String(points[index + 1]) });
+  }
+  return expanded;
+}
+
 export function formatPolygonPoints(points) {
   return (points || [])
     .map((point) => `(${point.X},${point.Y})`)
@@ -174,6 +187,9 @@ export function initializeTriOrbShapes(data) {
     const polygon = shape.polygon
       ? JSON.parse(JSON.stringify(shape.polygon))
       : createDefaultPolygonDetails();
+    if (polygon.points) {
+      polygon.points = expandPackedPoints(polygon.points);
+    }
     if (!getPolygonTypeValue(polygon)) {
       setPolygonTypeValue(polygon, inferredKind);
     }
@@ -0,0 +1,369 @@
+"""SVG path parsing and adaptive flattening for the SVG import.
+
+Usage::
+
+    python svg_path.py drawing.svg [--tolerance 0.1] [--output paths.json]
+
+Path data is parsed directly (every command of the SVG 1.1 grammar,
+absolute and relative). Line segments keep their exact end points;
+Bézier curves and elliptical arcs are split into the fewest chords whose
+distance from the curve stays within ``tolerance`` (SVG user units, which
+are mm in the Fusion 360 add-in exports). Béziers use Wang's bound on the
+second differences of the control points and arcs the sagitta of the
+larger radius, so a straight-sided outline stays as small as its path
+data. ``static/js/modules/svgPath.js`` implements the same flattening for
+the editor's "Import (SVG)".
+"""
+
+from __future__ import annotations
+
+import argparse
+from dataclasses import dataclass, field
+import json
+import math
+from pathlib import Path
+import re
+import sys
+import time
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+import xml.etree.ElementTree as ET
+
+from packed_points import js_number_to_string
+
+# 曲線と弦の最大距離 (mm)。
+DEFAULT_TOLERANCE = 0.1
+# 1 本の曲線を分割する上限（許容誤差が極端に小さい場合の保険）。
+MAX_CURVE_SEGMENTS = 4096
+
+_ARGUMENT_COUNTS = {"M": 2, "L": 2, "H": 1, "V": 1, "C": 6, "S": 4, "Q": 4, "T": 2, "A": 7, "Z": 0}
+_NUMBER = re.compile(r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?")
+_SEPARATORS = " \t\r\n\f,"
+
+Point = Tuple[float, float]
+
+
+@dataclass
+class Subpath:
+    """Flattened points of one subpath (the closing point is not repeated)."""
+
+    points: List[Point] = field(default_factory=list)
+    closed: bool = False
+
+
+@dataclass
+class FlattenedPath:
+    """Result of :func:`flatten_path`.
+
+    As when an SVG renderer meets bad path data, everything before the
+    first error is kept and ``error`` describes where parsing stopped.
+    """
+
+    subpaths: List[Subpath]
+    error: Optional[str] = None
+
+    @property
+    def point_count(self) -> int:
+        return sum(len(subpath.points) for subpath in self.subpaths)
+
+
+def parse_path(d: str) -> Tuple[List[Tuple[Any, ...]], Optional[str]]:
+    """Parse path data into absolute ``M``/``L``/``C``/``Q``/``A``/``Z`` commands.
+
+    ``H``/``V`` become ``L``, ``S``/``T`` become ``C``/``Q`` with the
+    reflected control point, and relative commands are resolved. Returns
+    the commands and the first error (``None`` when the data is valid).
+    """
+
+    commands: List[Tuple[Any, ...]] = []
+    x = y = start_x = start_y = 0.0
+    # S / T で反射させる直前の制御点。
+    last_cubic: Optional[Point] = None
+    last_quadratic: Optional[Point] = None
+    position, length = 0, len(d)
+    command: Optional[str] = None
+
+    def skip_separators(index: int) -> int:
+        while index < length and d[index] in _SEPARATORS:
+            index += 1
+        return index
+
+    position = skip_separators(position)
+    while position < length:
+        char = d[position]
+        if char.isalpha():
+            if char.upper() not in _ARGUMENT_COUNTS:
+                return commands, f"unknown command {char!r} at {position}"
+            command = char
+            position = skip_separators(position + 1)
+            if command in "Zz":
+                commands.append(("Z",))
+                x, y = start_x, start_y
+                last_cubic = last_quadratic = None
+                continue
+        elif command is None:
+            return commands, f"path data must start with a command (at {position})"
+        elif command in "Zz":
+            return commands, f"unexpected number after Z at {position}"
+
+        upper = command.upper()
+        relative = command.islower()
+        values: List[float] = []
+        for index in range(_ARGUMENT_COUNTS[upper]):
+            if upper == "A" and index in (3, 4):
+                # 円弧のフラグは区切り無しで続けて書ける 1 文字の 0 / 1。
+                if position >= length or d[position] not in "01":
+                    return commands, f"bad arc flag at {position}"
+                values.append(float(d[position]))
+                position = skip_separators(position + 1)
+                continue
+            match = _NUMBER.match(d, position)
+            if match is None:
+                return commands, f"expected a number for {command} at {position}"
+            values.append(float(match.group()))
+            position = skip_separators(match.end())
+
+        dx, dy = (x, y) if relative else (0.0, 0.0)
+        cubic: Optional[Point] = None
+        quadratic: Optional[Point] = None
+        if upper == "M":
+            x, y = values[0] + dx, values[1] + dy
+            start_x, start_y = x, y
+            commands.append(("M", x, y))
+            # M に続く座標の組は L として扱う。
+            command = "l" if relative else "L"
+        elif upper in "LHV":
+            if upper == "H":
+                x = values[0] + dx
+            elif upper == "V":
+                y = values[0] + dy
+            else:
+                x, y = values[0] + dx, values[1] + dy
+            commands.append(("L", x, y))
+        elif upper in "CS":
+            if upper == "C":
+                x1, y1 = values[0] + dx, values[1] + dy
+                rest = values[2:]
+            else:
+                x1, y1 = (2 * x - last_cubic[0], 2 * y - last_cubic[1]) if last_cubic else (x, y)
+                rest = values
+            x2, y2 = rest[0] + dx, rest[1] + dy
+            x, y = rest[2] + dx, rest[3] + dy
+            commands.append(("C", x1, y1, x2, y2, x, y))
+            cubic = (x2, y2)
+        elif upper in "QT":
+            if upper == "Q":
+                x1, y1 = values[0] + dx, values[1] + dy
+                x, y = values[2] + dx, values[3] + dy
+            else:
+                x1, y1 = (2 * x - last_quadratic[0], 2 * y - last_quadratic[1]) if last_quadratic else (x, y)
+                x, y = values[0] + dx, values[1] + dy
+            commands.append(("Q", x1, y1, x, y))
+            quadratic = (x1, y1)
+        else:
+            rx, ry, rotation, large_arc, sweep = values[:5]
+            x, y = values[5] + dx, values[6] + dy
+            commands.append(("A", rx, ry, rotation, bool(large_arc), bool(sweep), x, y))
+        last_cubic, last_quadratic = cubic, quadratic
+    return commands, None
+
+
+def bezier_segments(control: Sequence[Point], tolerance: float) -> int:
+    """Return how many equal parameter steps keep a Bézier within ``tolerance``.
+
+    Wang's formula: the chord error of ``n`` uniform steps is at most
+    ``d(d-1)/8 * max|P[i] - 2P[i+1] + P[i+2]| / n²`` for degree ``d``.
+    """
+
+    degree = len(control) - 1
+    largest = 0.0
+    for (ax, ay), (bx, by), (cx, cy) in zip(control, control[1:], control[2:]):
+        ddx, ddy = ax - 2 * bx + cx, ay - 2 * by + cy
+        largest = max(largest, math.sqrt(ddx * ddx + ddy * ddy))
+    if largest == 0:
+        return 1
+    segments = math.ceil(math.sqrt(degree * (degree - 1) / 8 * largest / tolerance))
+    return min(MAX_CURVE_SEGMENTS, max(1, segments))
+
+
+def _arc_step(radius: float, tolerance: float) -> float:
+    # 弦の高さ（サジッタ）が tolerance 以下になる 1 区間あたりの角度。
+    if tolerance >= radius:
+        return math.pi / 2
+    return 2.0 * math.acos(1.0 - tolerance / radius)
+
+
+def _round_curve_point(value: float) -> float:
+    # 曲線上に作った点は 0.001 mm に丸める（app.js の formatReplicateNumber と同じ丸め）。
+    return math.floor(value * 1000 + 0.5) / 1000
+
+
+def _arc_points(
+    x1: float, y1: float, rx: float, ry: float, rotation: float, large_arc: bool, sweep: bool,
+    x2: float, y2: float, tolerance: float,
+) -> List[Point]:
+    # SVG 1.1 F.6.5: 端点表現から中心表現へ変換し、角度を等分する。
+    cos_phi, sin_phi = math.cos(math.radians(rotation)), math.sin(math.radians(rotation))
+    half_dx, half_dy = (x1 - x2) / 2, (y1 - y2) / 2
+    x1p = cos_phi * half_dx + sin_phi * half_dy
+    y1p = -sin_phi * half_dx + cos_phi * half_dy
+    rx, ry = abs(rx), abs(ry)
+    # 半径が足りなければ端点を通るまで拡大する（F.6.6）。
+    scale = (x1p * x1p) / (rx * rx) + (y1p * y1p) / (ry * ry)
+    if scale > 1:
+        rx, ry = rx * math.sqrt(scale), ry * math.sqrt(scale)
+    numerator = rx * rx * ry * ry - rx * rx * y1p * y1p - ry * ry * x1p * x1p
+    denominator = rx * rx * y1p * y1p + ry * ry * x1p * x1p
+    coefficient = math.sqrt(max(0.0, numerator / denominator)) if denominator else 0.0
+    if large_arc == sweep:
+        coefficient = -coefficient
+    cxp, cyp = coefficient * rx * y1p / ry, -coefficient * ry * x1p / rx
+    cx = cos_phi * cxp - sin_phi * cyp + (x1 + x2) / 2
+    cy = sin_phi * cxp + cos_phi * cyp + (y1 + y2) / 2
+    ux, uy = (x1p - cxp) / rx, (y1p - cyp) / ry
+    vx, vy = (-x1p - cxp) / rx, (-y1p - cyp) / ry
+    start = math.atan2(uy, ux)
+    sweep_angle = math.atan2(ux * vy - uy * vx, ux * vx + uy * vy)
+    if not sweep and sweep_angle > 0:
+        sweep_angle -= 2 * math.pi
+    elif sweep and sweep_angle < 0:
+        sweep_angle += 2 * math.pi
+    segments = min(MAX_CURVE_SEGMENTS, max(1, math.ceil(abs(sweep_angle) / _arc_step(max(rx, ry), tolerance))))
+    points = []
+    for index in range(1, segments):
+        angle = start + sweep_angle * index / segments
+        cos_a, sin_a = math.cos(angle), math.sin(angle)
+        points.append(
+            (
+                _round_curve_point(cx + rx * cos_a * cos_phi - ry * sin_a * sin_phi),
+                _round_curve_point(cy + rx * cos_a * sin_phi + ry * sin_a * cos_phi),
+            )
+        )
+    points.append((x2, y2))
+    return points
+
+
+def _bezier_points(control: Sequence[Point], tolerance: float) -> List[Point]:
+    segments = bezier_segments(control, tolerance)
+    points = []
+    for index in range(1, segments):
+        t = index / segments
+        # de Casteljau で評価する。
+        current = list(control)
+        while len(current) > 1:
+            current = [
+                (a[0] + (b[0] - a[0]) * t, a[1] + (b[1] - a[1]) * t) for a, b in zip(current, current[1:])
+            ]
+        points.append((_round_curve_point(current[0][0]), _round_curve_point(current[0][1])))
+    points.append(control[-1])
+    return points
+
+
+def flatten_path(d: str, tolerance: float = DEFAULT_TOLERANCE) -> FlattenedPath:
+    """Flatten SVG path data into polylines, one per subpath."""
+
+    if not tolerance > 0:
+        raise ValueError("tolerance must be positive")
+    commands, error = parse_path(d or "")
+    subpaths: List[Subpath] = []
+    current: Optional[Subpath] = None
+    x = y = start_x = start_y = 0.0
+
+    def extend(points: List[Point]) -> None:
+        nonlocal current
+        if current is None:
+            # Z の後に M 無しで描画が続く場合は、直前の開始点から新しい部分パスを始める。
+            current = Subpath([(start_x, start_y)])
+            subpaths.append(current)
+        for point in points:
+            if point != current.points[-1]:
+                current.points.append(point)
+
+    for command in commands:
+        name = command[0]
+        if name == "M":
+            x, y = start_x, start_y = command[1], command[2]
+            current = Subpath([(x, y)])
+            subpaths.append(current)
+            continue
+        if name == "Z":
+            if current is not None:
+                current.closed = True
+                if len(current.points) > 1 and current.points[-1] == current.points[0]:
+                    current.points.pop()
+            current = None
+            x, y = start_x, start_y
+            continue
+        if name == "L":
+            points = [(command[1], command[2])]
+        elif name == "C":
+            points = _bezier_points([(x, y), command[1:3], command[3:5], command[5:7]], tolerance)
+        elif name == "Q":
+            points = _bezier_points([(x, y), command[1:3], command[3:5]], tolerance)
+        else:
+            rx, ry, rotation, large_arc, sweep, end_x, end_y = command[1:]
+            if (end_x, end_y) == (x, y):
+                # 始点と終点が同じ円弧は描かない。
+                continue
+            if rx == 0 or ry == 0:
+                points = [(end_x, end_y)]
+            else:
+                points = _arc_points(x, y, rx, ry, rotation, large_arc, sweep, end_x, end_y, tolerance)
+        extend(points)
+        x, y = points[-1]
+    # M だけの部分パスは何も描かない。
+    return FlattenedPath([subpath for subpath in subpaths if len(subpath.points) > 1], error)
+
+
+def path_polygons(d: str, tolerance: float = DEFAULT_TOLERANCE) -> Tuple[List[List[Dict[str, str]]], Optional[str]]:
+    """Return the editor's ``{X, Y}`` point lists for every subpath of ``d``.
+
+    Like the browser import, each polygon repeats its first point at the
+    end and polygons with fewer than three points are dropped.
+    """
+
+    flattened = flatten_path(d, tolerance)
+    polygons = []
+    for subpath in flattened.subpaths:
+        points = [{"X": js_number_to_string(x), "Y": js_number_to_string(y)} for x, y in subpath.points]
+        points.append(dict(points[0]))
+        if len(points) >= 3:
+            polygons.append(points)
+    return polygons, flattened.error
+
+
+def iter_svg_paths(svg_text: str) -> Iterator[Tuple[str, str]]:
+    """Yield ``(id, d)`` for every ``<path>`` element of an SVG document."""
+
+    root = ET.fromstring(svg_text)
+    for index, element in enumerate(node for node in root.iter() if node.tag.rsplit("}", 1)[-1] == "path"):
+        yield element.get("id") or f"path{index + 1}", element.get("d") or ""
+
+
+def main_cli(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("svg", type=Path)
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE, help="chord error in mm")
+    parser.add_argument("--output", type=Path, help="write the flattened subpaths as JSON")
+    args = parser.parse_args(argv)
+
+    start = time.perf_counter()
+    result = {}
+    total = 0
+    for path_id, d in iter_svg_paths(args.svg.read_text(encoding="utf-8")):
+        flattened = flatten_path(d, args.tolerance)
+        total += flattened.point_count
+        result[path_id] = {
+            "subpaths": [{"points": subpath.points, "closed": subpath.closed} for subpath in flattened.subpaths],
+            "error": flattened.error,
+        }
+        status = f"  ERROR {flattened.error}" if flattened.error else ""
+        print(f"{path_id}: {len(flattened.subpaths)} subpath(s), {flattened.point_count} points{status}")
+    elapsed = time.perf_counter() - start
+    print(f"{len(result)} path(s), {total} points in {elapsed * 1000:.1f} ms")
+    if args.output:
+        args.output.write_text(json.dumps(result), encoding="utf-8")
+    return 1 if any(entry["error"] for entry in result.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
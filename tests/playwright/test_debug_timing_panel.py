@@ -0,0 +1,29 @@
+from __future__ import annotations
+
+from playwright.sync_api import sync_playwright
+
+from tests.conftest import SERVER_URL, launch_chromium
+
+
+def test_debug_timing_panel_shows_server_and_client_stages(flask_server):
+    with sync_playwright() as playwright:
+        browser = launch_chromium(playwright)
+        try:
+            page = browser.new_page()
+            page.goto(SERVER_URL, wait_until="networkidle")
+            page.wait_for_function("window.__triorbTestApi !== undefined")
+            page.evaluate("window.__triorbTestApi.whenBootstrapReady()")
+
+            client_stages = page.evaluate(
+                "window.__triorbTestApi.getStageTimings().map((entry) => entry.name)"
+            )
+            panel = page.locator("#debug-timing-panel")
+            panel.wait_for(state="visible")
+            panel_text = panel.inner_text()
+        finally:
+            browser.close()
+
+    assert "renderFigure" in client_stages
+    assert "applyBootstrapGeometry" in client_stages
+    assert "renderFigure" in panel_text
+    assert "payload" in panel_text
@@ -29,6 +29,7 @@ def test_triorb_save_sequential_device_indices(flask_server):
             page.goto(SERVER_URL, wait_until="networkidle")
             page.wait_for_function("window.appBootstrapData !== undefined")
             page.wait_for_function("window.__triorbTestApi !== undefined")
+            page.evaluate("window.__triorbTestApi.whenBootstrapReady()")
 
             page.locator(".scanplane-details").first.evaluate("node => (node.open = true)")
             page.evaluate(
@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import re
+import urllib.request
+
+from playwright.sync_api import sync_playwright
+
+from tests.conftest import FLASK_PORT, SERVER_URL, launch_chromium
+
+_TIMESTAMP_PATTERN = re.compile(r'Timestamp="[^"]*"')
+# Plotly.react は描画時に layout を書き換えるため、currentFigure を含む
+# スナップショット本体は比較対象から外す。
+_SNAPSHOT_PATTERN = re.compile(r"(<StateSnapshot[^>]*>)[^<]*(</StateSnapshot>)")
+
+
+def _normalize(xml_text: str) -> str:
+    xml_text = _TIMESTAMP_PATTERN.sub('Timestamp=""', xml_text)
+    return _SNAPSHOT_PATTERN.sub(r"\1\2", xml_text)
+
+
+def _fetch_export(mode: str) -> str:
+    url = f"http://127.0.0.1:{FLASK_PORT}/api/export/{mode}"
+    with urllib.request.urlopen(url) as response:
+        return response.read().decode("utf-8")
+
+
+def test_server_export_matches_browser(flask_server):
+    with sync_playwright() as playwright:
+        browser = launch_chromium(playwright)
+        try:
+            page = browser.new_page()
+            page.goto(SERVER_URL, wait_until="networkidle")
+            page.wait_for_function("window.__triorbTestApi !== undefined")
+            page.evaluate("window.__triorbTestApi.whenBootstrapReady()")
+
+            browser_legacy = page.evaluate("window.__triorbTestApi.buildLegacyXml()")
+            browser_triorb = page.evaluate("window.__triorbTestApi.buildTriOrbXml()")
+        finally:
+            browser.close()
+
+    assert _normalize(_fetch_export("legacy")) == _normalize(browser_legacy)
+    assert _normalize(_fetch_export("triorb")) == _normalize(browser_triorb)
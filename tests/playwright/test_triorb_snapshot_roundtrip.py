@@ -21,6 +21,7 @@ def test_bootstrap_keeps_default_fieldset_devices(flask_server):
             page = browser.new_page()
             page.goto(SERVER_URL, wait_until="networkidle")
             page.wait_for_function("window.__triorbTestApi !== undefined")
+            page.evaluate("window.__triorbTestApi.whenBootstrapReady()")
 
             snapshot = page.evaluate("window.__triorbTestApi.getStateSnapshot()")
             coords = {
@@ -44,6 +45,7 @@ def test_triorb_snapshot_roundtrip_restores_exact_state(flask_server):
             page = browser.new_page()
             page.goto(SERVER_URL, wait_until="networkidle")
             page.wait_for_function("window.__triorbTestApi !== undefined")
+            page.evaluate("window.__triorbTestApi.whenBootstrapReady()")
 
             snapshot = page.evaluate("window.__triorbTestApi.getStateSnapshot()")
             assert snapshot["triorbShapes"], "Expected at least one TriOrb shape in bootstrap data"
@@ -114,6 +116,7 @@ def test_shape_assignment_modal_supports_shift_range_selection(flask_server):
             page = browser.new_page()
             page.goto(SERVER_URL, wait_until="networkidle")
             page.wait_for_function("window.__triorbTestApi !== undefined")
+            page.evaluate("window.__triorbTestApi.whenBootstrapReady()")
 
             snapshot = page.evaluate("window.__triorbTestApi.getStateSnapshot()")
             snapshot["triorbShapes"] = []
@@ -184,6 +187,7 @@ def test_create_shape_attach_to_fieldsets_supports_shift_range_selection(flask_s
             page = browser.new_page()
             page.goto(SERVER_URL, wait_until="networkidle")
             page.wait_for_function("window.__triorbTestApi !== undefined")
+            page.evaluate("window.__triorbTestApi.whenBootstrapReady()")
             page.evaluate("xml => window.__triorbTestApi.loadXml(xml)", xml_text)
 
             page.click("#btn-add-shape-overlay")
@@ -210,6 +214,7 @@ def test_create_shape_modal_resize_handle_works_without_reference_error(flask_se
             page.on("console", lambda msg: errors.append(msg.text) if msg.type == "error" else None)
             page.goto(SERVER_URL, wait_until="networkidle")
             page.wait_for_function("window.__triorbTestApi !== undefined")
+            page.evaluate("window.__triorbTestApi.whenBootstrapReady()")
 
             page.click("#btn-add-shape-overlay")
             page.locator("#create-shape-modal").wait_for(state="visible")
@@ -243,6 +248,7 @@ def test_sick_save_omits_empty_warning_field_trees(flask_server):
             page = browser.new_page()
             page.goto(SERVER_URL, wait_until="networkidle")
             page.wait_for_function("window.__triorbTestApi !== undefined")
+            page.evaluate("window.__triorbTestApi.whenBootstrapReady()")
 
             snapshot = page.evaluate("window.__triorbTestApi.getStateSnapshot()")
             shape_id = snapshot["triorbShapes"][0]["id"]
@@ -299,6 +305,7 @@ def test_loading_real_file_strips_protective_polygon_suffixes(flask_server):
             page = browser.new_page()
             page.goto(SERVER_URL, wait_until="networkidle")
             page.wait_for_function("window.__triorbTestApi !== undefined")
+            page.evaluate("window.__triorbTestApi.whenBootstrapReady()")
 
             page.evaluate("xml => window.__triorbTestApi.loadXml(xml)", xml_text)
             snapshot = page.evaluate("window.__triorbTestApi.getStateSnapshot()")
@@ -325,6 +332,7 @@ def test_real_file_triorb_roundtrip_does_not_inject_default_fieldset_devices(fla
             page = browser.new_page()
             page.goto(SERVER_URL, wait_until="networkidle")
             page.wait_for_function("window.__triorbTestApi !== undefined")
+            page.evaluate("window.__triorbTestApi.whenBootstrapReady()")
 
             page.evaluate("xml => window.__triorbTestApi.loadXml(xml)", xml_text)
             snapshot = page.evaluate("window.__triorbTestApi.getStateSnapshot()")
@@ -1,5 +1,9 @@
 """Flask アプリの最小限の起動確認テスト。"""
 
+from pathlib import Path
+import subprocess
+import sys
+
 from main import create_app
 
 
@@ -11,3 +15,20 @@ def test_index_returns_ok():
     response = client.get("/")
 
     assert response.status_code == 200
+
+
+def test_startup_does_not_load_numpy():
+    """numpy は図形演算の API を初めて呼んだときにだけ読み込まれることを確認。"""
+    code = (
+        "import sys, main; client = main.create_app().test_client(); client.get('/'); before = 'numpy' in sys.modules;"
+        " client.post('/api/shapes/query', json={'shapes': []}); print(before, 'numpy' in sys.modules)"
+    )
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).resolve().parents[1],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.stdout.strip() == "False True"
@@ -0,0 +1,94 @@
+from __future__ import annotations
+
+import json
+import shutil
+from pathlib import Path
+
+import pytest
+
+import batch_convert
+import main
+from packed_points import expand_points
+
+_DATA_DIR = Path(__file__).parent / "data"
+
+
+@pytest.fixture
+def source_tree(tmp_path: Path) -> Path:
+    root = tmp_path / "in"
+    (root / "site_a").mkdir(parents=True)
+    shutil.copy(_DATA_DIR / "io_sample.sgexml", root / "io_sample.sgexml")
+    shutil.copy(_DATA_DIR / "legacy_min10.sgexml", root / "site_a" / "legacy_min10.sgexml")
+    (root / "site_a" / "broken.sgexml").write_text("<SdImportExport><FileInfo>", encoding="utf-8")
+    (root / "notes.txt").write_text("ignored", encoding="utf-8")
+    return root
+
+
+@pytest.mark.parametrize("workers", [1, 2])
+def test_batch_mirrors_tree_and_reports_failures(source_tree, tmp_path, workers):
+    output_dir = tmp_path / "out"
+
+    summary = batch_convert.run_batch(
+        source_tree, output_dir, formats=["triorb", "legacy", "json"], workers=workers
+    )
+
+    assert [result.source.name for result in summary.results] == [
+        "io_sample.sgexml",
+        "broken.sgexml",
+        "legacy_min10.sgexml",
+    ]
+    assert [result.source.name for result in summary.failures] == ["broken.sgexml"]
+    assert "well-formed" in summary.failures[0].error
+    assert (output_dir / "io_sample.triorb.sgexml").exists()
+    assert (output_dir / "site_a" / "legacy_min10.sick.sgexml").exists()
+    assert not list(output_dir.rglob("broken*"))
+    assert summary.files_per_second > 0
+    assert summary.total_bytes == sum(
+        path.stat().st_size for path in source_tree.rglob("*.sgexml")
+    )
+
+
+def test_batch_json_matches_index_payload(source_tree, tmp_path):
+    output_dir = tmp_path / "out"
+
+    batch_convert.run_batch(source_tree, output_dir, formats=["json"], workers=1)
+
+    written = json.loads((output_dir / "io_sample.json").read_text(encoding="utf-8"))
+    expected = main.build_index_payload(main.SgexmlDocument.load(_DATA_DIR / "io_sample.sgexml"))
+    assert written == json.loads(json.dumps(expand_points(expected), default=batch_convert._json_default))
+    # 索引は一覧だけを持ち、casetable_payload / fieldsets と同じ内容は繰り返さない。
+    assert written["casetable_index"] == {"summaries": expected["casetable_index"].summaries(), "payloads": {}}
+    assert written["fieldset_planes"]["payloads"] == {}
+
+
+def test_batch_skips_earlier_outputs(source_tree):
+    # 出力先が入力ディレクトリの中にあっても、再実行で出力を変換し直さない。
+    output_dir = source_tree / "converted"
+    batch_convert.run_batch(source_tree, output_dir, formats=["triorb", "legacy"], workers=1)
+    (source_tree / "site_a" / "copied.triorb.sgexml").write_bytes((output_dir / "io_sample.triorb.sgexml").read_bytes())
+
+    summary = batch_convert.run_batch(source_tree, output_dir, formats=["triorb", "legacy"], workers=1)
+
+    assert [result.source.name for result in summary.results] == [
+        "io_sample.sgexml",
+        "broken.sgexml",
+        "legacy_min10.sgexml",
+    ]
+    assert not list(source_tree.rglob("*.triorb.triorb.sgexml"))
+    assert batch_convert.is_output_file(Path("x.sick.sgexml")) and not batch_convert.is_output_file(Path("x.sgexml"))
+
+
+def test_batch_rejects_unknown_format(source_tree, tmp_path):
+    with pytest.raises(ValueError):
+        batch_convert.run_batch(source_tree, tmp_path / "out", formats=["pdf"])
+
+
+def test_cli_exit_status_reflects_failures(source_tree, tmp_path, capsys):
+    exit_code = batch_convert.main_cli(
+        [str(source_tree), str(tmp_path / "out"), "--workers", "1", "--quiet"]
+    )
+
+    captured = capsys.readouterr()
+    assert exit_code == 1
+    assert "FAIL" in captured.err
+    assert "files/s" in captured.out and "MB/s" in captured.out
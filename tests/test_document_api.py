@@ -0,0 +1,191 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+import main
+import sgexml_writer
+
+_DATA_DIR = Path(__file__).parent / "data"
+_SAMPLE_XML = _DATA_DIR / "io_sample.sgexml"
+_EXPECTED_JSON = _DATA_DIR / "io_expected.json"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "SAMPLE_XML", _SAMPLE_XML)
+    return main.create_app().test_client()
+
+
+@pytest.mark.parametrize(
+    ("section", "expected_key"),
+    [
+        ("scan_planes", "scan_planes"),
+        ("fieldsets", "fieldsets_payload"),
+        ("casetable", "casetable_payload"),
+        ("fileinfo", "fileinfo_fields"),
+        ("menu", "menu_items"),
+        ("root_attributes", "root_attributes"),
+    ],
+)
+def test_document_section_matches_loader_output(client, section, expected_key):
+    expected = json.loads(_EXPECTED_JSON.read_text(encoding="utf-8"))
+
+    response = client.get(f"/api/document/{section}")
+
+    assert response.status_code == 200
+    assert response.get_json() == expected[expected_key]
+
+
+def test_triorb_shapes_section_includes_source(client):
+    expected = json.loads(_EXPECTED_JSON.read_text(encoding="utf-8"))
+
+    data = client.get("/api/document/triorb_shapes").get_json()
+
+    assert data == {"shapes": expected["triorb_shapes"], "source": expected["triorb_source"]}
+
+
+def test_casetables_are_listed_and_fetched_by_index(monkeypatch):
+    monkeypatch.setattr(main, "SAMPLE_XML", _DATA_DIR / "multi_casetable.sgexml")
+    client = main.create_app().test_client()
+
+    summaries = client.get("/api/document/casetables").get_json()
+    second = client.get("/api/document/casetables/1").get_json()
+
+    assert [(entry["index"], entry["name"]) for entry in summaries] == [
+        ("0", "Monitoring case table 1"),
+        ("1", "Monitoring case table 2"),
+        ("2", "Monitoring case table 3"),
+    ]
+    assert second["casetable_attributes"] == {"Index": "1"}
+    assert second == main.load_casetable_payload(index="1")
+    assert client.get("/api/document/casetable").get_json()["casetable_attributes"] == {"Index": "0"}
+    assert client.get("/api/document/casetables/7").status_code == 404
+
+
+def test_fieldset_planes_are_listed_and_fetched_by_index(monkeypatch):
+    monkeypatch.setattr(main, "SAMPLE_XML", _DATA_DIR / "multi_scanplane.sgexml")
+    client = main.create_app().test_client()
+
+    summaries = client.get("/api/document/fieldset_planes").get_json()
+    first = client.get("/api/document/fieldsets").get_json()
+    second = client.get("/api/document/fieldsets/1").get_json()
+    packed = client.get("/api/document/fieldsets/1?points=packed").get_json()
+
+    assert [(entry["index"], entry["fieldsets"]) for entry in summaries] == [("0", 2), ("1", 2)]
+    assert client.get("/api/document/fieldsets/0").get_json() == first
+    # 2 枚目の ScanPlane だけにある形状は、その ScanPlane の応答に追加の図形として含まれる。
+    assert len(second["shapes"]) == 1
+    assert second["fieldsets"][0]["fields"][0]["shapeRefs"] == [{"shapeId": second["shapes"][0]["id"]}]
+    assert packed["fieldsets"] == second["fieldsets"]
+    assert packed["shapes"] != second["shapes"]
+    assert client.get("/api/document/fieldsets/7").status_code == 404
+    assert client.get("/api/document/fieldsets/1?points=bogus").status_code == 400
+
+
+
+def test_generated_shape_ids_agree_across_workers(monkeypatch):
+    # ID の無い従来形式の図形も、別のワーカー（アプリ）で組み立てたセクション同士で参照が一致する。
+    monkeypatch.setattr(main, "SAMPLE_XML", _DATA_DIR / "multi_scanplane.sgexml")
+    shapes = main.create_app().test_client().get("/api/document/triorb_shapes").get_json()["shapes"]
+    fieldsets = main.create_app().test_client().get("/api/document/fieldsets").get_json()
+
+    refs = [ref["shapeId"] for fieldset in fieldsets["fieldsets"] for field in fieldset["fields"]
+            for ref in field["shapeRefs"]]
+    assert refs and set(refs) <= {shape["id"] for shape in shapes}
+    assert len({shape["id"] for shape in shapes}) == len(shapes)
+
+def test_unknown_section_returns_404(client):
+    assert client.get("/api/document/unknown").status_code == 404
+
+
+def test_index_defers_large_sections_by_default(client):
+    html = client.get("/").get_data(as_text=True)
+
+    assert "documentApi" in html
+    assert "/api/document/fieldsets" in html
+    assert "casetablePayload:" not in html
+
+
+def test_index_inlines_sections_for_static_builds(monkeypatch):
+    monkeypatch.setattr(main, "SAMPLE_XML", _SAMPLE_XML)
+    app = main.create_app()
+    app.config["INLINE_BOOTSTRAP"] = True
+
+    html = app.test_client().get("/").get_data(as_text=True)
+
+    assert "casetablePayload:" in html
+    assert "documentApi" not in html
+
+
+def test_static_build_embeds_every_scan_plane(monkeypatch):
+    monkeypatch.setattr(main, "SAMPLE_XML", _DATA_DIR / "multi_scanplane.sgexml")
+    app = main.create_app()
+    app.config["INLINE_BOOTSTRAP"] = True
+
+    html = app.test_client().get("/").get_data(as_text=True)
+
+    assert "fieldsetPlanePayloads:" in html
+    assert "1500" in html
+
+
+def test_static_build_embeds_every_casetable(monkeypatch):
+    monkeypatch.setattr(main, "SAMPLE_XML", _DATA_DIR / "multi_casetable.sgexml")
+    app = main.create_app()
+    app.config["INLINE_BOOTSTRAP"] = True
+
+    html = app.test_client().get("/").get_data(as_text=True)
+
+    assert "Monitoring case table 3" in html
+    assert '"Index": "2"' in html or '"Index":"2"' in html
+
+
+def _save_triorb(tmp_path):
+    # Save (TriOrb) と同じ形式で io_sample を書き出す。
+    payload = main.build_index_payload(main.SgexmlDocument.load(_SAMPLE_XML))
+    target = tmp_path / "saved.sgexml"
+    target.write_text("".join(sgexml_writer.iter_triorb_xml(payload)), encoding="utf-8")
+    return target
+
+
+def test_saved_document_is_served_from_its_snapshot(monkeypatch, tmp_path):
+    saved = _save_triorb(tmp_path)
+    monkeypatch.setattr(main, "SAMPLE_XML", saved)
+    parsed = []
+    build_index_payload = main.build_index_payload
+    monkeypatch.setattr(
+        main, "build_index_payload", lambda document: parsed.append(document) or build_index_payload(document)
+    )
+    client = main.create_app().test_client()
+
+    html = client.get("/").get_data(as_text=True)
+    snapshot = client.get("/api/document/state_snapshot").get_json()
+
+    assert "/api/document/state_snapshot" in html
+    assert 'id="fileinfo-Company"' in html
+    assert snapshot == main.read_state_snapshot(saved.read_bytes())
+    assert parsed == []
+    # 他のセクションを要求した時点で初めて XML を解析する。
+    planes = client.get("/api/document/scan_planes").get_json()
+    assert [plane["attributes"]["Name"] for plane in planes] == [
+        plane["attributes"]["Name"] for plane in snapshot["scanPlanes"]
+    ]
+    assert len(parsed) == 1 and parsed[0].is_loaded
+
+
+def test_stale_snapshot_falls_back_to_the_full_parse(monkeypatch, tmp_path):
+    saved = _save_triorb(tmp_path)
+    saved.write_bytes(saved.read_bytes().replace(b"Example Corp", b"Edited Corp", 1))
+    monkeypatch.setattr(main, "SAMPLE_XML", saved)
+    app = main.create_app()
+    app.config["INLINE_BOOTSTRAP"] = True
+
+    html = app.test_client().get("/").get_data(as_text=True)
+
+    assert "stateSnapshot:" not in html
+    assert "casetablePayload:" in html
+    assert 'value="Edited Corp"' in html
+    with pytest.raises(main.StaleSnapshotError):
+        main.read_state_snapshot(saved.read_bytes(), verify=True)
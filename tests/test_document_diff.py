@@ -0,0 +1,121 @@
+from __future__ import annotations
+
+import io
+import json
+from pathlib import Path
+
+import pytest
+
+import document_diff
+import main
+
+_DATA_DIR = Path(__file__).parent / "data"
+_SAMPLE = _DATA_DIR / "io_sample.sgexml"
+
+
+def _payload(text):
+    return main.build_index_payload(main.SgexmlDocument.from_bytes(_SAMPLE, text.encode("utf-8")))
+
+
+def _revised():
+    # 図形を 1 点動かし、Field を改名し、Case を追加した版。
+    text = _SAMPLE.read_text(encoding="utf-8")
+    text = text.replace('<Point X="200" Y="100" />', '<Point X="205" Y="98" />', 1)
+    text = text.replace('Name="Field B"', 'Name="Field B2"', 1)
+    return text.replace(
+        "</Case>\n      </Cases>",
+        '</Case>\n        <Case Index="1" Name="Case1"><SpeedActivation Mode="Off" /></Case>\n      </Cases>',
+        1,
+    )
+
+
+def test_pair_items_uses_each_key_in_turn():
+    old = [{"name": "a", "index": 0}, {"name": "b", "index": 1}, {"name": None, "index": 2}]
+    new = [{"name": "b", "index": 0}, {"name": "x", "index": 2}, {"name": "c", "index": 9}]
+
+    pairs, removed, added = document_diff.pair_items(
+        old, new, [lambda item: item["name"], lambda item: item["index"]]
+    )
+
+    assert [(a["name"], b["name"]) for a, b in pairs] == [("b", "b"), (None, "x")]
+    assert removed == [old[0]]
+    assert added == [new[2]]
+
+
+def test_identical_documents_have_no_difference():
+    text = _SAMPLE.read_text(encoding="utf-8")
+
+    diff = document_diff.diff_payloads(_payload(text), _payload(text))
+
+    assert document_diff.is_empty(diff)
+    assert diff["shapes"]["unchanged"] == 2
+
+
+def test_revision_reports_points_fields_and_cases():
+    diff = document_diff.diff_payloads(_payload(_SAMPLE.read_text(encoding="utf-8")), _payload(_revised()))
+
+    renamed, shape = diff["shapes"]["changed"]
+    # 従来形式の図形名は Field 名から作られるため、改名に追随する。
+    assert renamed["changes"] == {"name": ["SetA Field B Polygon", "SetA Field B2 Polygon"]}
+    assert renamed["geometry"] is None
+    assert shape["name"] == "Protective #1"
+    assert shape["geometry"]["moved"] == [{"index": 2, "dx": 5.0, "dy": -2.0}]
+    assert shape["geometry"]["max_delta"] == pytest.approx(5.385165, abs=1e-6)
+
+    (fieldset,) = diff["scan_planes"]["fieldsets"]["0"]["changed"]
+    field_a, field_b = fieldset["fields"]["changed"]
+    assert field_a["attributes"] == {} and field_a["shapes"]["changed"] == ["Protective #1"]
+    # 名前で対応が付かない Field は Index で対応付ける。
+    assert field_b["attributes"] == {"Name": ["Field B", "Field B2"]}
+
+    cases = diff["casetables"]["cases"]["0"]
+    assert cases["added"] == [{"name": "Case1", "index": "1"}]
+    assert cases["removed"] == [] and cases["changed"] == []
+    assert diff["summary"]["cases"] == {"added": 1, "removed": 0, "changed": 0}
+
+
+def test_tolerance_hides_small_moves():
+    old = [{"X": "0", "Y": "0"}, {"X": "10", "Y": "0"}]
+    new = [{"X": "0.0004", "Y": "0"}, {"X": "10", "Y": "3"}, {"X": "1", "Y": "1"}]
+
+    delta = document_diff.point_deltas(old, new, tolerance=0.001)
+
+    assert delta["moved"] == [{"index": 1, "dx": 0.0, "dy": 3.0}]
+    assert delta["added"] == [[1.0, 1.0]]
+    assert delta["points"] == [2, 3]
+
+
+def test_diff_endpoint_compares_against_the_current_document(monkeypatch):
+    monkeypatch.setattr(main, "SAMPLE_XML", _SAMPLE)
+    client = main.create_app().test_client()
+
+    response = client.post(
+        "/api/diff",
+        data={"file": (io.BytesIO(_revised().encode("utf-8")), "revised.sgexml")},
+        content_type="multipart/form-data",
+    )
+    broken = client.post(
+        "/api/diff",
+        data={"file": (io.BytesIO(b"<SdImportExport>"), "broken.sgexml")},
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["summary"]["shapes"] == {"added": 0, "removed": 0, "changed": 2}
+    # オーバーレイ用に図形そのもの（従来形式の点列）も返す。
+    assert body["shapes"]["changed"][1]["shape"]["polygon"]["points"][2] == {"X": "205", "Y": "98"}
+    assert broken.status_code == 422
+    assert client.post("/api/diff").status_code == 400
+
+
+def test_cli_writes_json_and_exit_status(tmp_path, capsys):
+    revised = tmp_path / "revised.sgexml"
+    revised.write_text(_revised(), encoding="utf-8")
+    output = tmp_path / "diff.json"
+
+    assert document_diff.main_cli([str(_SAMPLE), str(_SAMPLE), "--quiet"]) == 0
+    assert document_diff.main_cli([str(_SAMPLE), str(revised), "--output", str(output)]) == 1
+
+    assert json.loads(output.read_text(encoding="utf-8"))["summary"]["fields"]["changed"] == 2
+    assert "shape Protective #1" in capsys.readouterr().out
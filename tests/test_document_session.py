@@ -0,0 +1,54 @@
+from __future__ import annotations
+
+from pathlib import Path
+import xml.etree.ElementTree as ET
+
+import main
+
+_DATA_DIR = Path(__file__).parent / "data"
+_SAMPLE_XML = _DATA_DIR / "io_sample.sgexml"
+
+
+def _collect(document=None) -> dict:
+    fieldsets_payload, triorb_shapes, triorb_source = main.load_fieldsets_and_shapes(document)
+    return {
+        "menu_items": main.load_menu_items(document),
+        "fileinfo_fields": main.load_fileinfo_fields(document),
+        "root_attributes": main.load_root_attributes(document),
+        "scan_planes": main.load_scan_planes(document),
+        "casetable_payload": main.load_casetable_payload(document),
+        "fieldsets_payload": fieldsets_payload,
+        "triorb_shapes": triorb_shapes,
+        "triorb_source": triorb_source,
+    }
+
+
+def test_shared_document_parses_once_and_matches_legacy_loaders(monkeypatch):
+    monkeypatch.setattr(main, "SAMPLE_XML", _SAMPLE_XML)
+    legacy = _collect()
+
+    calls = []
+    original_parse = ET.parse
+
+    def _counting_parse(*args, **kwargs):
+        calls.append(args)
+        return original_parse(*args, **kwargs)
+
+    monkeypatch.setattr(ET, "parse", _counting_parse)
+    document = main.SgexmlDocument.load()
+    shared = _collect(document)
+
+    assert len(calls) == 1
+    assert shared == legacy
+
+
+def test_document_for_invalid_xml_yields_loader_fallbacks(tmp_path):
+    invalid_xml = tmp_path / "invalid.sgexml"
+    invalid_xml.write_text("<SdImportExport><FileInfo></SdImportExport", encoding="utf-8")
+
+    document = main.SgexmlDocument.load(invalid_xml)
+
+    assert not document.is_loaded
+    assert main.load_fileinfo_fields(document) == []
+    assert main.load_scan_planes(document) == []
+    assert main.load_casetable_payload(document)["casetable_attributes"] == {"Index": "0"}
@@ -0,0 +1,124 @@
+from __future__ import annotations
+
+import json
+import math
+from pathlib import Path
+import sys
+import xml.etree.ElementTree as ET
+
+import pytest
+
+# アドインは Fusion 360 の Add-Ins フォルダーに置く前提なので、幾何処理だけをフォルダーから直接読み込む。
+ADDIN_DIR = Path(__file__).resolve().parents[1] / "tools" / "fusion360_svg_export"
+if str(ADDIN_DIR) not in sys.path:
+    sys.path.insert(0, str(ADDIN_DIR))
+
+import geometry_core  # noqa: E402
+import main  # noqa: E402
+import svg_path  # noqa: E402
+
+
+def _passes(points, tol=geometry_core.COLLINEAR_TOL):
+    # 以前のアドインの実装: 共線点を同時に外す走査を、変化がなくなるまで繰り返す。
+    pts = list(points)
+    changed = True
+    while changed and len(pts) > 2:
+        changed = False
+        kept = []
+        for i in range(len(pts)):
+            if geometry_core.is_collinear(pts[i - 1], pts[i], pts[(i + 1) % len(pts)], tol):
+                changed = True
+                continue
+            kept.append(pts[i])
+        pts = kept
+    return pts
+
+
+def _subdivide(corners, pieces):
+    points = []
+    for index, (ax, ay) in enumerate(corners):
+        bx, by = corners[(index + 1) % len(corners)]
+        count = pieces[index % len(pieces)]
+        points.extend((ax + (bx - ax) * j / count, ay + (by - ay) * j / count) for j in range(count))
+    return points
+
+
+def test_closed_loop_matches_repeated_passes():
+    square = _subdivide([(0, 0), (100, 0), (100, 50), (0, 50)], [4, 1, 7, 3])
+    # 共線点から始まるループでは、継ぎ目の点も外れる。
+    rotated = square[2:] + square[:2]
+    hexagon = _subdivide([(50 * math.cos(k * math.pi / 3), 50 * math.sin(k * math.pi / 3)) for k in range(6)], [5, 2])
+
+    for points in (square, rotated, hexagon, hexagon[::-1]):
+        assert geometry_core.simplify_polyline(points, True) == _passes(points)
+    assert geometry_core.simplify_polyline(rotated, True) == [(100, 0), (100, 50), (0, 50), (0, 0)]
+
+
+def test_tessellated_arcs_keep_their_vertices():
+    # 1 度刻みの円弧は許容誤差より大きく曲がるので、1 点も落とさない。
+    circle = [(100 * math.cos(math.radians(k)), 100 * math.sin(math.radians(k))) for k in range(360)]
+    assert geometry_core.simplify_polyline(circle, True) == circle
+    # 直線上に潰れたループは空になる。
+    assert geometry_core.simplify_polyline([(0, 0), (1, 0), (2, 0), (1, 0)], True) == []
+
+
+def test_open_polyline_and_loop_points():
+    assert geometry_core.simplify_polyline([(0, 0), (1, 0), (2, 0), (2, 1)], False) == [(0, 0), (2, 0), (2, 1)]
+    edges = [((0, 0), (10, 0)), ((10, 0), (10, 0.0001)), ((10, 0.0001), (10, 10)), ((10, 10), (0, 0))]
+    # 許容距離より近い端点は繋いでいき、閉じ点は持たない。
+    assert geometry_core.loop_points(edges) == [(0, 0), (10, 0), (10, 10)]
+
+
+def test_build_svg_moves_drawing_to_origin():
+    polygons = [([(10, 20), (30, 20), (30, 25)], "Body 1"), ([(15, 22), (16, 22), (16, 23)], "Body 1")]
+
+    root = ET.fromstring(geometry_core.build_svg(polygons))
+
+    assert root.get("viewBox") == "0 0 20.0000 5.0000" and root.get("width") == "20.0000mm"
+    first, second = root.iter("{http://www.w3.org/2000/svg}path")
+    assert first.get("d") == "M 0.0000 0.0000 L 20.0000 0.0000 L 20.0000 5.0000 Z"
+    assert (first.get("id"), second.get("id"), second.get("data-name")) == ("Body_1", "Body_1_2", "Body 1")
+    assert geometry_core.bounding_box([[(1, 1), (3, 1)]]) == (1, 1, 2, 1.0)
+    with pytest.raises(ValueError):
+        geometry_core.build_svg([])
+
+
+# アドインが返す SVG 向きの点列（mm、Y 下向き）。
+BODIES = [([(12.5, -40), (112.5, -40), (112.5, 10.0000001), (12.5, 10)], "Base & Plate"), ([(0, 0), (1, 0)], "Edge")]
+
+
+def test_triorb_shapes_keep_exact_editor_coordinates():
+    (shape,) = geometry_core.triorb_shapes(BODIES)
+
+    assert shape["polygon"]["points"] == [
+        {"X": "12.5", "Y": "40"}, {"X": "112.5", "Y": "40"}, {"X": "112.5", "Y": "-10"}, {"X": "12.5", "Y": "-10"}
+    ]
+    assert (shape["name"], shape["kind"], shape["polygon"]["Type"]) == ("Base & Plate", "Field", "Field")
+    assert shape["id"].startswith("shape-") and geometry_core.triorb_shapes(BODIES)[0]["id"] == shape["id"]
+    # SVG を経由した場合と同じ形で、SVG のページ原点への平行移動だけがない。
+    svg = ET.fromstring(geometry_core.build_svg(BODIES[:1]))
+    (path,) = svg.iter("{http://www.w3.org/2000/svg}path")
+    (polygon,), _ = svg_path.path_polygons(path.get("d"))
+    moved = [(float(p["X"]) + 12.5, -(float(p["Y"]) - 40)) for p in polygon[:-1]]
+    assert moved == [(float(p["X"]), float(p["Y"])) for p in shape["polygon"]["points"]]
+
+
+def test_shapes_xml_and_json_load_like_saved_triorb_shapes():
+    (shape,) = geometry_core.triorb_shapes(BODIES)
+
+    fragment = geometry_core.render_export(BODIES, "TriOrb Shapes (XML)")
+    root = ET.fromstring(f"<Root>{fragment.split('?>', 1)[1]}</Root>")
+    loaded, source = main._load_triorb_shapes_from_root(root)
+    document = json.loads(geometry_core.render_export(BODIES, "TriOrb Shapes (JSON)"))
+
+    assert source == "Fusion360"
+    assert [{**item, "polygon": {**item["polygon"], "points": item["polygon"]["points"].to_dicts()}}
+            for item in loaded] == [shape]
+    assert document["format"] == "triorb-shapes" and document["unit"] == "mm"
+    (compact,) = document["shapes"]
+    assert compact["polygon"]["points"] == [[12.5, 40], [112.5, 40], [112.5, -10], [12.5, -10]]
+    assert {**compact, "polygon": shape["polygon"]} == shape
+    with pytest.raises(ValueError):
+        geometry_core.render_export(BODIES[1:], "TriOrb Shapes (JSON)")
+    with pytest.raises(ValueError):
+        geometry_core.render_export(BODIES, "DXF")
@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+import pytest
+
 import main
 
 
@@ -129,3 +131,77 @@ def test_load_scan_planes_returns_devices(monkeypatch, write_sample_xml):
             "devices": [{"attributes": {"Index": "1", "Typekey": "NANS3-TEST"}}],
         }
     ]
+
+
+_MULTI_CASETABLES = """
+<Export_CasetablesAndCases>
+    <Casetable Index="1">
+        <Configuration><Name>Second</Name></Configuration>
+        <Cases><Case Id="0"><Name>B1</Name></Case><Case Id="1"><Name>B2</Name></Case></Cases>
+    </Casetable>
+    <Casetable Index="0">
+        <Configuration><Name>Main</Name></Configuration>
+        <Cases><Case Id="0"><Name>A1</Name></Case></Cases>
+    </Casetable>
+    <Casetable>
+        <Configuration><Name>Unindexed</Name></Configuration>
+    </Casetable>
+    <Casetable Index="1">
+        <Configuration><Name>Duplicate</Name></Configuration>
+    </Casetable>
+</Export_CasetablesAndCases>
+"""
+
+
+def test_casetable_index_lists_every_casetable(monkeypatch, write_sample_xml):
+    monkeypatch.setattr(main, "SAMPLE_XML", write_sample_xml(_MULTI_CASETABLES, filename="multi.sgexml"))
+
+    index = main.load_casetable_index()
+
+    assert [(s["index"], s["name"], s["cases"]) for s in index.summaries()] == [
+        ("1", "Second", 2),
+        ("0", "Main", 1),
+        ("2", "Unindexed", 0),
+        ("3", "Duplicate", 0),
+    ]
+    # 既定は従来どおり Index="0"。
+    assert index.default_key == "0"
+    assert main.load_casetable_payload()["configuration"]["children"][0]["text"] == "Main"
+    assert main.load_casetable_payload(index="1")["cases"][1]["attributes"] == {"Id": "1"}
+    assert main.load_casetable_payload(index="3")["casetable_attributes"] == {"Index": "1"}
+    with pytest.raises(KeyError):
+        index.payload("9")
+
+
+
+def test_casetable_keys_never_collide(monkeypatch, write_sample_xml):
+    # 出現順のキーが既に Index として使われていても、別のキーへずらして全件を残す。
+    casetables = "".join(
+        f"<Casetable{attributes}><Configuration><Name>{name}</Name></Configuration></Casetable>"
+        for name, attributes in zip("ABCDE", (' Index="2"', ' Index="2"', "", ' Index="4"', ""))
+    )
+    body = f"<Export_CasetablesAndCases>{casetables}</Export_CasetablesAndCases>"
+    monkeypatch.setattr(main, "SAMPLE_XML", write_sample_xml(body, filename="collide.sgexml"))
+
+    index = main.load_casetable_index()
+
+    assert index.keys() == ["2", "1", "2_1", "4", "4_1"]
+    assert [summary["name"] for summary in index.summaries()] == list("ABCDE")
+    assert [index.payload(key)["configuration"]["children"][0]["text"] for key in index] == list("ABCDE")
+
+
+def test_build_index_payload_serializes_only_the_viewed_casetable(monkeypatch, write_sample_xml):
+    monkeypatch.setattr(main, "SAMPLE_XML", write_sample_xml(_MULTI_CASETABLES, filename="multi.sgexml"))
+    serialized = []
+    original = main._serialize_casetable
+    monkeypatch.setattr(
+        main, "_serialize_casetable", lambda node: serialized.append(node.get("Index")) or original(node)
+    )
+
+    payload = main.build_index_payload()
+    assert serialized == ["0"]
+
+    index = payload["casetable_index"]
+    assert index.payload("1") is index.payload("1")
+    assert serialized == ["0", "1"]
+    assert len(index.payloads()) == 4
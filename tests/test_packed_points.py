@@ -0,0 +1,110 @@
+from __future__ import annotations
+
+import json
+import math
+
+import pytest
+
+import main
+from packed_points import (
+    PackedPoints,
+    encode_shape_points,
+    expand_points,
+    js_number_to_string,
+    pack_coordinates,
+    pack_points,
+)
+
+_POINTS = [{"X": "0", "Y": "-12.5"}, {"X": "1500", "Y": "0.1"}, {"X": "-3e-7", "Y": "250"}]
+
+
+def test_pack_points_round_trips_verbatim():
+    packed = pack_points(_POINTS)
+
+    assert isinstance(packed, PackedPoints)
+    assert packed == _POINTS
+    assert list(packed) == _POINTS
+    assert packed[-1] == _POINTS[-1]
+    assert packed[1:] == _POINTS[1:]
+    assert packed.to_flat_list() == [0, -12.5, 1500, 0.1, -3e-7, 250]
+    assert packed.nbytes == 8 * 2 * len(_POINTS)
+
+
+def test_pack_points_keeps_non_canonical_points_as_dicts():
+    # String(number) で元の表記に戻らない値や追加属性は詰めずにそのまま残す。
+    for points in (
+        [{"X": "100.0", "Y": "0"}],
+        [{"X": "-0", "Y": "0"}],
+        [{"X": "007", "Y": "0"}],
+        [{"X": "abc", "Y": "0"}],
+        [{"X": "1", "Y": "2", "Z": "3"}],
+        [],
+    ):
+        result = pack_points(points)
+        assert isinstance(result, list)
+        assert result == points
+
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["0", "-0", "0.0", "1", "1.", "1.0", "+1", " 1", "01", "0.000001", "0.0000001", "1e-7", "1e-07", "1e21",
+     "100000000000000000000", "123456789012345", "1234567890123456", "0.30000000000000004", "0.3000000000000000",
+     "1_0", "Infinity", "inf", "nan", "1,2", "\u0663"],
+)
+def test_pack_coordinates_matches_the_string_round_trip(text):
+    try:
+        expected = math.isfinite(float(text)) and js_number_to_string(float(text)) == text
+    except ValueError:
+        expected = False
+
+    # 正規表現による近道と個別の判定のどちらを通っても String(number) の往復と一致する。
+    for points in ([{"X": text, "Y": "0"}], [{"X": "1", "Y": "2.5"}] * 3 + [{"X": "3", "Y": text, "Z": "9"}]):
+        assert (pack_coordinates(points) is not None) is expected
+    assert pack_coordinates([{"X": 1.0, "Y": "0"}]) is None and pack_coordinates([{"Y": "0"}]) is None
+
+def test_encode_shape_points_does_not_touch_the_source():
+    shape = {"id": "shape-1", "type": "Polygon", "polygon": {"Type": "Field", "points": pack_points(_POINTS)}}
+
+    packed = encode_shape_points([shape], "packed")[0]
+    objects = encode_shape_points([shape], "objects")[0]
+
+    assert packed["polygon"]["points"] == [0, -12.5, 1500, 0.1, -3e-7, 250]
+    assert objects["polygon"]["points"] == _POINTS
+    assert isinstance(shape["polygon"]["points"], PackedPoints)
+    assert expand_points({"shapes": [shape]}) == {"shapes": [objects]}
+
+
+def test_loader_stores_polygons_packed(write_sample_xml):
+    polygon = "".join(f'<Point X="{point["X"]}" Y="{point["Y"]}" />' for point in _POINTS)
+    path = write_sample_xml(
+        "<Export_FieldsetsAndFields><ScanPlane><Fieldsets><Fieldset Name=\"A\">"
+        f'<Field Name="F"><Polygon Type="Field">{polygon}</Polygon></Field>'
+        "</Fieldset></Fieldsets></ScanPlane></Export_FieldsetsAndFields>"
+    )
+
+    _, shapes, _ = main.load_fieldsets_and_shapes(main.SgexmlDocument.load(path))
+
+    assert isinstance(shapes[0]["polygon"]["points"], PackedPoints)
+    assert shapes[0]["polygon"]["points"] == _POINTS
+
+
+def test_triorb_shapes_api_point_encodings():
+    client = main.create_app().test_client()
+
+    objects = client.get("/api/document/triorb_shapes").get_json()["shapes"]
+    packed = client.get("/api/document/triorb_shapes?points=packed").get_json()["shapes"]
+
+    assert client.get("/api/document/triorb_shapes?points=svg").status_code == 400
+    polygons = [(o, p) for o, p in zip(objects, packed) if o["type"] == "Polygon"]
+    assert polygons
+    for as_objects, as_packed in polygons:
+        flat = [float(point[axis]) for point in as_objects["polygon"]["points"] for axis in ("X", "Y")]
+        assert as_packed["polygon"]["points"] == flat
+    assert len(json.dumps(packed)) < len(json.dumps(objects))
+
+
+def test_index_requests_packed_points():
+    html = main.create_app().test_client().get("/").get_data(as_text=True)
+
+    assert "/api/document/triorb_shapes?points=packed" in html
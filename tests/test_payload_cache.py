@@ -0,0 +1,92 @@
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+import pytest
+
+import main
+from payload_cache import DocumentPayloadCache
+
+_SAMPLE_XML = Path(__file__).parent / "data" / "io_sample.sgexml"
+
+
+def _counting_builder(calls: list):
+    def _build(data, digest):
+        calls.append(digest)
+        return {"size": len(data) if data is not None else None}
+
+    return _build
+
+
+def test_lookup_hits_until_content_changes(tmp_path):
+    source = tmp_path / "doc.sgexml"
+    source.write_text("<SdImportExport />", encoding="utf-8")
+    cache = DocumentPayloadCache(max_entries=4)
+    calls: list = []
+
+    first = cache.lookup(source, _counting_builder(calls))
+    second = cache.lookup(source, _counting_builder(calls))
+
+    assert second is first
+    assert len(calls) == 1
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+    # mtime を据え置いたまま同サイズで書き換えても内容ハッシュで検出する。
+    stat = source.stat()
+    source.write_text("<SdImportExpore />", encoding="utf-8")
+    os.utime(source, ns=(stat.st_atime_ns, stat.st_mtime_ns))
+    third = cache.lookup(source, _counting_builder(calls))
+
+    assert third.digest != first.digest
+    assert len(calls) == 2
+
+
+def test_lookup_evicts_least_recently_used(tmp_path):
+    cache = DocumentPayloadCache(max_entries=2)
+    calls: list = []
+    paths = []
+    for index in range(3):
+        path = tmp_path / f"doc{index}.sgexml"
+        path.write_text(f"<SdImportExport Index='{index}' />", encoding="utf-8")
+        paths.append(path)
+
+    cache.lookup(paths[0], _counting_builder(calls))
+    cache.lookup(paths[1], _counting_builder(calls))
+    cache.lookup(paths[0], _counting_builder(calls))
+    cache.lookup(paths[2], _counting_builder(calls))
+
+    assert cache.stats()["evictions"] == 1
+    cache.lookup(paths[0], _counting_builder(calls))
+    assert len(calls) == 3
+    cache.lookup(paths[1], _counting_builder(calls))
+    assert len(calls) == 4
+
+
+def test_missing_file_is_built_but_not_cached(tmp_path):
+    cache = DocumentPayloadCache()
+    calls: list = []
+
+    entry = cache.lookup(tmp_path / "missing.sgexml", _counting_builder(calls))
+
+    assert entry.value == {"size": None}
+    assert cache.stats()["entries"] == 0
+
+
+def test_invalid_max_entries_is_rejected():
+    with pytest.raises(ValueError):
+        DocumentPayloadCache(max_entries=0)
+
+
+def test_index_reuses_cached_payload(monkeypatch):
+    monkeypatch.setattr(main, "SAMPLE_XML", _SAMPLE_XML)
+    app = main.create_app()
+    client = app.test_client()
+
+    assert client.get("/").status_code == 200
+    assert client.get("/").status_code == 200
+
+    stats = app.extensions["payload_cache"].stats()
+    assert stats["misses"] == 1
+    assert stats["hits"] == 1
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import json
+import subprocess
+import sys
+from pathlib import Path
+
+import plotly_panel
+
+
+def test_spec_matches_plotly_figure_json():
+    import plotly.graph_objs as go
+
+    # 変更前と同じ手順で組み立てた Figure と JSON として一致すること。
+    figure = go.Figure(data=[])
+    axis_style = dict(
+        showgrid=True,
+        gridcolor="#d9dee7",
+        gridwidth=1,
+        zeroline=True,
+        zerolinecolor="#9fb3d1",
+        zerolinewidth=2,
+        showline=True,
+        linewidth=2,
+        linecolor="#6b7a99",
+        range=[-1000, 1000],
+        constrain="range",
+        tick0=0,
+        dtick=100,
+        minor=dict(showgrid=True, gridcolor="#f2f5fb", gridwidth=0.5, dtick=50),
+    )
+    figure.update_xaxes(title="X[mm]", **axis_style)
+    figure.update_yaxes(title="Y[mm]", scaleanchor="x", scaleratio=1, **axis_style)
+    line = dict(color="#cbd5f5", width=1, dash="dot")
+    shapes = []
+    for value in (-750, -500, -250, 250, 500, 750):
+        shapes.append(dict(type="line", xref="x", yref="y", x0=-1000, x1=1000, y0=value, y1=value, line=line))
+        shapes.append(dict(type="line", xref="x", yref="y", x0=value, x1=value, y0=-1000, y1=1000, line=line))
+    figure.update_layout(
+        plot_bgcolor="#ffffff",
+        paper_bgcolor="#ffffff",
+        margin=dict(l=60, r=20, t=30, b=60),
+        legend=dict(orientation="h", yanchor="bottom", y=1.02),
+        shapes=shapes,
+    )
+
+    expected = json.dumps(figure.to_plotly_json(), sort_keys=True)
+
+    assert json.dumps(plotly_panel.sample_figure_spec(), sort_keys=True) == expected
+    assert json.dumps(plotly_panel.build_sample_figure().to_plotly_json(), sort_keys=True) == expected
+
+
+def test_spec_is_memoized_per_axis_setting():
+    default = plotly_panel.sample_figure_spec()
+    wider = plotly_panel.sample_figure_spec(axis_range=(-2000, 2000))
+
+    assert plotly_panel.sample_figure_spec() is default
+    assert wider is not default
+    assert wider["layout"]["xaxis"]["range"] == [-2000, 2000]
+    assert wider["layout"]["shapes"][0]["x1"] == 2000
+
+
+def test_importing_main_does_not_load_plotly():
+    code = "import sys, main; main.create_app().test_client().get('/'); print('plotly' in sys.modules)"
+    result = subprocess.run(
+        [sys.executable, "-c", code],
+        cwd=Path(__file__).resolve().parents[1],
+        check=True,
+        capture_output=True,
+        text=True,
+    )
+
+    assert result.stdout.strip() == "False"
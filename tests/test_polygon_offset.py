@@ -0,0 +1,141 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pytest
+
+import main
+from packed_points import pack_points
+import polygon_offset
+
+SQUARE = [(0, 0), (100, 0), (100, 50), (0, 50)]
+# 右側が開いた C 字形（幅 20 の腕、開口部の高さ 60）。
+C_SHAPE = [(0, 0), (100, 0), (100, 20), (20, 20), (20, 80), (100, 80), (100, 100), (0, 100)]
+# 幅 4 のくびれで左右の 40 x 40 がつながった形。
+DUMBBELL = [
+    (0, 0), (40, 0), (40, 18), (60, 18), (60, 0), (100, 0),
+    (100, 40), (60, 40), (60, 22), (40, 22), (40, 40), (0, 40),
+]
+
+
+def _polygon(shape_id, points):
+    coords = [{"X": str(x), "Y": str(y)} for x, y in points]
+    return {"id": shape_id, "type": "Polygon", "polygon": {"Type": "Field", "points": coords}}
+
+
+def _areas(rings):
+    return sorted(round(polygon_offset.signed_area(np.array(ring)), 1) for ring in rings)
+
+
+def test_square_offsets_follow_the_join_style():
+    assert _areas(polygon_offset.offset_polygon(SQUARE, 10)) == [8400.0]
+    assert _areas(polygon_offset.offset_polygon(SQUARE, 10, join="bevel")) == [8200.0]
+    # 円弧は許容誤差の範囲で内側に近似する（正確な値は 8000 + 100π ≈ 8314.2）。
+    (rounded,) = _areas(polygon_offset.offset_polygon(SQUARE, 10, join="round"))
+    assert 8314.2 - 10 < rounded < 8314.2
+    assert _areas(polygon_offset.offset_polygon(SQUARE, -10)) == [2400.0]
+    assert polygon_offset.offset_polygon(SQUARE, -30) == []
+
+
+def test_concave_outset_narrows_the_notch_and_inset_removes_thin_arms():
+    # 開口部（高さ 60）は上下から 25 ずつ狭まり、150 x 150 に幅 10・奥行き 80 の溝が残る。
+    (outset,) = polygon_offset.offset_polygon(C_SHAPE, 25)
+    assert _areas([outset]) == [21700.0]
+    assert len(outset) == 8
+    # 腕の幅 20 は inset 10 でちょうど潰れる。
+    assert polygon_offset.offset_polygon(C_SHAPE, -10) == []
+    assert _areas(polygon_offset.offset_polygon(C_SHAPE, -10, join="bevel")) == [50.0, 50.0]
+
+
+def test_inset_splits_at_a_narrow_neck_and_outset_merges():
+    assert _areas(polygon_offset.offset_polygon(DUMBBELL, -3)) == [1156.0, 1156.0]
+    assert _areas(polygon_offset.offset_polygon(DUMBBELL, 3)) == [4372.0]
+    assert _areas(polygon_offset.offset_polygon(DUMBBELL, 10)) == [7200.0]
+
+
+def test_clockwise_input_keeps_its_orientation():
+    clockwise = SQUARE[::-1] + [SQUARE[-1]]
+
+    (ring,) = polygon_offset.offset_polygon(clockwise, 5)
+
+    assert polygon_offset.signed_area(np.array(ring)) == pytest.approx(-6600.0)
+    # 閉じるための重複点は落とす。
+    assert polygon_offset.offset_polygon(clockwise, 0) == [[(100.0, 50.0), (100.0, 0.0), (0.0, 0.0), (0.0, 50.0)]]
+
+
+def test_self_intersecting_wavy_curve_resolves_to_one_ring():
+    theta = np.linspace(0, 2 * math.pi, 720, endpoint=False)
+    radius = 100 + 20 * np.sin(7 * theta)
+    star = np.column_stack((radius * np.cos(theta), radius * np.sin(theta)))
+
+    for delta in (15, -15):
+        (ring,) = polygon_offset.offset_polygons([star], delta)[0]
+        assert polygon_offset.signed_area(ring) > 0
+    with pytest.raises(ValueError):
+        polygon_offset.offset_polygons([star], 5, join="square")
+
+
+def test_batch_matches_single_calls():
+    polygons = [SQUARE, C_SHAPE, DUMBBELL, [(0, 0), (10, 0), (20, 0)]]
+
+    batch = polygon_offset.offset_polygons(polygons, -3, join="round")
+
+    for polygon, rings in zip(polygons, batch):
+        single = polygon_offset.offset_polygons([polygon], -3, join="round")[0]
+        assert [ring.tolist() for ring in rings] == [ring.tolist() for ring in single]
+    # 面積の無い点列は inset で消える。
+    assert batch[-1] == []
+
+
+def test_offset_shapes_handles_every_shape_type():
+    shapes = [
+        _polygon("a", DUMBBELL),
+        {"id": "b", "type": "Rectangle", "rectangle": {"OriginX": "0", "OriginY": "10", "Width": "20", "Height": "10"}},
+        {"id": "c", "type": "Circle", "circle": {"CenterX": "0", "CenterY": "0", "Radius": "2.5"}},
+        _polygon("d", SQUARE),
+    ]
+
+    neck, rectangle, circle, square = polygon_offset.offset_shapes(shapes, -3)
+
+    # 分かれた場合は最大の輪を残す（左右同じ面積なら先に見つかった方）。
+    assert len(neck["polygon"]["points"]) == 6
+    assert rectangle["rectangle"] == {"OriginX": "3", "OriginY": "7", "Width": "14", "Height": "4"}
+    assert circle["circle"]["Radius"] == "0"
+    assert square["polygon"]["points"][0] == {"X": "3", "Y": "3"}
+    assert shapes[3]["polygon"]["points"][0] == {"X": "0", "Y": "0"}
+    assert polygon_offset.offset_shapes(shapes[3:], -30) == [None]
+    assert polygon_offset.offset_shapes(shapes[2:3], 0.1234)[0]["circle"]["Radius"] == "2.623"
+
+
+def test_offset_endpoint():
+    client = main.create_app().test_client()
+    shape = _polygon("a", SQUARE)
+
+    response = client.post("/api/shapes/offset", json={"shapes": [shape, shape], "delta": 10, "join": "bevel"})
+    vanished = client.post("/api/shapes/offset", json={"shapes": [shape], "delta": -30})
+
+    assert response.status_code == 200
+    first, second = response.get_json()["shapes"]
+    assert first == second and len(first["polygon"]["points"]) == 8
+    assert vanished.get_json() == {"shapes": [None]}
+    invalid = ({"delta": 1}, {"shapes": [shape], "delta": "x"}, {"shapes": [shape], "join": "square"}, {"shapes": [1]})
+    for body in invalid:
+        assert client.post("/api/shapes/offset", json=body).status_code == 400
+
+
+def test_packed_points_offset_like_dicts():
+    packed = pack_points(_polygon("a", SQUARE)["polygon"]["points"])
+
+    assert polygon_offset.offset_polygon(packed, 10) == polygon_offset.offset_polygon(SQUARE, 10)
+
+
+def test_per_ring_deltas():
+    rings = [np.array(SQUARE, dtype=float), np.array(C_SHAPE, dtype=float)]
+
+    curves = polygon_offset.raw_offset_curves(rings, [2.0, 5.0])
+
+    for ring, delta, curve in zip(rings, (2.0, 5.0), curves):
+        assert curve.tolist() == polygon_offset.raw_offset_curves([ring], delta)[0].tolist()
+    with pytest.raises(ValueError):
+        polygon_offset.raw_offset_curves(rings, [2.0, -5.0])
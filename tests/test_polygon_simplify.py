@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import math
+
+import numpy as np
+import pytest
+
+import main
+import polygon_offset
+import polygon_simplify
+
+CIRCLE = [
+    (round(100 * math.cos(2 * math.pi * index / 400), 3), round(100 * math.sin(2 * math.pi * index / 400), 3))
+    for index in range(400)
+]
+# 下辺に深さ 0.5 の窪み（内側）/ 出っ張り（外側）がある 100 x 100。
+NOTCH = [(0, 0), (40, 0), (40, 0.5), (60, 0.5), (60, 0), (100, 0), (100, 100), (0, 100)]
+BUMP = [(0, 0), (40, 0), (40, -0.5), (60, -0.5), (60, 0), (100, 0), (100, 100), (0, 100)]
+
+
+def _polygon(shape_id, points, polygon_type="Field"):
+    coords = [{"X": str(x), "Y": str(y)} for x, y in points]
+    return {"id": shape_id, "type": "Polygon", "polygon": {"Type": polygon_type, "points": coords}}
+
+
+def _inside_or_on(points, ring):
+    # 偶奇規則で内側か、辺から 1e-6 以内なら境界上とみなす。
+    points, ring = np.asarray(points, dtype=float), np.asarray(ring, dtype=float)
+    x, y = points[:, :1], points[:, 1:]
+    a, b = ring, np.roll(ring, -1, axis=0)
+    crosses = (a[:, 1] > y) != (b[:, 1] > y)
+    height = np.where(b[:, 1] == a[:, 1], 1.0, b[:, 1] - a[:, 1])
+    inside = (np.sum(crosses & (x < a[:, 0] + (y - a[:, 1]) * (b[:, 0] - a[:, 0]) / height), axis=1) % 2) == 1
+    ab = b - a
+    t = np.clip(np.einsum("pij,ij->pi", points[:, None] - a, ab) / np.einsum("ij,ij->i", ab, ab), 0, 1)
+    gap = points[:, None] - a - t[..., None] * ab
+    return inside | (np.sqrt((gap**2).sum(-1)).min(axis=1) < 1e-6)
+
+
+@pytest.mark.parametrize("method", polygon_simplify.METHODS)
+def test_circle_is_reduced_without_shrinking(method):
+    (result,) = polygon_simplify.simplify_polygons([CIRCLE], 2.0, method)
+
+    assert result.changed and result.kept is None
+    assert 20 < len(result.ring) < 40
+    # 弦の内側に入った分だけ外へ広げるので、元の頂点はすべて内側に残る。
+    assert 0 < result.growth <= 1.0
+    assert _inside_or_on(CIRCLE, result.ring).all()
+    radii = np.hypot(result.ring[:, 0], result.ring[:, 1])
+    assert radii.max() <= 100 + 1.5 * 2.0
+    # 時計回りの入力は時計回りのまま返す。
+    (clockwise,) = polygon_simplify.simplify_polygons([CIRCLE[::-1]], 2.0, method)
+    assert polygon_offset.signed_area(clockwise.ring) < 0
+
+
+@pytest.mark.parametrize("method", polygon_simplify.METHODS)
+def test_inner_details_are_filled_and_outer_ones_grow_the_polygon(method):
+    notch, bump = polygon_simplify.simplify_polygons([NOTCH, BUMP], 2.0, method)
+
+    # 窪みを埋めても縮まないので、元の頂点をそのまま使う。
+    assert notch.growth == 0 and notch.kept.tolist() == [0, 5, 6, 7]
+    # 出っ張りを消すと、その深さだけ全体を広げる。
+    assert bump.growth == 0.5 and bump.kept is None
+    assert _inside_or_on(BUMP, bump.ring).all()
+    assert polygon_offset.signed_area(bump.ring) == pytest.approx(101.002**2, abs=0.01)
+    # 許容誤差より深い出っ張りは残す。
+    (deep,) = polygon_simplify.simplify_polygons([BUMP], 0.5, method)
+    assert not deep.changed and len(deep.ring) == len(BUMP)
+
+
+
+@pytest.mark.parametrize("method", polygon_simplify.METHODS)
+def test_cutouts_are_simplified_inward(method):
+    notch, bump = polygon_simplify.simplify_polygons([NOTCH, BUMP], 2.0, method, inset=True)
+
+    # CutOut では出っ張りを削っても広がらないので、元の頂点をそのまま使う。
+    assert bump.growth == 0 and bump.kept.tolist() == [0, 5, 6, 7]
+    # 窪みを埋める代わりに、その深さだけ全体を縮めて元の輪の内側に収める。
+    assert notch.growth == -0.5 and notch.kept is None
+    assert _inside_or_on(notch.ring, NOTCH).all()
+    assert polygon_offset.signed_area(notch.ring) == pytest.approx(98.998**2, abs=0.01)
+    (circle,) = polygon_simplify.simplify_polygons([CIRCLE[::-1]], 2.0, method, inset=True)
+    # 凸な輪は弦が内側を通るので、縮めずに元の頂点だけで済む。
+    assert circle.changed and circle.growth == 0 and circle.kept is not None
+    assert _inside_or_on(circle.ring, CIRCLE).all() and polygon_offset.signed_area(circle.ring) < 0
+
+
+def test_simplify_shapes_never_shrinks_the_field():
+    shapes = [_polygon("field", NOTCH), _polygon("cutout", NOTCH, "CutOut"), _polygon("hole", BUMP, "CutOut")]
+
+    result, reports = polygon_simplify.simplify_shapes(shapes, 2.0)
+
+    field, cutout, hole = (np.array([[float(p["X"]), float(p["Y"])] for p in shape["polygon"]["points"]])
+                           for shape in result)
+    # Field は元の輪を含み、CutOut は元の輪に収まる（どちらもフィールドの領域は減らない）。
+    assert _inside_or_on(NOTCH, field).all() and len(field) == 4
+    assert _inside_or_on(cutout, NOTCH).all() and _inside_or_on(hole, BUMP).all()
+    assert [report.growth for report in reports] == [0.0, -0.5, 0.0]
+    assert [shape["polygon"]["Type"] for shape in result] == ["Field", "CutOut", "CutOut"]
+
+def test_batch_matches_single_calls_and_mixes_tolerances():
+    polygons = [CIRCLE, NOTCH, BUMP, [(0, 0), (1, 0), (0, 1)], [(0, 0), (5, 0), (10, 0)]]
+    tolerances = [0.5, 2.0, 2.0, 1.0, 1.0]
+
+    batch = polygon_simplify.simplify_polygons(polygons, tolerances)
+
+    for polygon, tolerance, result in zip(polygons, tolerances, batch):
+        (single,) = polygon_simplify.simplify_polygons([polygon], tolerance)
+        assert result.ring.tolist() == single.ring.tolist()
+    assert not batch[3].changed and not batch[4].changed
+    with pytest.raises(ValueError):
+        polygon_simplify.simplify_polygons([CIRCLE], 1.0, method="radial")
+
+
+def test_field_resolution_sets_the_tolerance():
+    fieldsets = {
+        "fieldsets": [
+            {
+                "fields": [
+                    {"attributes": {"Resolution": "70"}, "shapeRefs": [{"shapeId": "a"}, {"shapeId": "b"}]},
+                    {"attributes": {"Resolution": "30"}, "shapeRefs": [{"shapeId": "b"}]},
+                    {"attributes": {"Resolution": "70", "TolerancePositive": "1"}, "shapeRefs": [{"shapeId": "c"}]},
+                ]
+            }
+        ]
+    }
+
+    assert polygon_simplify.shape_tolerances([fieldsets]) == {"a": 3.5, "b": 1.5, "c": 1.0}
+    assert polygon_simplify.field_tolerance({}) == polygon_simplify.DEFAULT_TOLERANCE
+
+
+def test_simplify_shapes_keeps_source_strings_and_reports():
+    line = [(0, 0), (10, 0.0001), (20, 0), (30, 0), (30, 10), (0, 10), (0, 0)]
+    shapes = [
+        _polygon("line", line),
+        {"id": "r", "type": "Rectangle", "rectangle": {"OriginX": "0", "OriginY": "0", "Width": "1", "Height": "1"}},
+        _polygon("tri", [(0, 0), (1, 0), (0, 1), (0, 0)]),
+    ]
+
+    result, reports = polygon_simplify.simplify_shapes(shapes, {"line": 1.0})
+
+    assert result[0]["polygon"]["points"] == [
+        {"X": "0", "Y": "0"}, {"X": "30", "Y": "0"}, {"X": "30", "Y": "10"}, {"X": "0", "Y": "10"}
+    ]
+    assert result[1] == shapes[1] and result[2] == shapes[2]
+    assert len(shapes[0]["polygon"]["points"]) == 7
+    assert [report.to_dict() for report in reports] == [
+        {"id": "line", "tolerance": 1.0, "before": 7, "after": 4, "growth": 0.0},
+        {"id": "tri", "tolerance": polygon_simplify.DEFAULT_TOLERANCE, "before": 4, "after": 4, "growth": 0.0},
+    ]
+
+
+def test_simplify_payload_uses_every_plane():
+    payload = main.build_index_payload()
+
+    shapes, reports = polygon_simplify.simplify_payload(payload)
+
+    (report,) = reports
+    assert report.tolerance == 3.5 and report.after < report.before
+    polygon = next(shape for shape in shapes if shape["type"] == "Polygon")
+    original = next(shape for shape in payload["triorb_shapes"] if shape["type"] == "Polygon")
+    original_points = [(float(point["X"]), float(point["Y"])) for point in original["polygon"]["points"]]
+    ring = [(float(point["X"]), float(point["Y"])) for point in polygon["polygon"]["points"]]
+    assert _inside_or_on(original_points, ring).all()
+
+
+def test_simplify_endpoint():
+    client = main.create_app().test_client()
+    shape = _polygon("a", CIRCLE)
+    fieldsets = [{"fields": [{"attributes": {"Resolution": "40"}, "shapeRefs": [{"shapeId": "a"}]}]}]
+
+    response = client.post("/api/shapes/simplify", json={"shapes": [shape], "fieldsets": fieldsets})
+    explicit = client.post("/api/shapes/simplify", json={"shapes": [shape], "tolerance": 0.5, "method": "visvalingam"})
+
+    assert response.status_code == 200
+    (report,) = response.get_json()["reports"]
+    assert report["tolerance"] == 2.0 and report["after"] < 40
+    assert explicit.get_json()["reports"][0]["after"] > report["after"]
+    invalid = ({"shapes": {}}, {"shapes": [shape], "method": "x"}, {"shapes": [shape], "tolerance": 0}, {"shapes": [1]})
+    for body in invalid:
+        assert client.post("/api/shapes/simplify", json=body).status_code == 400
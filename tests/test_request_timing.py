@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import logging
+from pathlib import Path
+
+import main
+from request_timing import RequestTimer, StageTiming, format_server_timing, timed_stage
+
+
+def _metrics(header: str) -> dict:
+    metrics = {}
+    for item in header.split(", "):
+        name, *params = item.split(";")
+        metrics.setdefault(name, dict(param.split("=", 1) for param in params))
+    return metrics
+
+
+def test_index_reports_loader_stages(monkeypatch):
+    monkeypatch.setattr(main, "SAMPLE_XML", Path(__file__).parent / "data" / "io_sample.sgexml")
+    client = main.create_app().test_client()
+
+    first = _metrics(client.get("/").headers["Server-Timing"])
+    second = _metrics(client.get("/").headers["Server-Timing"])
+
+    for stage in ("payload", "parse", "fieldsets", "casetable", "scan_planes", "figure", "render", "total"):
+        assert stage in first
+        assert float(first[stage]["dur"]) >= 0
+    assert first["payload"]["desc"] == '"cache miss"'
+    # キャッシュヒット時は XML の解析もローダーも走らない。
+    assert second["payload"]["desc"] == '"cache hit"'
+    assert "parse" not in second and "casetable" not in second
+
+
+def test_document_api_reports_json_stage():
+    client = main.create_app().test_client()
+
+    response = client.get("/api/document/fieldsets")
+
+    assert {"payload", "json", "total"} <= set(_metrics(response.headers["Server-Timing"]))
+
+
+def test_timings_are_logged_with_structured_extra(caplog):
+    client = main.create_app().test_client()
+
+    with caplog.at_level(logging.INFO, logger="sick_sls_editor.timing"):
+        client.get("/api/document/menu")
+
+    record = caplog.records[-1]
+    assert record.path == "/api/document/menu"
+    assert {"payload", "json", "total"} <= set(record.timings)
+
+
+def test_timed_stage_is_a_no_op_outside_requests():
+    with timed_stage("parse"):
+        pass
+
+    payload = main.build_index_payload(main.SgexmlDocument.load())
+
+    assert payload["menu_items"]
+
+
+def test_server_timing_format():
+    ticks = iter([0.0, 1.0, 1.5])
+    timer = RequestTimer(clock=lambda: next(ticks))
+
+    with timer.stage("parse", 'say "hi"'):
+        pass
+
+    assert timer.stages == [StageTiming("parse", 500.0, 'say "hi"')]
+    assert format_server_timing(timer.stages) == 'parse;dur=500.00;desc="say \\"hi\\""'
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+import gzip
+from pathlib import Path
+import shutil
+
+import pytest
+
+import main
+from response_compression import compress, negotiate_encoding
+
+_SAMPLE_XML = Path(__file__).parent / "data" / "io_sample.sgexml"
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "SAMPLE_XML", _SAMPLE_XML)
+    return main.create_app().test_client()
+
+
+@pytest.mark.parametrize(
+    ("header", "expected"),
+    [
+        ("", None),
+        ("gzip, deflate", "gzip"),
+        ("gzip;q=0, deflate", None),
+        ("*", "br"),
+        ("*;q=0.5, br;q=0", "gzip"),
+        ("identity", None),
+        ("br;q=1.0, gzip;q=0.8", "br"),
+        ("br;q=0.5, gzip;q=0.8", "gzip"),
+    ],
+)
+def test_negotiate_encoding(header, expected):
+    assert negotiate_encoding(header, ("br", "gzip")) == expected
+
+
+def test_gzip_is_deterministic():
+    data = b"<Fieldset />" * 200
+
+    assert compress(data, "gzip") == compress(data, "gzip")
+    assert gzip.decompress(compress(data, "gzip")) == data
+    with pytest.raises(ValueError):
+        compress(data, "deflate")
+
+
+def test_index_is_compressed_and_revalidated(client):
+    plain = client.get("/")
+    compressed = client.get("/", headers={"Accept-Encoding": "gzip"})
+
+    assert "Content-Encoding" not in plain.headers
+    assert compressed.headers["Content-Encoding"] == "gzip"
+    assert "Accept-Encoding" in compressed.headers["Vary"]
+    assert gzip.decompress(compressed.data) == plain.data
+    assert compressed.headers["ETag"] == plain.headers["ETag"][:-1] + '-gz"'
+    assert compressed.headers["Cache-Control"] == "no-cache"
+
+    revalidated = client.get(
+        "/", headers={"Accept-Encoding": "gzip", "If-None-Match": compressed.headers["ETag"]}
+    )
+    assert revalidated.status_code == 304
+    assert revalidated.data == b""
+    assert revalidated.headers["ETag"] == compressed.headers["ETag"]
+    # 304 はページを組み立てずに返す。
+    assert "render" not in revalidated.headers["Server-Timing"]
+    assert client.get("/", headers={"If-None-Match": plain.headers["ETag"]}).status_code == 304
+
+
+def test_etag_follows_document_content_and_url(monkeypatch, tmp_path):
+    source = tmp_path / "doc.sgexml"
+    shutil.copyfile(_SAMPLE_XML, source)
+    monkeypatch.setattr(main, "SAMPLE_XML", source)
+    client = main.create_app().test_client()
+
+    fieldsets = client.get("/api/document/fieldsets").headers["ETag"]
+    packed = client.get("/api/document/fieldsets?points=packed").headers["ETag"]
+    assert fieldsets != packed
+    assert client.get("/api/document/fieldsets", headers={"If-None-Match": fieldsets}).status_code == 304
+
+    source.write_bytes(source.read_bytes().replace(b"</SdImportExport>", b"<!-- edited --></SdImportExport>"))
+    changed = client.get("/api/document/fieldsets", headers={"If-None-Match": fieldsets})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != fieldsets
+
+
+
+def test_strong_etag_always_names_the_same_bytes(monkeypatch):
+    # ID の無い図形を含む文書でも、別のワーカー（アプリ）が同じ ETag で同じ本文を返す。
+    monkeypatch.setattr(main, "SAMPLE_XML", Path(__file__).parent / "data" / "multi_scanplane.sgexml")
+    first, second = main.create_app().test_client(), main.create_app().test_client()
+
+    for url in ("/", *(f"/api/document/{section}" for section in main.DOCUMENT_SECTIONS), "/api/document/fieldsets/1"):
+        a, b = first.get(url), second.get(url)
+        assert a.status_code == 200 and a.headers["ETag"] == b.headers["ETag"]
+        assert not a.headers["ETag"].startswith("W/")
+        assert a.data == b.data, url
+
+def test_static_files_and_streams(client):
+    script = client.get("/static/js/app.js", headers={"Accept-Encoding": "gzip"})
+    assert script.headers["Content-Encoding"] == "gzip"
+    assert int(script.headers["Content-Length"]) == len(script.data)
+    assert "Accept-Ranges" not in script.headers
+    script.close()
+    cached = client.get(
+        "/static/js/app.js", headers={"Accept-Encoding": "gzip", "If-None-Match": script.headers["ETag"]}
+    )
+    assert cached.status_code == 304
+
+    export = client.get("/api/export/triorb", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in export.headers
+    assert export.data.startswith(b"<?xml")
+
+    small = client.get("/api/document/menu", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in small.headers
+    assert client.get("/api/document/unknown", headers={"If-None-Match": "*"}).status_code == 404
@@ -0,0 +1,161 @@
+from __future__ import annotations
+
+import io
+import json
+import re
+from pathlib import Path
+
+import pytest
+
+import main
+import sgexml_writer
+
+_DATA_DIR = Path(__file__).parent / "data"
+_SAMPLE_XML = _DATA_DIR / "io_sample.sgexml"
+_TIMESTAMP = "2025-01-01T00:00:00.000Z"
+# 期待値はブラウザ (app.js) の buildLegacyXml / buildTriOrbXml で同じ入力から生成したもの。
+# TriOrb の期待値は StateSnapshot を base64 のまま書く（CompressionStream の無い環境と同じ）経路の出力。
+_FIGURE = {
+    "data": [{"mode": "lines", "name": "Outline", "x": [0, 1.5, -2], "y": [10, 1e-07, 0.1]}],
+    "layout": {"title": {"text": "Fixture"}},
+}
+
+
+def _payload() -> dict:
+    return main.build_index_payload(main.SgexmlDocument.load(_SAMPLE_XML))
+
+
+@pytest.mark.parametrize("mode", ["legacy", "triorb"])
+def test_writer_matches_browser_export(mode):
+    expected = (_DATA_DIR / f"io_expected_{mode}.xml").read_text(encoding="utf-8")
+
+    actual = "".join(
+        sgexml_writer.iter_sgexml(
+            _payload(), mode, figure=_FIGURE, timestamp=_TIMESTAMP, snapshot_encoding="base64"
+        )
+    )
+
+    assert actual == expected
+
+
+@pytest.mark.parametrize("snapshot_encoding", sgexml_writer.SNAPSHOT_ENCODINGS)
+@pytest.mark.parametrize("chunk_size", [1, 64, 4096])
+def test_chunk_size_does_not_change_output(chunk_size, snapshot_encoding):
+    def export(**options):
+        return list(
+            sgexml_writer.iter_triorb_xml(
+                _payload(), figure=_FIGURE, timestamp=_TIMESTAMP, snapshot_encoding=snapshot_encoding, **options
+            )
+        )
+
+    expected = "".join(export())
+    chunks = export(chunk_size=chunk_size)
+
+    assert "".join(chunks) == expected
+    if chunk_size < len(expected):
+        assert len(chunks) > 1
+
+
+def test_triorb_snapshot_decodes_to_editor_state():
+    xml_text = "".join(sgexml_writer.iter_triorb_xml(_payload(), figure=_FIGURE, timestamp=_TIMESTAMP))
+    expected = (_DATA_DIR / "io_expected_triorb.xml").read_text(encoding="utf-8")
+
+    snapshot = main.read_state_snapshot(xml_text.encode("utf-8"))
+
+    assert 'Encoding="deflate+base64"' in xml_text
+    assert len(xml_text) < len(expected)
+    # 圧縮しても、ブラウザが base64 で書いたスナップショットと同じ内容に戻る。
+    assert snapshot == main.read_state_snapshot(expected.encode("utf-8"))
+    assert snapshot["version"] == sgexml_writer.TRIORB_STATE_SNAPSHOT_VERSION
+    assert snapshot["currentFigure"] == _FIGURE
+    assert snapshot["triorbShapes"][0]["id"] == "shape-001"
+    with pytest.raises(ValueError):
+        list(sgexml_writer.iter_triorb_xml(_payload(), snapshot_encoding="gzip"))
+
+
+def test_writer_exports_every_casetable():
+    # 期待値は app.js が 3 つの Casetable をすべて保存したときの出力。
+    payload = main.build_index_payload(main.SgexmlDocument.load(_DATA_DIR / "multi_casetable.sgexml"))
+    expected = (_DATA_DIR / "multi_casetable_expected_legacy.xml").read_text(encoding="utf-8")
+
+    actual = "".join(sgexml_writer.iter_legacy_xml(payload, timestamp=_TIMESTAMP))
+
+    assert actual == expected
+    xml_text = "".join(sgexml_writer.iter_triorb_xml(payload, figure=_FIGURE, timestamp=_TIMESTAMP))
+    snapshot = main.read_state_snapshot(xml_text.encode("utf-8"))
+    assert snapshot["activeCasetableKey"] == "0"
+    assert [entry["key"] for entry in snapshot["casetables"]] == ["0", "1", "2"]
+    assert snapshot["casetables"][0]["state"] is None
+    assert snapshot["casetables"][2]["state"]["attributes"] == {"Index": "2"}
+
+
+def test_writer_exports_every_scan_plane():
+    # 期待値は app.js が 2 つの ScanPlane の Fieldset をすべて保存したときの出力。
+    payload = main.build_index_payload(main.SgexmlDocument.load(_DATA_DIR / "multi_scanplane.sgexml"))
+    expected = (_DATA_DIR / "multi_scanplane_expected_legacy.xml").read_text(encoding="utf-8")
+
+    actual = "".join(sgexml_writer.iter_legacy_xml(payload, timestamp=_TIMESTAMP))
+
+    assert actual == expected
+    assert actual.count('<ScanPlane Index="1">') == 1
+    xml_text = "".join(sgexml_writer.iter_triorb_xml(payload, figure=_FIGURE, timestamp=_TIMESTAMP))
+    snapshot = main.read_state_snapshot(xml_text.encode("utf-8"))
+    assert snapshot["activeFieldsetPlaneKey"] == "0"
+    assert [entry["key"] for entry in snapshot["fieldsetPlanes"]] == ["0", "1"]
+    assert snapshot["fieldsetPlanes"][0]["state"] is None
+    user_field_ids = [
+        field["attributes"]["UserFieldId"]
+        for fieldset in snapshot["fieldsetPlanes"][1]["state"]["fieldsets"]
+        for field in fieldset["fields"]
+    ]
+    assert user_field_ids == ["3", "4"]
+
+
+def test_writer_does_not_mutate_payload():
+    payload = _payload()
+    before = json.dumps(payload, sort_keys=True, default=list)
+
+    "".join(sgexml_writer.iter_triorb_xml(payload, figure=_FIGURE, timestamp=_TIMESTAMP))
+
+    assert json.dumps(payload, sort_keys=True, default=list) == before
+
+
+def test_write_sgexml_to_path_and_stream(tmp_path):
+    expected = (_DATA_DIR / "io_expected_legacy.xml").read_text(encoding="utf-8")
+    target = tmp_path / "out.sgexml"
+    buffer = io.StringIO()
+
+    sgexml_writer.write_sgexml(_payload(), target, "legacy", timestamp=_TIMESTAMP)
+    sgexml_writer.write_sgexml(_payload(), buffer, "legacy", timestamp=_TIMESTAMP)
+
+    assert target.read_bytes() == expected.encode("utf-8")
+    assert buffer.getvalue() == expected
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        sgexml_writer.iter_sgexml(_payload(), "svg")
+
+
+@pytest.mark.parametrize(
+    ("value", "expected"),
+    [(0.1, "0.1"), (1e-7, "1e-7"), (1e21, "1e+21"), (123456789012345680000.0, "123456789012345680000"), (-0.0, "0"), (2.50, "2.5")],
+)
+def test_number_formatting_follows_javascript(value, expected):
+    assert sgexml_writer._js_number_to_string(value) == expected
+
+
+def test_export_endpoint_streams_xml(monkeypatch):
+    monkeypatch.setattr(main, "SAMPLE_XML", _SAMPLE_XML)
+    client = main.create_app().test_client()
+
+    response = client.get("/api/export/legacy")
+
+    assert response.status_code == 200
+    assert response.is_streamed
+    assert response.mimetype == "application/xml"
+    assert 'filename="sick_' in response.headers["Content-Disposition"]
+    body = re.sub(r'Timestamp="[^"]*"', 'Timestamp=""', response.get_data(as_text=True))
+    expected = (_DATA_DIR / "io_expected_legacy.xml").read_text(encoding="utf-8")
+    assert body == re.sub(r'Timestamp="[^"]*"', 'Timestamp=""', expected)
+    assert client.get("/api/export/unknown").status_code == 404
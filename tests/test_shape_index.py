@@ -0,0 +1,134 @@
+from __future__ import annotations
+
+import pickle
+
+import pytest
+
+import main
+from packed_points import pack_points
+from shape_index import FINGERPRINT_SIZE, ShapeIndex, geometry_fingerprint, shape_fingerprint
+
+_POINTS = [{"X": "0", "Y": "0"}, {"X": "100", "Y": "0"}, {"X": "100", "Y": "50"}]
+
+
+def test_fingerprint_is_fixed_size_and_ignores_attribute_order():
+    first = geometry_fingerprint("Rectangle", {"Type": "Field", "Width": "10", "Height": "5"})
+    second = geometry_fingerprint("Rectangle", {"Height": "5", "Width": "10", "Type": "Field"})
+
+    assert first == second
+    assert len(first) == FINGERPRINT_SIZE
+
+
+def test_fingerprint_distinguishes_geometry_verbatim():
+    base = geometry_fingerprint("Polygon", {"Type": "Field"}, _POINTS)
+
+    assert geometry_fingerprint("Polygon", {"Type": "Field"}, list(reversed(_POINTS))) != base
+    assert geometry_fingerprint("Polygon", {"Type": "CutOut"}, _POINTS) != base
+    # 旧キーと同様に文字列として比較するため、表記揺れは別図形として扱う。
+    assert geometry_fingerprint("Polygon", {"Type": "Field"}, [{"X": "0.0", "Y": "0"}] + _POINTS[1:]) != base
+    assert geometry_fingerprint("Polygon", {"Type": "Field"}, []) != geometry_fingerprint(
+        "Polygon", {"Type": "Field"}, None
+    )
+
+
+def test_fingerprint_depends_only_on_the_xy_sequence():
+    base = geometry_fingerprint("Polygon", {"Type": "Field"}, pack_points(_POINTS))
+    # 点に他の属性があっても、X/Y が同じなら PackedPoints と同じ図形として扱う。
+    annotated = [dict(point, Note="edge") for point in _POINTS]
+
+    assert geometry_fingerprint("Polygon", {"Type": "Field"}, _POINTS) == base
+    assert geometry_fingerprint("Polygon", {"Type": "Field"}, annotated) == base
+    assert geometry_fingerprint("Polygon", {"Type": "Field"}, iter(annotated)) == base
+    # 可逆でない表記は文字列のまま比較される。
+    verbose = [dict(point, X="0.0") if index == 0 else point for index, point in enumerate(annotated)]
+    assert geometry_fingerprint("Polygon", {"Type": "Field"}, verbose) == geometry_fingerprint(
+        "Polygon", {"Type": "Field"}, [{"X": "0.0", "Y": "0"}] + _POINTS[1:]
+    )
+
+
+def test_fingerprint_separators_cannot_be_forged_by_values():
+    # 旧キーは "/" や "=" を含む値で別属性の組み合わせと衝突し得た。
+    assert geometry_fingerprint("Circle", {"A": "1/B=2"}) != geometry_fingerprint(
+        "Circle", {"A": "1", "B": "2"}
+    )
+
+
+def test_shape_index_last_registration_wins():
+    older = {"id": "shape-a", "type": "Circle", "circle": {"Type": "Field", "Radius": "5"}}
+    newer = dict(older, id="shape-b")
+
+    index = ShapeIndex.from_shapes([older, newer])
+
+    assert len(index) == 1
+    assert index.get(shape_fingerprint(older)) == "shape-b"
+    assert index.get(None) is None
+
+
+def test_inline_duplicates_share_one_triorb_shape(write_sample_xml):
+    polygon = "".join(f'<Point X="{point["X"]}" Y="{point["Y"]}" />' for point in _POINTS)
+    field = f'<Field Name="F" Fieldtype="ProtectiveSafeBlanking"><Polygon Type="Field">{polygon}</Polygon></Field>'
+    path = write_sample_xml(
+        "<Export_FieldsetsAndFields><ScanPlane><Fieldsets>"
+        f'<Fieldset Name="A">{field}</Fieldset><Fieldset Name="B">{field}</Fieldset>'
+        "</Fieldsets></ScanPlane></Export_FieldsetsAndFields>"
+    )
+
+    for payload, shapes, _ in (
+        main.load_fieldsets_and_shapes(main.SgexmlDocument.load(path)),
+        main.load_fieldsets_and_shapes_streaming(path),
+    ):
+        refs = [field["shapeRefs"][0]["shapeId"] for fieldset in payload["fieldsets"] for field in fieldset["fields"]]
+        assert len(shapes) == 1
+        assert refs == [shapes[0]["id"], shapes[0]["id"]]
+
+
+
+def test_other_scan_planes_resolve_lazily_and_reuse_shapes(write_sample_xml):
+    polygon = "".join(f'<Point X="{point["X"]}" Y="{point["Y"]}" />' for point in _POINTS)
+    other = polygon.replace('X="100"', 'X="300"')
+
+    def plane(attributes, *polygons):
+        fieldsets = "".join(
+            f'<Fieldset Name="FS{position}"><Field Name="F"><Polygon Type="Field">{points}</Polygon></Field></Fieldset>'
+            for position, points in enumerate(polygons)
+        )
+        return f"<ScanPlane{attributes}><Fieldsets>{fieldsets}</Fieldsets></ScanPlane>"
+
+    path = write_sample_xml(
+        "<Export_FieldsetsAndFields>"
+        + plane(' Index="5"', polygon)
+        + plane("", other, polygon)
+        + plane(' Index="5"', other)
+        + "</Export_FieldsetsAndFields>"
+    )
+    planes = main.load_fieldset_planes(main.SgexmlDocument.load(path))
+
+    # Index の欠落・重複時は出現順をキーにする。既定は先頭の ScanPlane。
+    assert planes.keys() == ["5", "1", "2"]
+    assert [summary["fieldsets"] for summary in planes.summaries()] == [1, 2, 1]
+    assert len(planes.shapes) == 1
+    assert planes.payload() == planes.payload("5")
+    second = planes.payload("1")
+    refs = [field["shapeRefs"][0]["shapeId"] for fieldset in second["fieldsets"] for field in fieldset["fields"]]
+    # 先頭と同じ形状は既存の図形を参照し、新しい形状だけが追加の図形として返る。
+    assert [shape["id"] for shape in second["shapes"]] == [refs[0]]
+    assert refs[1] == planes.shapes[0]["id"]
+    assert len(planes.shapes) == 1
+    third = pickle.loads(pickle.dumps(planes)).payload("2")
+    assert third["shapes"] == second["shapes"]
+    assert third["fieldsets"][0]["fields"][0]["shapeRefs"] == [{"shapeId": refs[0]}]
+    with pytest.raises(KeyError):
+        planes.payload("9")
+
+
+def test_scan_plane_keys_never_collide(write_sample_xml):
+    # Index="1" の後に Index の無い 2 番目（出現順 1）が来ても、上書きせず別のキーにする。
+    planes_xml = "".join(
+        f'<ScanPlane{attributes}><Fieldsets><Fieldset Name="{name}" /></Fieldsets></ScanPlane>'
+        for name, attributes in zip("ABCD", (' Index="1"', "", ' Index="1"', ""))
+    )
+    path = write_sample_xml(f"<Export_FieldsetsAndFields>{planes_xml}</Export_FieldsetsAndFields>")
+    planes = main.load_fieldset_planes(main.SgexmlDocument.load(path))
+
+    assert planes.keys() == ["1", "1_1", "2", "3"]
+    assert [planes.payload(key)["fieldsets"][0]["attributes"]["Name"] for key in planes] == list("ABCD")
@@ -0,0 +1,129 @@
+from __future__ import annotations
+
+import math
+from pathlib import Path
+import random
+
+import pytest
+
+import main
+import spatial_index
+from spatial_index import Bounds, ShapeSpatialIndex
+
+DATA_DIR = Path(__file__).resolve().parent / "data"
+
+
+def _random_shapes(count, seed=0, spread=5000.0):
+    rng = random.Random(seed)
+    shapes = []
+    for index in range(count):
+        x, y = rng.uniform(-spread, spread), rng.uniform(-spread, spread)
+        kind = ("Polygon", "Rectangle", "Circle")[index % 3]
+        shape = {"id": f"shape-{index}", "type": kind}
+        if kind == "Polygon":
+            shape["polygon"] = {
+                "Type": "Field",
+                "points": [{"X": str(x + rng.uniform(-200, 200)), "Y": str(y + rng.uniform(-200, 200))}
+                           for _ in range(6)],
+            }
+        elif kind == "Rectangle":
+            # 一部はセル数の上限を超える大きな図形にする。
+            width = rng.uniform(20, 6000 if index % 40 == 1 else 300)
+            shape["rectangle"] = {
+                "Type": "Field", "OriginX": str(x), "OriginY": str(y), "Width": str(width),
+                "Height": str(rng.uniform(20, 300)), "Rotation": str(rng.uniform(-180, 180)),
+            }
+        else:
+            radius = rng.uniform(0, 250)
+            shape["circle"] = {"Type": "Field", "CenterX": str(x), "CenterY": str(y), "Radius": str(radius)}
+        shapes.append(shape)
+    return shapes
+
+
+def _intersects(a: Bounds, b: Bounds) -> bool:
+    return a.min_x <= b.max_x and a.max_x >= b.min_x and a.min_y <= b.max_y and a.max_y >= b.min_y
+
+
+def test_shape_bounds_follow_the_editor_geometry():
+    rectangle = {"type": "Rectangle", "rectangle": {"OriginX": "10", "OriginY": "20", "Width": "30", "Height": "10"}}
+    rotated = {"type": "Rectangle", "rectangle": {**rectangle["rectangle"], "Rotation": "90"}}
+    circle = {"type": "Circle", "circle": {"CenterX": "30", "CenterY": "40", "Radius": "5"}}
+    polygon = {"type": "Polygon", "polygon": {"points": [{"X": "1", "Y": "2"}, {"X": "-3", "Y": "bad"}]}}
+
+    # OriginX/OriginY は左上で、Height は下向きに伸びる。
+    assert spatial_index.shape_bounds(rectangle) == Bounds(10, 10, 40, 20, math.hypot(40, 20))
+    # 回転は左上の角を中心にする（getRectangleCornerPoints と同じ）。
+    bounds = spatial_index.shape_bounds(rotated)
+    assert [round(v, 9) for v in (bounds.min_x, bounds.min_y, bounds.max_x, bounds.max_y)] == [10, 20, 20, 50]
+    assert spatial_index.shape_bounds(circle) == Bounds(25, 35, 35, 45, 55)
+    # 解釈できない座標は 0 として扱う。
+    assert spatial_index.shape_bounds(polygon) == Bounds(-3, 0, 1, 2, 3)
+    assert spatial_index.shape_bounds({"type": "Rectangle", "rectangle": {"Width": "0", "Height": "5"}}) is None
+    assert spatial_index.shape_bounds({"type": "Polygon", "polygon": {"points": []}}) is None
+
+
+def test_queries_match_a_linear_scan():
+    shapes = _random_shapes(600, seed=1)
+    index = ShapeSpatialIndex(shapes)
+    bounds = {shape["id"]: spatial_index.shape_bounds(shape) for shape in shapes}
+    rng = random.Random(2)
+
+    assert len(index) == 600 and index._large
+    for _ in range(50):
+        x, y, size = rng.uniform(-6000, 6000), rng.uniform(-6000, 6000), rng.uniform(0, 2000)
+        box = Bounds(x, y, x + size, y + size, 0)
+        assert index.query_box(x, y, x + size, y + size) == [key for key, b in bounds.items() if _intersects(b, box)]
+        point = Bounds(x, y, x, y, 0)
+        assert index.query_point(x, y) == [key for key, b in bounds.items() if _intersects(b, point)]
+        expected = [
+            key for key, b in bounds.items()
+            if max(b.min_x - x, x - b.max_x, 0) ** 2 + max(b.min_y - y, y - b.max_y, 0) ** 2 <= size**2
+        ]
+        assert index.query_radius(x, y, size) == expected
+
+    keys = list(bounds)
+    pairs = [(a, b) for i, a in enumerate(keys) for b in keys[i + 1:] if _intersects(bounds[a], bounds[b])]
+    assert index.candidate_pairs() == pairs
+    assert index.max_reach() == max(b.reach for b in bounds.values())
+    assert index.max_reach(["shape-0", "missing"]) == bounds["shape-0"].reach
+
+
+def test_cell_size_and_empty_index():
+    empty = ShapeSpatialIndex([])
+    assert len(empty) == 0 and empty.query_box(-1, -1, 1, 1) == [] and empty.candidate_pairs() == []
+    assert empty.max_reach() == 0.0 and empty.cell_size == spatial_index.MIN_CELL_SIZE
+    assert spatial_index.default_cell_size([0, 10, 30, 20]) == 20
+    with pytest.raises(ValueError):
+        ShapeSpatialIndex(_random_shapes(3), cell_size=0)
+
+
+def test_index_over_a_loaded_document():
+    document = main.SgexmlDocument.load(DATA_DIR / "io_sample.sgexml")
+    shapes = main.build_index_payload(document)["triorb_shapes"]
+    index = ShapeSpatialIndex(shapes)
+
+    assert document.is_loaded and len(index) == 2
+    assert index.ids == [shape["id"] for shape in shapes if spatial_index.shape_bounds(shape) is not None]
+    for shape_id in index.ids:
+        bounds = index.bounds(shape_id)
+        assert shape_id in index.query_point((bounds.min_x + bounds.max_x) / 2, (bounds.min_y + bounds.max_y) / 2)
+
+
+def test_query_endpoint():
+    client = main.create_app().test_client()
+    shapes = _random_shapes(30, seed=4)
+    index = ShapeSpatialIndex(shapes)
+
+    response = client.post(
+        "/api/shapes/query", json={"shapes": shapes, "point": [0, 0], "radius": 3000, "box": [0, 0, 5000, 5000],
+                                   "pairs": True}
+    )
+
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["point"] == index.query_radius(0, 0, 3000) and body["box"] == index.query_box(0, 0, 5000, 5000)
+    assert body["pairs"] == [list(pair) for pair in index.candidate_pairs()]
+    assert body["cellSize"] == index.cell_size and body["reach"] == index.max_reach()
+    for bad in ({"shapes": "x"}, {"shapes": [1]}, {"shapes": [], "point": [1]}, {"shapes": [], "radius": -1},
+                {"shapes": [], "box": [0, 0, "a", 1]}):
+        assert client.post("/api/shapes/query", json=bad).status_code == 400
@@ -0,0 +1,104 @@
+from __future__ import annotations
+
+import json
+from pathlib import Path
+
+import pytest
+
+import main
+import sgexml_writer
+
+_PROJECT_ROOT = Path(__file__).resolve().parents[1]
+_DATA_DIR = Path(__file__).parent / "data"
+_EXPECTED_JSON = _DATA_DIR / "io_expected.json"
+
+
+def test_streaming_loader_matches_io_snapshot():
+    expected = json.loads(_EXPECTED_JSON.read_text(encoding="utf-8"))
+
+    fieldsets_payload, triorb_shapes, triorb_source = main.load_fieldsets_and_shapes_streaming(
+        _DATA_DIR / "io_sample.sgexml"
+    )
+
+    assert fieldsets_payload == expected["fieldsets_payload"]
+    assert triorb_shapes == expected["triorb_shapes"]
+    assert triorb_source == expected["triorb_source"]
+
+
+@pytest.mark.parametrize(
+    "sample_path",
+    [
+        _DATA_DIR / "legacy_min10.sgexml",
+        *sorted((_PROJECT_ROOT / "sample").glob("*.sgexml")),
+    ],
+    ids=lambda path: path.name,
+)
+def test_streaming_loader_matches_dom_loader(sample_path):
+    # ID の無い図形にも出現位置・フィンガープリントから同じ ID が付くので、そのまま比較できる。
+    expected = main.load_fieldsets_and_shapes(main.SgexmlDocument.load(sample_path))
+    actual = main.load_fieldsets_and_shapes_streaming(sample_path)
+
+    assert actual == expected
+
+
+def test_streaming_loader_resolves_triorb_section_written_after_fieldsets(write_sample_xml):
+    sample_path = write_sample_xml(
+        """
+        <Export_FieldsetsAndFields>
+            <ScanPlane Index="0">
+                <Fieldsets>
+                    <Fieldset Name="FS1">
+                        <Field Name="Protective" Fieldtype="ProtectiveSafeBlanking">
+                            <Rectangle Type="Field" OriginX="0" OriginY="0" Width="10" Height="20" Rotation="0" />
+                        </Field>
+                    </Fieldset>
+                </Fieldsets>
+            </ScanPlane>
+        </Export_FieldsetsAndFields>
+        <TriOrb_SICK_SLS_Editor Source="TriOrb">
+            <Shapes>
+                <Shape ID="rect-1" Name="Shared" Type="Rectangle">
+                    <Rectangle Type="Field" OriginX="0" OriginY="0" Width="10" Height="20" Rotation="0" />
+                </Shape>
+            </Shapes>
+        </TriOrb_SICK_SLS_Editor>
+        """,
+    )
+
+    fieldsets_payload, triorb_shapes, triorb_source = main.load_fieldsets_and_shapes_streaming(
+        sample_path
+    )
+
+    assert triorb_source == "TriOrb"
+    assert [shape["id"] for shape in triorb_shapes] == ["rect-1"]
+    assert fieldsets_payload["fieldsets"][0]["fields"][0]["shapeRefs"] == [{"shapeId": "rect-1"}]
+
+
+
+def test_streaming_loader_reads_the_second_triorb_root(tmp_path):
+    # Save (TriOrb) は SdImportExport の後ろに TriOrb_SICK_SLS_Editor を 2 つ目のルートとして書く。
+    payload = main.build_index_payload(main.SgexmlDocument.load(_DATA_DIR / "io_sample.sgexml"))
+    data = "".join(sgexml_writer.iter_triorb_xml(payload)).encode("utf-8")
+    assert main._triorb_section_offset(data) is not None
+    sample_path = tmp_path / "saved.sgexml"
+    sample_path.write_bytes(data)
+
+    expected = main.load_fieldsets_and_shapes(main.SgexmlDocument.load(sample_path))
+    actual = main.load_fieldsets_and_shapes_streaming(sample_path)
+
+    assert actual == expected
+    assert len(actual[0]["fieldsets"]) == len(payload["fieldsets"]["fieldsets"])
+    # Source は 2 つ目のルートにしか無い。
+    assert actual[2] == "TriOrb" and len(actual[1]) == len(payload["triorb_shapes"])
+
+def test_streaming_loader_returns_defaults_for_invalid_xml(tmp_path):
+    invalid_xml = tmp_path / "invalid.sgexml"
+    invalid_xml.write_text(
+        "<SdImportExport><Export_FieldsetsAndFields></SdImportExport", encoding="utf-8"
+    )
+
+    payload, shapes, source = main.load_fieldsets_and_shapes_streaming(invalid_xml)
+
+    assert payload == {"devices": [], "global_geometry": {}, "fieldsets": []}
+    assert shapes == []
+    assert source == ""
@@ -0,0 +1,98 @@
+from __future__ import annotations
+
+import math
+
+import pytest
+
+import main
+import svg_path
+
+# 角を半径 10 の円弧で丸めた 100 x 50 の長方形（CAD の書き出しによくある形）。
+ROUNDED_RECT = (
+    "M10 0 H90 A10 10 0 0 1 100 10 V40 A10 10 0 0 1 90 50 "
+    "H10 A10 10 0 0 1 0 40 V10 A10 10 0 0 1 10 0 Z"
+)
+
+
+def _max_radius_error(points, cx, cy, radius):
+    return max(abs(math.hypot(x - cx, y - cy) - radius) for x, y in points)
+
+
+def test_line_commands_keep_exact_points():
+    result = svg_path.flatten_path("M0 0 H10 V10 h-10 z m20 0 l5 0 0 5")
+
+    first, second = result.subpaths
+    assert first.points == [(0, 0), (10, 0), (10, 10), (0, 10)] and first.closed
+    # Z の後の相対移動は部分パスの始点から測る。
+    assert second.points == [(20, 0), (25, 0), (25, 5)] and not second.closed
+    assert result.error is None
+
+
+def test_compact_numbers_and_arc_flags_are_tokenized():
+    commands, error = svg_path.parse_path("M1.5.5.5-1e1a5,5 0 1,0 10,0a5 5 0 10-10 0")
+
+    assert error is None
+    assert commands[:2] == [("M", 1.5, 0.5), ("L", 0.5, -10.0)]
+    assert commands[2] == ("A", 5.0, 5.0, 0.0, True, False, 10.5, -10.0)
+    assert commands[3] == ("A", 5.0, 5.0, 0.0, True, False, 0.5, -10.0)
+
+
+def test_arcs_stay_within_the_tolerance():
+    for tolerance in (0.5, 0.1, 0.01):
+        (subpath,) = svg_path.flatten_path("M0 0 A50 50 0 1 1 100 0 A50 50 0 1 1 0 0 Z", tolerance).subpaths
+        points = subpath.points
+        # 頂点は円上（0.001 mm の丸めを除く）、弦の中点は円から tolerance 以内。
+        assert _max_radius_error(points, 50, 0, 50) <= 0.001
+        midpoints = [((ax + bx) / 2, (ay + by) / 2) for (ax, ay), (bx, by) in zip(points, points[1:] + points[:1])]
+        assert _max_radius_error(midpoints, 50, 0, 50) <= tolerance + 0.001
+    counts = [svg_path.flatten_path(ROUNDED_RECT, tolerance).point_count for tolerance in (0.5, 0.1, 0.01)]
+    assert counts == sorted(counts) and counts[0] < 20
+
+
+def test_smooth_curves_reflect_the_previous_control_point():
+    smooth, _ = svg_path.parse_path("M0 0 C0 10 10 10 10 0 S20 -10 20 0 Q25 5 30 0 T40 0")
+
+    assert smooth[2] == ("C", 10.0, -10.0, 20.0, -10.0, 20.0, 0.0)
+    assert smooth[4] == ("Q", 35.0, -5.0, 40.0, 0.0)
+    # 曲がっていない曲線は 1 本の線分になる。
+    assert svg_path.flatten_path("M0 0 C10 0 20 0 30 0").subpaths[0].points == [(0, 0), (30, 0)]
+    assert svg_path.bezier_segments([(0, 0), (0, 100), (100, 100), (100, 0)], 0.1) == 33
+
+
+def test_invalid_data_keeps_what_was_parsed():
+    result = svg_path.flatten_path("M0 0 L10 0 L10 10 L x")
+
+    assert result.subpaths[0].points == [(0, 0), (10, 0), (10, 10)]
+    assert result.error == "expected a number for L at 20"
+    assert svg_path.flatten_path("10 10").error.startswith("path data must start")
+    with pytest.raises(ValueError):
+        svg_path.flatten_path(ROUNDED_RECT, 0)
+
+
+def test_path_polygons_match_the_editor_format():
+    polygons, error = svg_path.path_polygons("M0 0 L10.5 0 L10.5 10 Z M 0 0 L 1 1")
+
+    assert error is None
+    assert polygons[0] == [
+        {"X": "0", "Y": "0"},
+        {"X": "10.5", "Y": "0"},
+        {"X": "10.5", "Y": "10"},
+        {"X": "0", "Y": "0"},
+    ]
+    # 2 点の部分パスも先頭で閉じて 3 点になる（ブラウザ版と同じ）。
+    assert len(polygons) == 2
+    svg = '<svg xmlns="http://www.w3.org/2000/svg"><g><path id="a" d="M0 0 H1"/><path d="M0 0"/></g></svg>'
+    assert list(svg_path.iter_svg_paths(svg)) == [("a", "M0 0 H1"), ("path2", "M0 0")]
+
+
+def test_flatten_endpoint():
+    client = main.create_app().test_client()
+
+    response = client.post("/api/svg/flatten", json={"paths": [ROUNDED_RECT, "M0 0 L"], "tolerance": 0.5})
+
+    assert response.status_code == 200
+    rounded, broken = response.get_json()["paths"]
+    assert rounded["error"] is None and rounded["polygons"][0][0] == {"X": "10", "Y": "0"}
+    assert broken == {"polygons": [], "error": "expected a number for L at 6"}
+    for body in ({"paths": "M0 0"}, {"paths": [1]}, {"paths": [], "tolerance": 0}, {"paths": [], "tolerance": "x"}):
+        assert client.post("/api/svg/flatten", json=body).status_code == 400
@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+import io
+import os
+from pathlib import Path
+import pickle
+import threading
+import time
+
+import pytest
+
+import main
+import sgexml_writer
+from upload_jobs import UploadJobs, UploadQueueFull
+
+SAMPLE = Path(__file__).parent / "data" / "io_sample.sgexml"
+
+
+@pytest.fixture()
+def app(monkeypatch, tmp_path):
+    monkeypatch.setattr(main, "SAMPLE_XML", SAMPLE)
+    app = main.create_app()
+    # テストではプロセスを fork せず、スレッドプールで解析する。
+    app.extensions["upload_jobs"] = UploadJobs(
+        main.parse_uploaded_document, executor="thread", upload_dir=tmp_path
+    )
+    yield app
+    app.extensions["upload_jobs"].shutdown()
+
+
+def _parse_or_crash(path):
+    # プロセスプールのワーカーを異常終了させ、プールを壊す。
+    data = Path(path).read_bytes()
+    if data == b"crash":
+        os._exit(1)
+    return data
+
+
+def _wait_job(jobs, job_id):
+    for _ in range(500):
+        job = jobs.get(job_id)
+        if job.finished:
+            return job
+        time.sleep(0.01)
+    raise AssertionError("job did not finish")
+
+
+def _wait(client, status_url, query=""):
+    for _ in range(200):
+        response = client.get(status_url + query)
+        if response.status_code != 202:
+            return response
+        time.sleep(0.01)
+    raise AssertionError("upload did not finish")
+
+
+def test_multipart_upload_matches_document_api(app):
+    client = app.test_client()
+
+    accepted = client.post(
+        "/api/uploads",
+        data={"file": (io.BytesIO(SAMPLE.read_bytes()), "io_sample.sgexml")},
+        content_type="multipart/form-data",
+    )
+    assert accepted.status_code == 202
+    assert accepted.headers["Location"] == accepted.get_json()["status_url"]
+
+    response = _wait(client, accepted.get_json()["status_url"], "?points=packed")
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body["status"] == "done"
+    assert body["filename"] == "io_sample.sgexml"
+    assert body["size"] == SAMPLE.stat().st_size
+    assert body["state_snapshot"] is False
+    for section in main.DOCUMENT_SECTIONS:
+        expected = client.get(f"/api/document/{section}?points=packed").get_json()
+        assert body["document"][section] == expected
+
+
+def test_uploaded_casetables_are_fetched_on_demand(app):
+    client = app.test_client()
+    source = Path(__file__).parent / "data" / "multi_casetable.sgexml"
+
+    accepted = client.post("/api/uploads", data=source.read_bytes())
+    body = _wait(client, accepted.get_json()["status_url"]).get_json()
+
+    assert [entry["index"] for entry in body["document"]["casetables"]] == ["0", "1", "2"]
+    third = client.get(body["casetables_url"] + "/2")
+    assert third.status_code == 200
+    assert third.get_json()["casetable_attributes"] == {"Index": "2"}
+    assert client.get(body["casetables_url"] + "/5").status_code == 404
+
+
+def test_uploaded_fieldset_planes_are_fetched_on_demand(app):
+    client = app.test_client()
+    source = Path(__file__).parent / "data" / "multi_scanplane.sgexml"
+
+    accepted = client.post("/api/uploads", data=source.read_bytes())
+    body = _wait(client, accepted.get_json()["status_url"]).get_json()
+
+    assert [entry["index"] for entry in body["document"]["fieldset_planes"]] == ["0", "1"]
+    second = client.get(body["fieldset_planes_url"] + "/1")
+    assert second.status_code == 200
+    assert len(second.get_json()["shapes"]) == 1
+    assert client.get(body["fieldset_planes_url"] + "/5").status_code == 404
+
+
+def test_raw_upload_decodes_filename(app):
+    client = app.test_client()
+
+    accepted = client.post(
+        "/api/uploads",
+        data=SAMPLE.read_bytes(),
+        headers={"Content-Type": "application/xml", "X-Filename": "%E3%82%B5%E3%83%B3%E3%83%97%E3%83%AB.sgexml"},
+    )
+    body = _wait(client, accepted.get_json()["status_url"]).get_json()
+
+    assert body["filename"] == "サンプル.sgexml"
+    assert body["document"]["fieldsets"] == client.get("/api/document/fieldsets").get_json()
+
+
+def test_state_snapshot_is_left_to_the_browser(app):
+    client = app.test_client()
+    data = SAMPLE.read_bytes() + b"<TriOrb_SICK_SLS_Editor><StateSnapshot>{}</StateSnapshot></TriOrb_SICK_SLS_Editor>"
+
+    accepted = client.post("/api/uploads", data=data)
+    body = _wait(client, accepted.get_json()["status_url"]).get_json()
+
+    assert body["state_snapshot"] is True
+    assert body["document"] is None
+
+
+def test_triorb_upload_returns_the_decoded_snapshot(app):
+    client = app.test_client()
+    payload = main.build_index_payload(main.SgexmlDocument.load(SAMPLE))
+    data = "".join(sgexml_writer.iter_triorb_xml(payload)).encode("utf-8")
+
+    accepted = client.post("/api/uploads", data=data)
+    body = _wait(client, accepted.get_json()["status_url"]).get_json()
+
+    assert body["state_snapshot"] is True
+    assert body["document"] is None
+    assert body["snapshot"] == main.read_state_snapshot(data)
+    assert body["snapshot"]["version"] == sgexml_writer.TRIORB_STATE_SNAPSHOT_VERSION
+
+
+def test_stale_snapshot_upload_is_parsed(app):
+    client = app.test_client()
+    payload = main.build_index_payload(main.SgexmlDocument.load(SAMPLE))
+    data = "".join(sgexml_writer.iter_triorb_xml(payload)).encode("utf-8")
+    data = data.replace(b"Example Corp", b"Edited Corp", 1)
+
+    accepted = client.post("/api/uploads", data=data)
+    body = _wait(client, accepted.get_json()["status_url"]).get_json()
+
+    assert body["state_snapshot"] is True
+    assert body["snapshot"] is None
+    assert {"tag": "Company", "value": "Edited Corp"} in body["document"]["fileinfo"]
+    assert body["document"]["triorb_shapes"]["source"] == payload["triorb_source"]
+
+
+def test_snapshot_decoding_errors():
+    assert main.decode_state_snapshot('{"version": 1}', "json") == {"version": 1}
+    assert main.decode_state_snapshot("eyJ2\nZXJzaW9uIjogMX0=") == {"version": 1}
+    for text, encoding in (("not base64!", "base64"), ("eyJ2ZXJzaW9uIjogMX0=", "deflate+base64"), ("[1]", "json")):
+        with pytest.raises(ValueError):
+            main.decode_state_snapshot(text, encoding)
+    assert main.read_state_snapshot(SAMPLE.read_bytes()) is None
+
+
+def test_malformed_upload_reports_failure(app, tmp_path):
+    client = app.test_client()
+
+    accepted = client.post("/api/uploads", data=b"<SdImportExport><broken>")
+    response = _wait(client, accepted.get_json()["status_url"])
+
+    assert response.status_code == 422
+    assert response.get_json()["status"] == "failed"
+    assert "well-formed" in response.get_json()["error"]
+    # 一時ファイルは解析の成否にかかわらず削除される。
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_unknown_job_and_bad_encoding(app):
+    client = app.test_client()
+
+    assert client.get("/api/uploads/missing").status_code == 404
+    accepted = client.post("/api/uploads", data=SAMPLE.read_bytes())
+    assert client.get(accepted.get_json()["status_url"] + "?points=bogus").status_code == 400
+
+
+def test_full_queue_returns_503(app):
+    release = threading.Event()
+
+    def blocking_parse(path):
+        release.wait(5)
+        return {"document": None, "state_snapshot": False}
+
+    app.extensions["upload_jobs"] = UploadJobs(blocking_parse, executor="thread", max_workers=1, max_pending=1)
+    client = app.test_client()
+    try:
+        assert client.post("/api/uploads", data=b"<a/>").status_code == 202
+        rejected = client.post("/api/uploads", data=b"<a/>")
+        assert rejected.status_code == 503
+        assert rejected.headers["Retry-After"] == "1"
+    finally:
+        release.set()
+    # 先行ジョブが終われば枠が空く。
+    for _ in range(200):
+        if app.extensions["upload_jobs"].stats()["pending"] == 0:
+            break
+        time.sleep(0.01)
+    assert client.post("/api/uploads", data=b"<a/>").status_code == 202
+
+
+def test_finished_jobs_are_evicted(tmp_path):
+    jobs = UploadJobs(lambda path: path.read_bytes(), executor="thread", max_finished=2, upload_dir=tmp_path)
+    submitted = [jobs.submit(io.BytesIO(b"%d" % index)) for index in range(4)]
+    jobs.shutdown()
+
+    assert jobs.get(submitted[0].id) is None
+    assert jobs.get(submitted[-1].id).result == b"3"
+    assert jobs.stats() == {"pending": 0, "finished": 2, "max_pending": 8}
+    # 件数に余裕があっても、終了から max_age 秒を過ぎた結果は破棄する。
+    jobs.get(submitted[-2].id).finished_at -= jobs.max_age + 1
+    assert jobs.get(submitted[-2].id) is None
+    assert jobs.stats()["finished"] == 1
+    with pytest.raises(ValueError):
+        UploadJobs(main.parse_uploaded_document, executor="fiber")
+    assert issubclass(UploadQueueFull, RuntimeError)
+
+
+def test_process_pool_returns_plain_sections(monkeypatch):
+    monkeypatch.setattr(main, "SAMPLE_XML", SAMPLE)
+    app = main.create_app()
+    jobs = app.extensions["upload_jobs"]
+    client = app.test_client()
+    source = Path(__file__).parent / "data" / "multi_scanplane.sgexml"
+    try:
+        assert jobs.executor_kind == "process"
+        accepted = client.post("/api/uploads", data=SAMPLE.read_bytes())
+        body = _wait(client, accepted.get_json()["status_url"], "?points=packed").get_json()
+        result = jobs.get(accepted.get_json()["id"]).result
+        planes = _wait(client, client.post("/api/uploads", data=source.read_bytes()).get_json()["status_url"])
+        second = client.get(planes.get_json()["fieldset_planes_url"] + "/1")
+    finally:
+        jobs.shutdown()
+
+    # ワーカーからは変換済みのセクションだけが戻り、要素ツリーや索引は pickle されない。
+    pickled = pickle.dumps(result)
+    assert b"xml.etree" not in pickled and b"CasetableIndex" not in pickled and b"FieldsetPlaneIndex" not in pickled
+    for section in main.DOCUMENT_SECTIONS:
+        assert body["document"][section] == client.get(f"/api/document/{section}?points=packed").get_json()
+    assert second.status_code == 200 and len(second.get_json()["shapes"]) == 1
+
+
+def test_failed_submission_is_not_left_pending(tmp_path):
+    jobs = UploadJobs(lambda path: None, executor="thread", max_workers=1, max_pending=1, upload_dir=tmp_path)
+    jobs._ensure_executor().shutdown()
+
+    with pytest.raises(RuntimeError):
+        jobs.submit(io.BytesIO(b"<a/>"))
+
+    # 投入できなかったジョブは登録されず、枠と一時ファイルも返る。
+    assert jobs.stats() == {"pending": 0, "finished": 0, "max_pending": 1}
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_broken_process_pool_is_rebuilt(tmp_path):
+    jobs = UploadJobs(_parse_or_crash, max_workers=1, upload_dir=tmp_path)
+    try:
+        crashed = _wait_job(jobs, jobs.submit(io.BytesIO(b"crash")).id)
+        recovered = _wait_job(jobs, jobs.submit(io.BytesIO(b"<a/>")).id)
+    finally:
+        jobs.shutdown()
+
+    assert crashed.status == "failed" and "BrokenProcessPool" in crashed.error
+    assert recovered.status == "done" and recovered.result == b"<a/>"
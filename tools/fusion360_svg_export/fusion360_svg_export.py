@@ -1,6 +1,7 @@
 """
 Fusion 360 向けの簡易 SVG エクスポート アドイン（Python 版）。
 - 表示中の Body を XY 投影した外径ポリゴンとして SVG へ書き出す。
+- SVG を経由せず、エディターへ直接取り込める TriOrb Shapes（XML 断片 / JSON）としても書き出せる。
 - Scripts/Add-Ins 配下にフォルダーごと配置し、Fusion 360 の Add-Ins から実行する。
 
 SICK SLS Editor の SVG インポート ワークフロー向けに、Fusion 側で
@@ -11,11 +12,20 @@ import adsk.core
 import adsk.fusion
 import traceback
 import re
-import math
+
+from .geometry_core import (
+    CLOSE_TOL_SQ,
+    COLLINEAR_TOL,
+    EXPORT_FORMATS,
+    UNIT_SCALE,
+    loop_points,
+    render_export,
+    simplify_polyline,
+)
 
 COMMAND_ID = "SlsEditor_SvgExport"
 COMMAND_NAME = "Export Bodies to SVG (SICK SLS)"
-COMMAND_DESCRIPTION = "表示中の Body を SVG 形式で保存します"
+COMMAND_DESCRIPTION = "表示中の Body を SVG / TriOrb Shapes 形式で保存します"
 
 _handlers = []
 
@@ -32,95 +42,6 @@ def _show_error(ui: adsk.core.UserInterface | None, message: str):
         ui.messageBox(message, "SVG Export")
 
 
-def _format_number(value: float) -> str:
-    return f"{value:.4f}"
-
-
-def _color_for_index(index: int) -> str:
-    value = (index + 1) * 1103515245 + 12345
-    r = (value >> 16) & 0xFF
-    g = (value >> 8) & 0xFF
-    b = value & 0xFF
-    return f"#{r:02X}{g:02X}{b:02X}"
-
-
-def _escape_xml_attr(value: str) -> str:
-    return (
-        value.replace("&", "&amp;")
-        .replace('"', "&quot;")
-        .replace("<", "&lt;")
-        .replace(">", "&gt;")
-    )
-
-
-def _svg_id_from_name(name: str) -> str:
-    sanitized = []
-    for ch in name:
-        if ch.isalnum() or ch in ("_", "-"):
-            sanitized.append(ch)
-        else:
-            sanitized.append("_")
-    result = "".join(sanitized).strip("_")
-    if not result:
-        result = "body"
-    if result[0].isdigit():
-        result = f"body_{result}"
-    return result
-
-
-def _distance_sq(a, b) -> float:
-    dx = a[0] - b[0]
-    dy = a[1] - b[1]
-    return dx * dx + dy * dy
-
-
-def _points_close(a, b, tol_sq: float) -> bool:
-    return _distance_sq(a, b) <= tol_sq
-
-
-def _simplify_polyline(points, is_closed: bool, collinear_tol: float):
-    if len(points) < 3:
-        return points
-
-    def is_collinear(a, b, c) -> bool:
-        abx = b[0] - a[0]
-        aby = b[1] - a[1]
-        bcx = c[0] - b[0]
-        bcy = c[1] - b[1]
-        len1 = math.hypot(abx, aby)
-        len2 = math.hypot(bcx, bcy)
-        if len1 == 0 or len2 == 0:
-            return True
-        cross = abx * bcy - aby * bcx
-        return abs(cross) <= collinear_tol * len1 * len2
-
-    if not is_closed:
-        result = [points[0]]
-        for i in range(1, len(points) - 1):
-            if is_collinear(result[-1], points[i], points[i + 1]):
-                continue
-            result.append(points[i])
-        result.append(points[-1])
-        return result
-
-    pts = points[:]
-    changed = True
-    while changed and len(pts) > 2:
-        changed = False
-        new_points = []
-        count = len(pts)
-        for i in range(count):
-            a = pts[i - 1]
-            b = pts[i]
-            c = pts[(i + 1) % count]
-            if is_collinear(a, b, c):
-                changed = True
-                continue
-            new_points.append(b)
-        pts = new_points
-    return pts
-
-
 def _collect_visible_bodies(design: adsk.fusion.Design) -> list[adsk.fusion.BRepBody]:
     bodies = []
     root = design.rootComponent
@@ -180,7 +101,7 @@ def _body_polygon_points(
     if count < 1:
         return []
 
-    points = []
+    edges = []
     co_edge = outer_loop.coEdges.item(0)
     for _ in range(count):
         edge = co_edge.edge
@@ -193,108 +114,46 @@ def _body_polygon_points(
 
         start_pt = start_vertex.geometry
         end_pt = end_vertex.geometry
-        start = (start_pt.x * unit_scale, -start_pt.y * unit_scale)
-        end = (end_pt.x * unit_scale, -end_pt.y * unit_scale)
-
-        if not points:
-            points.append(start)
-        if not _points_close(points[-1], end, close_tol_sq):
-            points.append(end)
+        edges.append(
+            (
+                (start_pt.x * unit_scale, -start_pt.y * unit_scale),
+                (end_pt.x * unit_scale, -end_pt.y * unit_scale),
+            )
+        )
 
         co_edge = co_edge.next
 
-    if len(points) > 1 and _points_close(points[0], points[-1], close_tol_sq):
-        points = points[:-1]
-
-    points = _simplify_polyline(points, True, collinear_tol)
-    return points
+    return simplify_polyline(loop_points(edges, close_tol_sq), True, collinear_tol)
 
 
-def _export_bodies_to_svg(
+def _export_bodies(
     design: adsk.fusion.Design,
     file_path: str,
+    export_format: str = "SVG",
 ) -> tuple[bool, str]:
     bodies = _collect_visible_bodies(design)
     if not bodies:
         return False, "表示中の Body がありません。"
 
-    unit_scale = 10.0
-    close_tol_sq = (1e-4 * unit_scale) ** 2
-    collinear_tol = 1e-6
-
-    def points_to_path(points):
-        if len(points) < 2:
-            return ""
-        commands = [f"M {_format_number(points[0][0])} {_format_number(points[0][1])}"]
-        commands.extend(
-            f"L {_format_number(p[0])} {_format_number(p[1])}" for p in points[1:]
-        )
-        commands.append("Z")
-        return " ".join(commands)
-
     polygons = []
-    all_points = []
     skipped = 0
     for body in bodies:
-        points = _body_polygon_points(body, unit_scale, close_tol_sq, collinear_tol)
+        points = _body_polygon_points(body, UNIT_SCALE, CLOSE_TOL_SQ, COLLINEAR_TOL)
         if len(points) < 2:
             skipped += 1
             continue
         polygons.append((points, body.name))
-        all_points.extend(points)
 
     if not polygons:
-        return False, "SVG に出力できる Body がありません。"
-
-    min_x = min(p[0] for p in all_points)
-    min_y = min(p[1] for p in all_points)
-    max_x = max(p[0] for p in all_points)
-    max_y = max(p[1] for p in all_points)
-
-    width = max_x - min_x
-    height = max_y - min_y
-    if width <= 0:
-        width = 1.0
-    if height <= 0:
-        height = 1.0
-
-    stroke_width = 1.0
-    paths: list[tuple[str, str]] = []
-    for points, name in polygons:
-        translated = [(p[0] - min_x, p[1] - min_y) for p in points]
-        path = points_to_path(translated)
-        if path:
-            paths.append((path, name))
-
-    svg_lines = [
-        '<?xml version="1.0" encoding="UTF-8"?>',
-        (
-            f'<svg xmlns="http://www.w3.org/2000/svg" version="1.1" '
-            f'width="{_format_number(width)}mm" height="{_format_number(height)}mm" '
-            f'viewBox="0 0 {_format_number(width)} {_format_number(height)}" '
-            'overflow="visible">'
-        ),
-        f'<g fill="none" stroke-width="{_format_number(stroke_width)}" '
-        'stroke-linecap="round" stroke-linejoin="round">',
-    ]
-
-    used_ids = {}
-    for index, (path, name) in enumerate(paths):
-        base_id = _svg_id_from_name(name or "body")
-        count = used_ids.get(base_id, 0) + 1
-        used_ids[base_id] = count
-        path_id = base_id if count == 1 else f"{base_id}_{count}"
-        svg_lines.append(
-            f'<path id="{_escape_xml_attr(path_id)}" '
-            f'data-name="{_escape_xml_attr(name)}" '
-            f'd="{path}" stroke="{_color_for_index(index)}"/>'
-        )
+        return False, f"{export_format} に出力できる Body がありません。"
 
-    svg_lines.append("</g>")
-    svg_lines.append("</svg>")
+    try:
+        text = render_export(polygons, export_format)
+    except ValueError as exc:
+        return False, str(exc)
 
     with open(file_path, "w", encoding="utf-8") as handle:
-        handle.write("\n".join(svg_lines))
+        handle.write(text)
 
     if skipped:
         return True, f"一部の Body をスキップしました ({skipped})"
@@ -315,24 +174,26 @@ class _CommandExecuteHandler(adsk.core.CommandEventHandler):
 
         inputs = args.command.commandInputs
         file_name_input = inputs.itemById("sls-filename")
+        format_input = adsk.core.DropDownCommandInput.cast(inputs.itemById("sls-format"))
+        export_format = format_input.selectedItem.name if format_input and format_input.selectedItem else "SVG"
 
         folder_dialog = ui.createFolderDialog()
-        folder_dialog.title = "SVG の出力先フォルダーを選択"
+        folder_dialog.title = f"{export_format} の出力先フォルダーを選択"
         if folder_dialog.showDialog() != adsk.core.DialogResults.DialogOK:
             return
 
         base_name = str(file_name_input.value or "bodies.svg")
-        base_name = re.sub(r"\.(svg|dxf)$", "", base_name, flags=re.IGNORECASE)
-        file_path = f"{folder_dialog.folder}/{base_name}.svg"
+        base_name = re.sub(r"\.(svg|dxf|xml|json)$", "", base_name, flags=re.IGNORECASE)
+        file_path = f"{folder_dialog.folder}/{base_name}{EXPORT_FORMATS[export_format]}"
 
-        succeeded, error_message = _export_bodies_to_svg(design, file_path)
+        succeeded, error_message = _export_bodies(design, file_path, export_format)
         if succeeded:
-            message = f"SVG を保存しました:\n{file_path}"
+            message = f"{export_format} を保存しました:\n{file_path}"
             if error_message:
                 message = f"{message}\n{error_message}"
             ui.messageBox(message, "SVG Export")
         else:
-            _show_error(ui, error_message or "SVG の保存に失敗しました。")
+            _show_error(ui, error_message or f"{export_format} の保存に失敗しました。")
 
 
 class _CommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
@@ -344,6 +205,11 @@ class _CommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
         inputs = command.commandInputs
 
         inputs.addStringValueInput("sls-filename", "ファイル名", "bodies.svg")
+        format_input = inputs.addDropDownCommandInput(
+            "sls-format", "形式", adsk.core.DropDownStyles.TextListDropDownStyle
+        )
+        for index, name in enumerate(EXPORT_FORMATS):
+            format_input.listItems.add(name, index == 0, "")
 
         on_execute = _CommandExecuteHandler()
         command.execute.add(on_execute)
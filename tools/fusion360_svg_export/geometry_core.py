@@ -0,0 +1,327 @@
+"""
+Fusion 360 SVG エクスポート アドインの幾何処理（adsk に依存しない純 Python）。
+- Body の外周ループから得た頂点列の整理（近接点・共線点の除去）と SVG 文書の組み立てを行う。
+- SICK SLS Editor がそのまま取り込める TriOrb Shapes（XML 断片 / JSON）も組み立てる。
+- Fusion 360 を使わずに Linux 上で単体テスト・ベンチマークできるよう、アドイン本体から切り出している。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import math
+from typing import Any, Iterable, Sequence
+
+Point = tuple[float, float]
+
+# アドインの既定値（Fusion の内部単位 cm を mm に換算して書き出す）。
+UNIT_SCALE = 10.0
+CLOSE_TOL_SQ = (1e-4 * UNIT_SCALE) ** 2
+COLLINEAR_TOL = 1e-6
+
+# TriOrb Shapes の書き出し。JSON は {"format": SHAPES_FORMAT, "version": 1, "unit": "mm", "shapes": [...]} で、
+# Polygon の点は [x, y] の数値の組（エディターの形式では {"X": "x", "Y": "y"}）。
+SHAPES_FORMAT = "triorb-shapes"
+SHAPES_SOURCE = "Fusion360"
+DEFAULT_KIND = "Field"
+DEFAULT_FIELDTYPE = "ProtectiveSafeBlanking"
+
+# アドインのダイアログで選べる書き出し形式と拡張子。
+EXPORT_FORMATS = {
+    "SVG": ".svg",
+    "TriOrb Shapes (XML)": ".xml",
+    "TriOrb Shapes (JSON)": ".json",
+}
+
+
+def format_number(value: float) -> str:
+    return f"{value:.4f}"
+
+
+def color_for_index(index: int) -> str:
+    value = (index + 1) * 1103515245 + 12345
+    r = (value >> 16) & 0xFF
+    g = (value >> 8) & 0xFF
+    b = value & 0xFF
+    return f"#{r:02X}{g:02X}{b:02X}"
+
+
+def escape_xml_attr(value: str) -> str:
+    return (
+        value.replace("&", "&amp;")
+        .replace('"', "&quot;")
+        .replace("<", "&lt;")
+        .replace(">", "&gt;")
+    )
+
+
+def svg_id_from_name(name: str) -> str:
+    sanitized = []
+    for ch in name:
+        if ch.isalnum() or ch in ("_", "-"):
+            sanitized.append(ch)
+        else:
+            sanitized.append("_")
+    result = "".join(sanitized).strip("_")
+    if not result:
+        result = "body"
+    if result[0].isdigit():
+        result = f"body_{result}"
+    return result
+
+
+def distance_sq(a: Point, b: Point) -> float:
+    dx = a[0] - b[0]
+    dy = a[1] - b[1]
+    return dx * dx + dy * dy
+
+
+def points_close(a: Point, b: Point, tol_sq: float) -> bool:
+    return distance_sq(a, b) <= tol_sq
+
+
+def is_collinear(a: Point, b: Point, c: Point, collinear_tol: float) -> bool:
+    """Whether ``b`` can be dropped between ``a`` and ``c`` (sine of the turn within the tolerance)."""
+    abx = b[0] - a[0]
+    aby = b[1] - a[1]
+    bcx = c[0] - b[0]
+    bcy = c[1] - b[1]
+    len1 = math.hypot(abx, aby)
+    len2 = math.hypot(bcx, bcy)
+    if len1 == 0 or len2 == 0:
+        return True
+    cross = abx * bcy - aby * bcx
+    return abs(cross) <= collinear_tol * len1 * len2
+
+
+def loop_points(edges: Iterable[tuple[Point, Point]], close_tol_sq: float = CLOSE_TOL_SQ) -> list[Point]:
+    """Chain the (start, end) pairs of a loop's co-edges, dropping points closer than the tolerance."""
+    points: list[Point] = []
+    for start, end in edges:
+        if not points:
+            points.append(start)
+        if not points_close(points[-1], end, close_tol_sq):
+            points.append(end)
+    if len(points) > 1 and points_close(points[0], points[-1], close_tol_sq):
+        points = points[:-1]
+    return points
+
+
+def simplify_polyline(points: Sequence[Point], is_closed: bool, collinear_tol: float = COLLINEAR_TOL) -> list[Point]:
+    """Drop vertices that do not turn the polyline.
+
+    Closed loops are reduced in a single stack pass: every new point pops the
+    vertices it makes collinear, and the seam between the last and the first
+    vertex is settled at the end. On loops whose turns are either exact or
+    clearly above the tolerance this keeps the same vertices, in the same
+    order, as removing collinear vertices pass by pass until nothing changes.
+    A loop that collapses onto a line comes back empty.
+    """
+    if len(points) < 3:
+        return list(points)
+
+    if not is_closed:
+        result = [points[0]]
+        for i in range(1, len(points) - 1):
+            if is_collinear(result[-1], points[i], points[i + 1], collinear_tol):
+                continue
+            result.append(points[i])
+        result.append(points[-1])
+        return result
+
+    # is_collinear を展開したもの（判定は同じ）。外積が 0 なら長さ 0 の辺も含めて共線。
+    hypot = math.hypot
+    stack: list[Point] = []
+    for point in points:
+        cx, cy = point
+        while len(stack) >= 2:
+            ax, ay = stack[-2]
+            bx, by = stack[-1]
+            abx = bx - ax
+            aby = by - ay
+            bcx = cx - bx
+            bcy = cy - by
+            cross = abx * bcy - aby * bcx
+            if cross and abs(cross) > collinear_tol * hypot(abx, aby) * hypot(bcx, bcy):
+                break
+            stack.pop()
+        stack.append(point)
+
+    # 継ぎ目: 末尾は先頭を、先頭は末尾を次の点として見直す。先頭を外すと末尾側の判定が変わるので両方が落ち着くまで繰り返す。
+    start = 0
+    while len(stack) - start >= 3:
+        if is_collinear(stack[-2], stack[-1], stack[start], collinear_tol):
+            stack.pop()
+        elif is_collinear(stack[-1], stack[start], stack[start + 1], collinear_tol):
+            start += 1
+        else:
+            return stack[start:]
+    return []
+
+
+def bounding_box(polygons: Iterable[Sequence[Point]]) -> tuple[float, float, float, float]:
+    """Return ``(min_x, min_y, width, height)``; an empty extent becomes 1 so the viewBox stays valid."""
+    min_x = min_y = math.inf
+    max_x = max_y = -math.inf
+    for points in polygons:
+        for x, y in points:
+            if x < min_x:
+                min_x = x
+            if x > max_x:
+                max_x = x
+            if y < min_y:
+                min_y = y
+            if y > max_y:
+                max_y = y
+    if min_x > max_x:
+        raise ValueError("no points to bound")
+    width = max_x - min_x
+    height = max_y - min_y
+    if width <= 0:
+        width = 1.0
+    if height <= 0:
+        height = 1.0
+    return min_x, min_y, width, height
+
+
+def points_to_path(points: Sequence[Point], offset: Point = (0.0, 0.0)) -> str:
+    if len(points) < 2:
+        return ""
+    ox, oy = offset
+    commands = [f"M {format_number(points[0][0] - ox)} {format_number(points[0][1] - oy)}"]
+    commands.extend(f"L {format_number(p[0] - ox)} {format_number(p[1] - oy)}" for p in points[1:])
+    commands.append("Z")
+    return " ".join(commands)
+
+
+def build_svg(polygons: Sequence[tuple[Sequence[Point], str]], stroke_width: float = 1.0) -> str:
+    """Build the SVG text for ``(points, body name)`` pairs, moved so the drawing starts at the origin."""
+    min_x, min_y, width, height = bounding_box(points for points, _ in polygons)
+
+    svg_lines = [
+        '<?xml version="1.0" encoding="UTF-8"?>',
+        (
+            f'<svg xmlns="http://www.w3.org/2000/svg" version="1.1" '
+            f'width="{format_number(width)}mm" height="{format_number(height)}mm" '
+            f'viewBox="0 0 {format_number(width)} {format_number(height)}" '
+            'overflow="visible">'
+        ),
+        f'<g fill="none" stroke-width="{format_number(stroke_width)}" '
+        'stroke-linecap="round" stroke-linejoin="round">',
+    ]
+
+    used_ids: dict[str, int] = {}
+    index = 0
+    for points, name in polygons:
+        path = points_to_path(points, (min_x, min_y))
+        if not path:
+            continue
+        base_id = svg_id_from_name(name or "body")
+        count = used_ids.get(base_id, 0) + 1
+        used_ids[base_id] = count
+        path_id = base_id if count == 1 else f"{base_id}_{count}"
+        svg_lines.append(
+            f'<path id="{escape_xml_attr(path_id)}" '
+            f'data-name="{escape_xml_attr(name)}" '
+            f'd="{path}" stroke="{color_for_index(index)}"/>'
+        )
+        index += 1
+
+    svg_lines.append("</g>")
+    svg_lines.append("</svg>")
+    return "\n".join(svg_lines)
+
+
+def format_coordinate(value: float) -> str:
+    """Format a mm coordinate like the editor writes it (``12.5``, ``-3``), to 0.1 µm."""
+    text = f"{value:.4f}".rstrip("0").rstrip(".")
+    return "0" if text in ("-0", "") else text
+
+
+def shape_id_for(points: Sequence[tuple[str, str]], name: str) -> str:
+    # 同じ Body を書き出し直しても同じ ID になるよう、名前と座標から決める（エディター側で重複すれば振り直される）。
+    digest = hashlib.sha1(name.encode("utf-8"))
+    for x, y in points:
+        digest.update(f"{x},{y};".encode("ascii"))
+    return f"shape-{digest.hexdigest()[:8]}"
+
+
+def triorb_shapes(
+    polygons: Sequence[tuple[Sequence[Point], str]],
+    kind: str = DEFAULT_KIND,
+    fieldtype: str = DEFAULT_FIELDTYPE,
+) -> list[dict[str, Any]]:
+    """Turn ``(points, body name)`` pairs into TriOrb Polygon shapes in the editor's format.
+
+    The points are the ones :func:`build_svg` takes (mm, Y pointing down);
+    Y is flipped back the way the editor's SVG import does, but the
+    drawing keeps its Fusion origin instead of being moved to the SVG page.
+    """
+    shapes = []
+    for points, name in polygons:
+        if len(points) < 3:
+            continue
+        name = name or "Body"
+        coords = [(format_coordinate(x), format_coordinate(-y)) for x, y in points]
+        shapes.append(
+            {
+                "id": shape_id_for(coords, name),
+                "name": name,
+                "type": "Polygon",
+                "fieldtype": fieldtype,
+                "kind": kind,
+                "polygon": {"Type": kind, "points": [{"X": x, "Y": y} for x, y in coords]},
+            }
+        )
+    return shapes
+
+
+def _json_number(text: str) -> float | int:
+    value = float(text)
+    return int(value) if value.is_integer() else value
+
+
+def build_shapes_json(shapes: Sequence[dict[str, Any]]) -> str:
+    """Serialize shapes compactly: polygon points become ``[x, y]`` number pairs."""
+    compact = []
+    for shape in shapes:
+        polygon = shape["polygon"]
+        points = [[_json_number(point["X"]), _json_number(point["Y"])] for point in polygon["points"]]
+        compact.append({**shape, "polygon": {**polygon, "points": points}})
+    document = {"format": SHAPES_FORMAT, "version": 1, "unit": "mm", "source": SHAPES_SOURCE, "shapes": compact}
+    return json.dumps(document, ensure_ascii=False, separators=(",", ":"))
+
+
+def build_shapes_xml(shapes: Sequence[dict[str, Any]]) -> str:
+    """Build a ``<TriOrb_SICK_SLS_Editor><Shapes>`` fragment laid out like Save (TriOrb)."""
+    lines = [
+        '<?xml version="1.0" encoding="utf-8"?>',
+        f'<TriOrb_SICK_SLS_Editor Source="{escape_xml_attr(SHAPES_SOURCE)}">',
+        "  <Shapes>",
+    ]
+    for shape in shapes:
+        lines.append(
+            f'    <Shape ID="{escape_xml_attr(shape["id"])}" Name="{escape_xml_attr(shape["name"])}" '
+            f'Type="Polygon" Fieldtype="{escape_xml_attr(shape["fieldtype"])}" Kind="{escape_xml_attr(shape["kind"])}">'
+        )
+        lines.append(f'      <Polygon Type="{escape_xml_attr(shape["polygon"]["Type"])}">')
+        lines.extend(f'        <Point X="{point["X"]}" Y="{point["Y"]}" />' for point in shape["polygon"]["points"])
+        lines.append("      </Polygon>")
+        lines.append("    </Shape>")
+    lines.append("  </Shapes>")
+    lines.append("</TriOrb_SICK_SLS_Editor>")
+    return "\n".join(lines)
+
+
+def render_export(polygons: Sequence[tuple[Sequence[Point], str]], export_format: str) -> str:
+    """Return the file text for one of :data:`EXPORT_FORMATS`."""
+    if export_format not in EXPORT_FORMATS:
+        raise ValueError(f"unknown export format: {export_format}")
+    if export_format == "SVG":
+        return build_svg(polygons)
+    shapes = triorb_shapes(polygons)
+    if not shapes:
+        raise ValueError("no polygon with three or more points")
+    if EXPORT_FORMATS[export_format] == ".json":
+        return build_shapes_json(shapes)
+    return build_shapes_xml(shapes)
@@ -0,0 +1,180 @@
+from __future__ import annotations
+
+from collections import OrderedDict
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass, field
+import os
+from pathlib import Path
+import shutil
+import tempfile
+import threading
+import time
+from typing import IO, Any, Callable, Dict, Optional
+import uuid
+
+EXECUTOR_KINDS = ("process", "thread")
+# アップロード本体はこの単位でディスクへ書き出し、メモリに丸ごと載せない。
+COPY_CHUNK_SIZE = 256 * 1024
+
+
+class UploadQueueFull(RuntimeError):
+    """Raised when every worker is busy and the pending queue is full."""
+
+
+@dataclass
+class UploadJob:
+    """State of one uploaded document being parsed in the pool."""
+
+    id: str
+    filename: str
+    size: int
+    created: float = field(default_factory=time.time)
+    finished_at: Optional[float] = None
+    status: str = "pending"
+    result: Any = None
+    error: Optional[str] = None
+
+    @property
+    def finished(self) -> bool:
+        return self.status != "pending"
+
+
+class UploadJobs:
+    """Parse uploaded files in a bounded worker pool, off the request threads.
+
+    ``submit`` only streams the upload to a temporary file and queues
+    ``parse(path)``; callers poll :meth:`get` for the result. At most
+    ``max_pending`` uploads are queued or running at once, beyond that
+    ``submit`` raises :class:`UploadQueueFull` instead of blocking. Finished
+    jobs are kept for polling until ``max_finished`` newer ones replace them
+    or ``max_age`` seconds have passed since they finished. A process pool
+    broken by a crashed worker is replaced on the next upload.
+    """
+
+    def __init__(
+        self,
+        parse: Callable[[Path], Any],
+        *,
+        max_workers: int = 2,
+        max_pending: int = 8,
+        max_finished: int = 32,
+        max_age: float = 600.0,
+        executor: str = "process",
+        upload_dir: Optional[Path] = None,
+    ) -> None:
+        if executor not in EXECUTOR_KINDS:
+            raise ValueError(f"Unknown executor kind: {executor!r}")
+        if max_workers < 1 or max_pending < max_workers:
+            raise ValueError("max_pending must be at least max_workers (>= 1)")
+        self.parse = parse
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self.max_age = max_age
+        self.executor_kind = executor
+        self.upload_dir = Path(upload_dir) if upload_dir is not None else None
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._jobs: "OrderedDict[str, UploadJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[Executor] = None
+
+    def _ensure_executor(self) -> Executor:
+        # プロセスプールは最初のアップロードまで起動しない（テストや静的ビルドで無駄に fork しない）。
+        with self._lock:
+            if self._executor is None:
+                if self.executor_kind == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers, thread_name_prefix="upload-parse"
+                    )
+            return self._executor
+
+    def _discard_executor(self, executor: Executor) -> None:
+        with self._lock:
+            if self._executor is executor:
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def submit(self, stream: IO[bytes], filename: str = "") -> UploadJob:
+        """Copy ``stream`` to disk and queue it for parsing."""
+
+        if not self._slots.acquire(blocking=False):
+            raise UploadQueueFull("too many uploads are being processed")
+        path: Optional[Path] = None
+        try:
+            if self.upload_dir is not None:
+                self.upload_dir.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile(
+                prefix="upload-", suffix=".sgexml", dir=self.upload_dir, delete=False
+            ) as handle:
+                path = Path(handle.name)
+                shutil.copyfileobj(stream, handle, COPY_CHUNK_SIZE)
+                size = handle.tell()
+            job = UploadJob(id=uuid.uuid4().hex, filename=filename, size=size)
+            executor = self._ensure_executor()
+            try:
+                future = executor.submit(self.parse, path)
+            except BrokenProcessPool:
+                # ワーカーの異常終了で壊れたプールは作り直し、以降のアップロードを受け付け続ける。
+                self._discard_executor(executor)
+                future = self._ensure_executor().submit(self.parse, path)
+            # 投入に成功したジョブだけを登録する（失敗したジョブがいつまでも pending に残らない）。
+            with self._lock:
+                self._jobs[job.id] = job
+        except BaseException:
+            self._slots.release()
+            if path is not None:
+                _unlink_quietly(path)
+            raise
+        future.add_done_callback(lambda done: self._finish(job, path, done))
+        return job
+
+    def _finish(self, job: UploadJob, path: Path, future: Future) -> None:
+        try:
+            job.result = future.result()
+            job.finished_at = time.time()
+            job.status = "done"
+        except Exception as exc:  # noqa: BLE001 - 解析失敗はジョブの結果として返す
+            job.error = f"{type(exc).__name__}: {exc}"
+            job.finished_at = time.time()
+            job.status = "failed"
+        finally:
+            _unlink_quietly(path)
+            self._slots.release()
+            with self._lock:
+                self._evict_finished()
+
+    def _evict_finished(self) -> None:
+        # _lock を持った状態で呼ぶ。ポーリングされなくなった結果も max_age 秒で手放す。
+        cutoff = time.time() - self.max_age
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        overflow = set(finished[: max(0, len(finished) - self.max_finished)])
+        for job_id in finished:
+            if job_id in overflow or self._jobs[job_id].finished_at < cutoff:
+                del self._jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[UploadJob]:
+        with self._lock:
+            self._evict_finished()
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._evict_finished()
+            pending = sum(1 for job in self._jobs.values() if not job.finished)
+            return {"pending": pending, "finished": len(self._jobs) - pending, "max_pending": self.max_pending}
+
+    def shutdown(self, wait: bool = True) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait)
+
+
+def _unlink_quietly(path: Path) -> None:
+    try:
+        os.unlink(path)
+    except OSError:
+        pass